@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Almacenamiento de Ledgers - P2P USDT
+
+Capa de lectura y escritura usada por el tracker y el dashboard. Los CSV
+siguen siendo la fuente de verdad editable; junto a cada uno se mantiene un
+espejo binario tipado (Parquet o Feather si pyarrow está disponible, pickle de
+pandas si no) que se reconstruye automáticamente cuando cambia el mtime/tamaño
+del CSV. Las transacciones nuevas se agregan al final del CSV sin reescribirlo.
+Los ledgers conocidos se leen con los tipos y columnas fijos de `esquemas`.
+"""
+
+import os
+import io
+import csv
+import json
+import mmap
+import importlib.util
+from contextlib import contextmanager
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Union
+
+from esquemas import ledger_de, es_vigente, esquema_vigente, adaptar, tipar
+from registro_p2p import obtener_registro
+
+try:
+    import fcntl  # POSIX
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt  # Windows
+except ImportError:
+    msvcrt = None
+
+registro = obtener_registro('almacenamiento')
+
+NOMBRE_DIRECTORIO_CACHE = '.cache'
+VERSION_ESPEJO = 3  # 3: monedas, plataforma y fuente de fondos categóricas
+TAMAÑO_BLOQUE_CONTEO = 16 * 1024 * 1024
+
+# Conteos de registros ya calculados {ruta: (firma, registros)}
+_CONTEOS = {}
+
+# Formato de espejo -> (extensión, módulo requerido)
+FORMATOS_ESPEJO = {
+    'parquet': ('.parquet', 'pyarrow'),
+    'feather': ('.feather', 'pyarrow'),
+    'pickle': ('.pkl', None),
+}
+
+# Columna de fecha de cada ledger, parseada una sola vez al construir el espejo
+COLUMNAS_FECHA = {
+    'compras_usdt.csv': 'Fecha_Compra',
+    'ventas_usdt.csv': 'Fecha_Venta',
+    'conversiones_fiat.csv': 'Fecha_Conversion',
+}
+
+
+def formato_disponible(formato: str) -> bool:
+    """Indica si el formato de espejo puede usarse en este entorno"""
+    if formato not in FORMATOS_ESPEJO:
+        return False
+    modulo = FORMATOS_ESPEJO[formato][1]
+    return modulo is None or importlib.util.find_spec(modulo) is not None
+
+
+def formato_por_defecto() -> str:
+    """Parquet si hay pyarrow, si no pickle"""
+    return 'parquet' if formato_disponible('parquet') else 'pickle'
+
+
+@contextmanager
+def bloqueo_archivo(ruta: str):
+    """Bloqueo exclusivo entre procesos (archivo .cache/<csv>.lock) mientras se escribe el CSV"""
+    directorio = os.path.join(os.path.dirname(os.path.abspath(ruta)), NOMBRE_DIRECTORIO_CACHE)
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, os.path.basename(ruta) + '.lock'), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def leer_encabezado(ruta: str) -> List[str]:
+    """Lee solo la primera línea del CSV y devuelve sus columnas"""
+    with open(ruta, 'r', encoding='utf-8', newline='') as f:
+        primera = f.readline()
+    return next(csv.reader([primera]), []) if primera.strip() else []
+
+
+def leer_csv_tipado(origen, columnas: List[str] = None,
+                    chunksize: int = None) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """pd.read_csv con dtype/usecols del esquema vigente del ledger.
+
+    `origen` es una ruta o un buffer (en ese caso hay que pasar `columnas`, el
+    encabezado). Un esquema anterior se lee infiriendo tipos y se adapta en
+    memoria; un archivo que no es un ledger conocido se lee tal cual.
+    """
+    if columnas is None:
+        columnas = leer_encabezado(origen)
+    ledger = ledger_de(columnas)
+    if ledger is None:
+        return pd.read_csv(origen, chunksize=chunksize)
+
+    if es_vigente(columnas, ledger):
+        opciones = esquema_vigente(ledger).opciones_lectura()
+        if chunksize is not None:
+            return pd.read_csv(origen, chunksize=chunksize, **opciones)
+        try:
+            return pd.read_csv(origen, **opciones)
+        except ValueError as e:
+            # Un valor no numérico en una columna numérica: se lee infiriendo tipos
+            registro.warning(f"⚠️  {_nombre(origen)}: no respeta los tipos del esquema ({e}); se infieren")
+            if hasattr(origen, 'seek'):
+                origen.seek(0)
+            return tipar(adaptar(pd.read_csv(origen), ledger), ledger)
+
+    registro.warning(f"⚠️  {_nombre(origen)} usa un esquema anterior de {ledger}; se adapta en memoria "
+                     f"(migrarlo con: python src/migrar_ledgers.py {_nombre(origen)})")
+    if chunksize is not None:
+        return (tipar(adaptar(chunk, ledger), ledger) for chunk in pd.read_csv(origen, chunksize=chunksize))
+    return tipar(adaptar(pd.read_csv(origen), ledger), ledger)
+
+
+def _columna_fecha_esquema(ruta_csv: str) -> Optional[str]:
+    """Columna de fecha del ledger al que pertenece el encabezado (archivos con otro nombre)"""
+    ledger = ledger_de(leer_encabezado(ruta_csv)) if os.path.getsize(ruta_csv) > 0 else None
+    return esquema_vigente(ledger).columna_fecha if ledger else None
+
+
+def _nombre(origen) -> str:
+    return origen if isinstance(origen, str) else getattr(origen, 'name', 'CSV')
+
+
+def _formatear_fila(valores: List) -> str:
+    """Serializa una fila con el mismo formato que DataFrame.to_csv"""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(
+        ['' if valor is None or (isinstance(valor, float) and valor != valor) else valor for valor in valores])
+    return buffer.getvalue()
+
+
+def contar_registros(ruta: str) -> int:
+    """Cantidad de registros del CSV (líneas sin contar el encabezado).
+
+    Cuenta saltos de línea sobre el archivo mapeado en memoria, por bloques,
+    sin parsear el CSV. Como en `validacion.bloques_de_filas`, un salto solo
+    termina una fila si hay una cantidad par de comillas antes; los saltos
+    dentro de un valor entre comillas no se cuentan. El resultado se cachea
+    hasta que cambia el archivo.
+    """
+    firma = firma_archivo(ruta)
+    cache = _CONTEOS.get(ruta)
+    if cache is not None and cache[0] == firma:
+        return cache[1]
+
+    lineas = 0
+    if firma['bytes'] > 0:
+        with open(ruta, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            entre_comillas = False
+            for inicio in range(0, len(mm), TAMAÑO_BLOQUE_CONTEO):
+                bloque = mm[inicio:inicio + TAMAÑO_BLOQUE_CONTEO]
+                if not entre_comillas and b'"' not in bloque:
+                    lineas += bloque.count(b'\n')
+                    continue
+                # Los tramos entre comillas alternan: fuera, dentro, fuera... ('""' deja un tramo vacío)
+                tramos = bloque.split(b'"')
+                lineas += sum(tramo.count(b'\n') for tramo in tramos[int(entre_comillas)::2])
+                entre_comillas ^= (len(tramos) - 1) % 2 == 1
+            if mm[-1:] != b'\n':
+                lineas += 1  # Última línea sin salto de línea final
+
+    registros = max(lineas - 1, 0)
+    _CONTEOS[ruta] = (firma, registros)
+    return registros
+
+
+def firma_archivo(ruta: str) -> Dict:
+    """mtime/tamaño/inode del archivo, usados para detectar cambios"""
+    st = os.stat(ruta)
+    return {'mtime_ns': st.st_mtime_ns, 'bytes': st.st_size, 'inode': st.st_ino}
+
+
+class AlmacenamientoLedgers:
+    """Lee ledgers CSV a través de un espejo binario tipado y agrega filas nuevas"""
+
+    def __init__(self, directorio_cache: str = None, formato: str = None):
+        # Si no se indica directorio, el espejo vive en <carpeta del CSV>/.cache
+        self.directorio_cache = directorio_cache
+        self.formato = formato or formato_por_defecto()
+        if not formato_disponible(self.formato):
+            raise ValueError(f"Formato de espejo no disponible: {self.formato}")
+
+        # Estadísticas de uso del espejo
+        self.reconstrucciones = 0
+        self.lecturas_espejo = 0
+
+        # Encabezados ya validados {ruta: (firma, columnas)}
+        self._encabezados = {}
+
+        # Índices de IDs a actualizar en cada alta {ruta absoluta: IndiceIDs}
+        self.indices = {}
+
+    def leer(self, ruta_csv: str, columna_fecha: str = None) -> pd.DataFrame:
+        """Devuelve el ledger tipado; reconstruye el espejo si el CSV cambió"""
+        if columna_fecha is None:
+            columna_fecha = COLUMNAS_FECHA.get(os.path.basename(ruta_csv)) or _columna_fecha_esquema(ruta_csv)
+
+        firma = firma_archivo(ruta_csv)
+        ruta_espejo, ruta_meta = self._rutas_espejo(ruta_csv)
+        meta = self._leer_meta(ruta_meta)
+
+        if self._espejo_vigente(meta, firma, columna_fecha) and os.path.exists(ruta_espejo):
+            try:
+                df = self._leer_espejo(ruta_espejo)
+                self.lecturas_espejo += 1
+                return df
+            except Exception:
+                pass  # Espejo corrupto o ilegible: se reconstruye desde el CSV
+
+        df = leer_csv_tipado(ruta_csv)
+        if columna_fecha and columna_fecha in df.columns:
+            df[columna_fecha] = pd.to_datetime(df[columna_fecha], format='mixed')
+
+        self._escribir_espejo(df, ruta_espejo, ruta_meta, {
+            'version': VERSION_ESPEJO,
+            'formato': self.formato,
+            'columna_fecha': columna_fecha,
+            'csv': firma,
+        })
+        self.reconstrucciones += 1
+        return df
+
+    def registrar_indice(self, indice):
+        """Asocia un índice de IDs a su CSV para actualizarlo en cada alta"""
+        self.indices[os.path.abspath(indice.ruta_csv)] = indice
+
+    def agregar_fila(self, ruta_csv: str, fila: Dict) -> bool:
+        """Agrega una fila al final del CSV con bloqueo y fsync.
+
+        Si la fila trae columnas que el encabezado no tiene (o el archivo no
+        existe), reescribe el archivo de forma atómica (temporal + rename).
+        Devuelve True si la fila se agregó sin reescribir el archivo.
+        """
+        with bloqueo_archivo(ruta_csv):
+            indice = self.indices.get(os.path.abspath(ruta_csv))
+            if indice is not None:
+                indice.sincronizar()
+
+            agregada = self._escribir_fila(ruta_csv, fila)
+
+            if indice is not None and indice.columna_id in fila:
+                indice.registrar(fila[indice.columna_id])
+            return agregada
+
+    def _escribir_fila(self, ruta_csv: str, fila: Dict) -> bool:
+        """Escribe la fila al final o, si cambia el esquema, reescribe el archivo"""
+        columnas = self._encabezado_validado(ruta_csv)
+
+        if not columnas or any(col not in columnas for col in fila):
+            self._reescribir_con_fila(ruta_csv, fila)
+            self._encabezados.pop(ruta_csv, None)
+            return False
+
+        linea = _formatear_fila([fila.get(col) for col in columnas])
+        with open(ruta_csv, 'r+b') as f:
+            # Si el archivo no termina en salto de línea, se agrega antes de la fila nueva
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    linea = '\n' + linea
+            f.seek(0, os.SEEK_END)
+            f.write(linea.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._encabezados[ruta_csv] = (firma_archivo(ruta_csv), columnas)
+        return True
+
+    def _encabezado_validado(self, ruta_csv: str) -> List[str]:
+        """Columnas del CSV; solo se relee el encabezado si el archivo cambió fuera de la app"""
+        if not os.path.exists(ruta_csv) or os.path.getsize(ruta_csv) == 0:
+            return []
+        firma = firma_archivo(ruta_csv)
+        cache = self._encabezados.get(ruta_csv)
+        if cache is not None and cache[0] == firma:
+            return cache[1]
+        columnas = leer_encabezado(ruta_csv)
+        self._encabezados[ruta_csv] = (firma, columnas)
+        return columnas
+
+    def _reescribir_con_fila(self, ruta_csv: str, fila: Dict):
+        """Reescritura atómica del CSV con la fila nueva (cambio de esquema o archivo nuevo)"""
+        nueva = pd.DataFrame([fila])
+        if os.path.exists(ruta_csv) and os.path.getsize(ruta_csv) > 0:
+            df = pd.concat([pd.read_csv(ruta_csv), nueva], ignore_index=True)
+        else:
+            df = nueva
+
+        directorio = os.path.dirname(os.path.abspath(ruta_csv))
+        os.makedirs(directorio, exist_ok=True)
+        ruta_tmp = ruta_csv + '.tmp'
+        with open(ruta_tmp, 'w', encoding='utf-8', newline='') as f:
+            df.to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ruta_tmp, ruta_csv)
+
+    def invalidar(self, ruta_csv: str):
+        """Elimina el espejo de un CSV (se reconstruirá en la próxima lectura)"""
+        for ruta in self._rutas_espejo(ruta_csv):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+
+    def _rutas_espejo(self, ruta_csv: str):
+        """Rutas del espejo binario y de su metadato"""
+        directorio = self.directorio_cache or os.path.join(os.path.dirname(os.path.abspath(ruta_csv)), NOMBRE_DIRECTORIO_CACHE)
+        base = os.path.splitext(os.path.basename(ruta_csv))[0]
+        extension = FORMATOS_ESPEJO[self.formato][0]
+        return (os.path.join(directorio, base + extension),
+                os.path.join(directorio, base + '.meta.json'))
+
+    def _espejo_vigente(self, meta: Optional[Dict], firma: Dict, columna_fecha: str) -> bool:
+        """El espejo sirve si fue construido con el mismo formato a partir del mismo CSV"""
+        return (meta is not None
+                and meta.get('version') == VERSION_ESPEJO
+                and meta.get('formato') == self.formato
+                and meta.get('columna_fecha') == columna_fecha
+                and meta.get('csv') == firma)
+
+    def _leer_meta(self, ruta_meta: str) -> Optional[Dict]:
+        """Lee el metadato del espejo, o None si no existe o es inválido"""
+        try:
+            with open(ruta_meta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _leer_espejo(self, ruta_espejo: str) -> pd.DataFrame:
+        """Lee el espejo binario según el formato configurado"""
+        if self.formato == 'parquet':
+            return pd.read_parquet(ruta_espejo)
+        if self.formato == 'feather':
+            return pd.read_feather(ruta_espejo)
+        return pd.read_pickle(ruta_espejo)
+
+    def _escribir_espejo(self, df: pd.DataFrame, ruta_espejo: str, ruta_meta: str, meta: Dict):
+        """Escribe espejo y metadato de forma atómica; si falla, solo se pierde el espejo"""
+        try:
+            os.makedirs(os.path.dirname(ruta_espejo), exist_ok=True)
+            ruta_tmp = ruta_espejo + '.tmp'
+            if self.formato == 'parquet':
+                df.to_parquet(ruta_tmp, index=False)
+            elif self.formato == 'feather':
+                df.reset_index(drop=True).to_feather(ruta_tmp)
+            else:
+                df.to_pickle(ruta_tmp)
+            os.replace(ruta_tmp, ruta_espejo)
+
+            ruta_meta_tmp = ruta_meta + '.tmp'
+            with open(ruta_meta_tmp, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(ruta_meta_tmp, ruta_meta)
+        except Exception:
+            # El espejo es solo una optimización: los datos siguen en el CSV
+            for ruta in (ruta_espejo, ruta_meta):
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+
+
+class CacheLedgers:
+    """Caché en memoria de ledgers tipados, invalidada por mtime/tamaño/inode.
+
+    Los DataFrames devueltos se comparten entre pantallas: no deben modificarse.
+    """
+
+    def __init__(self, almacen: AlmacenamientoLedgers = None):
+        self.almacen = almacen or AlmacenamientoLedgers()
+        self._entradas = {}  # {ruta: {'firma', 'df', 'registros'}}
+
+        # Contadores de uso
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, ruta_csv: str) -> pd.DataFrame:
+        """DataFrame tipado del ledger; solo se recarga si el archivo cambió"""
+        return self._entrada(ruta_csv)['df']
+
+    def registros(self, ruta_csv: str) -> List[Dict]:
+        """Filas del ledger como lista de dicts (copia de la lista cacheada)"""
+        entrada = self._entrada(ruta_csv)
+        if entrada['registros'] is None:
+            entrada['registros'] = entrada['df'].to_dict('records')
+        return list(entrada['registros'])
+
+    def version(self, *rutas_csv: str) -> tuple:
+        """Firma combinada de los ledgers; cambia cuando cambia alguno de ellos"""
+        firmas = []
+        for ruta in rutas_csv:
+            firma = _firma_o_none(ruta)
+            firmas.append(None if firma is None else (firma['mtime_ns'], firma['bytes'], firma['inode']))
+        return tuple(firmas)
+
+    def invalidar(self, ruta_csv: str = None):
+        """Descarta una entrada (o todas) para forzar la recarga"""
+        if ruta_csv is None:
+            self._entradas.clear()
+        else:
+            self._entradas.pop(ruta_csv, None)
+
+    def estadisticas(self) -> Dict:
+        """Aciertos, fallos y ledgers en memoria"""
+        total = self.aciertos + self.fallos
+        return {
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': self.aciertos / total if total else 0.0,
+            'ledgers_en_memoria': len(self._entradas),
+        }
+
+    def _entrada(self, ruta_csv: str) -> Dict:
+        """Devuelve la entrada vigente del ledger, recargándola si cambió"""
+        firma = _firma_o_none(ruta_csv)
+        entrada = self._entradas.get(ruta_csv)
+        if entrada is not None and entrada['firma'] == firma:
+            self.aciertos += 1
+            return entrada
+
+        self.fallos += 1
+        df = self.almacen.leer(ruta_csv) if firma is not None else pd.DataFrame()
+        entrada = {'firma': firma, 'df': df, 'registros': None}
+        self._entradas[ruta_csv] = entrada
+        return entrada
+
+
+def _firma_o_none(ruta: str) -> Optional[Dict]:
+    """Firma del archivo, o None si no existe"""
+    try:
+        return firma_archivo(ruta)
+    except OSError:
+        return None
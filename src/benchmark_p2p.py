@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark P2P Cripto - USDT
+
+Suites disponibles:
+- pipeline: genera un ledger sintético determinista (compras, ventas y
+  conversiones) y cronometra cada etapa de P2PTracker y las funciones de
+  datos/métricas del dashboard ejecutado sin interfaz.
+- comisiones: compara el cálculo de comisiones y normalización a USD fila
+  por fila (DataFrame.apply, implementación original) contra el motor
+  columnar de motor_comisiones.
+
+Uso:
+    python src/benchmark_p2p.py [filas ...] [--suite pipeline|comisiones] [--json resultados.json]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List
+
+from script_p2p_tracker import P2PTracker
+
+TAMAÑOS_POR_DEFECTO = [10_000, 100_000, 1_000_000]
+TAMAÑOS_PIPELINE = [1_000, 10_000, 100_000]
+
+# Mezclas del ledger sintético
+PLATAFORMAS_SINTETICAS = (['binance', 'Binance', 'kucoin', 'otro'], [0.55, 0.05, 0.25, 0.15])
+MONEDAS_SINTETICAS = (['UYU', 'USD'], [0.7, 0.3])
+FUENTES_SINTETICAS = ['Capital Nuevo', 'Ahorros UYU', 'Ahorros USD']
+PROPORCION_VENTAS = 0.8         # Ventas por cada compra
+PROPORCION_CONVERSIONES = 0.1   # Conversiones por cada compra
+PROPORCION_VENTA_ID = 0.35      # Compras financiadas con fiat de una venta previa (Venta_ID_)
+PROPORCION_RETROACTIVAS = 0.02  # Filas cargadas tarde, con fecha anterior a sus vecinas
+FECHA_INICIO_SINTETICA = pd.Timestamp('2022-01-01')
+DURACION_SINTETICA_S = 3 * 365 * 86400
+FILAS_POR_CHUNK_SINTETICO = 1_000_000
+
+
+def generar_compras_sinteticas(filas: int, semilla: int = 42) -> pd.DataFrame:
+    """Genera compras sintéticas con mezcla de plataformas, monedas y comisiones manuales"""
+    rng = np.random.default_rng(semilla)
+    monedas = rng.choice(['UYU', 'USD'], size=filas)
+    es_uyu = monedas == 'UYU'
+    return pd.DataFrame({
+        'ID_Compra': [f"C{i + 1}" for i in range(filas)],
+        'Fecha_Compra': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365 * 86400, filas), unit='s'),
+        'Cantidad_USDT_Comprada': rng.uniform(1, 500, filas).round(2),
+        'Moneda_Pago': monedas,
+        'Precio_Unitario_Moneda_Pago': np.where(es_uyu, rng.uniform(38, 42, filas), rng.uniform(0.99, 1.03, filas)).round(3),
+        'Tasa_Cambio_UYU_USD_Compra': np.where(es_uyu, rng.uniform(38, 42, filas).round(2), 1.0),
+        'Fuente_De_Fondos_Fiat': 'Capital Nuevo',
+        'Comisiones_Compra_Moneda_Pago': np.where(rng.random(filas) < 0.3, rng.uniform(0, 5, filas).round(2), 0.0),
+        'Plataforma': rng.choice(['binance', 'kucoin', 'otro'], size=filas),
+    })
+
+
+def generar_ventas_sinteticas(filas: int, semilla: int = 43) -> pd.DataFrame:
+    """Genera ventas sintéticas con mezcla de plataformas, monedas y comisiones manuales"""
+    rng = np.random.default_rng(semilla)
+    monedas = rng.choice(['UYU', 'USD'], size=filas)
+    es_uyu = monedas == 'UYU'
+    return pd.DataFrame({
+        'ID_Venta': [f"V{i + 1}" for i in range(filas)],
+        'Fecha_Venta': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365 * 86400, filas), unit='s'),
+        'Cantidad_USDT_Vendida': rng.uniform(1, 400, filas).round(2),
+        'Moneda_Recibida': monedas,
+        'Precio_Unitario_Moneda_Recibida': np.where(es_uyu, rng.uniform(39, 43, filas), rng.uniform(1.0, 1.05, filas)).round(3),
+        'Tasa_Cambio_UYU_USD_Venta': np.where(es_uyu, rng.uniform(38, 42, filas).round(2), 1.0),
+        'Comisiones_Venta_Moneda_Recibida': np.where(rng.random(filas) < 0.3, rng.uniform(0, 5, filas).round(2), 0.0),
+        'Plataforma': rng.choice(['binance', 'kucoin', 'otro'], size=filas),
+    })
+
+
+def _fechas_sinteticas(indices: np.ndarray, total: int, rng: np.random.Generator) -> pd.Series:
+    """Fechas crecientes con el índice, con ruido y algunas filas retroactivas (fuera de orden)"""
+    segundos = indices / max(total, 1) * DURACION_SINTETICA_S + rng.normal(0, 6 * 3600, len(indices))
+    retroactivas = rng.random(len(indices)) < PROPORCION_RETROACTIVAS
+    segundos[retroactivas] -= rng.uniform(0, 30 * 86400, retroactivas.sum())
+    segundos = np.clip(segundos, 0, DURACION_SINTETICA_S).astype('int64')
+    return pd.Series(FECHA_INICIO_SINTETICA + pd.to_timedelta(segundos, unit='s'))
+
+
+def _precios_y_tasas(monedas: np.ndarray, rng: np.random.Generator, precio_uyu: tuple, precio_usd: tuple):
+    """Precio unitario y tasa UYU/USD coherentes con la moneda de cada fila"""
+    n = len(monedas)
+    es_uyu = monedas == 'UYU'
+    precios = np.where(es_uyu, rng.uniform(*precio_uyu, n).round(2), rng.uniform(*precio_usd, n).round(3))
+    tasas = np.where(es_uyu, rng.uniform(38.5, 41.5, n).round(2), 1.0)
+    return precios, tasas
+
+
+def _comisiones_sinteticas(filas: int, rng: np.random.Generator) -> np.ndarray:
+    """70% automáticas (0), 20% manuales y 10% vacías"""
+    sorteo = rng.random(filas)
+    comisiones = np.where(sorteo < 0.7, 0.0, rng.uniform(0.1, 5, filas).round(2))
+    comisiones[sorteo >= 0.9] = np.nan
+    return comisiones
+
+
+def _chunk_compras(inicio: int, filas: int, total: int, total_ventas: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Compras [inicio, inicio + filas) del ledger sintético"""
+    indices = np.arange(inicio, inicio + filas)
+    monedas = rng.choice(MONEDAS_SINTETICAS[0], size=filas, p=MONEDAS_SINTETICAS[1])
+    precios, tasas = _precios_y_tasas(monedas, rng, (39, 42), (0.99, 1.03))
+
+    # Fiat de una venta anterior en la línea de tiempo, o una fuente de capital
+    venta_previa = (indices / max(total, 1) * total_ventas).astype('int64') - rng.integers(1, 50, filas)
+    usa_venta = (rng.random(filas) < PROPORCION_VENTA_ID) & (venta_previa >= 0)
+    fuentes = rng.choice(FUENTES_SINTETICAS, size=filas).astype(object)
+    fuentes[usa_venta] = [f"Venta_ID_V{j + 1}" for j in venta_previa[usa_venta]]
+
+    return pd.DataFrame({
+        'ID_Compra': [f"C{i + 1}" for i in indices],
+        'Fecha_Compra': _fechas_sinteticas(indices, total, rng),
+        'Cantidad_USDT_Comprada': rng.uniform(10, 1000, filas).round(2),
+        'Moneda_Pago': monedas,
+        'Precio_Unitario_Moneda_Pago': precios,
+        'Tasa_Cambio_UYU_USD_Compra': tasas,
+        'Fuente_De_Fondos_Fiat': fuentes,
+        'Comisiones_Compra_Moneda_Pago': _comisiones_sinteticas(filas, rng),
+        'Plataforma': rng.choice(PLATAFORMAS_SINTETICAS[0], size=filas, p=PLATAFORMAS_SINTETICAS[1]),
+    })
+
+
+def _chunk_ventas(inicio: int, filas: int, total: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Ventas [inicio, inicio + filas) del ledger sintético"""
+    indices = np.arange(inicio, inicio + filas)
+    monedas = rng.choice(MONEDAS_SINTETICAS[0], size=filas, p=MONEDAS_SINTETICAS[1])
+    precios, tasas = _precios_y_tasas(monedas, rng, (39.5, 42.5), (1.0, 1.05))
+    return pd.DataFrame({
+        'ID_Venta': [f"V{i + 1}" for i in indices],
+        'Fecha_Venta': _fechas_sinteticas(indices, total, rng),
+        'Cantidad_USDT_Vendida': rng.uniform(10, 1000, filas).round(2),
+        'Moneda_Recibida': monedas,
+        'Precio_Unitario_Moneda_Recibida': precios,
+        'Tasa_Cambio_UYU_USD_Venta': tasas,
+        'Comisiones_Venta_Moneda_Recibida': _comisiones_sinteticas(filas, rng),
+        'Plataforma': rng.choice(PLATAFORMAS_SINTETICAS[0], size=filas, p=PLATAFORMAS_SINTETICAS[1]),
+    })
+
+
+def _chunk_conversiones(inicio: int, filas: int, total: int, total_ventas: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Conversiones UYU -> USD asociadas a ventas previas (algunas sin venta o con ID inexistente)"""
+    indices = np.arange(inicio, inicio + filas)
+    ventas = np.minimum((indices / max(total, 1) * total_ventas).astype('int64'), max(total_ventas - 1, 0))
+    segundos_venta = ventas / max(total_ventas, 1) * DURACION_SINTETICA_S
+    segundos = (segundos_venta + rng.uniform(3600, 3 * 86400, filas)).astype('int64')
+
+    asociadas = np.array([f"V{j + 1}" for j in ventas], dtype=object)
+    sorteo = rng.random(filas)
+    asociadas[sorteo < 0.05] = np.nan
+    asociadas[(sorteo >= 0.05) & (sorteo < 0.07)] = 'V0'  # ID inexistente
+
+    cantidad_origen = rng.uniform(1000, 40000, filas).round(2)
+    cantidad_destino = (cantidad_origen / rng.uniform(38.5, 41.5, filas)).round(2)
+    return pd.DataFrame({
+        'ID_Conversion': [f"CF{i + 1}" for i in indices],
+        'Fecha_Conversion': pd.Series(FECHA_INICIO_SINTETICA + pd.to_timedelta(segundos, unit='s')),
+        'Moneda_Origen': 'UYU',
+        'Cantidad_Origen': cantidad_origen,
+        'Moneda_Destino': 'USD',
+        'Cantidad_Destino': cantidad_destino,
+        'Tasa_Conversion_Implicita': (cantidad_origen / cantidad_destino).round(4),
+        'ID_Venta_Asociada': asociadas,
+        'Notas': 'Conversión sintética',
+    })
+
+
+def generar_ledger_sintetico(directorio: str, filas: int, semilla: int = 42,
+                             filas_por_chunk: int = FILAS_POR_CHUNK_SINTETICO) -> Dict[str, str]:
+    """Escribe compras, ventas y conversiones sintéticas deterministas en `directorio`.
+
+    `filas` es la cantidad de compras; ventas y conversiones se escalan con
+    PROPORCION_VENTAS y PROPORCION_CONVERSIONES. Se genera por chunks para que
+    10M de filas no requieran tener el ledger completo en memoria.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    totales = {
+        'compras': filas,
+        'ventas': int(filas * PROPORCION_VENTAS),
+        'conversiones': int(filas * PROPORCION_CONVERSIONES),
+    }
+    generadores = {
+        'compras': lambda inicio, n, rng: _chunk_compras(inicio, n, totales['compras'], totales['ventas'], rng),
+        'ventas': lambda inicio, n, rng: _chunk_ventas(inicio, n, totales['ventas'], rng),
+        'conversiones': lambda inicio, n, rng: _chunk_conversiones(inicio, n, totales['conversiones'], totales['ventas'], rng),
+    }
+    rutas = {
+        'compras': os.path.join(directorio, 'compras_usdt.csv'),
+        'ventas': os.path.join(directorio, 'ventas_usdt.csv'),
+        'conversiones': os.path.join(directorio, 'conversiones_fiat.csv'),
+    }
+
+    for numero_ledger, (clave, generar) in enumerate(generadores.items()):
+        total = totales[clave]
+        with open(rutas[clave], 'w', encoding='utf-8', newline='') as f:
+            for numero_chunk, inicio in enumerate(range(0, max(total, 1), filas_por_chunk)):
+                rng = np.random.default_rng([semilla, numero_ledger, numero_chunk])
+                chunk = generar(inicio, min(filas_por_chunk, total - inicio), rng)
+                chunk.to_csv(f, index=False, header=(inicio == 0))
+    return rutas
+
+
+def preliminares_compras_fila_a_fila(df_compras: pd.DataFrame) -> pd.DataFrame:
+    """Implementación original (apply por fila) de los preliminares de compras, usada como referencia"""
+    df = df_compras.copy()
+    df['Plataforma'] = df['Plataforma'].astype(str).str.lower()
+    df['Comisiones_Compra_Moneda_Pago'] = df['Comisiones_Compra_Moneda_Pago'].fillna(0)
+
+    def calcular_comision_compra(row):
+        plataforma_val = str(row['Plataforma']).lower() if pd.notna(row['Plataforma']) else 'otro'
+        if plataforma_val == 'binance' and row['Comisiones_Compra_Moneda_Pago'] == 0:
+            tasa_comision_binance = 0
+            if row['Moneda_Pago'] == 'UYU':
+                tasa_comision_binance = P2PTracker.BINANCE_FEE_UYU
+            elif row['Moneda_Pago'] == 'USD':
+                tasa_comision_binance = P2PTracker.BINANCE_FEE_USD
+            if tasa_comision_binance > 0:
+                comision_en_usdt = row['Cantidad_USDT_Comprada'] * tasa_comision_binance
+                return comision_en_usdt * row['Precio_Unitario_Moneda_Pago']
+        return row['Comisiones_Compra_Moneda_Pago']
+
+    df['Comisiones_Compra_Moneda_Pago'] = df.apply(calcular_comision_compra, axis=1)
+    df['Costo_Total_Moneda_Pago'] = (
+        df['Cantidad_USDT_Comprada'] * df['Precio_Unitario_Moneda_Pago'] + df['Comisiones_Compra_Moneda_Pago']
+    )
+    df['Costo_Total_en_USD'] = df.apply(
+        lambda row: row['Costo_Total_Moneda_Pago'] if row['Moneda_Pago'] == 'USD'
+        else row['Costo_Total_Moneda_Pago'] / row['Tasa_Cambio_UYU_USD_Compra'],
+        axis=1
+    )
+    df['Costo_Adquisicion_Unitario_USD'] = df['Costo_Total_en_USD'] / df['Cantidad_USDT_Comprada']
+    return df
+
+
+def preliminares_ventas_fila_a_fila(df_ventas: pd.DataFrame) -> pd.DataFrame:
+    """Implementación original (apply por fila) de los preliminares de ventas, usada como referencia"""
+    df = df_ventas.copy()
+    df['Plataforma'] = df['Plataforma'].astype(str).str.lower()
+    df['Comisiones_Venta_Moneda_Recibida'] = df['Comisiones_Venta_Moneda_Recibida'].fillna(0)
+
+    def calcular_comision_venta(row):
+        plataforma_val = str(row['Plataforma']).lower() if pd.notna(row['Plataforma']) else 'otro'
+        if plataforma_val == 'binance' and row['Comisiones_Venta_Moneda_Recibida'] == 0:
+            tasa_comision_binance = 0
+            if row['Moneda_Recibida'] == 'UYU':
+                tasa_comision_binance = P2PTracker.BINANCE_FEE_UYU
+            elif row['Moneda_Recibida'] == 'USD':
+                tasa_comision_binance = P2PTracker.BINANCE_FEE_USD
+            if tasa_comision_binance > 0:
+                comision_en_usdt = row['Cantidad_USDT_Vendida'] * tasa_comision_binance
+                return comision_en_usdt * row['Precio_Unitario_Moneda_Recibida']
+        return row['Comisiones_Venta_Moneda_Recibida']
+
+    df['Comisiones_Venta_Moneda_Recibida'] = df.apply(calcular_comision_venta, axis=1)
+    df['Ingreso_Total_Moneda_Recibida'] = (
+        df['Cantidad_USDT_Vendida'] * df['Precio_Unitario_Moneda_Recibida'] - df['Comisiones_Venta_Moneda_Recibida']
+    )
+    df['Ingreso_Neto_en_USD'] = df.apply(
+        lambda row: row['Ingreso_Total_Moneda_Recibida'] if row['Moneda_Recibida'] == 'USD'
+        else row['Ingreso_Total_Moneda_Recibida'] / row['Tasa_Cambio_UYU_USD_Venta'],
+        axis=1
+    )
+    return df
+
+
+def _cronometrar(funcion) -> float:
+    """Ejecuta la función y devuelve los segundos transcurridos"""
+    inicio = time.perf_counter()
+    funcion()
+    return time.perf_counter() - inicio
+
+
+def benchmark_comisiones(tamaños: List[int] = None) -> List[Dict]:
+    """Compara ambos caminos de cálculo y verifica que los resultados sean idénticos"""
+    tamaños = tamaños or TAMAÑOS_POR_DEFECTO
+    resultados = []
+
+    for filas in tamaños:
+        print(f"🟡 Benchmark de comisiones con {filas:,} filas...")
+        tracker = P2PTracker()
+        tracker.df_compras = generar_compras_sinteticas(filas)
+        tracker.df_ventas = generar_ventas_sinteticas(filas)
+
+        referencia = {}
+        t_fila_compras = _cronometrar(lambda: referencia.update(compras=preliminares_compras_fila_a_fila(tracker.df_compras)))
+        t_fila_ventas = _cronometrar(lambda: referencia.update(ventas=preliminares_ventas_fila_a_fila(tracker.df_ventas)))
+        t_col_compras = _cronometrar(tracker.calcular_preliminares_compras)
+        t_col_ventas = _cronometrar(tracker.calcular_preliminares_ventas)
+
+        # Los resultados deben coincidir exactamente con el camino original
+        pd.testing.assert_frame_equal(tracker.df_compras_calc, referencia['compras'], check_exact=True)
+        columnas_ventas = list(referencia['ventas'].columns)
+        pd.testing.assert_frame_equal(tracker.df_ventas_calc[columnas_ventas], referencia['ventas'], check_exact=True)
+
+        resultado = {
+            'filas': filas,
+            'fila_a_fila_s': t_fila_compras + t_fila_ventas,
+            'columnar_s': t_col_compras + t_col_ventas,
+        }
+        resultado['aceleracion'] = resultado['fila_a_fila_s'] / resultado['columnar_s'] if resultado['columnar_s'] > 0 else float('inf')
+        resultados.append(resultado)
+        print(f"✅ {filas:,} filas: fila a fila {resultado['fila_a_fila_s']:.3f}s | "
+              f"columnar {resultado['columnar_s']:.3f}s | x{resultado['aceleracion']:.1f}")
+
+    return resultados
+
+
+def _cronometrar_etapas(etapas: List) -> Dict[str, float]:
+    """Cronometra cada (nombre, función) en orden, sin la salida por consola de las etapas"""
+    tiempos = {}
+    with open(os.devnull, 'w', encoding='utf-8') as nulo, contextlib.redirect_stdout(nulo):
+        for nombre, funcion in etapas:
+            tiempos[nombre] = _cronometrar(funcion)
+    return tiempos
+
+
+def benchmark_tracker(rutas: Dict[str, str], directorio_reportes: str) -> Dict[str, float]:
+    """Tiempo de cada etapa de P2PTracker sobre el ledger dado"""
+    tracker = P2PTracker(directorio_reportes=directorio_reportes)
+    argumentos = (rutas['compras'], rutas['ventas'], rutas['conversiones'])
+    return _cronometrar_etapas([
+        ('cargar_datos', lambda: tracker.cargar_datos(*argumentos)),  # Construye el espejo binario
+        ('cargar_datos_espejo', lambda: tracker.cargar_datos(*argumentos)),
+        ('calcular_preliminares_compras', tracker.calcular_preliminares_compras),
+        ('calcular_preliminares_ventas', tracker.calcular_preliminares_ventas),
+        ('crear_transacciones_ordenadas', tracker.crear_transacciones_ordenadas),
+        ('procesar_cpp_y_pl', tracker.procesar_cpp_y_pl),
+        ('procesar_conversiones_fiat', tracker.procesar_conversiones_fiat),
+        ('generar_reportes', tracker.generar_reportes),
+    ])
+
+
+def benchmark_dashboard(rutas: Dict[str, str]) -> Dict[str, float]:
+    """Tiempo de las funciones de datos y métricas del dashboard, sin interfaz"""
+    import dashboard_p2p
+    from rich.console import Console
+
+    # El dashboard lee las rutas de constantes del módulo
+    dashboard_p2p.COMPRAS_CSV = rutas['compras']
+    dashboard_p2p.VENTAS_CSV = rutas['ventas']
+    dashboard_p2p.CONVERSIONES_CSV = rutas['conversiones']
+
+    with open(os.devnull, 'w', encoding='utf-8') as nulo, contextlib.redirect_stdout(nulo):
+        dashboard = dashboard_p2p.P2PDashboardRich()
+    dashboard.console = Console(file=io.StringIO(), width=120)
+
+    return _cronometrar_etapas([
+        ('show_status_panel', dashboard.show_status_panel),
+        ('cargar_datos_rapido', dashboard.cargar_datos_rapido),
+        ('cargar_datos_rapido_cache', dashboard.cargar_datos_rapido),
+        ('obtener_metricas', dashboard.obtener_metricas),
+        ('obtener_metricas_cache', dashboard.obtener_metricas),
+        ('obtener_ultimo_id', lambda: dashboard.obtener_ultimo_id('venta')),
+        ('existe_id', lambda: dashboard.existe_id('venta', 'V1')),
+    ])
+
+
+def benchmark_pipeline(tamaños: List[int] = None, semilla: int = 42, directorio: str = None) -> List[Dict]:
+    """Genera un ledger sintético por tamaño y cronometra tracker y dashboard"""
+    tamaños = tamaños or TAMAÑOS_PIPELINE
+    directorio_base = directorio or tempfile.mkdtemp(prefix='benchmark_p2p_')
+    resultados = []
+
+    try:
+        for filas in tamaños:
+            print(f"🟡 Generando ledger sintético de {filas:,} compras...")
+            directorio_tamaño = os.path.join(directorio_base, f"filas_{filas}")
+            inicio = time.perf_counter()
+            rutas = generar_ledger_sintetico(directorio_tamaño, filas, semilla)
+            generacion_s = time.perf_counter() - inicio
+
+            print(f"🟡 Cronometrando tracker y dashboard...")
+            resultado = {
+                'filas_compras': filas,
+                'filas_ventas': int(filas * PROPORCION_VENTAS),
+                'filas_conversiones': int(filas * PROPORCION_CONVERSIONES),
+                'generacion_s': generacion_s,
+                'tracker': benchmark_tracker(rutas, os.path.join(directorio_tamaño, 'reports')),
+                'dashboard': benchmark_dashboard(rutas),
+            }
+            resultados.append(resultado)
+
+            total_tracker = sum(resultado['tracker'].values())
+            etapa_lenta = max(resultado['tracker'], key=resultado['tracker'].get)
+            print(f"✅ {filas:,} filas: tracker {total_tracker:.3f}s (más lenta: {etapa_lenta}) | "
+                  f"dashboard {sum(resultado['dashboard'].values()):.3f}s")
+    finally:
+        if directorio is None:
+            shutil.rmtree(directorio_base, ignore_errors=True)
+
+    return resultados
+
+
+def _commit_actual() -> str:
+    """Commit de git del código medido, o None si no está disponible"""
+    try:
+        salida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return salida.stdout.strip() or None
+
+
+def guardar_resultados_json(ruta: str, suite: str, resultados: List[Dict], semilla: int):
+    """Guarda los resultados con metadatos para comparar entre commits"""
+    documento = {
+        'suite': suite,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'semilla': semilla,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'resultados': resultados,
+    }
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(documento, f, ensure_ascii=False, indent=2)
+    print(f"✅ Resultados guardados en '{ruta}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del tracker y dashboard P2P")
+    parser.add_argument('filas', nargs='*', type=int, help="Tamaños a medir (compras del ledger sintético)")
+    parser.add_argument('--suite', choices=['pipeline', 'comisiones'], default='pipeline')
+    parser.add_argument('--json', dest='ruta_json', help="Archivo donde guardar los resultados")
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--directorio', help="Conservar los ledgers generados en este directorio")
+    args = parser.parse_args()
+
+    if args.suite == 'comisiones':
+        print("🚀 Iniciando benchmark de comisiones y normalización a USD...")
+        resultados = benchmark_comisiones(args.filas or TAMAÑOS_POR_DEFECTO)
+    else:
+        print("🚀 Iniciando benchmark del pipeline con ledgers sintéticos...")
+        resultados = benchmark_pipeline(args.filas or TAMAÑOS_PIPELINE, args.semilla, args.directorio)
+
+    if args.ruta_json:
+        guardar_resultados_json(args.ruta_json, args.suite, resultados, args.semilla)
+    print("\n🎉 ¡Benchmark completado!")
+
+
+if __name__ == "__main__":
+    main()
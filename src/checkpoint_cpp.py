@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Checkpoints de Inventario CPP - P2P USDT
+
+Persiste el estado del tracker (inventario, lotes de fiat, última fecha/ID y
+huella de los archivos procesados) para que la siguiente ejecución procese
+solo las filas agregadas al final de cada CSV. Los arreglos NumPy del estado
+(lotes y saldos de fiat) van a un archivo binario `.npz` al lado del JSON, que
+solo guarda su nombre: así el checkpoint se escribe y se lee sin pasar cada
+valor por texto.
+"""
+
+import io
+import csv
+import os
+import json
+import time
+import glob
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, Optional
+
+from almacenamiento import leer_csv_tipado
+
+VERSION_CHECKPOINT = 3  # 3: arreglos en un .npz aparte; 2: lotes de fiat en arreglos por moneda
+NOMBRE_CHECKPOINT = 'checkpoint_cpp.json'
+CLAVE_ARREGLO = '__arreglo__'  # {CLAVE_ARREGLO: nombre} reemplaza en el JSON a un arreglo del .npz
+TAMAÑO_BLOQUE = 1024 * 1024
+
+
+def huella_archivo(ruta: str, hasta_byte: int = None) -> str:
+    """Calcula la huella (blake2b) de los primeros `hasta_byte` bytes del archivo"""
+    h = hashlib.blake2b(digest_size=20)
+    restante = hasta_byte
+    with open(ruta, 'rb') as f:
+        while restante is None or restante > 0:
+            bloque = f.read(TAMAÑO_BLOQUE if restante is None else min(TAMAÑO_BLOQUE, restante))
+            if not bloque:
+                break
+            h.update(bloque)
+            if restante is not None:
+                restante -= len(bloque)
+    return h.hexdigest()
+
+
+def estado_archivo(ruta: str, hasta_byte: int = None) -> Dict:
+    """Devuelve tamaño y huella del archivo (o de sus primeros `hasta_byte` bytes, los que se leyeron)"""
+    bytes_leidos = os.path.getsize(ruta) if hasta_byte is None else hasta_byte
+    return {
+        'ruta': os.path.abspath(ruta),
+        'bytes': bytes_leidos,
+        'huella': huella_archivo(ruta, bytes_leidos),
+    }
+
+
+def verificar_prefijo(ruta: str, estado_previo: Dict) -> Optional[str]:
+    """Verifica que el archivo solo haya crecido por el final.
+
+    Devuelve None si el prefijo procesado está intacto, o el motivo por el
+    cual hay que recalcular todo.
+    """
+    if not os.path.exists(ruta):
+        return f"no existe {ruta}"
+    if os.path.abspath(ruta) != estado_previo.get('ruta'):
+        return f"cambió la ruta de {os.path.basename(ruta)}"
+
+    bytes_previos = estado_previo.get('bytes', 0)
+    if os.path.getsize(ruta) < bytes_previos:
+        return f"{os.path.basename(ruta)} se achicó"
+    if huella_archivo(ruta, bytes_previos) != estado_previo.get('huella'):
+        return f"{os.path.basename(ruta)} fue editado antes del checkpoint"
+
+    if bytes_previos > 0:
+        with open(ruta, 'rb') as f:
+            f.seek(bytes_previos - 1)
+            if f.read(1) != b'\n':
+                return f"{os.path.basename(ruta)} no terminaba en salto de línea"
+    return None
+
+
+def leer_filas_nuevas(ruta: str, desde_byte: int, hasta_byte: int = None) -> pd.DataFrame:
+    """Lee solo las filas agregadas entre `desde_byte` y `hasta_byte`, reutilizando el encabezado"""
+    with open(ruta, 'rb') as f:
+        encabezado = f.readline()
+        inicio = max(desde_byte, len(encabezado))
+        f.seek(inicio)
+        cola = f.read() if hasta_byte is None else f.read(max(hasta_byte - inicio, 0))
+    columnas = next(csv.reader([encabezado.decode('utf-8')]), [])
+    return leer_csv_tipado(io.BytesIO(encabezado + cola), columnas)
+
+
+def leer_prefijo_por_chunks(ruta: str, hasta_byte: int, filas_por_chunk: int) -> Iterator[pd.DataFrame]:
+    """Chunks tipados de los primeros `hasta_byte` bytes del CSV (no ve filas agregadas después)"""
+    with open(ruta, 'rb') as f:
+        columnas = next(csv.reader([f.readline().decode('utf-8')]), [])
+        f.seek(0)
+        yield from leer_csv_tipado(io.BufferedReader(_Prefijo(f, hasta_byte)), columnas, chunksize=filas_por_chunk)
+
+
+class _Prefijo(io.RawIOBase):
+    """Lectura de un archivo binario abierto que termina en `fin` aunque el archivo siga creciendo"""
+
+    def __init__(self, archivo, fin: int):
+        self._archivo = archivo
+        self._fin = fin
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self._fin - self._archivo.tell())
+        return self._archivo.readinto(memoryview(buffer)[:n]) if n > 0 else 0
+
+
+def cargar_checkpoint(ruta: str) -> Optional[Dict]:
+    """Carga el checkpoint si existe y es de una versión compatible (None si falta su .npz)"""
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('version') != VERSION_CHECKPOINT:
+            return None
+        nombre = checkpoint.pop('arreglos', None)
+        if nombre is None:
+            return checkpoint
+        with np.load(os.path.join(os.path.dirname(ruta), nombre), allow_pickle=False) as arreglos:
+            return _restaurar_arreglos(checkpoint, arreglos)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def guardar_checkpoint(ruta: str, checkpoint: Dict):
+    """Guarda el checkpoint de forma atómica (archivo temporal + rename).
+
+    El .npz lleva un nombre nuevo en cada guardado y el JSON lo referencia:
+    si se corta entre los dos archivos queda el par anterior intacto.
+    """
+    directorio = os.path.dirname(ruta)
+    os.makedirs(directorio, exist_ok=True)
+    base = os.path.splitext(os.path.basename(ruta))[0]
+    arreglos = {}
+    checkpoint = dict(_extraer_arreglos(checkpoint, arreglos), version=VERSION_CHECKPOINT)
+    if arreglos:
+        checkpoint['arreglos'] = f"{base}.{time.time_ns()}.npz"
+        ruta_arreglos = os.path.join(directorio, checkpoint['arreglos'])
+        with open(f"{ruta_arreglos}.tmp", 'wb') as f:
+            np.savez(f, **arreglos)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{ruta_arreglos}.tmp", ruta_arreglos)
+
+    ruta_tmp = f"{ruta}.tmp"
+    with open(ruta_tmp, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False, default=_serializar_valor)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(ruta_tmp, ruta)
+
+    # Los .npz de checkpoints anteriores ya no se referencian
+    for viejo in glob.glob(os.path.join(glob.escape(directorio), f"{glob.escape(base)}.*.npz")):
+        if os.path.basename(viejo) != checkpoint.get('arreglos'):
+            os.remove(viejo)
+
+
+def _extraer_arreglos(valor, arreglos: Dict[str, np.ndarray]):
+    """Copia de `valor` con cada np.ndarray movido a `arreglos` (los de objetos se guardan como texto)"""
+    if isinstance(valor, dict):
+        return {clave: _extraer_arreglos(v, arreglos) for clave, v in valor.items()}
+    if isinstance(valor, np.ndarray):
+        nombre = f"a{len(arreglos)}"
+        arreglos[nombre] = valor.astype(str) if valor.dtype == object else valor
+        return {CLAVE_ARREGLO: nombre}
+    return valor
+
+
+def _restaurar_arreglos(valor, arreglos):
+    """Inverso de `_extraer_arreglos`"""
+    if isinstance(valor, dict):
+        if set(valor) == {CLAVE_ARREGLO}:
+            return arreglos[valor[CLAVE_ARREGLO]]
+        return {clave: _restaurar_arreglos(v, arreglos) for clave, v in valor.items()}
+    return valor
+
+
+def _serializar_valor(valor):
+    """Convierte timestamps y escalares NumPy a tipos JSON"""
+    if valor is pd.NaT:
+        return None
+    if isinstance(valor, pd.Timestamp):
+        return valor.isoformat()
+    if hasattr(valor, 'item'):
+        return valor.item()
+    return valor
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Representación Compacta - P2P USDT
+
+Utilidades para mantener los ledgers en memoria con poco espacio:
+columnas de texto con pocos valores distintos (plataforma, monedas, fuente de
+fondos) como categóricas, es decir códigos enteros más un diccionario, y montos
+en punto fijo (enteros en millonésimas) para las sumas del CPP. Las
+transformaciones de texto se aplican a cada categoría distinta, no a cada fila.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Callable, List
+
+# Millonésimas: micro-USDT para cantidades y micro-USD para montos
+ESCALA_PUNTO_FIJO = 10**6
+
+
+def normalizar_categorias(serie: pd.Series, funcion: Callable[[pd.Index], pd.Index] = None,
+                          faltante: str = None) -> pd.Series:
+    """Categórica con `funcion` aplicada a las categorías (ej: minúsculas) y los vacíos como `faltante`.
+
+    Las categorías que quedan iguales después de normalizar se fusionan
+    ('Binance' y 'BINANCE' -> 'binance'). Acepta series de texto no categóricas.
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype('category')
+    categorias = serie.cat.categories.astype(str)
+    if funcion is not None:
+        categorias = funcion(categorias)
+    mapa, unicas = pd.factorize(categorias)
+    unicas = list(unicas)
+
+    codigos = serie.cat.codes.to_numpy()
+    nuevos = np.where(codigos >= 0, mapa[np.maximum(codigos, 0)] if len(mapa) else -1, -1)
+    if faltante is not None and (nuevos < 0).any():
+        if faltante not in unicas:
+            unicas.append(faltante)
+        nuevos[nuevos < 0] = unicas.index(faltante)
+    return pd.Series(pd.Categorical.from_codes(nuevos, categories=unicas), index=serie.index, name=serie.name)
+
+
+def categorizar(df: pd.DataFrame, columnas: List[str]) -> pd.DataFrame:
+    """Vuelve categóricas las columnas indicadas que existan (ej: tras concatenar archivos con otras categorías)"""
+    for columna in columnas:
+        if columna in df.columns and not isinstance(df[columna].dtype, pd.CategoricalDtype):
+            df[columna] = df[columna].astype('category')
+    return df
+
+
+def a_punto_fijo(valores, escala: int = ESCALA_PUNTO_FIJO) -> np.ndarray:
+    """Montos float a enteros int64 en 1/escala (redondeo al más cercano).
+
+    NaN e infinitos no tienen representación entera: ValueError en lugar de
+    convertirlos en silencio a 0 o a un entero desbordado.
+    """
+    valores = np.asarray(valores, dtype='float64')
+    if not np.isfinite(valores).all():
+        raise ValueError("a_punto_fijo: hay valores NaN o infinitos")
+    return np.rint(valores * escala).astype('int64')
+
+
+def desde_punto_fijo(enteros, escala: int = ESCALA_PUNTO_FIJO) -> np.ndarray:
+    """Enteros en 1/escala a float64"""
+    return np.asarray(enteros, dtype='float64') / escala
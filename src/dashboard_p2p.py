@@ -8,6 +8,7 @@ Fecha: 2024
 Dashboard interactivo profesional para seguimiento P2P USDT usando Rich
 """
 
+import numpy as np
 import pandas as pd
 import os
 import sys
@@ -23,12 +24,24 @@ from rich.text import Text
 from rich.columns import Columns
 from rich.padding import Padding
 from rich.prompt import Prompt, Confirm
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
 from rich.align import Align
 from rich.rule import Rule
 from rich import box
 from rich.style import Style
 
+from almacenamiento import AlmacenamientoLedgers, CacheLedgers, contar_registros
+from esquemas import esquema_vigente
+from migrar_ledgers import necesita_migracion, migrar_archivo
+from validacion import validar_ledgers, reemplazar_con_limpio
+from indice_ids import IndiceIDs
+from motor_metricas import MotorMetricas
+from ejecucion_cpp import EjecutorCPP, ResultadoCPP
+from motor_fiat import PREFIJO_FUENTE_VENTA, FUENTE_FIFO
+from paginador import PaginadorTabla, FILAS_POR_PAGINA, FILAS_VISTA_AMPLIA
+from motor_temporal import MotorTemporal, totales
+from motor_rentabilidad import MotorRentabilidad, VENTANAS_POR_DEFECTO, PERCENTILES_SPREAD
+
 # Importar la función para crear ejemplos desde el script tracker
 try:
     from script_p2p_tracker import crear_archivos_ejemplo as crear_ejemplos_desde_tracker
@@ -42,6 +55,7 @@ BASE_DIR = os.path.dirname(SCRIPT_DIR)
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 REPORTS_DIR = os.path.join(DATA_DIR, 'reports')
 BACKUPS_DIR = os.path.join(DATA_DIR, 'backups')
+LIMPIOS_DIR = os.path.join(DATA_DIR, 'limpios')  # Copias corregidas por la validación
 
 # Rutas a los archivos de datos principales
 COMPRAS_CSV = os.path.join(DATA_DIR, 'compras_usdt.csv')
@@ -67,6 +81,33 @@ class P2PDashboardRich:
         self.data_loaded = False
         self.calculations_done = False
         
+        # Lectura de CSV a través del espejo binario tipado (data/.cache)
+        self.almacen = AlmacenamientoLedgers()
+        
+        # Secuencia e índice de IDs por ledger, actualizados en cada alta
+        self.indices_ids = {
+            'compra': IndiceIDs(COMPRAS_CSV, 'ID_Compra', 'C'),
+            'venta': IndiceIDs(VENTAS_CSV, 'ID_Venta', 'V'),
+            'conversion': IndiceIDs(CONVERSIONES_CSV, 'ID_Conversion', 'CF')
+        }
+        for indice in self.indices_ids.values():
+            self.almacen.registrar_indice(indice)
+        
+        # Caché en memoria de DataFrames tipados, invalidada por mtime/tamaño/inode
+        self.cache = CacheLedgers(self.almacen)
+        
+        # Métricas vectorizadas compartidas por resumen y análisis, cacheadas por versión de datos
+        self.motor_metricas = MotorMetricas()
+        
+        # Pipeline CPP de P2PTracker en segundo plano; el resultado queda en memoria
+        self.ejecutor_cpp = EjecutorCPP(COMPRAS_CSV, VENTAS_CSV, CONVERSIONES_CSV, REPORTS_DIR)
+        
+        # Agregados por día/semana/mes sobre la salida CPP, cacheados por granularidad
+        self.motor_temporal = MotorTemporal()
+        
+        # Ventanas móviles de margen, spread y curva de P&L, cacheadas por tamaño de ventana
+        self.motor_rentabilidad = MotorRentabilidad()
+        
         # Base de datos simple
         self.datos = {
             'compras': [],
@@ -92,30 +133,26 @@ class P2PDashboardRich:
         self._inicializar_archivos_csv()
 
     def _inicializar_archivos_csv(self):
-        """Crea los archivos CSV con headers si no existen"""
+        """Crea los archivos CSV con headers si no existen y migra los de esquemas anteriores"""
         try:
             # Definir headers para cada archivo CSV
             csv_configs = {
                 COMPRAS_CSV: {
-                    'headers': ['ID_Compra', 'Fecha_Compra', 'Cantidad_USDT_Comprada', 'Moneda_Pago',
-                               'Precio_Unitario_Moneda_Pago', 'Tasa_Cambio_UYU_USD_Compra',
-                               'Fuente_De_Fondos_Fiat', 'Comisiones_Compra_Moneda_Pago', 'Plataforma'],
+                    'headers': esquema_vigente('compras').columnas,
                     'description': 'Compras USDT'
                 },
                 VENTAS_CSV: {
-                    'headers': ['ID_Venta', 'Fecha_Venta', 'Cantidad_USDT_Vendida', 'Moneda_Recibida',
-                               'Precio_Unitario_Moneda_Recibida', 'Tasa_Cambio_UYU_USD_Venta',
-                               'Comisiones_Venta_Moneda_Recibida', 'Plataforma'],
+                    'headers': esquema_vigente('ventas').columnas,
                     'description': 'Ventas USDT'
                 },
                 CONVERSIONES_CSV: {
-                    'headers': ['ID_Conversion', 'Fecha_Conversion', 'Monto_Origen', 'Moneda_Origen',
-                               'Monto_Destino', 'Moneda_Destino', 'Tasa_Cambio'],
+                    'headers': esquema_vigente('conversiones').columnas,
                     'description': 'Conversiones Fiat'
                 }
             }
             
             archivos_creados = []
+            archivos_migrados = []
             
             for ruta_archivo, config in csv_configs.items():
                 if not os.path.exists(ruta_archivo):
@@ -124,6 +161,18 @@ class P2PDashboardRich:
                     # Guardar el archivo CSV
                     df_empty.to_csv(ruta_archivo, index=False, encoding='utf-8')
                     archivos_creados.append(config['description'])
+                elif necesita_migracion(ruta_archivo):
+                    # Archivo de una versión anterior: se lleva al esquema vigente (queda <csv>.bak)
+                    migrar_archivo(ruta_archivo)
+                    archivos_migrados.append(config['description'])
+            
+            if archivos_migrados:
+                message = Text()
+                message.append("🔄 ", style="bright_blue")
+                message.append("Archivos CSV actualizados al esquema vigente (respaldo en .bak): ", style="dim white")
+                message.append(f"{', '.join(archivos_migrados)}", style="bright_green")
+                self.console.print(Panel(message, style="dim blue", box=box.ROUNDED, padding=(0, 1)))
+                self.console.print()
             
             # Mostrar mensaje discreto solo en primera ejecución
             if archivos_creados:
@@ -194,12 +243,10 @@ class P2PDashboardRich:
 
     def show_status_panel(self):
         """Muestra el panel de estado rápido"""
-        self.cargar_datos_rapido()
-        
-        # Calcular métricas básicas
-        num_compras = len(self.datos.get('compras', []))
-        num_ventas = len(self.datos.get('ventas', []))
-        num_conversiones = len(self.datos.get('conversiones', []))
+        # Conteo de registros a partir de los archivos, sin parsear los CSV
+        num_compras = self._contar_registros_archivo(COMPRAS_CSV)
+        num_ventas = self._contar_registros_archivo(VENTAS_CSV)
+        num_conversiones = self._contar_registros_archivo(CONVERSIONES_CSV)
         
         # Crear tabla de estado básico
         basic_stats = Table(show_header=False, box=None, padding=(0, 1))
@@ -232,6 +279,13 @@ class P2PDashboardRich:
         self.console.print(status_panel)
         self.console.print()
 
+    def _contar_registros_archivo(self, ruta: str) -> int:
+        """Cantidad de registros del CSV (0 si no existe o no se puede leer)"""
+        try:
+            return contar_registros(ruta) if os.path.exists(ruta) else 0
+        except OSError:
+            return 0
+
     def show_main_menu(self):
         """Muestra el menú principal elegante"""
         menu_items = [
@@ -309,78 +363,59 @@ class P2PDashboardRich:
         self.console.print(section_panel)
         self.console.print()
 
-    def display_dataframe_table(self, df: pd.DataFrame, title: str, max_rows: int = 15):
-        """Muestra una tabla de DataFrame con paginación usando Rich Table"""
+    def display_dataframe_table(self, df: pd.DataFrame, title: str, max_rows: int = FILAS_POR_PAGINA):
+        """Muestra una tabla de DataFrame con paginación usando Rich Table.
+        
+        Solo se formatean las filas visibles; "Ver todas" amplía la ventana a
+        FILAS_VISTA_AMPLIA filas desplazables en vez de dibujar la tabla completa.
+        """
         if df.empty:
             self.show_info_message(f"No hay datos para mostrar en {title}")
             Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
             return
 
-        total_rows = len(df)
-        start_row = 0
+        paginador = PaginadorTabla(df, title, max_rows)
+        vista_amplia = False
 
-        while start_row < total_rows:
+        while True:
             self.clear_screen()
             self.show_header()
+            self.console.print(paginador.tabla(compacta=vista_amplia))
             
-            end_row = min(start_row + max_rows, total_rows)
+            if paginador.total <= paginador.filas_por_pagina:
+                Prompt.ask("\n[bold]Presiona Enter para volver[/bold]")
+                break
             
-            # Crear tabla Rich
-            table = Table(
-                title=f"[bold]{title}[/bold] - Filas {start_row + 1} a {end_row} de {total_rows}",
-                box=box.ROUNDED,
-                header_style="bold magenta",
-                show_lines=True,
-                expand=True
+            # Controles de paginación
+            self.console.print(f"\n[bold]Mostrando {paginador.inicio + 1}-{paginador.fin} de {paginador.total} registros[/bold]")
+            opciones = []
+            if paginador.fin < paginador.total:
+                opciones.append(("s", "Siguiente página"))
+            if paginador.inicio > 0:
+                opciones.append(("a", "Anterior"))
+            opciones += [("i", "Inicio"), ("f", "Fin"), ("g", "Ir a fila"),
+                         ("t", "Vista normal" if vista_amplia else "Ver todas"), ("v", "Volver")]
+            action = Prompt.ask(
+                "[bold bright_yellow]" + " / ".join(f"{texto} ({letra})" for letra, texto in opciones) + "[/bold bright_yellow]",
+                choices=[letra for letra, _ in opciones],
+                default="s" if paginador.fin < paginador.total else "v"
             )
             
-            # Añadir columnas con anchos dinámicos
-            for col in df.columns:
-                if 'ID' in col:
-                    table.add_column(col, style="cyan", width=8)
-                elif 'Fecha' in col:
-                    table.add_column(col, style="blue", width=12)
-                elif any(word in col.lower() for word in ['cantidad', 'precio', 'ganancia', 'perdida', 'costo']):
-                    table.add_column(col, style="green", justify="right", width=12)
-                else:
-                    table.add_column(col, style="white", width=15)
-            
-            # Añadir filas con formato
-            df_slice = df.iloc[start_row:end_row]
-            for _, row in df_slice.iterrows():
-                formatted_row = []
-                for col, value in row.items():
-                    if pd.isna(value):
-                        formatted_row.append("[dim]N/A[/dim]")
-                    elif isinstance(value, (int, float)):
-                        if any(word in col.lower() for word in ['ganancia', 'perdida', 'pl']):
-                            color = "green" if value >= 0 else "red"
-                            formatted_row.append(f"[{color}]{value:,.2f}[/{color}]")
-                        else:
-                            formatted_row.append(f"{value:,.2f}" if isinstance(value, float) else str(value))
-                    else:
-                        formatted_row.append(str(value))
-                table.add_row(*formatted_row)
-            
-            self.console.print(table)
-            
-            # Controles de paginación
-            if end_row < total_rows:
-                self.console.print(f"\n[bold]Mostrando {end_row} de {total_rows} registros[/bold]")
-                action = Prompt.ask(
-                    "[bold bright_yellow]Siguiente página (s) / Ver todas (t) / Volver (v)[/bold bright_yellow]",
-                    choices=["s", "t", "v"],
-                    default="s"
-                )
-                
-                if action == "s":
-                    start_row = end_row
-                elif action == "t":
-                    max_rows = total_rows
-                else:
-                    break
+            if action == "s":
+                paginador.siguiente()
+            elif action == "a":
+                paginador.anterior()
+            elif action == "i":
+                paginador.ir_a(0)
+            elif action == "f":
+                paginador.ir_a(paginador.total)
+            elif action == "g":
+                fila = self._get_validated_float(f"Fila (1-{paginador.total})", min_val=1, max_val=paginador.total)
+                paginador.ir_a(int(fila) - 1)
+            elif action == "t":
+                vista_amplia = not vista_amplia
+                paginador.cambiar_tamaño(FILAS_VISTA_AMPLIA if vista_amplia else max_rows)
             else:
-                Prompt.ask("\n[bold]Presiona Enter para volver[/bold]")
                 break
 
     def _get_validated_float(self, prompt: str, min_val: float = None, max_val: float = None, default: float = None) -> float:
@@ -433,67 +468,82 @@ class P2PDashboardRich:
         self.console.print(summary_panel)
 
     def cargar_datos_rapido(self):
-        """Carga rápida de datos"""
+        """Carga rápida de datos desde la caché en memoria (solo relee archivos modificados)"""
         try:
-            if os.path.exists(COMPRAS_CSV):
-                df = pd.read_csv(COMPRAS_CSV)
-                self.datos['compras'] = df.to_dict('records')
-            else:
-                self.datos['compras'] = []
-            
-            if os.path.exists(VENTAS_CSV):
-                df = pd.read_csv(VENTAS_CSV)
-                self.datos['ventas'] = df.to_dict('records')
-            else:
-                self.datos['ventas'] = []
-                
-            if os.path.exists(CONVERSIONES_CSV):
-                df = pd.read_csv(CONVERSIONES_CSV)
-                self.datos['conversiones'] = df.to_dict('records')
-            else:
-                self.datos['conversiones'] = []
-            
+            self.datos['compras'] = self.cache.registros(COMPRAS_CSV)
+            self.datos['ventas'] = self.cache.registros(VENTAS_CSV)
+            self.datos['conversiones'] = self.cache.registros(CONVERSIONES_CSV)
             self.data_loaded = True
         except Exception as e:
             self.show_error_message(f"Error al cargar datos: {e}")
             self.data_loaded = False
 
-    def obtener_ultimo_id(self, tipo: str) -> int:
-        """Obtiene el último ID numérico"""
-        archivo_map = {
-            'compra': COMPRAS_CSV,
-            'venta': VENTAS_CSV,
-            'conversion': CONVERSIONES_CSV
-        }
+    def obtener_df(self, tipo: str) -> pd.DataFrame:
+        """DataFrame tipado y cacheado de 'compras', 'ventas' o 'conversiones' (no modificar)"""
+        ruta = {'compras': COMPRAS_CSV, 'ventas': VENTAS_CSV, 'conversiones': CONVERSIONES_CSV}[tipo]
+        return self.cache.obtener(ruta)
+
+    def version_datos(self) -> tuple:
+        """Versión combinada de los tres ledgers (cambia al modificar cualquiera)"""
+        return self.cache.version(COMPRAS_CSV, VENTAS_CSV, CONVERSIONES_CSV)
+
+    def obtener_metricas(self) -> Optional[Dict]:
+        """Métricas globales y por plataforma; se recalculan solo si cambió algún CSV"""
+        return self.motor_metricas.obtener(
+            self.version_datos(), self.obtener_df('compras'), self.obtener_df('ventas'), self.obtener_df('conversiones')
+        )
+
+    def obtener_resultado_cpp(self, generar_reportes: bool = False) -> Optional[ResultadoCPP]:
+        """Resultado del pipeline CPP para los datos actuales.
+        
+        Reutiliza el último si los ledgers no cambiaron; si no, corre el pipeline
+        en segundo plano mostrando el avance. None si falló o se dejó corriendo.
+        """
+        version = self.version_datos()
+        if self.ejecutor_cpp.en_curso() and not self._esperar_calculo_cpp():
+            return None
         
-        id_col_map = {
-            'compra': 'ID_Compra',
-            'venta': 'ID_Venta',
-            'conversion': 'ID_Conversion'
-        }
+        resultado = self.ejecutor_cpp.resultado_vigente(version)
+        if resultado is None or generar_reportes:
+            self.ejecutor_cpp.iniciar(version, generar_reportes)
+            if not self._esperar_calculo_cpp():
+                return None
+            resultado = self.ejecutor_cpp.resultado_vigente(version)
+        return resultado
+
+    def _esperar_calculo_cpp(self) -> bool:
+        """Barra de progreso del cálculo en curso; Ctrl+C vuelve al menú sin cortarlo"""
+        ejecutor = self.ejecutor_cpp
+        try:
+            with Progress(
+                SpinnerColumn(),
+                TextColumn("[bold cyan]{task.description}"),
+                BarColumn(),
+                TextColumn("{task.completed}/{task.total} etapas"),
+                TimeElapsedColumn(),
+                console=self.console,
+                transient=True
+            ) as progress:
+                tarea = progress.add_task(ejecutor.descripcion(), total=len(ejecutor.etapas))
+                while not ejecutor.esperar(0.1):
+                    progress.update(tarea, completed=ejecutor.completadas, description=ejecutor.descripcion())
+                progress.update(tarea, completed=len(ejecutor.etapas))
+        except KeyboardInterrupt:
+            self.show_info_message("El cálculo CPP sigue en segundo plano; sus resultados se usarán al terminar")
+            return False
         
-        prefijo_map = {
-            'compra': 'C',
-            'venta': 'V',
-            'conversion': 'CF'
-        }
+        if ejecutor.error is not None:
+            self.show_error_message(f"Error en el cálculo CPP: {ejecutor.error}")
+            return False
+        return True
 
-        archivo_path = archivo_map.get(tipo)
-        id_col = id_col_map.get(tipo)
-        prefijo = prefijo_map.get(tipo)
+    def obtener_ultimo_id(self, tipo: str) -> int:
+        """Obtiene el último ID numérico desde el índice de IDs persistido"""
+        return self.indices_ids[tipo].ultimo_numero()
 
-        max_id = 0
-        if os.path.exists(archivo_path):
-            try:
-                df = pd.read_csv(archivo_path)
-                if not df.empty and id_col in df.columns:
-                    ids_numericos = df[id_col].astype(str).str.replace(prefijo, '', regex=False)
-                    ids_numericos = pd.to_numeric(ids_numericos, errors='coerce').dropna()
-                    if not ids_numericos.empty:
-                        max_id = int(ids_numericos.max())
-            except Exception:
-                pass
-        return max_id
+    def existe_id(self, tipo: str, id_valor: str) -> bool:
+        """Indica si un ID ya existe en el ledger ('compra', 'venta' o 'conversion')"""
+        return self.indices_ids[tipo].existe(id_valor)
 
     def guardar_compra_simple(self, id_compra: str, cantidad: float, moneda: str, precio: float, 
                              plataforma: str, comisiones: float, tasa_cambio: float, fuente_fondos: str):
@@ -511,14 +561,8 @@ class P2PDashboardRich:
             'Plataforma': plataforma
         }
         
-        # Cargar datos existentes o crear nuevo DataFrame
-        if os.path.exists(COMPRAS_CSV):
-            df_compras = pd.read_csv(COMPRAS_CSV)
-            df_compras = pd.concat([df_compras, pd.DataFrame([nueva_compra])], ignore_index=True)
-        else:
-            df_compras = pd.DataFrame([nueva_compra])
-        
-        df_compras.to_csv(COMPRAS_CSV, index=False)
+        # Agregar solo la fila nueva al final del CSV (reescritura atómica si cambia el esquema)
+        self.almacen.agregar_fila(COMPRAS_CSV, nueva_compra)
         self.datos['compras'].append(nueva_compra)
         self.data_loaded = True
 
@@ -537,14 +581,8 @@ class P2PDashboardRich:
             'Plataforma': plataforma
         }
         
-        # Cargar datos existentes o crear nuevo DataFrame
-        if os.path.exists(VENTAS_CSV):
-            df_ventas = pd.read_csv(VENTAS_CSV)
-            df_ventas = pd.concat([df_ventas, pd.DataFrame([nueva_venta])], ignore_index=True)
-        else:
-            df_ventas = pd.DataFrame([nueva_venta])
-        
-        df_ventas.to_csv(VENTAS_CSV, index=False)
+        # Agregar solo la fila nueva al final del CSV (reescritura atómica si cambia el esquema)
+        self.almacen.agregar_fila(VENTAS_CSV, nueva_venta)
         self.datos['ventas'].append(nueva_venta)
         self.data_loaded = True
 
@@ -647,6 +685,9 @@ class P2PDashboardRich:
                 tasa_cambio = self._get_validated_float("💱 Tasa de Cambio (1 USD = X UYU)", min_val=0.01)
             
             fuente_fondos = Prompt.ask("[bold cyan]📊 Fuente de Fondos Fiat[/bold cyan]", default="Capital Nuevo")
+            if fuente_fondos.startswith(PREFIJO_FUENTE_VENTA) and not self.existe_id('venta', fuente_fondos[len(PREFIJO_FUENTE_VENTA):]):
+                self.show_error_message(f"La venta referenciada en '{fuente_fondos}' no existe; la compra se financiará "
+                                        f"con fiat de ventas en orden FIFO (igual que '{FUENTE_FIFO}').")
             comisiones = self._get_validated_float("💸 Comisiones pagadas (en la moneda de pago)", min_val=0.0, default=0.0)
             
             # Cálculo del costo total
@@ -773,6 +814,9 @@ class P2PDashboardRich:
             
             # ID de venta asociada (opcional)
             id_venta_asociada = Prompt.ask("[bold cyan]🔗 ID de Venta Asociada[/bold cyan] (opcional, ej: V001)", default="")
+            while id_venta_asociada and not self.existe_id('venta', id_venta_asociada):
+                self.show_error_message(f"No existe la venta '{id_venta_asociada}'.")
+                id_venta_asociada = Prompt.ask("[bold cyan]🔗 ID de Venta Asociada[/bold cyan] (vacío para omitir)", default="")
             
             notas = Prompt.ask("[bold cyan]📝 Notas[/bold cyan] (opcional)", default="Conversión manual")
             
@@ -820,14 +864,8 @@ class P2PDashboardRich:
             'Notas': notas
         }
         
-        # Cargar datos existentes o crear nuevo DataFrame
-        if os.path.exists(CONVERSIONES_CSV):
-            df_conversiones = pd.read_csv(CONVERSIONES_CSV)
-            df_conversiones = pd.concat([df_conversiones, pd.DataFrame([nueva_conversion])], ignore_index=True)
-        else:
-            df_conversiones = pd.DataFrame([nueva_conversion])
-        
-        df_conversiones.to_csv(CONVERSIONES_CSV, index=False)
+        # Agregar solo la fila nueva al final del CSV (reescritura atómica si cambia el esquema)
+        self.almacen.agregar_fila(CONVERSIONES_CSV, nueva_conversion)
         self.datos['conversiones'].append(nueva_conversion)
         self.data_loaded = True
 
@@ -835,29 +873,29 @@ class P2PDashboardRich:
         """Ver datos actuales con Rich"""
         self.show_section_header("📋 TODOS LOS DATOS ACTUALES", "Inicio > Gestión > Ver Datos")
         
-        self.cargar_datos_rapido()
-        
-        if not self.data_loaded:
-            self.show_error_message("No se pudieron cargar los datos")
+        # DataFrames tipados de la caché: el paginador solo formatea la página visible
+        try:
+            df_compras = self.obtener_df('compras')
+            df_ventas = self.obtener_df('ventas')
+            df_conversiones = self.obtener_df('conversiones')
+        except Exception as e:
+            self.show_error_message(f"No se pudieron cargar los datos: {e}")
             Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
             return
         
         # Mostrar compras
-        if self.datos['compras']:
-            df_compras = pd.DataFrame(self.datos['compras'])
+        if not df_compras.empty:
             self.display_dataframe_table(df_compras, "📈 COMPRAS DE USDT")
         
         # Mostrar ventas
-        if self.datos['ventas']:
-            df_ventas = pd.DataFrame(self.datos['ventas'])
+        if not df_ventas.empty:
             self.display_dataframe_table(df_ventas, "📉 VENTAS DE USDT")
         
         # Mostrar conversiones
-        if self.datos['conversiones']:
-            df_conversiones = pd.DataFrame(self.datos['conversiones'])
+        if not df_conversiones.empty:
             self.display_dataframe_table(df_conversiones, "🔄 CONVERSIONES FIAT")
         
-        if not any([self.datos['compras'], self.datos['ventas'], self.datos['conversiones']]):
+        if df_compras.empty and df_ventas.empty and df_conversiones.empty:
             self.show_info_message("No hay datos para mostrar. Registra algunas transacciones primero.")
             Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
 
@@ -892,66 +930,24 @@ class P2PDashboardRich:
         Prompt.ask("\n[bold bright_yellow]Presiona Enter para volver al menú principal[/bold bright_yellow]")
 
     def _calcular_metricas_financieras(self):
-        """Calcula métricas financieras básicas"""
+        """Calcula métricas financieras básicas.
+        
+        P&L, ROI, inventario y CPP salen del pipeline de P2PTracker (costo
+        promedio al momento de cada venta); si no está disponible, se usa el
+        costo promedio global de todas las compras.
+        """
         try:
-            compras = self.datos.get('compras', [])
-            ventas = self.datos.get('ventas', [])
-            conversiones = self.datos.get('conversiones', [])
-            
-            if not compras and not ventas:
+            metricas = self.obtener_metricas()
+            if not metricas:
                 return None
-            
-            # Cálculos básicos de compras
-            total_usdt_comprado = sum(float(c.get('Cantidad_USDT_Comprada', 0)) for c in compras)
-            inversion_total_usd = 0
-            
-            for compra in compras:
-                cantidad = float(compra.get('Cantidad_USDT_Comprada', 0))
-                precio = float(compra.get('Precio_Unitario_Moneda_Pago', 0))
-                moneda = compra.get('Moneda_Pago', 'USD')
-                tasa = float(compra.get('Tasa_Cambio_UYU_USD_Compra', 1))
-                comisiones = float(compra.get('Comisiones_Compra_Moneda_Pago', 0))
-                
-                costo_total = (cantidad * precio) + comisiones
-                if moneda == 'UYU':
-                    costo_total = costo_total / tasa
-                inversion_total_usd += costo_total
-            
-            # Cálculos básicos de ventas
-            total_usdt_vendido = sum(float(v.get('Cantidad_USDT_Vendida', 0)) for v in ventas)
-            ingresos_total_usd = 0
-            
-            for venta in ventas:
-                cantidad = float(venta.get('Cantidad_USDT_Vendida', 0))
-                precio = float(venta.get('Precio_Unitario_Moneda_Recibida', 0))
-                moneda = venta.get('Moneda_Recibida', 'USD')
-                tasa = float(venta.get('Tasa_Cambio_UYU_USD_Venta', 1))
-                comisiones = float(venta.get('Comisiones_Venta_Moneda_Recibida', 0))
-                
-                ingreso_neto = (cantidad * precio) - comisiones
-                if moneda == 'UYU':
-                    ingreso_neto = ingreso_neto / tasa
-                ingresos_total_usd += ingreso_neto
-            
-            # Cálculo de métricas
-            usdt_en_inventario = total_usdt_comprado - total_usdt_vendido
-            cpp_promedio = inversion_total_usd / total_usdt_comprado if total_usdt_comprado > 0 else 0
-            pl_realizado = ingresos_total_usd - (total_usdt_vendido * cpp_promedio) if total_usdt_vendido > 0 else 0
-            roi_porcentaje = (pl_realizado / inversion_total_usd * 100) if inversion_total_usd > 0 else 0
-            
-            return {
-                'total_compras': len(compras),
-                'total_ventas': len(ventas),
-                'total_conversiones': len(conversiones),
-                'total_usdt_comprado': total_usdt_comprado,
-                'total_usdt_vendido': total_usdt_vendido,
-                'usdt_en_inventario': usdt_en_inventario,
-                'inversion_total_usd': inversion_total_usd,
-                'ingresos_total_usd': ingresos_total_usd,
-                'cpp_promedio': cpp_promedio,
-                'pl_realizado': pl_realizado,
-                'roi_porcentaje': roi_porcentaje
-            }
+            globales = dict(metricas['globales'])
+            resultado = self.obtener_resultado_cpp()
+            if resultado is not None:
+                globales.update(resultado.metricas(globales['inversion_total_usd']))
+                globales['fuente_pl'] = f"CPP de P2PTracker ({resultado.duracion_s:.2f}s)"
+            else:
+                globales['fuente_pl'] = "costo promedio global (cálculo CPP no disponible)"
+            return globales
         except Exception as e:
             self.show_error_message(f"Error al calcular métricas: {e}")
             return None
@@ -1005,48 +1001,17 @@ class P2PDashboardRich:
         )
         
         self.console.print(panel_metricas)
+        if metricas.get('fuente_pl'):
+            self.console.print(f"[dim]P&L calculado con {metricas['fuente_pl']}[/dim]")
         self.console.print()
 
     def _mostrar_resumen_por_plataforma(self):
         """Muestra resumen agrupado por plataforma"""
         try:
-            # Agrupar compras por plataforma
-            compras_por_plataforma = {}
-            for compra in self.datos.get('compras', []):
-                plataforma = compra.get('Plataforma', 'Desconocida').title()
-                if plataforma not in compras_por_plataforma:
-                    compras_por_plataforma[plataforma] = {'cantidad': 0, 'costo': 0}
-                
-                cantidad = float(compra.get('Cantidad_USDT_Comprada', 0))
-                precio = float(compra.get('Precio_Unitario_Moneda_Pago', 0))
-                moneda = compra.get('Moneda_Pago', 'USD')
-                tasa = float(compra.get('Tasa_Cambio_UYU_USD_Compra', 1))
-                
-                costo = cantidad * precio
-                if moneda == 'UYU':
-                    costo = costo / tasa
-                
-                compras_por_plataforma[plataforma]['cantidad'] += cantidad
-                compras_por_plataforma[plataforma]['costo'] += costo
-            
-            # Agrupar ventas por plataforma
-            ventas_por_plataforma = {}
-            for venta in self.datos.get('ventas', []):
-                plataforma = venta.get('Plataforma', 'Desconocida').title()
-                if plataforma not in ventas_por_plataforma:
-                    ventas_por_plataforma[plataforma] = {'cantidad': 0, 'ingreso': 0}
-                
-                cantidad = float(venta.get('Cantidad_USDT_Vendida', 0))
-                precio = float(venta.get('Precio_Unitario_Moneda_Recibida', 0))
-                moneda = venta.get('Moneda_Recibida', 'USD')
-                tasa = float(venta.get('Tasa_Cambio_UYU_USD_Venta', 1))
-                
-                ingreso = cantidad * precio
-                if moneda == 'UYU':
-                    ingreso = ingreso / tasa
-                
-                ventas_por_plataforma[plataforma]['cantidad'] += cantidad
-                ventas_por_plataforma[plataforma]['ingreso'] += ingreso
+            metricas = self.obtener_metricas()
+            if not metricas:
+                return
+            por_plataforma = metricas['por_plataforma']
             
             # Crear tabla de resumen por plataforma
             plataforma_table = Table(
@@ -1061,19 +1026,13 @@ class P2PDashboardRich:
             plataforma_table.add_column("Costo USD", style="yellow", justify="right", width=15)
             plataforma_table.add_column("Ingreso USD", style="green", justify="right", width=15)
             
-            # Obtener todas las plataformas únicas
-            todas_plataformas = set(compras_por_plataforma.keys()) | set(ventas_por_plataforma.keys())
-            
-            for plataforma in sorted(todas_plataformas):
-                compras_data = compras_por_plataforma.get(plataforma, {'cantidad': 0, 'costo': 0})
-                ventas_data = ventas_por_plataforma.get(plataforma, {'cantidad': 0, 'ingreso': 0})
-                
+            for plataforma, data in por_plataforma.iterrows():
                 plataforma_table.add_row(
                     plataforma,
-                    f"{compras_data['cantidad']:,.2f}" if compras_data['cantidad'] > 0 else "[dim]0.00[/dim]",
-                    f"{ventas_data['cantidad']:,.2f}" if ventas_data['cantidad'] > 0 else "[dim]0.00[/dim]",
-                    f"${compras_data['costo']:,.2f}" if compras_data['costo'] > 0 else "[dim]$0.00[/dim]",
-                    f"${ventas_data['ingreso']:,.2f}" if ventas_data['ingreso'] > 0 else "[dim]$0.00[/dim]"
+                    f"{data['usdt_comprado']:,.2f}" if data['usdt_comprado'] > 0 else "[dim]0.00[/dim]",
+                    f"{data['usdt_vendido']:,.2f}" if data['usdt_vendido'] > 0 else "[dim]0.00[/dim]",
+                    f"${data['costo_total']:,.2f}" if data['costo_total'] > 0 else "[dim]$0.00[/dim]",
+                    f"${data['ingreso_total']:,.2f}" if data['ingreso_total'] > 0 else "[dim]$0.00[/dim]"
                 )
             
             self.console.print(plataforma_table)
@@ -1092,7 +1051,7 @@ class P2PDashboardRich:
                 todas_transacciones.append({
                     'tipo': 'Compra',
                     'id': compra.get('ID_Compra', ''),
-                    'fecha': compra.get('Fecha_Compra', ''),
+                    'fecha': compra.get('Fecha_Compra'),
                     'cantidad': float(compra.get('Cantidad_USDT_Comprada', 0)),
                     'plataforma': compra.get('Plataforma', '').title()
                 })
@@ -1101,13 +1060,13 @@ class P2PDashboardRich:
                 todas_transacciones.append({
                     'tipo': 'Venta',
                     'id': venta.get('ID_Venta', ''),
-                    'fecha': venta.get('Fecha_Venta', ''),
+                    'fecha': venta.get('Fecha_Venta'),
                     'cantidad': float(venta.get('Cantidad_USDT_Vendida', 0)),
                     'plataforma': venta.get('Plataforma', '').title()
                 })
             
-            # Ordenar por fecha (más recientes primero)
-            todas_transacciones.sort(key=lambda x: x['fecha'], reverse=True)
+            # Ordenar por fecha (más recientes primero); las fechas llegan ya parseadas desde el espejo
+            todas_transacciones.sort(key=lambda x: pd.Timestamp.min if pd.isna(x['fecha']) else pd.Timestamp(x['fecha']), reverse=True)
             
             # Mostrar últimas 10 transacciones
             ultimas_table = Table(
@@ -1129,7 +1088,7 @@ class P2PDashboardRich:
                 ultimas_table.add_row(
                     f"[{tipo_color}]{tipo_icon} {transaccion['tipo']}[/{tipo_color}]",
                     transaccion['id'],
-                    transaccion['fecha'][:16] if len(transaccion['fecha']) > 16 else transaccion['fecha'],
+                    pd.Timestamp(transaccion['fecha']).strftime("%Y-%m-%d %H:%M") if pd.notna(transaccion['fecha']) else "N/A",
                     f"{transaccion['cantidad']:,.2f}",
                     transaccion['plataforma']
                 )
@@ -1146,7 +1105,7 @@ class P2PDashboardRich:
             
             menu_items = [
                 ("1️⃣", "📊 Análisis por Plataforma Detallado", "info"),
-                ("2️⃣", "📈 Análisis Temporal (por Mes)", "success"),
+                ("2️⃣", "📈 Análisis Temporal (Día/Semana/Mes)", "success"),
                 ("3️⃣", "💰 Análisis de Rentabilidad", "warning"),
                 ("4️⃣", "🔄 Análisis de Conversiones Fiat", "primary"),
                 ("5️⃣", "⬅️ Volver al Menú Principal", "muted")
@@ -1189,73 +1148,19 @@ class P2PDashboardRich:
         """Análisis detallado por plataforma"""
         self.show_section_header("📊 ANÁLISIS POR PLATAFORMA DETALLADO", "Inicio > Análisis > Por Plataforma")
         
-        self.cargar_datos_rapido()
+        try:
+            metricas = self.obtener_metricas()
+        except Exception as e:
+            self.show_error_message(f"Error al cargar datos: {e}")
+            metricas = None
         
-        if not self.data_loaded or (not self.datos.get('compras') and not self.datos.get('ventas')):
+        if not metricas:
             self.show_info_message("No hay datos suficientes para el análisis por plataforma")
             Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
             return
         
         try:
-            # Análisis detallado por plataforma
-            analisis_plataforma = {}
-            
-            # Procesar compras
-            for compra in self.datos.get('compras', []):
-                plataforma = compra.get('Plataforma', 'Desconocida').title()
-                if plataforma not in analisis_plataforma:
-                    analisis_plataforma[plataforma] = {
-                        'compras_count': 0, 'ventas_count': 0,
-                        'usdt_comprado': 0, 'usdt_vendido': 0,
-                        'costo_total': 0, 'ingreso_total': 0,
-                        'cpp_promedio': 0, 'precio_venta_promedio': 0
-                    }
-                
-                cantidad = float(compra.get('Cantidad_USDT_Comprada', 0))
-                precio = float(compra.get('Precio_Unitario_Moneda_Pago', 0))
-                moneda = compra.get('Moneda_Pago', 'USD')
-                tasa = float(compra.get('Tasa_Cambio_UYU_USD_Compra', 1))
-                comisiones = float(compra.get('Comisiones_Compra_Moneda_Pago', 0))
-                
-                costo_total = (cantidad * precio) + comisiones
-                if moneda == 'UYU':
-                    costo_total = costo_total / tasa
-                
-                analisis_plataforma[plataforma]['compras_count'] += 1
-                analisis_plataforma[plataforma]['usdt_comprado'] += cantidad
-                analisis_plataforma[plataforma]['costo_total'] += costo_total
-            
-            # Procesar ventas
-            for venta in self.datos.get('ventas', []):
-                plataforma = venta.get('Plataforma', 'Desconocida').title()
-                if plataforma not in analisis_plataforma:
-                    analisis_plataforma[plataforma] = {
-                        'compras_count': 0, 'ventas_count': 0,
-                        'usdt_comprado': 0, 'usdt_vendido': 0,
-                        'costo_total': 0, 'ingreso_total': 0,
-                        'cpp_promedio': 0, 'precio_venta_promedio': 0
-                    }
-                
-                cantidad = float(venta.get('Cantidad_USDT_Vendida', 0))
-                precio = float(venta.get('Precio_Unitario_Moneda_Recibida', 0))
-                moneda = venta.get('Moneda_Recibida', 'USD')
-                tasa = float(venta.get('Tasa_Cambio_UYU_USD_Venta', 1))
-                comisiones = float(venta.get('Comisiones_Venta_Moneda_Recibida', 0))
-                
-                ingreso_neto = (cantidad * precio) - comisiones
-                if moneda == 'UYU':
-                    ingreso_neto = ingreso_neto / tasa
-                
-                analisis_plataforma[plataforma]['ventas_count'] += 1
-                analisis_plataforma[plataforma]['usdt_vendido'] += cantidad
-                analisis_plataforma[plataforma]['ingreso_total'] += ingreso_neto
-            
-            # Calcular promedios y métricas
-            for plataforma, data in analisis_plataforma.items():
-                if data['usdt_comprado'] > 0:
-                    data['cpp_promedio'] = data['costo_total'] / data['usdt_comprado']
-                if data['usdt_vendido'] > 0:
-                    data['precio_venta_promedio'] = data['ingreso_total'] / data['usdt_vendido']
+            analisis_plataforma = metricas['por_plataforma']
             
             # Crear tabla de análisis detallado
             analisis_table = Table(
@@ -1273,12 +1178,11 @@ class P2PDashboardRich:
             analisis_table.add_column("CPP Promedio", style="blue", justify="right", width=12)
             analisis_table.add_column("Precio Venta Prom.", style="green", justify="right", width=16)
             
-            for plataforma in sorted(analisis_plataforma.keys()):
-                data = analisis_plataforma[plataforma]
+            for plataforma, data in analisis_plataforma.iterrows():
                 analisis_table.add_row(
                     plataforma,
-                    str(data['compras_count']),
-                    str(data['ventas_count']),
+                    str(int(data['compras_count'])),
+                    str(int(data['ventas_count'])),
                     f"{data['usdt_comprado']:,.2f}",
                     f"{data['usdt_vendido']:,.2f}",
                     f"${data['cpp_promedio']:,.4f}" if data['cpp_promedio'] > 0 else "[dim]N/A[/dim]",
@@ -1293,30 +1197,295 @@ class P2PDashboardRich:
         Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
 
     def _analisis_temporal(self):
-        """Análisis temporal por mes"""
-        self.show_section_header("📈 ANÁLISIS TEMPORAL (POR MES)", "Inicio > Análisis > Temporal")
-        self.show_info_message("Análisis temporal por mes - Funcionalidad avanzada en desarrollo")
-        Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
+        """Análisis temporal: P&L, volumen, spread y comisiones por día/semana/mes"""
+        self.show_section_header("📈 ANÁLISIS TEMPORAL", "Inicio > Análisis > Temporal")
+        
+        resultado = self.obtener_resultado_cpp()
+        if resultado is None or (resultado.ventas_pl.empty and resultado.compras.empty):
+            self.show_info_message("No hay datos CPP suficientes para el análisis temporal")
+            Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
+            return
+        
+        granularidades = {'d': ('dia', 'Día'), 's': ('semana', 'Semana'), 'm': ('mes', 'Mes')}
+        desgloses = {'t': ('total', 'Total'), 'p': ('plataforma', 'Plataforma'), 'c': ('moneda', 'Moneda'),
+                     'x': ('plataforma_moneda', 'Plataforma y Moneda')}
+        granularidad, desglose = 'm', 't'
+        
+        while True:
+            try:
+                tabla = self.motor_temporal.obtener(resultado.version, resultado.ventas_pl, resultado.compras,
+                                                    granularidades[granularidad][0], desgloses[desglose][0])
+            except Exception as e:
+                self.show_error_message(f"Error en análisis temporal: {e}")
+                Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
+                return
+            
+            self.show_section_header(
+                f"📈 ANÁLISIS TEMPORAL - POR {granularidades[granularidad][1].upper()} ({desgloses[desglose][1]})",
+                "Inicio > Análisis > Temporal"
+            )
+            self._mostrar_tabla_temporal(tabla, desgloses[desglose][0])
+            
+            accion = Prompt.ask(
+                "[bold bright_yellow]Día (d) / Semana (s) / Mes (m) · Desglose: Total (t) / Plataforma (p) / "
+                "Moneda (c) / Ambos (x) · Ver todos los períodos (a) / Volver (v)[/bold bright_yellow]",
+                choices=list(granularidades) + list(desgloses) + ['a', 'v'],
+                default='v'
+            )
+            if accion in granularidades:
+                granularidad = accion
+            elif accion in desgloses:
+                desglose = accion
+            elif accion == 'a':
+                self.display_dataframe_table(tabla, f"📈 P&L POR {granularidades[granularidad][1].upper()}")
+            else:
+                break
+
+    def _mostrar_tabla_temporal(self, tabla: pd.DataFrame, desglose: str, max_periodos: int = 12):
+        """Últimos períodos del agregado temporal, con fila de totales"""
+        if tabla.empty:
+            self.show_info_message("No hay operaciones con fecha para agrupar")
+            return
+        
+        periodos = tabla['Periodo'].unique()[-max_periodos:]
+        visibles = tabla[tabla['Periodo'].isin(periodos)]
+        claves = [columna for columna in ('Plataforma', 'Moneda') if columna in tabla.columns]
+        
+        temporal_table = Table(
+            title=f"[bold]Últimos {len(periodos)} de {tabla['Periodo'].nunique()} períodos[/bold]",
+            box=box.ROUNDED,
+            header_style="bold magenta"
+        )
+        temporal_table.add_column("Período", style="cyan")
+        for clave in claves:
+            temporal_table.add_column(clave, style="white")
+        temporal_table.add_column("Ventas", style="blue", justify="right")
+        temporal_table.add_column("Volumen USDT", style="yellow", justify="right")
+        temporal_table.add_column("P&L USD", justify="right")
+        temporal_table.add_column("Spread USD/USDT", style="green", justify="right")
+        temporal_table.add_column("Margen", justify="right")
+        temporal_table.add_column("Comisiones USD", style="red", justify="right")
+        
+        def fila(datos, etiquetas):
+            color = 'green' if datos['PL_Realizado_USD'] >= 0 else 'red'
+            return etiquetas + [
+                f"{int(datos['Ventas'])}",
+                f"{datos['Volumen_USDT']:,.2f}",
+                f"[{color}]${datos['PL_Realizado_USD']:,.2f}[/{color}]",
+                "[dim]N/A[/dim]" if pd.isna(datos['Spread_USD_por_USDT']) else f"${datos['Spread_USD_por_USDT']:,.4f}",
+                "[dim]N/A[/dim]" if pd.isna(datos['Margen_Pct']) else f"{datos['Margen_Pct']:,.2f}%",
+                f"${datos['Comisiones_USD']:,.2f}"
+            ]
+        
+        for _, datos in visibles.iterrows():
+            temporal_table.add_row(*fila(datos, [datos['Periodo']] + [str(datos[clave]) for clave in claves]))
+        temporal_table.add_section()
+        temporal_table.add_row(*fila(totales(tabla), ["[bold]Total[/bold]"] + [""] * len(claves)))
+        
+        self.console.print(temporal_table)
+        self.console.print()
 
     def _analisis_rentabilidad(self):
-        """Análisis de rentabilidad"""
+        """Análisis de rentabilidad: margen móvil por USDT, spread realizado y curva de P&L"""
         self.show_section_header("💰 ANÁLISIS DE RENTABILIDAD", "Inicio > Análisis > Rentabilidad")
-        self.show_info_message("Análisis de rentabilidad detallado - Funcionalidad avanzada en desarrollo")
-        Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
+        
+        resultado = self.obtener_resultado_cpp()
+        if resultado is None or resultado.ventas_pl.empty:
+            self.show_info_message("No hay ventas con P&L calculado para analizar")
+            Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
+            return
+        
+        atajos = {str(dias): dias for dias in VENTANAS_POR_DEFECTO}
+        dias = 30
+        
+        while True:
+            try:
+                version, ventas = resultado.version, resultado.ventas_pl
+                curva = self.motor_rentabilidad.curva(version, ventas)
+                ventanas = {d: self.motor_rentabilidad.ventana(version, ventas, d)
+                            for d in sorted(set(VENTANAS_POR_DEFECTO) | {dias})}
+                spread_total = self.motor_rentabilidad.spread_total(version, ventas)
+            except Exception as e:
+                self.show_error_message(f"Error en análisis de rentabilidad: {e}")
+                Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
+                return
+            
+            self.show_section_header(f"💰 ANÁLISIS DE RENTABILIDAD - VENTANA DE {dias} DÍAS",
+                                     "Inicio > Análisis > Rentabilidad")
+            self._mostrar_curvas_rentabilidad(curva, ventanas[dias])
+            self._mostrar_ventanas_rentabilidad(ventanas, dias)
+            self._mostrar_spread_rentabilidad(ventanas[dias]['spread'], spread_total, dias)
+            
+            accion = Prompt.ask(
+                "[bold bright_yellow]Ventana: 7 / 30 / 90 días · Otra ventana (o) · Serie diaria (d) / "
+                "Volver (v)[/bold bright_yellow]",
+                choices=list(atajos) + ['o', 'd', 'v'],
+                default='v'
+            )
+            if accion in atajos:
+                dias = atajos[accion]
+            elif accion == 'o':
+                dias = int(self._get_validated_float("Tamaño de la ventana en días", min_val=1, max_val=3650,
+                                                     default=dias))
+            elif accion == 'd':
+                serie = ventanas[dias]['serie'].merge(curva, on='Dia')
+                self.display_dataframe_table(serie, f"💰 MARGEN MÓVIL {dias} DÍAS Y P&L ACUMULADO")
+            else:
+                break
+
+    @staticmethod
+    def _minigrafico(valores: np.ndarray, ancho: int = 60) -> str:
+        """Línea de bloques unicode con el último valor de cada tramo (NaN en blanco)"""
+        bloques = "▁▂▃▄▅▆▇█"
+        if len(valores) > ancho:
+            valores = valores[np.linspace(0, len(valores) - 1, ancho).round().astype(int)]
+        validos = valores[~np.isnan(valores)]
+        if len(validos) == 0:
+            return ""
+        minimo, rango = validos.min(), validos.max() - validos.min()
+        return "".join(
+            " " if np.isnan(v) else bloques[int((v - minimo) / rango * (len(bloques) - 1)) if rango > 0 else 0]
+            for v in valores
+        )
+
+    def _mostrar_curvas_rentabilidad(self, curva: pd.DataFrame, ventana: Dict):
+        """Curva de P&L acumulado y margen móvil como minigráficos"""
+        acumulado = curva['PL_Acumulado_USD'].to_numpy(dtype='float64')
+        margen = ventana['serie']['Margen_por_USDT'].to_numpy(dtype='float64')
+        desde, hasta = curva['Dia'].iloc[0].date(), curva['Dia'].iloc[-1].date()
+        
+        color = 'green' if acumulado[-1] >= 0 else 'red'
+        contenido = (
+            f"[bold]P&L acumulado[/bold] ({desde} → {hasta}, {len(curva)} días con ventas)\n"
+            f"[{color}]{self._minigrafico(acumulado)}[/{color}]  "
+            f"mín ${np.min(acumulado):,.2f} · máx ${np.max(acumulado):,.2f} · "
+            f"final [{color}]${acumulado[-1]:,.2f}[/{color}]\n\n"
+            f"[bold]Margen por USDT, ventana de {ventana['resumen']['dias']} días[/bold]\n"
+            f"[cyan]{self._minigrafico(margen)}[/cyan]  "
+            f"mín ${np.nanmin(margen):,.4f} · máx ${np.nanmax(margen):,.4f}"
+        )
+        self.console.print(Panel(contenido, title="[bold]📈 Curvas[/bold]", border_style="bright_blue"))
+        self.console.print()
+
+    def _mostrar_ventanas_rentabilidad(self, ventanas: Dict[int, Dict], seleccionada: int):
+        """Comparación de ventanas móviles: margen actual, promedio, mejor y peor"""
+        ventanas_table = Table(title="[bold]Margen por USDT en ventanas móviles[/bold]", box=box.ROUNDED,
+                               header_style="bold magenta")
+        ventanas_table.add_column("Ventana", style="cyan")
+        ventanas_table.add_column("Volumen USDT", style="yellow", justify="right")
+        ventanas_table.add_column("P&L USD", justify="right")
+        ventanas_table.add_column("Margen actual", justify="right")
+        ventanas_table.add_column("Margen promedio", style="white", justify="right")
+        ventanas_table.add_column("Mejor ventana", style="green", justify="right")
+        ventanas_table.add_column("Peor ventana", style="red", justify="right")
+        
+        def extremo(datos):
+            return "[dim]N/A[/dim]" if datos is None else f"${datos[1]:,.4f} ({datos[0].date()})"
+        
+        for dias, ventana in ventanas.items():
+            resumen = ventana['resumen']
+            color = 'green' if resumen['pl_actual'] >= 0 else 'red'
+            etiqueta = f"{dias} días" + (" ◀" if dias == seleccionada else "")
+            ventanas_table.add_row(
+                f"[bold]{etiqueta}[/bold]" if dias == seleccionada else etiqueta,
+                f"{resumen['volumen_actual']:,.2f}",
+                f"[{color}]${resumen['pl_actual']:,.2f}[/{color}]",
+                "[dim]N/A[/dim]" if pd.isna(resumen['margen_actual']) else f"[{color}]${resumen['margen_actual']:,.4f}[/{color}]",
+                "[dim]N/A[/dim]" if pd.isna(resumen['margen_promedio']) else f"${resumen['margen_promedio']:,.4f}",
+                extremo(resumen.get('mejor')),
+                extremo(resumen.get('peor'))
+            )
+        
+        self.console.print(ventanas_table)
+        self.console.print("[dim]Margen = P&L realizado / USDT vendidos en la ventana que cierra cada día; "
+                           "'actual' es la que cierra el último día con ventas.[/dim]")
+        self.console.print()
+
+    def _mostrar_spread_rentabilidad(self, spread_ventana: Dict, spread_total: Dict, dias: int):
+        """Distribución del spread realizado (precio de venta neto en USD - CPP) e histograma"""
+        spread_table = Table(title="[bold]Spread realizado por USDT (venta neta USD - CPP)[/bold]",
+                             box=box.ROUNDED, header_style="bold magenta")
+        spread_table.add_column("Estadística", style="cyan")
+        spread_table.add_column(f"Últimos {dias} días", justify="right")
+        spread_table.add_column("Histórico", justify="right")
+        
+        def valor(distribucion, clave, formato="${:,.4f}"):
+            if distribucion['ventas'] == 0:
+                return "[dim]N/A[/dim]"
+            dato = distribucion['percentiles'][clave] if isinstance(clave, int) else distribucion[clave]
+            texto = formato.format(dato)
+            return f"[red]{texto}[/red]" if clave != 'negativas_pct' and dato < 0 else texto
+        
+        spread_table.add_row("Ventas con costo base", f"{spread_ventana['ventas']:,}", f"{spread_total['ventas']:,}")
+        spread_table.add_row("Media", valor(spread_ventana, 'media'), valor(spread_total, 'media'))
+        spread_table.add_row("Desvío", valor(spread_ventana, 'desvio'), valor(spread_total, 'desvio'))
+        for percentil in PERCENTILES_SPREAD:
+            spread_table.add_row(f"P{percentil}", valor(spread_ventana, percentil), valor(spread_total, percentil))
+        spread_table.add_row("Ventas con spread negativo", valor(spread_ventana, 'negativas_pct', "{:.1f}%"),
+                             valor(spread_total, 'negativas_pct', "{:.1f}%"))
+        self.console.print(spread_table)
+        
+        if spread_ventana['ventas'] > 0:
+            conteos, bordes = spread_ventana['histograma']
+            maximo = conteos.max()
+            self.console.print(f"\n[bold]Histograma del spread, últimos {dias} días (P1-P99)[/bold]")
+            for conteo, desde, hasta in zip(conteos, bordes[:-1], bordes[1:]):
+                barra = "█" * int(round(conteo / maximo * 40)) if maximo else ""
+                color = 'red' if hasta <= 0 else 'green'
+                self.console.print(f"  {desde:>9.4f} a {hasta:>9.4f}  [{color}]{barra}[/{color}] {conteo:,}")
+        self.console.print()
 
     def _analisis_conversiones(self):
-        """Análisis de conversiones fiat"""
+        """Análisis de conversiones fiat: registradas, conciliadas por venta y no conciliadas"""
         self.show_section_header("🔄 ANÁLISIS DE CONVERSIONES FIAT", "Inicio > Análisis > Conversiones")
         
-        self.cargar_datos_rapido()
+        df_conversiones = self.obtener_df('conversiones')
         
-        if not self.datos.get('conversiones'):
+        if df_conversiones.empty:
             self.show_info_message("No hay conversiones registradas para analizar")
             Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
             return
         
-        df_conversiones = pd.DataFrame(self.datos['conversiones'])
-        self.display_dataframe_table(df_conversiones, "🔄 CONVERSIONES FIAT REGISTRADAS")
+        resultado = self.obtener_resultado_cpp()
+        if resultado is None:
+            self.display_dataframe_table(df_conversiones, "🔄 CONVERSIONES FIAT REGISTRADAS")
+            return
+        
+        por_venta = resultado.conversiones_por_venta
+        no_conciliadas = resultado.conversiones_no_conciliadas
+        while True:
+            self.show_section_header("🔄 ANÁLISIS DE CONVERSIONES FIAT", "Inicio > Análisis > Conversiones")
+            resumen = Table(box=box.ROUNDED, show_header=False)
+            resumen.add_column("Concepto", style="cyan")
+            resumen.add_column("Valor", justify="right")
+            resumen.add_row("Conversiones registradas", f"{len(df_conversiones):,}")
+            resumen.add_row("Ventas con conversiones", f"{len(por_venta):,}")
+            resumen.add_row("Conversiones no conciliadas",
+                            f"[red]{len(no_conciliadas):,}[/red]" if len(no_conciliadas) else "0")
+            for motivo, cantidad in no_conciliadas['Motivo'].value_counts().items():
+                resumen.add_row(f"  • {motivo.replace('_', ' ')}", f"{cantidad:,}")
+            if not por_venta.empty:
+                tasa = por_venta['Tasa_Implicita_UYU_USD'].dropna()
+                if not tasa.empty:
+                    resumen.add_row("Tasa implícita UYU/USD (mediana)", f"{tasa.median():,.4f}")
+                residual = por_venta.groupby('Moneda_Generada')['Saldo_Residual_Moneda_Original'].sum()
+                for moneda, saldo in residual.items():
+                    resumen.add_row(f"Saldo residual {moneda}", f"{saldo:,.2f}")
+            self.console.print(Panel(resumen, title="[bold]Conciliación con ventas[/bold]", border_style="bright_blue"))
+            
+            accion = Prompt.ask(
+                "[bold bright_yellow]Registradas (r) / Por venta (p) / No conciliadas (n) / Volver (v)[/bold bright_yellow]",
+                choices=['r', 'p', 'n', 'v'],
+                default='v'
+            )
+            if accion == 'r':
+                self.display_dataframe_table(df_conversiones, "🔄 CONVERSIONES FIAT REGISTRADAS")
+            elif accion == 'p':
+                self.display_dataframe_table(por_venta, "🔄 CONVERSIONES POR VENTA")
+            elif accion == 'n':
+                self.display_dataframe_table(no_conciliadas, "🔄 CONVERSIONES NO CONCILIADAS")
+            else:
+                break
 
     def menu_herramientas(self):
         """Menú de herramientas y utilidades"""
@@ -1389,8 +1558,7 @@ class P2PDashboardRich:
         for nombre, ruta in archivos_estado:
             if os.path.exists(ruta):
                 try:
-                    df = pd.read_csv(ruta)
-                    registros = len(df)
+                    registros = contar_registros(ruta)
                     tamaño = os.path.getsize(ruta)
                     mod_time = datetime.fromtimestamp(os.path.getmtime(ruta)).strftime("%Y-%m-%d %H:%M")
                     
@@ -1419,6 +1587,12 @@ class P2PDashboardRich:
                 )
         
         self.console.print(estado_table)
+        
+        stats_cache = self.cache.estadisticas()
+        self.console.print(
+            f"[dim]Caché de datos: {stats_cache['aciertos']} aciertos / {stats_cache['fallos']} fallos "
+            f"({stats_cache['tasa_aciertos']:.0%}) - {stats_cache['ledgers_en_memoria']} archivos en memoria[/dim]"
+        )
         Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
 
     def _crear_backup(self):
@@ -1457,17 +1631,94 @@ class P2PDashboardRich:
         Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
 
     def _ejecutar_script_principal(self):
-        """Ejecuta el script principal para cálculos CPP"""
+        """Ejecuta el pipeline CPP completo en segundo plano y genera reportes y checkpoint"""
         self.show_section_header("📊 EJECUTAR SCRIPT PRINCIPAL", "Inicio > Herramientas > Script Principal")
-        self.show_info_message("Funcionalidad para ejecutar script_p2p_tracker.py - En desarrollo")
-        self.show_info_message("Esta función ejecutará los cálculos CPP completos y generará reportes")
+        
+        resultado = self.obtener_resultado_cpp(generar_reportes=True)
+        if resultado is None:
+            Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
+            return
+        
+        color_pl = 'green' if resultado.pl_realizado >= 0 else 'red'
+        resultado_table = Table(show_header=False, box=box.ROUNDED, padding=(0, 2))
+        resultado_table.add_column("Métrica", style="bold white", width=28)
+        resultado_table.add_column("Valor", style="bold", justify="right", width=22)
+        resultado_table.add_row("🛍️ Compras procesadas:", f"[cyan]{resultado.total_compras}[/cyan]")
+        resultado_table.add_row("💸 Ventas procesadas:", f"[magenta]{resultado.total_ventas}[/magenta]")
+        resultado_table.add_row("💰 P&L Realizado (CPP):", f"[{color_pl}]${resultado.pl_realizado:,.2f} USD[/{color_pl}]")
+        resultado_table.add_row("🪙 USDT en Inventario:", f"[cyan]{resultado.inventario_usdt:,.2f} USDT[/cyan]")
+        resultado_table.add_row("💵 CPP Actual:", f"[yellow]${resultado.cpp_actual:,.4f} USD[/yellow]")
+        resultado_table.add_row("📊 Costo del Inventario:", f"[blue]${resultado.inventario_costo_usd:,.2f} USD[/blue]")
+        resultado_table.add_row("⏱️ Tiempo de cálculo:", f"{resultado.duracion_s:.2f}s")
+        self.console.print(resultado_table)
+        
+        if resultado.ventas_sin_stock:
+            self.show_error_message(
+                f"{resultado.ventas_sin_stock} ventas con stock insuficiente "
+                f"({resultado.usdt_sin_stock:,.2f} USDT sin inventario)"
+            )
+        self.show_success_message(f"Reportes y checkpoint guardados en: {REPORTS_DIR}")
         Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
 
     def _validar_datos(self):
-        """Valida y limpia los datos"""
+        """Valida los ledgers por chunks y ofrece reemplazarlos por sus copias corregidas"""
         self.show_section_header("🧹 VALIDAR Y LIMPIAR DATOS", "Inicio > Herramientas > Validar")
-        self.show_info_message("Funcionalidad de validación y limpieza de datos - En desarrollo")
-        self.show_info_message("Esta función verificará la integridad de los datos y corregirá errores comunes")
+        
+        archivos = {'compras': COMPRAS_CSV, 'ventas': VENTAS_CSV, 'conversiones': CONVERSIONES_CSV}
+        ruta_detalle = os.path.join(REPORTS_DIR, 'reporte_validacion.csv')
+        try:
+            with self.console.status("[bold cyan]Validando ledgers...[/bold cyan]"):
+                validador = validar_ledgers(archivos, LIMPIOS_DIR, ruta_detalle)
+        except (OSError, ValueError) as e:
+            self.show_error_message(f"Error al validar los datos: {e}")
+            Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
+            return
+        
+        reporte = validador.reporte()
+        filas_revisadas = sum(validador.filas.values())
+        if reporte.empty:
+            self.show_success_message(f"Sin problemas en {filas_revisadas} filas revisadas")
+            Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
+            return
+        
+        reporte_table = Table(
+            title=f"[bold]🧹 VIOLACIONES POR REGLA ({filas_revisadas} filas revisadas)[/bold]",
+            box=box.ROUNDED,
+            header_style="bold blue"
+        )
+        reporte_table.add_column("Ledger", style="cyan", width=12)
+        reporte_table.add_column("Regla", style="white", width=38)
+        reporte_table.add_column("Filas", style="yellow", justify="right", width=9)
+        reporte_table.add_column("Corregidas", style="green", justify="right", width=10)
+        reporte_table.add_column("Descartadas", style="red", justify="right", width=11)
+        reporte_table.add_column("Ejemplos", style="dim", width=30)
+        
+        for _, fila in reporte.iterrows():
+            reporte_table.add_row(
+                fila['Ledger'],
+                fila['Descripción'],
+                str(fila['Filas']),
+                str(fila['Corregidas']),
+                str(fila['Descartadas']),
+                fila['Ejemplos']
+            )
+        
+        self.console.print(reporte_table)
+        self.show_info_message(f"Detalle de cada violación en: {ruta_detalle}")
+        
+        resumen_limpios = ", ".join(f"{ledger}: {validador.filas_limpias[ledger]}/{validador.filas[ledger]} filas"
+                                    for ledger in validador.limpios)
+        self.show_info_message(f"Copias corregidas en {LIMPIOS_DIR} ({resumen_limpios})")
+        if Confirm.ask("[bold yellow]¿Reemplazar los CSV por las copias corregidas? (los originales quedan como .bak)[/bold yellow]",
+                       default=False):
+            try:
+                for ledger, ruta_limpia in validador.limpios.items():
+                    reemplazar_con_limpio(archivos[ledger], ruta_limpia)
+                self.cache.invalidar()
+                self.show_success_message("Archivos reemplazados por sus copias corregidas")
+            except OSError as e:
+                self.show_error_message(f"Error al reemplazar los archivos: {e}")
+        
         Prompt.ask("\n[bold]Presiona Enter para continuar[/bold]")
 
 def main():
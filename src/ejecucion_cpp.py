@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor CPP en Segundo Plano - P2P USDT
+
+Ejecuta el pipeline de P2PTracker en un hilo aparte para que el dashboard
+siga respondiendo (barra de progreso, Ctrl+C) y deja el resultado en
+memoria: P&L por venta, flujo de fiat e inventario, sin releer los reportes.
+"""
+
+import time
+import threading
+import pandas as pd
+from typing import Dict, List, Optional
+
+from script_p2p_tracker import P2PTracker, ejecutar_pipeline, resolver_etapas, COLUMNAS_REPORTE_VENTAS
+
+# Solo cálculos (consultas del dashboard) o cálculos + reportes y checkpoint en disco
+ETAPAS_EN_MEMORIA = ['conversiones']
+ETAPAS_CON_REPORTES = ['conversiones', 'checkpoint']
+
+# Columnas que conserva el resultado (el reporte de P&L más lo que usan los análisis)
+COLUMNAS_RESULTADO_VENTAS = COLUMNAS_REPORTE_VENTAS + ['Comisiones_Venta_Moneda_Recibida']
+COLUMNAS_RESULTADO_COMPRAS = ['ID_Compra', 'Fecha_Compra', 'Cantidad_USDT_Comprada', 'Moneda_Pago',
+                              'Precio_Unitario_Moneda_Pago', 'Tasa_Cambio_UYU_USD_Compra',
+                              'Comisiones_Compra_Moneda_Pago', 'Costo_Total_en_USD', 'Plataforma']
+
+DESCRIPCION_ETAPAS = {
+    'cargar': 'Cargando ledgers',
+    'preliminares': 'Calculando montos en USD',
+    'ordenar': 'Ordenando transacciones',
+    'cpp': 'Aplicando CPP y P&L',
+    'conversiones': 'Procesando conversiones de fiat',
+    'reportes': 'Generando reportes',
+    'checkpoint': 'Guardando checkpoint',
+}
+
+
+def _columnas_calculadas(df: Optional[pd.DataFrame], columnas: List[str]) -> pd.DataFrame:
+    """Columnas del DataFrame calculado por el tracker (vacío si no hay filas)"""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=columnas)
+    return df.reindex(columns=columnas)
+
+
+class ResultadoCPP:
+    """Resultado en memoria de una ejecución del pipeline CPP"""
+
+    def __init__(self, tracker: P2PTracker, version, duracion_s: float):
+        self.version = version  # Versión de los ledgers con la que se calculó
+        self.duracion_s = duracion_s
+
+        self.ventas_pl = _columnas_calculadas(tracker.df_ventas_calc, COLUMNAS_RESULTADO_VENTAS)
+        self.compras = _columnas_calculadas(tracker.df_compras_calc, COLUMNAS_RESULTADO_COMPRAS)
+        self.flujo_fiat = tracker.lotes_fiat.reporte()
+        self.lotes_fiat = tracker.lotes_fiat  # Saldo de fiat por fecha (disponible_al)
+        self.conversiones_por_venta = tracker.conversiones_por_venta
+        self.conversiones_no_conciliadas = tracker.conversiones_no_conciliadas
+
+        self.total_compras = 0 if tracker.df_compras is None else len(tracker.df_compras)
+        self.total_ventas = len(self.ventas_pl)
+        self.inventario_usdt = tracker.inventario_usdt_cantidad
+        self.inventario_costo_usd = tracker.inventario_usdt_costo_total_usd
+        self.cpp_actual = self.inventario_costo_usd / self.inventario_usdt if self.inventario_usdt > 0 else 0.0
+        self.pl_realizado = float(pd.to_numeric(self.ventas_pl['Ganancia_Perdida_USDT_en_USD'], errors='coerce').sum())
+        self.ventas_sin_stock = tracker.ventas_sin_stock
+        self.usdt_sin_stock = tracker.usdt_sin_stock
+
+    def metricas(self, inversion_total_usd: float) -> Dict:
+        """Métricas globales del dashboard que dependen del CPP"""
+        return {
+            'pl_realizado': self.pl_realizado,
+            'roi_porcentaje': (self.pl_realizado / inversion_total_usd * 100) if inversion_total_usd > 0 else 0,
+            'usdt_en_inventario': self.inventario_usdt,
+            'cpp_promedio': self.cpp_actual,
+        }
+
+
+class EjecutorCPP:
+    """Corre el pipeline en un hilo y expone su avance y el último resultado"""
+
+    def __init__(self, archivo_compras: str, archivo_ventas: str, archivo_conversiones: str = None,
+                 directorio_reportes: str = None):
+        self.archivos = (archivo_compras, archivo_ventas, archivo_conversiones)
+        self.directorio_reportes = directorio_reportes
+        self.resultado: Optional[ResultadoCPP] = None
+        self.error: Optional[Exception] = None
+
+        # Avance de la ejecución en curso (lo escribe el hilo, lo lee la interfaz)
+        self.etapas: List[str] = []
+        self.etapa_actual: Optional[str] = None
+        self.completadas = 0
+        self._hilo: Optional[threading.Thread] = None
+
+    def iniciar(self, version, generar_reportes: bool = False) -> bool:
+        """Lanza el cálculo en segundo plano; False si ya hay uno en curso"""
+        if self.en_curso():
+            return False
+        self.etapas = resolver_etapas(ETAPAS_CON_REPORTES if generar_reportes else ETAPAS_EN_MEMORIA)
+        self.etapa_actual = None
+        self.completadas = 0
+        self.error = None
+        self._hilo = threading.Thread(target=self._trabajar, args=(version, self.etapas),
+                                      name='motor-cpp', daemon=True)
+        self._hilo.start()
+        return True
+
+    def en_curso(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def esperar(self, timeout: float = None) -> bool:
+        """Espera hasta `timeout` segundos; True si el cálculo terminó"""
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+        return not self.en_curso()
+
+    def descripcion(self) -> str:
+        """Texto de la etapa en curso para la barra de progreso"""
+        return DESCRIPCION_ETAPAS.get(self.etapa_actual, 'Preparando cálculo CPP')
+
+    def resultado_vigente(self, version) -> Optional[ResultadoCPP]:
+        """Último resultado si se calculó con esta versión de los ledgers"""
+        if self.resultado is not None and self.resultado.version == version:
+            return self.resultado
+        return None
+
+    def _avanzar(self, etapa: str):
+        if self.etapa_actual is not None:
+            self.completadas += 1
+        self.etapa_actual = etapa
+
+    def _trabajar(self, version, etapas: List[str]):
+        inicio = time.perf_counter()
+        try:
+            # Recálculo completo: el resultado en memoria necesita todas las ventas, no solo las nuevas
+            tracker = P2PTracker(directorio_reportes=self.directorio_reportes)
+            ejecutar_pipeline(tracker, *self.archivos, etapas=etapas, incremental=False, progreso=self._avanzar)
+            self.resultado = ResultadoCPP(tracker, version, time.perf_counter() - inicio)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.etapa_actual = None
+            self.completadas = len(etapas)
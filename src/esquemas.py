@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Esquemas de Ledgers - P2P USDT
+
+Registro versionado de las columnas y tipos de los tres ledgers (compras,
+ventas y conversiones). Con la versión vigente los lectores pasan `dtype` y
+`usecols` fijos a pandas, que así no infiere tipos ni arrastra columnas
+ajenas; monedas, plataforma y fuente de fondos se leen como categóricas
+(códigos enteros, ver `compacto`). Las versiones anteriores se reconocen por
+su encabezado y se adaptan con `adaptar` (columnas renombradas, valores por
+defecto y derivadas); el migrador de `migrar_ledgers` aplica esa misma
+adaptación para reescribirlos.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Tuple
+
+TEXTO = 'str'
+NUMERO = 'float64'
+CATEGORIA = 'category'  # Texto con pocos valores distintos
+
+
+class Esquema:
+    """Columnas (en orden) y tipos de una versión de un ledger"""
+
+    def __init__(self, ledger: str, version: int, tipos: Dict[str, str], columna_fecha: str, columna_id: str):
+        self.ledger = ledger
+        self.version = version
+        self.tipos = tipos
+        self.columna_fecha = columna_fecha  # Se lee como texto y se parsea aparte (formatos mixtos)
+        self.columna_id = columna_id
+
+    @property
+    def columnas(self) -> List[str]:
+        return list(self.tipos)
+
+    @property
+    def categoricas(self) -> List[str]:
+        return [columna for columna, tipo in self.tipos.items() if tipo == CATEGORIA]
+
+    def opciones_lectura(self) -> Dict:
+        """Argumentos de pd.read_csv para leer esta versión sin inferir tipos"""
+        return {'usecols': self.columnas, 'dtype': self.tipos}
+
+
+_COMPRAS_V1 = {
+    'ID_Compra': TEXTO, 'Fecha_Compra': TEXTO, 'Cantidad_USDT_Comprada': NUMERO, 'Moneda_Pago': CATEGORIA,
+    'Precio_Unitario_Moneda_Pago': NUMERO, 'Tasa_Cambio_UYU_USD_Compra': NUMERO, 'Fuente_De_Fondos_Fiat': CATEGORIA,
+    'Comisiones_Compra_Moneda_Pago': NUMERO,
+}
+_VENTAS_V1 = {
+    'ID_Venta': TEXTO, 'Fecha_Venta': TEXTO, 'Cantidad_USDT_Vendida': NUMERO, 'Moneda_Recibida': CATEGORIA,
+    'Precio_Unitario_Moneda_Recibida': NUMERO, 'Tasa_Cambio_UYU_USD_Venta': NUMERO,
+    'Comisiones_Venta_Moneda_Recibida': NUMERO,
+}
+# v1: la que creaba el dashboard al inicializar; v2: la que escribía el tracker de ejemplo
+_CONVERSIONES_V1 = {
+    'ID_Conversion': TEXTO, 'Fecha_Conversion': TEXTO, 'Monto_Origen': NUMERO, 'Moneda_Origen': CATEGORIA,
+    'Monto_Destino': NUMERO, 'Moneda_Destino': CATEGORIA, 'Tasa_Cambio': NUMERO,
+}
+_CONVERSIONES_V2 = {
+    'ID_Conversion': TEXTO, 'Fecha_Conversion': TEXTO, 'Moneda_Origen': CATEGORIA, 'Cantidad_Origen': NUMERO,
+    'Moneda_Destino': CATEGORIA, 'Cantidad_Destino': NUMERO, 'ID_Venta_Asociada': CATEGORIA, 'Notas': TEXTO,
+}
+
+# Historial de versiones por ledger; la de número más alto es la vigente
+ESQUEMAS: Dict[str, Dict[int, Esquema]] = {
+    'compras': {
+        1: Esquema('compras', 1, _COMPRAS_V1, 'Fecha_Compra', 'ID_Compra'),
+        2: Esquema('compras', 2, {**_COMPRAS_V1, 'Plataforma': CATEGORIA}, 'Fecha_Compra', 'ID_Compra'),
+    },
+    'ventas': {
+        1: Esquema('ventas', 1, _VENTAS_V1, 'Fecha_Venta', 'ID_Venta'),
+        2: Esquema('ventas', 2, {**_VENTAS_V1, 'Plataforma': CATEGORIA}, 'Fecha_Venta', 'ID_Venta'),
+    },
+    'conversiones': {
+        1: Esquema('conversiones', 1, _CONVERSIONES_V1, 'Fecha_Conversion', 'ID_Conversion'),
+        2: Esquema('conversiones', 2, _CONVERSIONES_V2, 'Fecha_Conversion', 'ID_Conversion'),
+        3: Esquema('conversiones', 3, {
+            'ID_Conversion': TEXTO, 'Fecha_Conversion': TEXTO, 'Moneda_Origen': CATEGORIA, 'Cantidad_Origen': NUMERO,
+            'Moneda_Destino': CATEGORIA, 'Cantidad_Destino': NUMERO, 'Tasa_Conversion_Implicita': NUMERO,
+            'ID_Venta_Asociada': CATEGORIA, 'Notas': TEXTO,
+        }, 'Fecha_Conversion', 'ID_Conversion'),
+    },
+}
+
+# Columnas de versiones anteriores -> columna vigente con el mismo dato
+ALIAS_LEGADOS = {
+    'conversiones': {
+        'Monto_Origen': 'Cantidad_Origen',
+        'Monto_Destino': 'Cantidad_Destino',
+        'Tasa_Cambio': 'Tasa_Conversion_Implicita',
+    },
+}
+
+# Valor de las columnas que una versión anterior no tenía
+VALORES_POR_DEFECTO = {
+    'compras': {'Plataforma': 'Otro'},
+    'ventas': {'Plataforma': 'Otro'},
+}
+
+
+def _tasa_implicita(df: pd.DataFrame) -> pd.Series:
+    """UYU por unidad de la otra moneda, igual que el formulario de conversiones del dashboard"""
+    origen = pd.to_numeric(df['Cantidad_Origen'], errors='coerce')
+    destino = pd.to_numeric(df['Cantidad_Destino'], errors='coerce')
+    desde_uyu = df['Moneda_Origen'].astype(str).str.strip().str.upper() == 'UYU'
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tasa = pd.Series(np.where(desde_uyu, origen / destino, destino / origen), index=df.index)
+    return tasa.replace([np.inf, -np.inf], np.nan)
+
+
+# Columnas que se calculan a partir de otras cuando faltan
+DERIVADAS: Dict[str, Dict[str, Callable[[pd.DataFrame], pd.Series]]] = {
+    'conversiones': {'Tasa_Conversion_Implicita': _tasa_implicita},
+}
+
+
+def esquema_vigente(ledger: str) -> Esquema:
+    """Última versión del esquema del ledger"""
+    versiones = ESQUEMAS[ledger]
+    return versiones[max(versiones)]
+
+
+def ledger_de(columnas: List[str]) -> Optional[str]:
+    """Ledger al que pertenece un encabezado (por su columna de ID), o None si no es ninguno"""
+    for ledger in ESQUEMAS:
+        if esquema_vigente(ledger).columna_id in columnas:
+            return ledger
+    return None
+
+
+def identificar(columnas: List[str]) -> Tuple[Optional[str], Optional[int]]:
+    """(ledger, versión) del encabezado; versión None si no coincide con ninguna (ej: columnas mezcladas)"""
+    ledger = ledger_de(columnas)
+    if ledger is None:
+        return None, None
+    presentes = set(columnas)
+    for version, esquema in ESQUEMAS[ledger].items():
+        if presentes == set(esquema.columnas):
+            return ledger, version
+    return ledger, None
+
+
+def es_vigente(columnas: List[str], ledger: str) -> bool:
+    """Tiene todas las columnas vigentes y ninguna columna legada (las demás se ignoran al leer)"""
+    presentes = set(columnas)
+    return (set(esquema_vigente(ledger).columnas) <= presentes
+            and not presentes & set(ALIAS_LEGADOS.get(ledger, {})))
+
+
+def adaptar(df: pd.DataFrame, ledger: str) -> pd.DataFrame:
+    """Lleva un DataFrame de una versión anterior (o mezcla de versiones) a las columnas vigentes.
+
+    Las columnas legadas completan a su equivalente vigente donde este está
+    vacío, así un archivo con filas de ambos esquemas no pierde datos.
+    """
+    df = df.copy()
+    for legada, vigente in ALIAS_LEGADOS.get(ledger, {}).items():
+        if legada in df.columns:
+            df[vigente] = df[legada] if vigente not in df.columns else df[vigente].fillna(df[legada])
+    for columna, valor in VALORES_POR_DEFECTO.get(ledger, {}).items():
+        if columna not in df.columns:
+            df[columna] = valor
+    for columna, derivar in DERIVADAS.get(ledger, {}).items():
+        calculada = derivar(df)
+        df[columna] = calculada if columna not in df.columns else df[columna].fillna(calculada)
+    return df.reindex(columns=esquema_vigente(ledger).columnas)
+
+
+def tipar(df: pd.DataFrame, ledger: str) -> pd.DataFrame:
+    """Aplica los tipos vigentes a un DataFrame ya adaptado (las columnas no convertibles se dejan como están)"""
+    for columna, tipo in esquema_vigente(ledger).tipos.items():
+        try:
+            df[columna] = df[columna].astype(tipo)
+        except (ValueError, TypeError):
+            pass
+    return df
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Procesamiento en Flujo (Streaming) - P2P USDT
+
+Ordenamiento externo para ledgers más grandes que la RAM: cada chunk del CSV
+se ordena por fecha y se guarda como una corrida en disco; luego las
+corridas de compras y ventas se fusionan (k-way merge) en un único flujo
+cronológico que alimenta la recurrencia CPP por bloques.
+"""
+
+import os
+import heapq
+import pickle
+import numpy as np
+import pandas as pd
+from typing import Callable, Iterator, List
+
+COLUMNA_CLAVE_FECHA = '_fecha_ns'
+COLUMNA_CLAVE_LADO = '_lado'
+COLUMNA_CLAVE_POSICION = '_posicion'
+COLUMNAS_CLAVE = [COLUMNA_CLAVE_FECHA, COLUMNA_CLAVE_LADO, COLUMNA_CLAVE_POSICION]
+
+FILAS_LECTURA_CORRIDA = 1024  # Filas por sub-bloque de cada corrida en memoria durante la fusión
+_FECHA_NULA_NS = np.iinfo('int64').max  # NaT va al final, igual que en np.argsort
+
+
+def clave_fecha_ns(fechas: pd.Series) -> np.ndarray:
+    """Fechas como enteros (ns) para ordenar; NaT queda al final"""
+    valores = fechas.to_numpy(dtype='datetime64[ns]')
+    claves = valores.view('int64').copy()
+    claves[np.isnat(valores)] = _FECHA_NULA_NS
+    return claves
+
+
+def generar_corridas(chunks: Iterator[pd.DataFrame], preparar: Callable[[pd.DataFrame], pd.DataFrame],
+                     columna_fecha: str, lado: int, columnas: List[str], directorio: str,
+                     prefijo: str) -> List[str]:
+    """Ordena cada chunk por fecha y lo guarda como una corrida en disco.
+
+    `preparar` recibe el chunk crudo y devuelve el DataFrame con las columnas
+    calculadas. Devuelve las rutas de las corridas en el orden en que se generaron.
+    """
+    rutas = []
+    posicion_inicial = 0
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        calc = preparar(chunk)
+
+        corrida = pd.DataFrame({
+            COLUMNA_CLAVE_FECHA: clave_fecha_ns(calc[columna_fecha]),
+            COLUMNA_CLAVE_LADO: np.full(len(calc), lado, dtype='int64'),
+            COLUMNA_CLAVE_POSICION: np.arange(posicion_inicial, posicion_inicial + len(calc), dtype='int64'),
+        })
+        for columna in columnas:
+            corrida[columna] = calc[columna].to_numpy() if columna in calc.columns else pd.NA
+        posicion_inicial += len(calc)
+
+        # La posición ya es creciente: un orden estable por fecha respeta el orden del archivo
+        orden = np.argsort(corrida[COLUMNA_CLAVE_FECHA].to_numpy(), kind='stable')
+        corrida = corrida.iloc[orden].reset_index(drop=True)
+
+        ruta = os.path.join(directorio, f"{prefijo}_{len(rutas):05d}.run")
+        with open(ruta, 'wb') as f:
+            for inicio in range(0, len(corrida), FILAS_LECTURA_CORRIDA):
+                pickle.dump(corrida.iloc[inicio:inicio + FILAS_LECTURA_CORRIDA], f, protocol=pickle.HIGHEST_PROTOCOL)
+        rutas.append(ruta)
+
+    return rutas
+
+
+def leer_corrida(ruta: str) -> Iterator[tuple]:
+    """Recorre una corrida fila a fila, cargando un sub-bloque por vez"""
+    with open(ruta, 'rb') as f:
+        while True:
+            try:
+                bloque = pickle.load(f)
+            except EOFError:
+                return
+            yield from bloque.itertuples(index=False, name=None)
+
+
+def fusionar_corridas(rutas: List[str]) -> Iterator[tuple]:
+    """K-way merge de las corridas por (fecha, lado, posición).
+
+    La clave es única, así que el orden coincide con el orden estable del
+    procesamiento en memoria: ante fechas iguales, compras antes que ventas
+    y cada lado en el orden del archivo.
+    """
+    return heapq.merge(*(leer_corrida(ruta) for ruta in rutas))
+
+
+def agrupar_en_bloques(filas: Iterator[tuple], filas_por_bloque: int) -> Iterator[List[tuple]]:
+    """Agrupa el flujo fusionado en listas de hasta `filas_por_bloque` filas"""
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= filas_por_bloque:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de IDs por Ledger - P2P USDT
+
+Secuencia persistida (último número usado) e índice de IDs existentes para
+cada CSV. Se actualiza en cada alta hecha desde la app y solo se reconstruye
+leyendo la columna de IDs cuando el CSV cambió fuera de la app.
+"""
+
+import os
+import json
+import pandas as pd
+from typing import Optional
+
+from almacenamiento import NOMBRE_DIRECTORIO_CACHE, firma_archivo
+
+VERSION_INDICE = 1
+
+
+def numero_de_id(id_valor, prefijo: str) -> Optional[int]:
+    """Parte numérica de un ID con prefijo (ej: 'V012' -> 12), o None si no aplica"""
+    texto = str(id_valor).strip()
+    if texto.startswith(prefijo):
+        texto = texto[len(prefijo):]
+    return int(texto) if texto.isdigit() else None
+
+
+class IndiceIDs:
+    """Secuencia de IDs e índice de existencia de un ledger CSV"""
+
+    def __init__(self, ruta_csv: str, columna_id: str, prefijo: str, directorio_cache: str = None):
+        self.ruta_csv = ruta_csv
+        self.columna_id = columna_id
+        self.prefijo = prefijo
+
+        directorio = directorio_cache or os.path.join(os.path.dirname(os.path.abspath(ruta_csv)), NOMBRE_DIRECTORIO_CACHE)
+        base = os.path.splitext(os.path.basename(ruta_csv))[0]
+        self.ruta_ids = os.path.join(directorio, base + '.ids')  # Un ID por línea (solo se agrega al final)
+        self.ruta_meta = os.path.join(directorio, base + '.ids.json')
+
+        # Estado en memoria
+        self.maximo = 0
+        self.ids = set()
+        self._firma = None
+        self.reconstrucciones = 0
+
+    def ultimo_numero(self) -> int:
+        """Último número usado en la secuencia"""
+        self.sincronizar()
+        return self.maximo
+
+    def siguiente_id(self, digitos: int = 3) -> str:
+        """Próximo ID sugerido (ej: 'C004')"""
+        return f"{self.prefijo}{self.ultimo_numero() + 1:0{digitos}d}"
+
+    def existe(self, id_valor) -> bool:
+        """Indica si el ID ya existe en el ledger"""
+        self.sincronizar()
+        return str(id_valor).strip() in self.ids
+
+    def sincronizar(self):
+        """Carga el índice persistido o lo reconstruye si el CSV cambió fuera de la app"""
+        if not os.path.exists(self.ruta_csv):
+            self.maximo, self.ids, self._firma = 0, set(), None
+            return
+
+        firma_actual = firma_archivo(self.ruta_csv)
+        if self._firma == firma_actual:
+            return
+
+        meta = self._leer_meta()
+        if meta is not None and meta.get('csv') == firma_actual and self._cargar_persistido(meta):
+            return
+        self._reconstruir()
+
+    def registrar(self, id_valor):
+        """Registra un ID recién agregado al CSV.
+        
+        Se llama con el CSV bloqueado, después de `sincronizar()` previo a la escritura.
+        """
+        id_texto = str(id_valor).strip()
+        archivo_nuevo = not self.ids
+        self.ids.add(id_texto)
+        numero = numero_de_id(id_texto, self.prefijo)
+        if numero is not None and numero > self.maximo:
+            self.maximo = numero
+
+        os.makedirs(os.path.dirname(self.ruta_ids), exist_ok=True)
+        with open(self.ruta_ids, 'w' if archivo_nuevo else 'a', encoding='utf-8') as f:
+            f.write(id_texto + '\n')
+        self._firma = firma_archivo(self.ruta_csv)
+        self._guardar_meta()
+
+    def _cargar_persistido(self, meta) -> bool:
+        """Carga la secuencia e IDs persistidos; False si están incompletos"""
+        try:
+            with open(self.ruta_ids, 'r', encoding='utf-8') as f:
+                ids = set(linea.rstrip('\n') for linea in f if linea.strip())
+        except OSError:
+            return False
+        if len(ids) != meta.get('cantidad'):
+            return False
+        self.ids = ids
+        self.maximo = meta.get('maximo', 0)
+        self._firma = meta.get('csv')
+        return True
+
+    def _reconstruir(self):
+        """Reconstruye el índice leyendo solo la columna de IDs del CSV"""
+        self._firma = firma_archivo(self.ruta_csv)
+        try:
+            ids = pd.read_csv(self.ruta_csv, usecols=[self.columna_id], dtype=str)[self.columna_id].dropna().str.strip()
+        except (ValueError, pd.errors.EmptyDataError):
+            ids = pd.Series([], dtype=str)
+
+        self.ids = set(ids.tolist())
+        numeros = pd.to_numeric(ids.str.replace(self.prefijo, '', regex=False), errors='coerce').dropna()
+        self.maximo = int(numeros.max()) if not numeros.empty else 0
+        self.reconstrucciones += 1
+
+        os.makedirs(os.path.dirname(self.ruta_ids), exist_ok=True)
+        ruta_tmp = self.ruta_ids + '.tmp'
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            f.writelines(id_texto + '\n' for id_texto in self.ids)
+        os.replace(ruta_tmp, self.ruta_ids)
+        self._guardar_meta()
+
+    def _leer_meta(self):
+        """Lee el metadato del índice, o None si no existe o es de otra versión"""
+        try:
+            with open(self.ruta_meta, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('version') == VERSION_INDICE else None
+
+    def _guardar_meta(self):
+        """Guarda el metadato de forma atómica"""
+        ruta_tmp = self.ruta_meta + '.tmp'
+        with open(ruta_tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': VERSION_INDICE,
+                'maximo': self.maximo,
+                'cantidad': len(self.ids),
+                'csv': self._firma,
+            }, f)
+        os.replace(ruta_tmp, self.ruta_meta)
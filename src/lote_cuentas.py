@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Procesamiento por Lotes de Cuentas - P2P USDT
+
+Cada subdirectorio de la raíz con compras_usdt.csv y/o ventas_usdt.csv es
+una cuenta. Cada cuenta corre su propio pipeline de P2PTracker (incremental
+o completo) en un pool de procesos, y al final se consolidan los reportes de
+P&L y de flujo de fiat de todas las cuentas, más un resumen de tiempos por cuenta.
+
+Uso:
+    python src/lote_cuentas.py RAIZ [--salida DIR] [--workers N] [--full] [--formato csv|parquet|jsonl]
+
+Estructura esperada:
+    RAIZ/cuenta_a/compras_usdt.csv, ventas_usdt.csv, conversiones_fiat.csv
+    RAIZ/cuenta_b/...
+Salida (por defecto RAIZ/reports_lote/):
+    cuenta_a/reporte_ventas_pl.csv, ... (reportes y checkpoint de cada cuenta)
+    consolidado_ventas_pl.csv, consolidado_flujo_fiat.csv, consolidado_asignaciones_fiat.csv,
+    resumen_cuentas.csv
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+from script_p2p_tracker import (P2PTracker, ejecutar_pipeline, COMPRAS_CSV_TRACKER, VENTAS_CSV_TRACKER,
+                                CONVERSIONES_CSV_TRACKER)
+from reportes import FORMATOS_REPORTE, formato_reporte_disponible, ruta_reporte, guardar_reporte, leer_reporte
+from registro_p2p import obtener_registro, configurar_registro
+
+registro = obtener_registro('lote')
+
+# Nombres de archivo de cada cuenta (los mismos que usa el tracker en data/)
+ARCHIVO_COMPRAS = os.path.basename(COMPRAS_CSV_TRACKER)
+ARCHIVO_VENTAS = os.path.basename(VENTAS_CSV_TRACKER)
+ARCHIVO_CONVERSIONES = os.path.basename(CONVERSIONES_CSV_TRACKER)
+NOMBRE_SALIDA_LOTE = 'reports_lote'
+COLUMNA_CUENTA = 'Cuenta'
+COLUMNAS_RESUMEN = ['Cuenta', 'Estado', 'Modo', 'Compras_Procesadas', 'Ventas_Procesadas', 'Ventas_Reporte',
+                    'PL_Total_USD', 'Inventario_USDT', 'Pared_s', 'CPU_s', 'Error']
+
+
+def descubrir_cuentas(raiz: str) -> Dict[str, str]:
+    """Cuentas de la raíz: {nombre: directorio}, en orden alfabético"""
+    cuentas = {}
+    for nombre in sorted(os.listdir(raiz)):
+        directorio = os.path.join(raiz, nombre)
+        if not os.path.isdir(directorio):
+            continue
+        if any(os.path.exists(os.path.join(directorio, archivo)) for archivo in (ARCHIVO_COMPRAS, ARCHIVO_VENTAS)):
+            cuentas[nombre] = directorio
+    return cuentas
+
+
+def _iniciar_worker(nivel_consola):
+    """Configura el registro de cada proceso del pool"""
+    configurar_registro(nivel_consola)
+
+
+def procesar_cuenta(cuenta: str, directorio: str, directorio_salida: str, incremental: bool = True,
+                    formato: str = 'csv') -> Dict:
+    """Corre el pipeline de una cuenta (en un proceso del pool) y devuelve su fila de resumen.
+
+    Los errores no cortan el lote: la cuenta queda con Estado 'error'.
+    """
+    inicio_pared = time.perf_counter()
+    inicio_cpu = time.process_time()
+    resultado = {'Cuenta': cuenta, 'Estado': 'ok', 'Modo': None, 'Compras_Procesadas': 0, 'Ventas_Procesadas': 0,
+                 'Inventario_USDT': None, 'Error': None}
+    try:
+        tracker = P2PTracker(directorio_reportes=os.path.join(directorio_salida, cuenta), formato_reportes=formato)
+        ejecutar_pipeline(tracker, os.path.join(directorio, ARCHIVO_COMPRAS), os.path.join(directorio, ARCHIVO_VENTAS),
+                          os.path.join(directorio, ARCHIVO_CONVERSIONES), incremental=incremental)
+        resultado['Modo'] = 'incremental' if tracker.modo_incremental else 'completo'
+        resultado['Compras_Procesadas'] = len(tracker.df_compras)
+        resultado['Ventas_Procesadas'] = len(tracker.df_ventas)
+        resultado['Inventario_USDT'] = tracker.inventario_usdt_cantidad
+    except Exception as e:
+        resultado['Estado'] = 'error'
+        resultado['Error'] = f"{type(e).__name__}: {e}"
+    resultado['Pared_s'] = time.perf_counter() - inicio_pared
+    resultado['CPU_s'] = time.process_time() - inicio_cpu
+    return resultado
+
+
+def procesar_lote(cuentas: Dict[str, str], directorio_salida: str, incremental: bool = True,
+                  formato: str = 'csv', workers: int = None, nivel_worker=logging.ERROR) -> List[Dict]:
+    """Procesa las cuentas en paralelo; devuelve los resúmenes en el orden de `cuentas`"""
+    os.makedirs(directorio_salida, exist_ok=True)
+    resultados = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker, initargs=(nivel_worker,)) as pool:
+        futuros = {
+            pool.submit(procesar_cuenta, cuenta, directorio, directorio_salida, incremental, formato): cuenta
+            for cuenta, directorio in cuentas.items()
+        }
+        for i, futuro in enumerate(as_completed(futuros), start=1):
+            resultado = futuro.result()
+            resultados[futuros[futuro]] = resultado
+            if resultado['Estado'] == 'ok':
+                registro.info(f"✅ [{i}/{len(cuentas)}] {resultado['Cuenta']} ({resultado['Modo']}) "
+                              f"en {resultado['Pared_s']:.2f}s")
+            else:
+                registro.error(f"❌ [{i}/{len(cuentas)}] {resultado['Cuenta']}: {resultado['Error']}")
+    return [resultados[cuenta] for cuenta in cuentas]
+
+
+def _leer_reporte_cuenta(directorio_salida: str, cuenta: str, nombre: str, formato: str) -> pd.DataFrame:
+    """Reporte de una cuenta con la columna Cuenta al inicio (None si no existe)"""
+    ruta = ruta_reporte(os.path.join(directorio_salida, cuenta), nombre, formato)
+    if not os.path.exists(ruta):
+        return None
+    df = leer_reporte(ruta, formato)
+    df.insert(0, COLUMNA_CUENTA, cuenta)
+    return df
+
+
+def consolidar_reportes(resultados: List[Dict], directorio_salida: str, formato: str = 'csv') -> Dict[str, str]:
+    """Une los reportes de las cuentas procesadas y completa P&L y ventas del resumen"""
+    rutas = {}
+    for nombre, consolidado in (('reporte_ventas_pl', 'consolidado_ventas_pl'),
+                                ('reporte_flujo_fiat', 'consolidado_flujo_fiat'),
+                                ('reporte_asignaciones_fiat', 'consolidado_asignaciones_fiat')):
+        partes = []
+        for resultado in resultados:
+            if resultado['Estado'] != 'ok':
+                continue
+            df = _leer_reporte_cuenta(directorio_salida, resultado['Cuenta'], nombre, formato)
+            if df is None:
+                continue
+            if nombre == 'reporte_ventas_pl':
+                resultado['Ventas_Reporte'] = len(df)
+                resultado['PL_Total_USD'] = float(pd.to_numeric(df['Ganancia_Perdida_USDT_en_USD'], errors='coerce').sum())
+            partes.append(df)
+        if not partes:
+            registro.info(f"ℹ️  Ninguna cuenta tiene {nombre}; no se genera {consolidado}.")
+            continue
+        rutas[consolidado] = ruta_reporte(directorio_salida, consolidado, formato)
+        guardar_reporte(pd.concat(partes, ignore_index=True), rutas[consolidado], formato)
+        registro.info(f"✅ {consolidado} guardado en '{rutas[consolidado]}' ({len(partes)} cuentas)")
+    return rutas
+
+
+def guardar_resumen(resultados: List[Dict], directorio_salida: str, formato: str = 'csv') -> str:
+    """Resumen por cuenta: estado, modo, filas, P&L, inventario y tiempos"""
+    df = pd.DataFrame(resultados).reindex(columns=COLUMNAS_RESUMEN)
+    ruta = ruta_reporte(directorio_salida, 'resumen_cuentas', formato)
+    guardar_reporte(df, ruta, formato)
+    registro.info(f"✅ Resumen por cuenta guardado en '{ruta}'")
+    return ruta
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Procesa varias cuentas P2P en paralelo y consolida sus reportes")
+    parser.add_argument('raiz', help="Directorio con un subdirectorio por cuenta")
+    parser.add_argument('--salida', metavar='DIRECTORIO',
+                        help=f"Directorio de reportes (default: RAIZ/{NOMBRE_SALIDA_LOTE})")
+    parser.add_argument('--workers', type=int, metavar='N', help="Procesos en paralelo (default: núcleos disponibles)")
+    parser.add_argument('--formato', choices=sorted(FORMATOS_REPORTE), default='csv')
+    parser.add_argument('--full', dest='incremental', action='store_false',
+                        help="Recalcular cada cuenta desde cero ignorando su checkpoint")
+    parser.add_argument('--cuentas', nargs='+', metavar='CUENTA', help="Procesar solo estas cuentas")
+    parser.add_argument('--quiet', '-q', action='store_true', help="Sin salida por consola salvo errores")
+    parser.add_argument('--log-jsonl', metavar='RUTA', help="Agregar un log de auditoría JSON-lines")
+    args = parser.parse_args(argv)
+    if not formato_reporte_disponible(args.formato):
+        parser.error(f"el formato '{args.formato}' requiere instalar {FORMATOS_REPORTE[args.formato][1]}")
+    if args.workers is not None and args.workers <= 0:
+        parser.error("--workers debe ser mayor que 0")
+
+    configurar_registro(logging.ERROR if args.quiet else logging.INFO, ruta_jsonl=args.log_jsonl)
+    directorio_salida = args.salida or os.path.join(args.raiz, NOMBRE_SALIDA_LOTE)
+
+    cuentas = descubrir_cuentas(args.raiz)
+    if args.cuentas:
+        faltantes = sorted(set(args.cuentas) - set(cuentas))
+        if faltantes:
+            parser.error(f"cuentas no encontradas en {args.raiz}: {', '.join(faltantes)}")
+        cuentas = {cuenta: directorio for cuenta, directorio in cuentas.items() if cuenta in args.cuentas}
+    if not cuentas:
+        registro.warning(f"⚠️  No se encontraron cuentas en '{args.raiz}'")
+        return 0
+
+    registro.info(f"🚀 Procesando {len(cuentas)} cuentas ({'incremental' if args.incremental else 'completo'})...")
+    inicio = time.perf_counter()
+    resultados = procesar_lote(cuentas, directorio_salida, args.incremental, args.formato, args.workers)
+    consolidar_reportes(resultados, directorio_salida, args.formato)
+    guardar_resumen(resultados, directorio_salida, args.formato)
+
+    errores = sum(resultado['Estado'] != 'ok' for resultado in resultados)
+    suma_cuentas = sum(resultado['Pared_s'] for resultado in resultados)
+    registro.info(f"\n⏱️  {time.perf_counter() - inicio:.2f}s en total "
+                  f"({suma_cuentas:.2f}s sumando las cuentas una tras otra)")
+    if errores:
+        registro.error(f"❌ {errores} cuentas con error (ver resumen_cuentas)")
+        return 1
+    registro.info("🎉 ¡Lote completado exitosamente!")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
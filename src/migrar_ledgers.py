@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Migración de Ledgers - P2P USDT
+
+Reescribe en su lugar los CSV de compras, ventas y conversiones que usan un
+esquema anterior (ver `esquemas`): renombra columnas legadas, completa las
+que faltan y deja el encabezado vigente. Se procesa por chunks (memoria
+acotada), leyendo los valores como texto para copiarlos sin reformatear; el
+archivo nuevo reemplaza al original de forma atómica y el original queda
+como respaldo `<csv>.bak`.
+
+Uso:
+    python src/migrar_ledgers.py data/conversiones_fiat.csv [otros.csv ...]
+"""
+
+import os
+import sys
+import csv
+import shutil
+import logging
+import argparse
+import pandas as pd
+from typing import List, Optional
+
+from almacenamiento import bloqueo_archivo, leer_encabezado
+from esquemas import identificar, es_vigente, esquema_vigente, adaptar
+from registro_p2p import obtener_registro, configurar_registro
+
+registro = obtener_registro('migracion')
+
+FILAS_POR_CHUNK_MIGRACION = 100_000
+SUFIJO_RESPALDO = '.bak'
+
+
+def necesita_migracion(ruta: str) -> bool:
+    """True si el CSV es un ledger conocido con un esquema anterior al vigente"""
+    if not os.path.exists(ruta) or os.path.getsize(ruta) == 0:
+        return False
+    columnas = leer_encabezado(ruta)
+    ledger, _ = identificar(columnas)
+    return ledger is not None and not es_vigente(columnas, ledger)
+
+
+def migrar_archivo(ruta: str, respaldo: bool = True,
+                   filas_por_chunk: int = FILAS_POR_CHUNK_MIGRACION) -> Optional[int]:
+    """Migra el CSV al esquema vigente; devuelve las filas migradas o None si no hacía falta"""
+    with bloqueo_archivo(ruta):
+        if not necesita_migracion(ruta):
+            return None
+        ledger, version = identificar(leer_encabezado(ruta))
+        descripcion = f"v{version}" if version is not None else "columnas mezcladas"
+
+        filas = 0
+        ruta_tmp = ruta + '.migrando'
+        with open(ruta_tmp, 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f, lineterminator='\n').writerow(esquema_vigente(ledger).columnas)
+            # Todo como texto y solo '' como vacío: los valores se copian tal cual estaban
+            for chunk in pd.read_csv(ruta, dtype=str, keep_default_na=False, na_values=[''],
+                                     chunksize=filas_por_chunk):
+                adaptar(chunk, ledger).to_csv(f, header=False, index=False)
+                filas += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if respaldo:
+            shutil.copy2(ruta, ruta + SUFIJO_RESPALDO)
+        os.replace(ruta_tmp, ruta)
+
+    registro.info(f"✅ {ruta}: {filas} filas de {ledger} migradas desde {descripcion}"
+                  + (f" (respaldo en {ruta + SUFIJO_RESPALDO})" if respaldo else ""))
+    return filas
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Migra ledgers CSV con esquemas anteriores al esquema vigente")
+    parser.add_argument('archivos', nargs='+', metavar='CSV')
+    parser.add_argument('--sin-respaldo', dest='respaldo', action='store_false',
+                        help=f"No conservar el original como <csv>{SUFIJO_RESPALDO}")
+    parser.add_argument('--filas-por-chunk', type=int, default=FILAS_POR_CHUNK_MIGRACION, metavar='N')
+    args = parser.parse_args(argv)
+    if args.filas_por_chunk <= 0:
+        parser.error("--filas-por-chunk debe ser mayor que 0")
+
+    configurar_registro(logging.INFO)
+    errores = 0
+    for ruta in args.archivos:
+        if not os.path.exists(ruta):
+            registro.error(f"❌ Archivo no encontrado: {ruta}")
+            errores += 1
+            continue
+        try:
+            if migrar_archivo(ruta, args.respaldo, args.filas_por_chunk) is None:
+                registro.info(f"ℹ️  {ruta}: ya usa el esquema vigente (o no es un ledger)")
+        except (OSError, ValueError) as e:
+            registro.error(f"❌ Error migrando {ruta}: {e}")
+            errores += 1
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
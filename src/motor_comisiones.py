@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de Comisiones y Normalización a USD - P2P USDT
+
+Calcula comisiones de plataforma y montos en USD de forma columnar (NumPy),
+a partir de una tabla de comisiones indexada por (plataforma, moneda).
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+# Tabla de comisiones automáticas: (plataforma en minúsculas, moneda) -> tasa
+# La comisión automática solo se aplica cuando la comisión manual es 0.
+TABLA_COMISIONES: Dict[Tuple[str, str], float] = {
+    ('binance', 'UYU'): 0.0016,  # 0.16%
+    ('binance', 'USD'): 0.0028,  # 0.28%
+}
+
+
+def obtener_tasas_comision(plataformas: pd.Series, monedas: pd.Series,
+                           tabla: Dict[Tuple[str, str], float] = None) -> np.ndarray:
+    """Devuelve la tasa de comisión de cada fila según la tabla (0 si no aplica)"""
+    tabla = TABLA_COMISIONES if tabla is None else tabla
+    plataformas_arr = plataformas.astype(str).str.lower().to_numpy(dtype=object)
+    monedas_arr = monedas.to_numpy(dtype=object)
+
+    tasas = np.zeros(len(plataformas_arr), dtype='float64')
+    for (plataforma, moneda), tasa in tabla.items():
+        mascara = (plataformas_arr == plataforma.lower()) & (monedas_arr == moneda)
+        tasas[mascara] = tasa
+    return tasas
+
+
+def calcular_comisiones(cantidades: pd.Series, precios: pd.Series, comisiones: pd.Series,
+                        plataformas: pd.Series, monedas: pd.Series,
+                        tabla: Dict[Tuple[str, str], float] = None) -> pd.Series:
+    """Completa las comisiones en 0 con la comisión automática de la tabla.
+
+    La comisión automática se expresa en la moneda de la operación:
+    (cantidad_usdt * tasa) * precio_unitario.
+    """
+    comisiones_arr = comisiones.fillna(0).to_numpy(dtype='float64')
+    tasas = obtener_tasas_comision(plataformas, monedas, tabla)
+
+    mascara = (tasas > 0) & (comisiones_arr == 0)
+    comision_auto = cantidades.to_numpy(dtype='float64') * tasas * precios.to_numpy(dtype='float64')
+
+    return pd.Series(np.where(mascara, comision_auto, comisiones_arr), index=comisiones.index)
+
+
+def convertir_a_usd(montos: pd.Series, monedas: pd.Series, tasas_cambio: pd.Series) -> pd.Series:
+    """Convierte montos a USD: se mantienen si la moneda es USD, si no se dividen por la tasa"""
+    montos_arr = montos.to_numpy(dtype='float64')
+    es_usd = monedas.to_numpy(dtype=object) == 'USD'
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        convertidos = montos_arr / tasas_cambio.to_numpy(dtype='float64')
+    return pd.Series(np.where(es_usd, montos_arr, convertidos), index=montos.index)
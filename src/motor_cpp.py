@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor CPP (Costo Promedio Ponderado) - P2P USDT
+
+Kernel basado en arreglos: combina compras y ventas por fecha en un único
+conjunto de arreglos (cantidad, monto USD, lado, posición) y aplica la
+recurrencia de costo promedio ponderado en una sola pasada. Opcionalmente la
+recurrencia corre en punto fijo (enteros en millonésimas): las sumas de
+inventario son exactas y vender todo el stock lo deja exactamente en cero. Si
+hay cantidades o montos NaN/infinitos (ej: tasa de cambio 0 o precio vacío),
+ese cálculo se hace en float para que se vean igual que sin punto fijo.
+
+En modo sobreventa, la parte de una venta que excede el stock queda en una
+cola FIFO de lotes negativos; las compras siguientes la saldan a su costo
+unitario antes de sumar al inventario y le asignan ese costo a la venta
+original por su índice (sin volver a recorrer las ventas anteriores).
+"""
+
+import numpy as np
+from typing import Dict, Sequence
+
+from compacto import a_punto_fijo
+
+LADO_COMPRA = 0
+LADO_VENTA = 1
+
+
+def ordenar_transacciones(fechas_compras: np.ndarray, fechas_ventas: np.ndarray,
+                          cantidades_compras: np.ndarray, cantidades_ventas: np.ndarray,
+                          costos_usd_compras: np.ndarray, ingresos_usd_ventas: np.ndarray) -> Dict[str, np.ndarray]:
+    """Combina compras y ventas en arreglos ordenados cronológicamente.
+
+    El orden es estable: ante fechas iguales, las compras van antes que las
+    ventas y se respeta el orden original de cada archivo.
+    """
+    n_compras = len(fechas_compras)
+    n_ventas = len(fechas_ventas)
+
+    fechas = np.concatenate([
+        np.asarray(fechas_compras, dtype='datetime64[ns]'),
+        np.asarray(fechas_ventas, dtype='datetime64[ns]')
+    ])
+    orden = np.argsort(fechas, kind='stable')
+
+    lado = np.concatenate([
+        np.full(n_compras, LADO_COMPRA, dtype='int8'),
+        np.full(n_ventas, LADO_VENTA, dtype='int8')
+    ])
+    posicion = np.concatenate([
+        np.arange(n_compras, dtype='int64'),
+        np.arange(n_ventas, dtype='int64')
+    ])
+    cantidad = np.concatenate([
+        np.asarray(cantidades_compras, dtype='float64'),
+        np.asarray(cantidades_ventas, dtype='float64')
+    ])
+    monto_usd = np.concatenate([
+        np.asarray(costos_usd_compras, dtype='float64'),
+        np.asarray(ingresos_usd_ventas, dtype='float64')
+    ])
+
+    return {
+        'fecha': fechas[orden],
+        'lado': lado[orden],
+        'posicion': posicion[orden],
+        'cantidad': cantidad[orden],
+        'monto_usd': monto_usd[orden],
+    }
+
+
+def calcular_cpp(transacciones: Dict[str, np.ndarray], cantidad_inicial: float = 0.0,
+                 costo_inicial_usd: float = 0.0, escala: int = None, sobreventa: bool = False,
+                 pendientes_iniciales: Sequence[float] = ()) -> Dict:
+    """Aplica la recurrencia CPP sobre transacciones ya ordenadas.
+
+    Para cada venta devuelve el costo base, la ganancia/pérdida y el CPP usado
+    (en el orden de las transacciones). Si no hay stock suficiente, la venta se
+    registra con costo base 0 y todo el ingreso como P&L, sin descontar inventario.
+    Con `escala` (ej: 10**6) cantidades y montos se llevan a enteros en 1/escala
+    y el costo de cada venta se redondea a esa unidad; los resultados vuelven en float.
+    `no_finitos` cuenta las transacciones con cantidad o monto NaN/infinito; si hay
+    alguna (o el inventario inicial no es finito) se ignora `escala` y todo va en float.
+
+    Con `sobreventa=True` la venta sin stock suficiente consume el stock que
+    haya y el faltante queda pendiente; cada compra posterior salda primero los
+    pendientes (FIFO) y su costo se suma al costo base de esas ventas. Los
+    `pendientes_iniciales` son faltantes de una ejecución o bloque anterior.
+    En `resoluciones` cada venta se identifica por su índice de transacción, o
+    por -1-k si es el pendiente inicial k; `pendientes` son los que quedan.
+    """
+    no_finitos = int((~np.isfinite(transacciones['cantidad']) | ~np.isfinite(transacciones['monto_usd'])).sum())
+    finitos = no_finitos == 0 and np.isfinite([cantidad_inicial, costo_inicial_usd, *pendientes_iniciales]).all()
+    entero = escala is not None and finitos
+    if entero:
+        cantidades = a_punto_fijo(transacciones['cantidad'], escala).tolist()
+        montos_usd = a_punto_fijo(transacciones['monto_usd'], escala).tolist()
+        inv_cantidad = round(cantidad_inicial * escala)
+        inv_costo = round(costo_inicial_usd * escala)
+        cola_cantidad = a_punto_fijo(pendientes_iniciales, escala).tolist()
+    else:
+        cantidades = transacciones['cantidad'].tolist()
+        montos_usd = transacciones['monto_usd'].tolist()
+        inv_cantidad = cantidad_inicial
+        inv_costo = costo_inicial_usd
+        cola_cantidad = [float(cantidad) for cantidad in pendientes_iniciales]
+    es_venta = (transacciones['lado'] == LADO_VENTA).tolist()
+    n = len(cantidades)
+
+    costo_base = [0] * n
+    ganancia = [0] * n
+    cpp = [0.0] * n
+    sin_stock = [False] * n
+    faltante = [0] * n  # Cantidad sobrevendida (solo en modo sobreventa)
+    inventario_previo = [0] * n  # Inventario disponible antes de cada transacción
+
+    # Lotes negativos: venta a la que pertenece cada uno y cantidad pendiente; `cabeza` apunta al más antiguo
+    cola_venta = list(range(-1, -1 - len(cola_cantidad), -1))
+    cabeza = 0
+    resuelta_venta, resuelta_compra, resuelta_cantidad, resuelta_costo = [], [], [], []
+
+    for i in range(n):
+        cantidad = cantidades[i]
+        inventario_previo[i] = inv_cantidad
+
+        if not es_venta[i]:
+            monto = montos_usd[i]
+            while cabeza < len(cola_cantidad) and cantidad > 0:
+                # Saldar el lote más antiguo al costo unitario de esta compra
+                venta = cola_venta[cabeza]
+                saldada = min(cola_cantidad[cabeza], cantidad)
+                if saldada == cantidad:
+                    costo = monto
+                elif entero:
+                    costo = (saldada * monto + cantidad // 2) // cantidad
+                else:
+                    costo = saldada * monto / cantidad
+                cantidad -= saldada
+                monto -= costo
+                cola_cantidad[cabeza] -= saldada
+                if cola_cantidad[cabeza] <= 0:
+                    cabeza += 1
+
+                if venta >= 0:
+                    costo_base[venta] += costo
+                    ganancia[venta] -= costo
+                    cpp[venta] = costo_base[venta] / cantidades[venta]
+                resuelta_venta.append(venta)
+                resuelta_compra.append(i)
+                resuelta_cantidad.append(saldada)
+                resuelta_costo.append(costo)
+            inv_cantidad += cantidad
+            inv_costo += monto
+            continue
+
+        if inv_cantidad == 0 or inv_cantidad < cantidad:
+            sin_stock[i] = True
+            if not sobreventa:
+                # Stock insuficiente: P&L = ingreso completo, inventario sin cambios
+                ganancia[i] = montos_usd[i]
+                continue
+            # Se vende todo el stock a su costo y el faltante queda como lote negativo
+            costo_base[i] = inv_costo
+            ganancia[i] = montos_usd[i] - inv_costo
+            cpp[i] = inv_costo / inv_cantidad if inv_cantidad else 0.0
+            faltante[i] = cantidad - inv_cantidad
+            cola_venta.append(i)
+            cola_cantidad.append(faltante[i])
+            inv_cantidad = 0
+            inv_costo = 0
+            continue
+
+        cpp_actual = inv_costo / inv_cantidad
+        if entero:
+            # División entera redondeada: sin error acumulado entre ventas
+            costo = (cantidad * inv_costo + inv_cantidad // 2) // inv_cantidad
+        else:
+            costo = cantidad * cpp_actual
+
+        costo_base[i] = costo
+        ganancia[i] = montos_usd[i] - costo
+        cpp[i] = cpp_actual
+
+        inv_costo -= costo
+        inv_cantidad -= cantidad
+
+    divisor = escala if entero else 1
+    pendientes = [(venta, cantidad / divisor) for venta, cantidad in zip(cola_venta[cabeza:], cola_cantidad[cabeza:])]
+    return {
+        'costo_base_usd': np.array(costo_base, dtype='float64') / divisor,
+        'ganancia_perdida_usd': np.array(ganancia, dtype='float64') / divisor,
+        'cpp_usd': np.array(cpp, dtype='float64'),
+        'sin_stock': np.array(sin_stock, dtype='bool'),
+        'faltante': np.array(faltante, dtype='float64') / divisor,
+        'inventario_previo': np.array(inventario_previo, dtype='float64') / divisor,
+        'inventario_cantidad': inv_cantidad / divisor,
+        'inventario_costo_usd': inv_costo / divisor,
+        'resoluciones': {
+            'venta': np.array(resuelta_venta, dtype='int64'),
+            'compra': np.array(resuelta_compra, dtype='int64'),
+            'cantidad': np.array(resuelta_cantidad, dtype='float64') / divisor,
+            'costo_usd': np.array(resuelta_costo, dtype='float64') / divisor,
+        },
+        'pendientes': pendientes,
+        'no_finitos': no_finitos,
+    }
+
+
+def columnas_por_venta(transacciones: Dict[str, np.ndarray], resultado: Dict, n_ventas: int) -> Dict[str, np.ndarray]:
+    """Reordena los resultados del kernel a la posición original de cada venta"""
+    mascara = transacciones['lado'] == LADO_VENTA
+    posiciones = transacciones['posicion'][mascara]
+
+    columnas = {}
+    for clave in ('costo_base_usd', 'ganancia_perdida_usd', 'cpp_usd'):
+        columna = np.zeros(n_ventas, dtype='float64')
+        columna[posiciones] = resultado[clave][mascara]
+        columnas[clave] = columna
+    return columnas
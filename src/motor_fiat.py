@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de Lotes de Fiat - P2P USDT
+
+El fiat neto de cada venta es un lote en su moneda. Las compras financiadas con
+fiat de ventas se asignan contra esos lotes: primero el lote indicado en
+Fuente_De_Fondos_Fiat ("Venta_ID_<id>") y el resto en orden FIFO, o todo FIFO
+con "Ventas_FIFO". Una compra puede repartirse entre varias ventas; lo que no
+alcanza a cubrirse queda registrado como "sin_cubrir".
+
+Los lotes viven en arreglos NumPy por moneda (sin un dict por venta) y cada
+moneda lleva una línea de tiempo ordenada del saldo disponible, así que "fiat
+disponible al día X" es una búsqueda binaria. Los reportes de flujo de fiat y
+de asignaciones se arman directamente desde los arreglos.
+
+Las conversiones se concilian contra los lotes con un merge por
+ID_Venta_Asociada: monto convertido, tasa implícita y saldo residual por venta,
+y las conversiones sin venta (o en otra moneda) se informan todas juntas.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+PREFIJO_FUENTE_VENTA = 'Venta_ID_'
+FUENTE_FIFO = 'Ventas_FIFO'
+TOLERANCIA = 1e-9
+
+ESTADOS_FIAT = np.array(['Disponible', 'Parcialmente Usado', 'Totalmente Usado', 'Convertido'], dtype=object)
+DISPONIBLE, PARCIALMENTE_USADO, TOTALMENTE_USADO, CONVERTIDO = range(4)
+TIPOS_ASIGNACION = np.array(['explicita', 'fifo', 'sin_cubrir'], dtype=object)
+EXPLICITA, FIFO, SIN_CUBRIR = range(3)
+
+COLUMNAS_REPORTE_FIAT = ['ID_Venta', 'Moneda_Generada', 'Monto_Neto_Generado_Moneda_Original',
+                         'Monto_Fiat_Utilizado_Moneda_Original', 'Monto_Fiat_Disponible_Moneda_Original',
+                         'Estado_Fiat', 'Fecha_Venta']
+COLUMNAS_ASIGNACIONES_FIAT = ['ID_Compra', 'Fecha_Compra', 'ID_Venta', 'Moneda', 'Monto_Asignado', 'Tipo_Asignacion']
+
+COLUMNAS_CONVERSIONES = ['ID_Conversion', 'Fecha_Conversion', 'Moneda_Origen', 'Cantidad_Origen', 'Moneda_Destino',
+                         'Cantidad_Destino', 'ID_Venta_Asociada', 'Notas']
+COLUMNAS_CONVERSIONES_POR_VENTA = ['ID_Venta', 'Moneda_Generada', 'Monto_Neto_Generado_Moneda_Original',
+                                   'Monto_Fiat_Disponible_Moneda_Original', 'Conversiones',
+                                   'Monto_Convertido_Moneda_Original', 'Moneda_Destino',
+                                   'Monto_Recibido_Moneda_Destino', 'Tasa_Implicita_UYU_USD',
+                                   'Saldo_Residual_Moneda_Original', 'Fecha_Ultima_Conversion']
+COLUMNAS_CONVERSIONES_NO_CONCILIADAS = COLUMNAS_CONVERSIONES + ['Motivo']
+SIN_VENTA_ASOCIADA = ['', 'N/A', 'NAN', 'NONE']
+
+_TIPOS_LOTE = {'id': object, 'fecha': 'int64', 'paso': 'int64', 'monto': 'float64', 'usado': 'float64',
+               'estado': 'int8', 'orden': 'int64'}
+_TIPOS_SALDO = {'fecha': 'int64', 'saldo': 'float64'}
+_TIPOS_ASIGNACION = {'id_compra': object, 'fecha': 'int64', 'id_venta': object, 'moneda': object,
+                     'monto': 'float64', 'tipo': 'int8'}
+
+
+class _Columnas:
+    """Arreglos paralelos que crecen por duplicación (agregar filas cuesta O(1) amortizado)"""
+
+    def __init__(self, tipos: Dict[str, object], capacidad: int = 16):
+        self.n = 0
+        self.datos = {columna: np.empty(capacidad, dtype=tipo) for columna, tipo in tipos.items()}
+
+    def _reservar(self, extra: int):
+        capacidad = len(next(iter(self.datos.values())))
+        if self.n + extra <= capacidad:
+            return
+        nueva = max(capacidad * 2, self.n + extra)
+        for columna, arreglo in self.datos.items():
+            ampliado = np.empty(nueva, dtype=arreglo.dtype)
+            ampliado[:self.n] = arreglo[:self.n]
+            self.datos[columna] = ampliado
+
+    def extender(self, **columnas):
+        """Agrega filas (una secuencia por columna, todas del mismo largo)"""
+        k = len(next(iter(columnas.values())))
+        self._reservar(k)
+        for columna, valores in columnas.items():
+            self.datos[columna][self.n:self.n + k] = valores
+        self.n += k
+
+    def agregar(self, **valores):
+        """Agrega una fila"""
+        self._reservar(1)
+        for columna, valor in valores.items():
+            self.datos[columna][self.n] = valor
+        self.n += 1
+
+    def __getitem__(self, columna: str) -> np.ndarray:
+        return self.datos[columna][:self.n]
+
+    def __len__(self) -> int:
+        return self.n
+
+
+def _a_ns(fechas) -> np.ndarray:
+    """Fechas (Timestamp, texto o arreglo) como enteros en nanosegundos"""
+    return np.asarray(pd.to_datetime(fechas), dtype='datetime64[ns]').view('int64')
+
+
+class LotesFiat:
+    """Lotes de fiat por moneda, asignación explícita/FIFO y saldo disponible por fecha.
+
+    Los lotes y las asignaciones se registran en orden cronológico por tramos
+    (el lote de transacciones que procesa el tracker en cada pasada); `paso`
+    es la posición de la transacción dentro del tramo y evita asignar una
+    compra contra una venta posterior con la misma fecha.
+    """
+
+    def __init__(self):
+        self._lotes: Dict[str, _Columnas] = {}
+        self._saldos: Dict[str, _Columnas] = {}
+        self._primero: Dict[str, int] = {}  # Primer lote de la moneda que puede tener saldo (FIFO)
+        self._indice: Dict[str, tuple] = {}  # ID_Venta -> (moneda, posición del lote)
+        self._paso_base = 0
+        self._orden = 0
+
+        # Movimientos del tramo en curso: {moneda: [(fecha_ns, paso, monto), ...]}
+        self._movimientos: Dict[str, List[tuple]] = {}
+
+        # Asignaciones y montos sin cubrir de esta ejecución (no van al checkpoint)
+        self.asignaciones = _Columnas(_TIPOS_ASIGNACION)
+        self.sin_cubrir: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return sum(len(lotes) for lotes in self._lotes.values())
+
+    def _lotes_moneda(self, moneda: str) -> _Columnas:
+        if moneda not in self._lotes:
+            self._lotes[moneda] = _Columnas(_TIPOS_LOTE)
+            self._saldos[moneda] = _Columnas(_TIPOS_SALDO)
+            self._primero[moneda] = 0
+        return self._lotes[moneda]
+
+    def registrar_ventas(self, ids: np.ndarray, monedas: np.ndarray, montos: np.ndarray,
+                         fechas_ns: np.ndarray, pasos: np.ndarray):
+        """Crea un lote por venta (arreglos en orden cronológico, `pasos` relativos al tramo)"""
+        ids = np.asarray(ids).astype(str).astype(object)
+        monedas = pd.Series(monedas).fillna('N/A').astype(str).to_numpy()
+        montos = np.nan_to_num(np.asarray(montos, dtype='float64'))
+        fechas_ns = np.asarray(fechas_ns, dtype='int64')
+        pasos = np.asarray(pasos, dtype='int64') + self._paso_base
+        orden = np.arange(self._orden, self._orden + len(ids), dtype='int64')
+        self._orden += len(ids)
+
+        for moneda in pd.unique(monedas):
+            mascara = monedas == moneda
+            lotes = self._lotes_moneda(moneda)
+            inicio = len(lotes)
+            k = int(mascara.sum())
+            lotes.extender(id=ids[mascara], fecha=fechas_ns[mascara], paso=pasos[mascara], monto=montos[mascara],
+                           usado=np.zeros(k), estado=np.full(k, DISPONIBLE, dtype='int8'), orden=orden[mascara])
+            self._indice.update(zip(ids[mascara], zip([moneda] * k, range(inicio, inicio + k))))
+            self._movimientos.setdefault(moneda, []).extend(
+                zip(fechas_ns[mascara].tolist(), pasos[mascara].tolist(), montos[mascara].tolist()))
+
+    def asignar(self, id_compra, fuente, moneda: str, monto: float, fecha_ns: int, paso: int) -> float:
+        """Asigna el fiat de una compra contra los lotes según su fuente; devuelve el monto sin cubrir.
+
+        Las fuentes que no son de ventas (capital nuevo, ahorros, etc.) no se asignan.
+        """
+        if not isinstance(fuente, str) or not monto > 0:
+            return 0.0
+        paso += self._paso_base
+        if fuente.startswith(PREFIJO_FUENTE_VENTA):
+            ubicacion = self._indice.get(fuente[len(PREFIJO_FUENTE_VENTA):])
+            if ubicacion is not None and ubicacion[0] == moneda:
+                monto -= self._consumir(moneda, ubicacion[1], monto, id_compra, fecha_ns, paso, EXPLICITA)
+        elif fuente != FUENTE_FIFO:
+            return 0.0
+
+        monto = self._asignar_fifo(moneda, monto, id_compra, fecha_ns, paso)
+        if monto > TOLERANCIA:
+            self.asignaciones.agregar(id_compra=id_compra, fecha=fecha_ns, id_venta=None, moneda=moneda,
+                                      monto=monto, tipo=SIN_CUBRIR)
+            self.sin_cubrir[moneda] = self.sin_cubrir.get(moneda, 0.0) + monto
+            return monto
+        return 0.0
+
+    def _consumir(self, moneda: str, j: int, monto: float, id_compra, fecha_ns: int, paso: int, tipo: int) -> float:
+        """Toma hasta `monto` del lote j (solo si es anterior a la compra); devuelve lo tomado"""
+        lotes = self._lotes[moneda]
+        if lotes.datos['paso'][j] >= paso:
+            return 0.0
+        disponible = lotes.datos['monto'][j] - lotes.datos['usado'][j]
+        tomado = min(disponible, monto)
+        if tomado <= TOLERANCIA:
+            return 0.0
+
+        lotes.datos['usado'][j] += tomado
+        agotado = lotes.datos['monto'][j] - lotes.datos['usado'][j] <= TOLERANCIA
+        lotes.datos['estado'][j] = TOTALMENTE_USADO if agotado else PARCIALMENTE_USADO
+        self.asignaciones.agregar(id_compra=id_compra, fecha=fecha_ns, id_venta=lotes.datos['id'][j], moneda=moneda,
+                                  monto=tomado, tipo=tipo)
+        self._movimientos.setdefault(moneda, []).append((fecha_ns, paso, -tomado))
+        return tomado
+
+    def _asignar_fifo(self, moneda: str, monto: float, id_compra, fecha_ns: int, paso: int) -> float:
+        """Consume los lotes más antiguos con saldo; devuelve lo que quedó sin cubrir"""
+        lotes = self._lotes.get(moneda)
+        if lotes is None or monto <= TOLERANCIA:
+            return monto
+        montos, usados, pasos = lotes.datos['monto'], lotes.datos['usado'], lotes.datos['paso']
+
+        # Los lotes anteriores a _primero ya no tienen saldo: cada lote se saltea una sola vez
+        j = self._primero[moneda]
+        while j < lotes.n and pasos[j] < paso and monto > TOLERANCIA:
+            monto -= self._consumir(moneda, j, monto, id_compra, fecha_ns, paso, FIFO)
+            if montos[j] - usados[j] > TOLERANCIA:
+                break
+            j += 1
+        self._primero[moneda] = j
+        return monto
+
+    def cerrar_tramo(self, transacciones: int):
+        """Vuelca los movimientos del tramo a la línea de saldos de cada moneda"""
+        for moneda, movimientos in self._movimientos.items():
+            if not movimientos:
+                continue
+            fechas, pasos, montos = (np.array(columna) for columna in zip(*movimientos))
+            orden = np.lexsort((pasos, fechas))
+            saldos = self._saldos[moneda]
+            saldo_previo = saldos['saldo'][-1] if len(saldos) else 0.0
+            saldos.extender(fecha=fechas[orden], saldo=saldo_previo + np.cumsum(montos[orden]))
+        self._movimientos = {}
+        self._paso_base += transacciones
+
+    def marcar_convertido(self, id_venta) -> bool:
+        """Marca el lote de la venta como convertido; False si la venta no existe.
+
+        Es solo un estado del reporte: el saldo del lote sigue disponible para asignaciones.
+        """
+        ubicacion = self._indice.get(str(id_venta))
+        if ubicacion is None:
+            return False
+        self._lotes[ubicacion[0]].datos['estado'][ubicacion[1]] = CONVERTIDO
+        return True
+
+    def marcar_convertidos(self, ids_venta) -> int:
+        """Marca como convertidos los lotes de estas ventas; devuelve cuántos existían"""
+        marcados = 0
+        for id_venta in ids_venta:
+            marcados += self.marcar_convertido(id_venta)
+        return marcados
+
+    def disponible_al(self, moneda: str, fechas):
+        """Saldo disponible de la moneda al final de cada fecha (búsqueda binaria en la línea de saldos)"""
+        saldos = self._saldos.get(moneda)
+        escalar = np.ndim(fechas) == 0
+        posiciones = np.atleast_1d(_a_ns(fechas))
+        if saldos is None or len(saldos) == 0:
+            resultado = np.zeros(len(posiciones))
+        else:
+            indices = np.searchsorted(saldos['fecha'], posiciones, side='right')
+            resultado = np.where(indices > 0, saldos['saldo'][np.maximum(indices - 1, 0)], 0.0)
+        return float(resultado[0]) if escalar else resultado
+
+    def monedas(self) -> List[str]:
+        return sorted(self._lotes)
+
+    def reporte(self) -> pd.DataFrame:
+        """Flujo de fiat por venta, en el orden en que se generaron los lotes"""
+        partes = []
+        for moneda, lotes in self._lotes.items():
+            if len(lotes) == 0:
+                continue
+            partes.append(pd.DataFrame({
+                'orden': lotes['orden'],
+                'ID_Venta': lotes['id'],
+                'Moneda_Generada': moneda,
+                'Monto_Neto_Generado_Moneda_Original': lotes['monto'],
+                'Monto_Fiat_Utilizado_Moneda_Original': lotes['usado'],
+                'Monto_Fiat_Disponible_Moneda_Original': lotes['monto'] - lotes['usado'],
+                'Estado_Fiat': ESTADOS_FIAT[lotes['estado']],
+                'Fecha_Venta': lotes['fecha'].view('datetime64[ns]'),
+            }))
+        if not partes:
+            return pd.DataFrame(columns=COLUMNAS_REPORTE_FIAT)
+        df = pd.concat(partes, ignore_index=True).sort_values('orden', kind='stable')
+        return df[COLUMNAS_REPORTE_FIAT].reset_index(drop=True)
+
+    def reporte_asignaciones(self) -> pd.DataFrame:
+        """Asignaciones de compras contra lotes de esta ejecución (una fila por tramo de lote)"""
+        asignaciones = self.asignaciones
+        return pd.DataFrame({
+            'ID_Compra': asignaciones['id_compra'],
+            'Fecha_Compra': asignaciones['fecha'].view('datetime64[ns]'),
+            'ID_Venta': asignaciones['id_venta'],
+            'Moneda': asignaciones['moneda'],
+            'Monto_Asignado': asignaciones['monto'],
+            'Tipo_Asignacion': TIPOS_ASIGNACION[asignaciones['tipo']],
+        }, columns=COLUMNAS_ASIGNACIONES_FIAT)
+
+    def serializar(self) -> Dict:
+        """Lotes, saldos y punteros para el checkpoint (las columnas como arreglos NumPy)"""
+        return {
+            'paso_base': self._paso_base,
+            'orden': self._orden,
+            'lotes': {moneda: {columna: lotes[columna].copy() for columna in _TIPOS_LOTE}
+                      for moneda, lotes in self._lotes.items()},
+            'saldos': {moneda: {columna: saldos[columna].copy() for columna in _TIPOS_SALDO}
+                       for moneda, saldos in self._saldos.items()},
+            'primero': dict(self._primero),
+        }
+
+    @classmethod
+    def restaurar(cls, datos: Optional[Dict]) -> 'LotesFiat':
+        """Reconstruye los lotes desde `serializar` (columnas como arreglos o listas)"""
+        lotes_fiat = cls()
+        if not datos:
+            return lotes_fiat
+        lotes_fiat._paso_base = datos['paso_base']
+        lotes_fiat._orden = datos['orden']
+        for moneda, columnas in datos['lotes'].items():
+            lotes = lotes_fiat._lotes_moneda(moneda)
+            lotes.extender(**{columna: np.array(valores, dtype=_TIPOS_LOTE[columna])
+                              for columna, valores in columnas.items()})
+            lotes_fiat._indice.update(zip(lotes['id'], zip([moneda] * len(lotes), range(len(lotes)))))
+            lotes_fiat._saldos[moneda].extender(**{columna: np.array(valores, dtype=_TIPOS_SALDO[columna])
+                                                   for columna, valores in datos['saldos'][moneda].items()})
+            lotes_fiat._primero[moneda] = datos['primero'][moneda]
+        return lotes_fiat
+
+
+def normalizar_conversiones(conversiones: pd.DataFrame) -> pd.DataFrame:
+    """Columnas del ledger de conversiones con tipos y ID_Venta_Asociada limpios ('' si no tiene)"""
+    conv = conversiones.reindex(columns=COLUMNAS_CONVERSIONES)
+    ids = conv['ID_Venta_Asociada'].astype(object).fillna('').astype(str).str.strip()
+    conv['ID_Venta_Asociada'] = ids.mask(ids.str.upper().isin(SIN_VENTA_ASOCIADA), '')
+    conv['Notas'] = conv['Notas'].fillna('').astype(str).str.strip()
+    conv['Fecha_Conversion'] = pd.to_datetime(conv['Fecha_Conversion'], format='mixed', errors='coerce')
+    for columna in ('Cantidad_Origen', 'Cantidad_Destino'):
+        conv[columna] = pd.to_numeric(conv[columna], errors='coerce')
+    for columna in ('Moneda_Origen', 'Moneda_Destino'):
+        conv[columna] = conv[columna].astype(object).fillna('N/A').astype(str).str.strip().str.upper()
+    return conv
+
+
+def conciliar_conversiones(conversiones: pd.DataFrame, flujo_fiat: pd.DataFrame):
+    """Une conversiones normalizadas con el flujo de fiat por ID_Venta_Asociada, en una pasada.
+
+    Devuelve (por_venta, no_conciliadas): montos convertidos, tasa implícita y
+    saldo residual de cada venta con conversiones, y las conversiones cuya
+    venta no existe o es de otra moneda, con su motivo.
+    """
+    asociadas = conversiones[conversiones['ID_Venta_Asociada'] != '']
+    lotes = flujo_fiat[['ID_Venta', 'Moneda_Generada']].astype({'ID_Venta': str})
+    unidas = asociadas.merge(lotes, how='left', left_on='ID_Venta_Asociada', right_on='ID_Venta',
+                             validate='many_to_one' if lotes['ID_Venta'].is_unique else None)
+
+    motivo = pd.Series(np.where(unidas['ID_Venta'].isna(), 'venta_inexistente',
+                                np.where(unidas['Moneda_Origen'] != unidas['Moneda_Generada'].str.upper(), 'moneda_distinta', '')),
+                       index=unidas.index)
+    no_conciliadas = unidas.loc[motivo != '', COLUMNAS_CONVERSIONES].assign(Motivo=motivo[motivo != ''])
+    conciliadas = unidas[motivo == '']
+
+    # Tasa implícita en UYU por USD, sea cual sea el sentido de la conversión
+    origen_uyu = (conciliadas['Moneda_Origen'] == 'UYU') & (conciliadas['Moneda_Destino'] == 'USD')
+    destino_uyu = (conciliadas['Moneda_Origen'] == 'USD') & (conciliadas['Moneda_Destino'] == 'UYU')
+    montos_tasa = pd.DataFrame({
+        'ID_Venta': conciliadas['ID_Venta'],
+        'uyu': np.where(origen_uyu, conciliadas['Cantidad_Origen'],
+                        np.where(destino_uyu, conciliadas['Cantidad_Destino'], 0.0)),
+        'usd': np.where(origen_uyu, conciliadas['Cantidad_Destino'],
+                        np.where(destino_uyu, conciliadas['Cantidad_Origen'], 0.0)),
+    })
+
+    grupos = conciliadas.groupby('ID_Venta', sort=False)
+    agregado = pd.DataFrame({
+        'Conversiones': grupos.size(),
+        'Monto_Convertido_Moneda_Original': grupos['Cantidad_Origen'].sum(),
+        'Moneda_Destino': grupos['Moneda_Destino'].first().where(grupos['Moneda_Destino'].nunique() == 1, 'Varias'),
+        'Monto_Recibido_Moneda_Destino': grupos['Cantidad_Destino'].sum(),
+        'Fecha_Ultima_Conversion': grupos['Fecha_Conversion'].max(),
+    })
+    sumas_tasa = montos_tasa.groupby('ID_Venta', sort=False)[['uyu', 'usd']].sum()
+    agregado['Tasa_Implicita_UYU_USD'] = sumas_tasa['uyu'] / sumas_tasa['usd'].where(sumas_tasa['usd'] > 0)
+
+    # Las ventas quedan en el orden del flujo de fiat
+    por_venta = flujo_fiat.astype({'ID_Venta': str}).merge(agregado, left_on='ID_Venta', right_index=True)
+    por_venta['Saldo_Residual_Moneda_Original'] = (por_venta['Monto_Fiat_Disponible_Moneda_Original']
+                                                   - por_venta['Monto_Convertido_Moneda_Original'])
+    return por_venta[COLUMNAS_CONVERSIONES_POR_VENTA].reset_index(drop=True), no_conciliadas.reset_index(drop=True)
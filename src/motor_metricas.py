@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de Métricas del Dashboard - P2P USDT
+
+Calcula en una sola pasada vectorizada (un groupby por plataforma) las
+métricas que muestran el resumen financiero, el resumen por plataforma y el
+análisis detallado por plataforma, con las mismas fórmulas de costo/ingreso
+en USD (comisiones incluidas, las automáticas de `motor_comisiones` como en
+P2PTracker) para todas las pantallas.
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from typing import Dict, Optional, Tuple
+
+from compacto import normalizar_categorias
+from motor_comisiones import calcular_comisiones, convertir_a_usd
+
+COLUMNAS_POR_PLATAFORMA = [
+    'compras_count', 'ventas_count', 'usdt_comprado', 'usdt_vendido',
+    'costo_total', 'ingreso_total', 'cpp_promedio', 'precio_venta_promedio'
+]
+
+
+def _columna(df: pd.DataFrame, nombre: str, defecto) -> pd.Series:
+    """Columna del DataFrame o una serie constante si no existe"""
+    if nombre in df.columns:
+        return df[nombre]
+    return pd.Series(defecto, index=df.index)
+
+
+def _numerica(df: pd.DataFrame, nombre: str, defecto: float) -> np.ndarray:
+    """Columna numérica como float64, con NaN reemplazados por el valor por defecto"""
+    return pd.to_numeric(_columna(df, nombre, defecto), errors='coerce').fillna(defecto).to_numpy(dtype='float64')
+
+
+def _plataformas(df: pd.DataFrame) -> pd.Categorical:
+    """Nombre de plataforma para mostrar (ej: 'binance' -> 'Binance'), como categórica"""
+    return normalizar_categorias(_columna(df, 'Plataforma', 'Desconocida'), lambda c: c.str.title(),
+                                 faltante='Desconocida').array
+
+
+def _montos_usd(df: pd.DataFrame, cantidad: np.ndarray, columna_precio: str, columna_comision: str,
+                columna_moneda: str, columna_tasa: str, signo_comision: float,
+                tabla: Dict[Tuple[str, str], float] = None) -> np.ndarray:
+    """(cantidad * precio ± comisiones) en USD, con las mismas fórmulas que P2PTracker.
+
+    Las comisiones en 0 se completan con la tabla (`calcular_comisiones`) y los
+    montos en otra moneda se dividen por la tasa (`convertir_a_usd`).
+    """
+    cantidades = pd.Series(cantidad, index=df.index)
+    precios = pd.Series(_numerica(df, columna_precio, 0.0), index=df.index)
+    monedas = _columna(df, columna_moneda, 'USD')
+    comisiones = calcular_comisiones(
+        cantidades, precios, pd.Series(_numerica(df, columna_comision, 0.0), index=df.index),
+        _columna(df, 'Plataforma', 'Otro'), monedas, tabla
+    )
+    monto = cantidades * precios + signo_comision * comisiones
+    tasas = pd.Series(_numerica(df, columna_tasa, 1.0), index=df.index)
+    return convertir_a_usd(monto, monedas, tasas).to_numpy(dtype='float64')
+
+
+def preparar_movimientos(df_compras: pd.DataFrame, df_ventas: pd.DataFrame,
+                         tabla_comisiones: Dict[Tuple[str, str], float] = None) -> pd.DataFrame:
+    """Une compras y ventas en un único marco columnar (una fila por transacción)"""
+    cant_c = _numerica(df_compras, 'Cantidad_USDT_Comprada', 0.0)
+    costo_c = _montos_usd(df_compras, cant_c, 'Precio_Unitario_Moneda_Pago', 'Comisiones_Compra_Moneda_Pago',
+                          'Moneda_Pago', 'Tasa_Cambio_UYU_USD_Compra', 1.0, tabla_comisiones)
+    cant_v = _numerica(df_ventas, 'Cantidad_USDT_Vendida', 0.0)
+    ingreso_v = _montos_usd(df_ventas, cant_v, 'Precio_Unitario_Moneda_Recibida', 'Comisiones_Venta_Moneda_Recibida',
+                            'Moneda_Recibida', 'Tasa_Cambio_UYU_USD_Venta', -1.0, tabla_comisiones)
+
+    n_c, n_v = len(cant_c), len(cant_v)
+    ceros_c, ceros_v = np.zeros(n_c), np.zeros(n_v)
+    return pd.DataFrame({
+        'plataforma': union_categoricals([_plataformas(df_compras), _plataformas(df_ventas)], sort_categories=True),
+        'compras_count': np.concatenate([np.ones(n_c, dtype='int64'), np.zeros(n_v, dtype='int64')]),
+        'ventas_count': np.concatenate([np.zeros(n_c, dtype='int64'), np.ones(n_v, dtype='int64')]),
+        'usdt_comprado': np.concatenate([cant_c, ceros_v]),
+        'usdt_vendido': np.concatenate([ceros_c, cant_v]),
+        'costo_total': np.concatenate([costo_c, ceros_v]),
+        'ingreso_total': np.concatenate([ceros_c, ingreso_v]),
+    })
+
+
+def calcular_metricas(df_compras: pd.DataFrame, df_ventas: pd.DataFrame,
+                      df_conversiones: pd.DataFrame = None,
+                      tabla_comisiones: Dict[Tuple[str, str], float] = None) -> Optional[Dict]:
+    """Métricas globales y por plataforma; None si no hay compras ni ventas"""
+    if df_compras.empty and df_ventas.empty:
+        return None
+
+    movimientos = preparar_movimientos(df_compras, df_ventas, tabla_comisiones)
+
+    # Única pasada de agregación: todas las sumas por plataforma
+    por_plataforma = movimientos.groupby('plataforma', sort=True, observed=True).sum()
+    por_plataforma['cpp_promedio'] = np.where(
+        por_plataforma['usdt_comprado'] > 0,
+        por_plataforma['costo_total'] / por_plataforma['usdt_comprado'].where(por_plataforma['usdt_comprado'] > 0), 0.0)
+    por_plataforma['precio_venta_promedio'] = np.where(
+        por_plataforma['usdt_vendido'] > 0,
+        por_plataforma['ingreso_total'] / por_plataforma['usdt_vendido'].where(por_plataforma['usdt_vendido'] > 0), 0.0)
+    por_plataforma = por_plataforma[COLUMNAS_POR_PLATAFORMA]
+
+    # Las métricas globales salen de las sumas por plataforma
+    totales = por_plataforma[['compras_count', 'ventas_count', 'usdt_comprado', 'usdt_vendido',
+                              'costo_total', 'ingreso_total']].sum()
+    total_usdt_comprado = float(totales['usdt_comprado'])
+    total_usdt_vendido = float(totales['usdt_vendido'])
+    inversion_total_usd = float(totales['costo_total'])
+    ingresos_total_usd = float(totales['ingreso_total'])
+
+    cpp_promedio = inversion_total_usd / total_usdt_comprado if total_usdt_comprado > 0 else 0
+    pl_realizado = ingresos_total_usd - (total_usdt_vendido * cpp_promedio) if total_usdt_vendido > 0 else 0
+    roi_porcentaje = (pl_realizado / inversion_total_usd * 100) if inversion_total_usd > 0 else 0
+
+    return {
+        'globales': {
+            'total_compras': len(df_compras),
+            'total_ventas': len(df_ventas),
+            'total_conversiones': 0 if df_conversiones is None else len(df_conversiones),
+            'total_usdt_comprado': total_usdt_comprado,
+            'total_usdt_vendido': total_usdt_vendido,
+            'usdt_en_inventario': total_usdt_comprado - total_usdt_vendido,
+            'inversion_total_usd': inversion_total_usd,
+            'ingresos_total_usd': ingresos_total_usd,
+            'cpp_promedio': cpp_promedio,
+            'pl_realizado': pl_realizado,
+            'roi_porcentaje': roi_porcentaje
+        },
+        'por_plataforma': por_plataforma
+    }
+
+
+class MotorMetricas:
+    """Cachea las métricas hasta que cambia la versión de los datos"""
+
+    def __init__(self, tabla_comisiones: Dict[Tuple[str, str], float] = None):
+        self.tabla_comisiones = tabla_comisiones
+        self._version = None
+        self._metricas = None
+        self.calculos = 0
+
+    def obtener(self, version, df_compras: pd.DataFrame, df_ventas: pd.DataFrame,
+                df_conversiones: pd.DataFrame = None) -> Optional[Dict]:
+        """Devuelve las métricas cacheadas o las recalcula si cambió la versión"""
+        if self._version is not None and self._version == version:
+            return self._metricas
+        self._metricas = calcular_metricas(df_compras, df_ventas, df_conversiones, self.tabla_comisiones)
+        self._version = version
+        self.calculos += 1
+        return self._metricas
+
+    def invalidar(self):
+        """Fuerza el recálculo en la próxima consulta"""
+        self._version = None
+        self._metricas = None
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor de Rentabilidad - P2P USDT
+
+Sobre el P&L por venta de P2PTracker (Costo_Promedio_Ponderado_USD y
+Ganancia_Perdida_USDT_en_USD) calcula curvas de P&L acumulado, margen por
+USDT en ventanas móviles de N días y la distribución del spread realizado
+(precio de venta en USD frente al CPP de compra).
+
+Las ventas se ordenan una vez y se guardan sumas acumuladas: el total de
+cualquier ventana sale de restar dos posiciones de esas sumas (búsqueda
+binaria de los bordes), sin recorrer las ventas por cada ventana. Cada
+tamaño de ventana queda cacheado hasta que cambian los datos.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+VENTANAS_POR_DEFECTO = [7, 30, 90]
+PERCENTILES_SPREAD = [5, 25, 50, 75, 95]
+BINS_HISTOGRAMA = 10
+_DIA_NS = 86_400 * 10**9
+
+
+def _numerica(df: pd.DataFrame, columna: str) -> np.ndarray:
+    return pd.to_numeric(df[columna], errors='coerce').to_numpy(dtype='float64')
+
+
+def preparar_ventas(ventas_pl: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Arreglos por venta en orden cronológico, sumas acumuladas y cierres diarios"""
+    fechas = pd.to_datetime(ventas_pl['Fecha_Venta']).to_numpy(dtype='datetime64[ns]')
+    cantidad = _numerica(ventas_pl, 'Cantidad_USDT_Vendida')
+    validas = ~np.isnat(fechas) & (cantidad > 0)
+
+    orden = np.argsort(fechas[validas], kind='stable')
+    fechas_ns = fechas[validas].view('int64')[orden]
+    cantidad = cantidad[validas][orden]
+    pnl = np.nan_to_num(_numerica(ventas_pl, 'Ganancia_Perdida_USDT_en_USD')[validas][orden])
+    cpp = _numerica(ventas_pl, 'Costo_Promedio_Ponderado_USD')[validas][orden]
+    precio_venta_usd = _numerica(ventas_pl, 'Ingreso_Neto_en_USD')[validas][orden] / cantidad
+
+    # Spread realizado: precio de venta neto en USD menos el CPP al momento de la venta
+    spread = precio_venta_usd - cpp
+    spread[~(cpp > 0)] = np.nan  # Ventas sin stock (sin costo base) no tienen spread
+
+    # Cierre de cada día con ventas: índice de la primera venta posterior al día
+    dias_ns = np.unique(fechas_ns - fechas_ns % _DIA_NS)
+    fin_dia_ns = dias_ns + _DIA_NS
+
+    return {
+        'fechas_ns': fechas_ns,
+        'spread': spread,
+        'acum_pnl': np.concatenate([[0.0], np.cumsum(pnl)]),
+        'acum_volumen': np.concatenate([[0.0], np.cumsum(cantidad)]),
+        'dias': dias_ns.view('datetime64[ns]'),
+        'fin_dia_ns': fin_dia_ns,
+        'idx_fin_dia': np.searchsorted(fechas_ns, fin_dia_ns, side='left'),
+    }
+
+
+def curva_pl(datos: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """P&L del día y acumulado al cierre de cada día con ventas"""
+    acumulado = datos['acum_pnl'][datos['idx_fin_dia']]
+    return pd.DataFrame({
+        'Dia': datos['dias'],
+        'PL_Dia_USD': np.diff(np.concatenate([[0.0], acumulado])),
+        'PL_Acumulado_USD': acumulado,
+    })
+
+
+def distribucion_spread(spread: np.ndarray) -> Dict:
+    """Percentiles, media, desvío, proporción negativa e histograma del spread"""
+    spread = spread[~np.isnan(spread)]
+    if len(spread) == 0:
+        return {'ventas': 0}
+    # El histograma se corta en p1-p99 para que un valor extremo no aplaste el resto
+    limites = np.percentile(spread, [1, 99])
+    if limites[0] == limites[1]:
+        limites = [limites[0] - 0.5, limites[1] + 0.5]
+    conteos, bordes = np.histogram(np.clip(spread, *limites), bins=BINS_HISTOGRAMA, range=tuple(limites))
+    return {
+        'ventas': len(spread),
+        'media': float(spread.mean()),
+        'desvio': float(spread.std()),
+        'percentiles': dict(zip(PERCENTILES_SPREAD, np.percentile(spread, PERCENTILES_SPREAD).tolist())),
+        'negativas_pct': float((spread < 0).mean() * 100),
+        'histograma': (conteos, bordes),
+    }
+
+
+def ventana_movil(datos: Dict[str, np.ndarray], dias: int) -> Dict:
+    """P&L, volumen y margen por USDT de los últimos `dias` días, al cierre de cada día"""
+    inicio_ns = datos['fin_dia_ns'] - dias * _DIA_NS
+    idx_inicio = np.searchsorted(datos['fechas_ns'], inicio_ns, side='left')
+    idx_fin = datos['idx_fin_dia']
+
+    pnl = datos['acum_pnl'][idx_fin] - datos['acum_pnl'][idx_inicio]
+    volumen = datos['acum_volumen'][idx_fin] - datos['acum_volumen'][idx_inicio]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margen = np.where(volumen > 0, pnl / volumen, np.nan)
+    serie = pd.DataFrame({
+        'Dia': datos['dias'],
+        'PL_Ventana_USD': pnl,
+        'Volumen_Ventana_USDT': volumen,
+        'Margen_por_USDT': margen,
+    })
+
+    resumen = {'dias': dias}
+    if len(serie):
+        validos = serie.dropna(subset=['Margen_por_USDT'])
+        resumen.update({
+            'margen_actual': float(margen[-1]),
+            'pl_actual': float(pnl[-1]),
+            'volumen_actual': float(volumen[-1]),
+            'margen_promedio': float(validos['Margen_por_USDT'].mean()) if len(validos) else float('nan'),
+        })
+        if len(validos):
+            mejor = validos['Margen_por_USDT'].idxmax()
+            peor = validos['Margen_por_USDT'].idxmin()
+            resumen['mejor'] = (validos.at[mejor, 'Dia'], float(validos.at[mejor, 'Margen_por_USDT']))
+            resumen['peor'] = (validos.at[peor, 'Dia'], float(validos.at[peor, 'Margen_por_USDT']))
+
+    # Spread de las ventas dentro de la última ventana
+    desde = np.searchsorted(datos['fechas_ns'], inicio_ns[-1], side='left') if len(inicio_ns) else 0
+    return {'serie': serie, 'resumen': resumen, 'spread': distribucion_spread(datos['spread'][desde:])}
+
+
+class MotorRentabilidad:
+    """Cachea la preparación por versión de datos y cada ventana por tamaño en días"""
+
+    def __init__(self):
+        self._version = None
+        self._datos: Optional[Dict[str, np.ndarray]] = None
+        self._curva = None
+        self._spread_total = None
+        self._ventanas: Dict[int, Dict] = {}
+        self.preparaciones = 0
+
+    def _vigente(self, version, ventas_pl: pd.DataFrame) -> Dict[str, np.ndarray]:
+        if self._version is None or self._version != version:
+            self._datos = preparar_ventas(ventas_pl)
+            self._curva = None
+            self._spread_total = None
+            self._ventanas = {}
+            self._version = version
+            self.preparaciones += 1
+        return self._datos
+
+    def curva(self, version, ventas_pl: pd.DataFrame) -> pd.DataFrame:
+        """Curva de P&L acumulado por día"""
+        datos = self._vigente(version, ventas_pl)
+        if self._curva is None:
+            self._curva = curva_pl(datos)
+        return self._curva
+
+    def spread_total(self, version, ventas_pl: pd.DataFrame) -> Dict:
+        """Distribución del spread de todas las ventas"""
+        datos = self._vigente(version, ventas_pl)
+        if self._spread_total is None:
+            self._spread_total = distribucion_spread(datos['spread'])
+        return self._spread_total
+
+    def ventana(self, version, ventas_pl: pd.DataFrame, dias: int) -> Dict:
+        """Serie, resumen y spread de la ventana móvil de `dias` días"""
+        if dias <= 0:
+            raise ValueError(f"La ventana debe ser de al menos 1 día: {dias}")
+        datos = self._vigente(version, ventas_pl)
+        if dias not in self._ventanas:
+            self._ventanas[dias] = ventana_movil(datos, dias)
+        return self._ventanas[dias]
+
+    def invalidar(self):
+        """Fuerza la preparación en la próxima consulta"""
+        self._version = None
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor Temporal - P2P USDT
+
+Agrega la salida CPP de P2PTracker (P&L por venta y compras calculadas) por
+día, semana o mes, con desglose por plataforma y moneda. Las operaciones se
+agregan una sola vez a una base diaria (día x plataforma x moneda) con sumas;
+semanas y meses se obtienen reagrupando esa base, no las operaciones, y cada
+combinación granularidad/desglose queda cacheada hasta que cambian los datos.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+from motor_comisiones import convertir_a_usd
+from compacto import normalizar_categorias, categorizar
+
+# Granularidad -> frecuencia de pandas.Period
+GRANULARIDADES = {'dia': 'D', 'semana': 'W-SUN', 'mes': 'M'}
+DESGLOSES = {
+    'total': [],
+    'plataforma': ['Plataforma'],
+    'moneda': ['Moneda'],
+    'plataforma_moneda': ['Plataforma', 'Moneda'],
+}
+COLUMNAS_SUMA = ['Ventas', 'Volumen_USDT', 'Ingreso_Bruto_USD', 'Costo_Base_USD', 'PL_Realizado_USD',
+                 'Comisiones_Venta_USD', 'Compras', 'Volumen_Compras_USDT', 'Comisiones_Compra_USD']
+COLUMNAS_DERIVADAS = ['Spread_USD_por_USDT', 'Margen_Pct', 'Comisiones_USD']
+
+
+def _numerica(df: pd.DataFrame, columna: str) -> pd.Series:
+    """Columna como float64 con NaN en 0"""
+    return pd.to_numeric(df[columna], errors='coerce').fillna(0.0).astype('float64')
+
+
+def _plataformas(serie: pd.Series) -> pd.Series:
+    return normalizar_categorias(serie, lambda c: c.str.title(), faltante='Desconocida')
+
+
+def _base_ventas(ventas: pd.DataFrame) -> pd.DataFrame:
+    """Montos por venta en USD, con comisiones y monto bruto"""
+    comisiones_usd = convertir_a_usd(_numerica(ventas, 'Comisiones_Venta_Moneda_Recibida'),
+                                     ventas['Moneda_Recibida'], _numerica(ventas, 'Tasa_Cambio_UYU_USD_Venta'))
+    ingreso_neto = _numerica(ventas, 'Ingreso_Neto_en_USD')
+    return pd.DataFrame({
+        'Dia': pd.to_datetime(ventas['Fecha_Venta']).dt.floor('D'),
+        'Plataforma': _plataformas(ventas['Plataforma']),
+        'Moneda': normalizar_categorias(ventas['Moneda_Recibida'], faltante='N/A'),
+        'Ventas': 1,
+        'Volumen_USDT': _numerica(ventas, 'Cantidad_USDT_Vendida'),
+        'Ingreso_Bruto_USD': ingreso_neto + comisiones_usd.fillna(0.0),
+        'Costo_Base_USD': _numerica(ventas, 'Costo_Base_USD_de_USDT_Vendido'),
+        'PL_Realizado_USD': _numerica(ventas, 'Ganancia_Perdida_USDT_en_USD'),
+        'Comisiones_Venta_USD': comisiones_usd.fillna(0.0),
+    })
+
+
+def _base_compras(compras: pd.DataFrame) -> pd.DataFrame:
+    """Volumen y comisiones por compra en USD"""
+    comisiones_usd = convertir_a_usd(_numerica(compras, 'Comisiones_Compra_Moneda_Pago'),
+                                     compras['Moneda_Pago'], _numerica(compras, 'Tasa_Cambio_UYU_USD_Compra'))
+    return pd.DataFrame({
+        'Dia': pd.to_datetime(compras['Fecha_Compra']).dt.floor('D'),
+        'Plataforma': _plataformas(compras['Plataforma']),
+        'Moneda': normalizar_categorias(compras['Moneda_Pago'], faltante='N/A'),
+        'Compras': 1,
+        'Volumen_Compras_USDT': _numerica(compras, 'Cantidad_USDT_Comprada'),
+        'Comisiones_Compra_USD': comisiones_usd.fillna(0.0),
+    })
+
+
+def agregar_por_dia(ventas: pd.DataFrame, compras: pd.DataFrame) -> pd.DataFrame:
+    """Base diaria: sumas por (Dia, Plataforma, Moneda) en una sola pasada de groupby"""
+    partes = []
+    if not ventas.empty:
+        partes.append(_base_ventas(ventas))
+    if not compras.empty:
+        partes.append(_base_compras(compras))
+    if not partes:
+        return pd.DataFrame(columns=['Dia', 'Plataforma', 'Moneda'] + COLUMNAS_SUMA)
+
+    operaciones = pd.concat(partes, ignore_index=True).reindex(
+        columns=['Dia', 'Plataforma', 'Moneda'] + COLUMNAS_SUMA)
+    # Compras y ventas traen categorías distintas: se recodifican para agrupar por códigos
+    operaciones = categorizar(operaciones, ['Plataforma', 'Moneda'])
+    operaciones[COLUMNAS_SUMA] = operaciones[COLUMNAS_SUMA].fillna(0)
+    operaciones = operaciones.dropna(subset=['Dia'])
+    base = operaciones.groupby(['Dia', 'Plataforma', 'Moneda'], sort=True, observed=True)[COLUMNAS_SUMA].sum().reset_index()
+    base[['Ventas', 'Compras']] = base[['Ventas', 'Compras']].astype('int64')
+    return base
+
+
+def agregar_periodos(base: pd.DataFrame, granularidad: str, desglose: str = 'total') -> pd.DataFrame:
+    """Reagrupa la base diaria por período y desglose, con spread, margen y comisiones totales"""
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"Granularidad no soportada: {granularidad}")
+    if desglose not in DESGLOSES:
+        raise ValueError(f"Desglose no soportado: {desglose}")
+
+    claves = DESGLOSES[desglose]
+    if base.empty:
+        return pd.DataFrame(columns=['Periodo'] + claves + COLUMNAS_SUMA + COLUMNAS_DERIVADAS)
+
+    periodos = base['Dia'].dt.to_period(GRANULARIDADES[granularidad])
+    tabla = base.groupby([periodos.rename('Periodo')] + claves, sort=True, observed=True)[COLUMNAS_SUMA].sum().reset_index()
+
+    volumen = tabla['Volumen_USDT'].to_numpy(dtype='float64')
+    costo = tabla['Costo_Base_USD'].to_numpy(dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Spread bruto (antes de comisiones) de la venta frente al CPP, por USDT vendido
+        tabla['Spread_USD_por_USDT'] = np.where(
+            volumen > 0, (tabla['Ingreso_Bruto_USD'].to_numpy() - costo) / volumen, np.nan)
+        tabla['Margen_Pct'] = np.where(costo > 0, tabla['PL_Realizado_USD'].to_numpy() / costo * 100, np.nan)
+    tabla['Comisiones_USD'] = tabla['Comisiones_Venta_USD'] + tabla['Comisiones_Compra_USD']
+    tabla['Periodo'] = tabla['Periodo'].astype(str)
+    return tabla
+
+
+class MotorTemporal:
+    """Cachea la base diaria por versión de datos y cada agregado por (granularidad, desglose)"""
+
+    def __init__(self):
+        self._version = None
+        self._base = None
+        self._agregados: Dict[tuple, pd.DataFrame] = {}
+        self.calculos_base = 0
+
+    def obtener(self, version, ventas: pd.DataFrame, compras: pd.DataFrame,
+                granularidad: str = 'mes', desglose: str = 'total') -> pd.DataFrame:
+        """Agregado por período; la base diaria solo se recalcula si cambió la versión"""
+        if self._version is None or self._version != version:
+            self._base = agregar_por_dia(ventas, compras)
+            self._agregados = {}
+            self._version = version
+            self.calculos_base += 1
+
+        clave = (granularidad, desglose)
+        if clave not in self._agregados:
+            self._agregados[clave] = agregar_periodos(self._base, granularidad, desglose)
+        return self._agregados[clave]
+
+    def invalidar(self):
+        """Fuerza el recálculo en la próxima consulta"""
+        self._version = None
+        self._base = None
+        self._agregados = {}
+
+
+def totales(tabla: pd.DataFrame) -> Dict:
+    """Totales de un agregado (sumas y spread/margen ponderados)"""
+    sumas = {columna: float(tabla[columna].sum()) for columna in COLUMNAS_SUMA + ['Comisiones_USD']}
+    sumas['Spread_USD_por_USDT'] = ((sumas['Ingreso_Bruto_USD'] - sumas['Costo_Base_USD']) / sumas['Volumen_USDT']
+                                    if sumas['Volumen_USDT'] > 0 else float('nan'))
+    sumas['Margen_Pct'] = (sumas['PL_Realizado_USD'] / sumas['Costo_Base_USD'] * 100
+                           if sumas['Costo_Base_USD'] > 0 else float('nan'))
+    return sumas
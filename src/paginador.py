@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Paginador de Tablas del Dashboard - P2P USDT
+
+Muestra DataFrames grandes página por página: el estilo y el formateador de
+cada columna se eligen una sola vez según nombre y dtype, y en cada página
+solo se formatean las filas visibles (iloc sobre el DataFrame tipado), así
+recorrer 500k ventas cuesta lo mismo que recorrer 50.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List
+
+from rich.table import Table
+from rich import box
+
+FILAS_POR_PAGINA = 15
+FILAS_VISTA_AMPLIA = 100  # "Ver todas" muestra una ventana desplazable de este tamaño, no la tabla completa
+TEXTO_NULO = "[dim]N/A[/dim]"
+PALABRAS_NUMERICAS = ['cantidad', 'precio', 'ganancia', 'perdida', 'costo']
+PALABRAS_RESULTADO = ['ganancia', 'perdida', 'pl']
+
+Formateador = Callable[[pd.Series], List[str]]
+
+
+def estilo_columna(columna: str) -> Dict:
+    """Estilo, alineación y ancho de la columna según su nombre"""
+    nombre = columna.lower()
+    if 'ID' in columna:
+        return {'style': 'cyan', 'width': 8}
+    if 'Fecha' in columna:
+        return {'style': 'blue', 'width': 12}
+    if any(palabra in nombre for palabra in PALABRAS_NUMERICAS):
+        return {'style': 'green', 'justify': 'right', 'width': 12}
+    return {'style': 'white', 'width': 15}
+
+
+def _con_nulos(formatear: Callable[[np.ndarray], List[str]]) -> Formateador:
+    """Aplica `formatear` a los valores no nulos y N/A al resto"""
+    def formateador(serie: pd.Series) -> List[str]:
+        nulos = serie.isna().to_numpy()
+        textos = [TEXTO_NULO] * len(serie)
+        indices = np.flatnonzero(~nulos)
+        if len(indices):
+            for i, texto in zip(indices, formatear(serie.to_numpy()[indices])):
+                textos[i] = texto
+        return textos
+    return formateador
+
+
+def _formatear_resultado(valores: np.ndarray) -> List[str]:
+    return [f"[green]{v:,.2f}[/green]" if v >= 0 else f"[red]{v:,.2f}[/red]" for v in valores]
+
+
+def _formatear_decimal(valores: np.ndarray) -> List[str]:
+    return [f"{v:,.2f}" for v in valores]
+
+
+def _formatear_texto(valores: np.ndarray) -> List[str]:
+    return [str(v) for v in valores]
+
+
+def _formatear_fecha(valores: np.ndarray) -> List[str]:
+    return [str(v) for v in pd.to_datetime(valores)]
+
+
+def crear_formateador(columna: str, dtype) -> Formateador:
+    """Formateador de la columna, elegido una vez por dtype y nombre"""
+    if pd.api.types.is_bool_dtype(dtype):
+        return _con_nulos(_formatear_texto)
+    if pd.api.types.is_numeric_dtype(dtype):
+        if any(palabra in columna.lower() for palabra in PALABRAS_RESULTADO):
+            return _con_nulos(_formatear_resultado)  # Ganancias en verde, pérdidas en rojo
+        if pd.api.types.is_float_dtype(dtype):
+            return _con_nulos(_formatear_decimal)
+        return _con_nulos(_formatear_texto)
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return _con_nulos(_formatear_fecha)
+    return _con_nulos(_formatear_texto)
+
+
+class PaginadorTabla:
+    """Arma tablas Rich de una ventana de filas del DataFrame (sin copiarlo)"""
+
+    def __init__(self, df: pd.DataFrame, titulo: str, filas_por_pagina: int = FILAS_POR_PAGINA):
+        self.df = df
+        self.titulo = titulo
+        self.filas_por_pagina = filas_por_pagina
+        self.total = len(df)
+        self.inicio = 0
+        self.columnas = [str(columna) for columna in df.columns]
+        self.estilos = [estilo_columna(columna) for columna in self.columnas]
+        self.formateadores = [crear_formateador(columna, dtype) for columna, dtype in zip(self.columnas, df.dtypes)]
+
+    @property
+    def fin(self) -> int:
+        return min(self.inicio + self.filas_por_pagina, self.total)
+
+    def ir_a(self, fila: int):
+        """Ubica la ventana en `fila` (0-based), sin pasarse del final"""
+        ultima_ventana = max(self.total - self.filas_por_pagina, 0)
+        self.inicio = min(max(fila, 0), ultima_ventana)
+
+    def siguiente(self):
+        self.ir_a(self.inicio + self.filas_por_pagina)
+
+    def anterior(self):
+        self.ir_a(self.inicio - self.filas_por_pagina)
+
+    def cambiar_tamaño(self, filas_por_pagina: int):
+        """Cambia el alto de la ventana manteniendo la primera fila visible"""
+        self.filas_por_pagina = filas_por_pagina
+        self.ir_a(self.inicio)
+
+    def tabla(self, compacta: bool = False) -> Table:
+        """Tabla Rich con las filas de la ventana actual"""
+        tabla = Table(
+            title=f"[bold]{self.titulo}[/bold] - Filas {self.inicio + 1} a {self.fin} de {self.total}",
+            box=box.ROUNDED,
+            header_style="bold magenta",
+            show_lines=not compacta,
+            expand=True
+        )
+        for columna, estilo in zip(self.columnas, self.estilos):
+            tabla.add_column(columna, **estilo)
+
+        pagina = self.df.iloc[self.inicio:self.fin]
+        textos = [formatear(pagina.iloc[:, i]) for i, formatear in enumerate(self.formateadores)]
+        for fila in zip(*textos):
+            tabla.add_row(*fila)
+        return tabla
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfilado por Etapas - P2P USDT
+
+Registra, para cada etapa (o método instrumentado), tiempo de pared, tiempo
+de CPU, pico de memoria (tracemalloc y RSS del proceso) y filas procesadas.
+Emite una tabla resumen por el registro del tracker (así --quiet la silencia
+y el log JSONL recibe cada etapa como evento) y una traza en formato Chrome
+trace-event (abrir con chrome://tracing o https://ui.perfetto.dev).
+"""
+
+import os
+import sys
+import json
+import time
+import functools
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from registro_p2p import obtener_registro
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+registro = obtener_registro('perfilado')
+
+_MB = 1024 * 1024
+
+
+def rss_pico_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso (MB), o None si no está disponible"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB; macOS, bytes
+    return pico / _MB if sys.platform == 'darwin' else pico / 1024
+
+
+class Perfilador:
+    """Acumula mediciones por etapa; las etapas pueden anidarse"""
+
+    def __init__(self, medir_memoria: bool = True):
+        # tracemalloc hace más lenta la ejecución; se puede desactivar y quedarse con el RSS
+        self.medir_memoria = medir_memoria
+        self.eventos: List[Dict] = []
+        self._pila: List[Dict] = []
+        self._inicio = time.perf_counter()
+        self._tracemalloc_propio = False
+
+    def iniciar(self):
+        """Empieza a medir memoria con tracemalloc (si corresponde)"""
+        if self.medir_memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracemalloc_propio = True
+        return self
+
+    def detener(self):
+        """Detiene tracemalloc si lo inició este perfilador"""
+        if self._tracemalloc_propio:
+            tracemalloc.stop()
+            self._tracemalloc_propio = False
+
+    @contextmanager
+    def etapa(self, nombre: str, filas: Callable[[], int] = None):
+        """Mide el bloque `with`; `filas` se evalúa al terminar para contar filas procesadas"""
+        midiendo = tracemalloc.is_tracing()
+        marco = {'pico_hijos': 0}
+        if midiendo:
+            actual, pico = tracemalloc.get_traced_memory()
+            if self._pila:
+                # El pico del padre hasta ahora no debe perderse al reiniciarlo para el hijo
+                padre = self._pila[-1]
+                padre['pico_hijos'] = max(padre['pico_hijos'], pico)
+            tracemalloc.reset_peak()
+            marco['memoria_inicial'] = actual
+        self._pila.append(marco)
+
+        inicio_pared = time.perf_counter()
+        inicio_cpu = time.process_time()
+        try:
+            yield self
+        finally:
+            duracion = time.perf_counter() - inicio_pared
+            cpu = time.process_time() - inicio_cpu
+            self._pila.pop()
+
+            pico_tracemalloc_mb = None
+            if midiendo and tracemalloc.is_tracing():
+                pico = max(marco['pico_hijos'], tracemalloc.get_traced_memory()[1])
+                pico_tracemalloc_mb = max(pico - marco['memoria_inicial'], 0) / _MB
+                if self._pila:
+                    padre = self._pila[-1]
+                    padre['pico_hijos'] = max(padre['pico_hijos'], pico)
+
+            cantidad_filas = None
+            if filas is not None:
+                try:
+                    cantidad_filas = filas()
+                except Exception:
+                    cantidad_filas = None
+
+            self.eventos.append({
+                'nombre': nombre,
+                'profundidad': len(self._pila),
+                'inicio_s': inicio_pared - self._inicio,
+                'pared_s': duracion,
+                'cpu_s': cpu,
+                'pico_tracemalloc_mb': pico_tracemalloc_mb,
+                'rss_pico_mb': rss_pico_mb(),
+                'filas': cantidad_filas,
+            })
+
+    def instrumentar(self, objeto, metodos: Dict[str, Optional[Callable]]):
+        """Envuelve los métodos del objeto para medir cada llamada.
+
+        `metodos` mapea nombre de método -> función(objeto) que devuelve las
+        filas procesadas, o None si no aplica.
+        """
+        for nombre, contar_filas in metodos.items():
+            original = getattr(objeto, nombre, None)
+            if original is None:
+                continue
+            filas = (lambda contar=contar_filas: contar(objeto)) if contar_filas else None
+            setattr(objeto, nombre, self._envolver(original, nombre, filas))
+        return objeto
+
+    def _envolver(self, funcion: Callable, nombre: str, filas: Optional[Callable]) -> Callable:
+        """Versión medida de `funcion`"""
+        @functools.wraps(funcion)
+        def medida(*args, **kwargs):
+            with self.etapa(nombre, filas):
+                return funcion(*args, **kwargs)
+        return medida
+
+    def resumen(self) -> List[Dict]:
+        """Mediciones agregadas por etapa, en orden de primera aparición"""
+        agregadas: Dict[str, Dict] = {}
+        for evento in sorted(self.eventos, key=lambda e: e['inicio_s']):
+            fila = agregadas.setdefault(evento['nombre'], {
+                'nombre': evento['nombre'], 'profundidad': evento['profundidad'], 'llamadas': 0,
+                'pared_s': 0.0, 'cpu_s': 0.0, 'pico_tracemalloc_mb': None, 'rss_pico_mb': None, 'filas': None,
+            })
+            fila['llamadas'] += 1
+            fila['pared_s'] += evento['pared_s']
+            fila['cpu_s'] += evento['cpu_s']
+            for clave in ('pico_tracemalloc_mb', 'rss_pico_mb'):
+                if evento[clave] is not None:
+                    fila[clave] = max(fila[clave] or 0.0, evento[clave])
+            if evento['filas'] is not None:
+                fila['filas'] = (fila['filas'] or 0) + evento['filas']
+        return list(agregadas.values())
+
+    def registrar_resumen(self):
+        """Emite la tabla resumen por etapa (una línea del registro por etapa, con sus mediciones como campos)"""
+        filas = self.resumen()
+        if not filas:
+            registro.info("ℹ️  No hay etapas perfiladas.")
+            return
+
+        def formato(valor, patron):
+            return '-' if valor is None else format(valor, patron)
+
+        ancho = max(len('  ' * f['profundidad'] + f['nombre']) for f in filas)
+        encabezado = (f"{'Etapa':<{ancho}}  {'Llam.':>5}  {'Pared (s)':>10}  {'CPU (s)':>10}  "
+                      f"{'Pico tracemalloc (MB)':>21}  {'RSS pico (MB)':>13}  {'Filas':>12}")
+        registro.info(f"\n📊 Perfil por etapa\n{encabezado}\n{'-' * len(encabezado)}")
+        for f in filas:
+            nombre = '  ' * f['profundidad'] + f['nombre']
+            registro.info(f"{nombre:<{ancho}}  {f['llamadas']:>5}  {f['pared_s']:>10.3f}  {f['cpu_s']:>10.3f}  "
+                          f"{formato(f['pico_tracemalloc_mb'], '.1f'):>21}  {formato(f['rss_pico_mb'], '.1f'):>13}  "
+                          f"{formato(f['filas'], ','):>12}",
+                          extra={'evento': 'perfil_etapa', **f})
+
+    def traza_chrome(self) -> Dict:
+        """Eventos en formato Chrome trace-event (eventos completos 'X', tiempos en µs)"""
+        pid = os.getpid()
+        tid = threading.get_ident()
+        eventos = []
+        for evento in sorted(self.eventos, key=lambda e: e['inicio_s']):
+            eventos.append({
+                'name': evento['nombre'],
+                'cat': 'p2p',
+                'ph': 'X',
+                'ts': evento['inicio_s'] * 1e6,
+                'dur': evento['pared_s'] * 1e6,
+                'pid': pid,
+                'tid': tid,
+                'args': {
+                    'cpu_s': evento['cpu_s'],
+                    'pico_tracemalloc_mb': evento['pico_tracemalloc_mb'],
+                    'rss_pico_mb': evento['rss_pico_mb'],
+                    'filas': evento['filas'],
+                },
+            })
+        return {'traceEvents': eventos, 'displayTimeUnit': 'ms'}
+
+    def guardar_traza_chrome(self, ruta: str):
+        """Guarda la traza en formato Chrome trace-event"""
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.traza_chrome(), f, ensure_ascii=False)
+        registro.info(f"✅ Traza de perfilado guardada en '{ruta}'")
+
+
+@contextmanager
+def perfilar(ruta_traza: str = None, medir_memoria: bool = True):
+    """Context manager: perfila el bloque, registra el resumen y guarda la traza (si se indica ruta)"""
+    perfilador = Perfilador(medir_memoria).iniciar()
+    try:
+        yield perfilador
+    finally:
+        perfilador.detener()
+        perfilador.registrar_resumen()
+        if ruta_traza:
+            perfilador.guardar_traza_chrome(ruta_traza)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registro de Eventos - P2P USDT
+
+Capa de logging del tracker: mensajes de progreso por consola con niveles
+y, opcionalmente, un log de auditoría en formato JSON-lines (un objeto por
+línea, con los campos estructurados de cada evento).
+"""
+
+import sys
+import json
+import logging
+from datetime import datetime
+from typing import Optional
+
+NOMBRE_REGISTRO = 'p2p'
+
+# Atributos propios de logging.LogRecord; el resto son campos estructurados (extra=...)
+_CAMPOS_ESTANDAR = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# Sin configurar (uso como librería) no se emite nada
+logging.getLogger(NOMBRE_REGISTRO).addHandler(logging.NullHandler())
+
+
+def obtener_registro(modulo: str) -> logging.Logger:
+    """Logger hijo del registro P2P (ej: 'p2p.tracker')"""
+    return logging.getLogger(f"{NOMBRE_REGISTRO}.{modulo}")
+
+
+class FormateadorJSONL(logging.Formatter):
+    """Un objeto JSON por línea con fecha, nivel, módulo, mensaje y campos extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        evento = {
+            'fecha': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'modulo': record.name,
+            'mensaje': record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _CAMPOS_ESTANDAR and not clave.startswith('_'):
+                evento.setdefault(clave, valor)  # Los campos base no se pisan
+        if record.exc_info:
+            evento['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+def _nivel(nivel) -> int:
+    """Acepta 'INFO', 'debug' o el número de nivel"""
+    return nivel if isinstance(nivel, int) else logging.getLevelName(str(nivel).upper())
+
+
+def configurar_registro(nivel_consola='INFO', ruta_jsonl: Optional[str] = None,
+                        nivel_jsonl='DEBUG') -> logging.Logger:
+    """Configura la salida del tracker.
+
+    La consola muestra solo el mensaje (como los print de siempre) desde
+    `nivel_consola`; None la desactiva (ej: cron). Si se indica `ruta_jsonl`,
+    los eventos desde `nivel_jsonl` se agregan a ese archivo como log de auditoría.
+    """
+    registro = logging.getLogger(NOMBRE_REGISTRO)
+    for handler in [h for h in registro.handlers if getattr(h, '_p2p', False)]:
+        registro.removeHandler(handler)
+        handler.close()
+
+    niveles = []
+    if nivel_consola is not None:
+        consola = logging.StreamHandler(sys.stdout)
+        consola.setFormatter(logging.Formatter('%(message)s'))
+        consola.setLevel(_nivel(nivel_consola))
+        consola._p2p = True
+        registro.addHandler(consola)
+        niveles.append(consola.level)
+
+    if ruta_jsonl:
+        archivo = logging.FileHandler(ruta_jsonl, mode='a', encoding='utf-8')
+        archivo.setFormatter(FormateadorJSONL())
+        archivo.setLevel(_nivel(nivel_jsonl))
+        archivo._p2p = True
+        registro.addHandler(archivo)
+        niveles.append(archivo.level)
+
+    # El logger deja pasar lo que pida el handler más detallado
+    registro.setLevel(min(niveles) if niveles else logging.CRITICAL + 1)
+    registro.propagate = False
+    return registro
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Escritura de Reportes - P2P USDT
+
+Guarda los reportes del tracker en CSV, Parquet o JSON-lines, ya sea de una
+vez, agregando filas a un reporte existente (modo incremental) o por bloques
+a medida que se calculan (modo en flujo).
+"""
+
+import os
+import importlib.util
+import pandas as pd
+from typing import List
+
+# Formato de reporte -> (extensión, módulo requerido)
+FORMATOS_REPORTE = {
+    'csv': ('.csv', None),
+    'parquet': ('.parquet', 'pyarrow'),
+    'jsonl': ('.jsonl', None),
+}
+
+
+def formato_reporte_disponible(formato: str) -> bool:
+    """Indica si el formato de reporte puede usarse en este entorno"""
+    if formato not in FORMATOS_REPORTE:
+        return False
+    modulo = FORMATOS_REPORTE[formato][1]
+    return modulo is None or importlib.util.find_spec(modulo) is not None
+
+
+def ruta_reporte(directorio: str, nombre: str, formato: str) -> str:
+    """Ruta del reporte con la extensión del formato (ej: reporte_ventas_pl.jsonl)"""
+    return os.path.join(directorio, nombre + FORMATOS_REPORTE[formato][0])
+
+
+def _a_jsonl(df: pd.DataFrame) -> str:
+    """Filas como JSON-lines (fechas ISO, NaN -> null), terminado en salto de línea"""
+    if df.empty:
+        return ''
+    texto = df.to_json(orient='records', lines=True, date_format='iso', force_ascii=False)
+    return texto if texto.endswith('\n') else texto + '\n'
+
+
+def _fechas_con_hora(df: pd.DataFrame) -> pd.DataFrame:
+    """Fechas de un reporte CSV con hora aunque todas caigan a medianoche.
+
+    pandas escribe solo 'YYYY-MM-DD' si ninguna fecha de la columna tiene hora,
+    así que un bloque agregado podía salir con otro formato que el resto del reporte.
+    """
+    for columna in df.columns:
+        serie = df[columna]
+        if pd.api.types.is_datetime64_any_dtype(serie) and (serie.dropna() == serie.dropna().dt.normalize()).all():
+            df = df.assign(**{columna: serie.dt.strftime('%Y-%m-%d %H:%M:%S')})
+    return df
+
+
+def guardar_reporte(df: pd.DataFrame, ruta: str, formato: str, agregar: bool = False):
+    """Escribe el reporte completo, o agrega sus filas al final si `agregar`"""
+    if formato == 'csv':
+        df = _fechas_con_hora(df)
+        if agregar:
+            df.to_csv(ruta, index=False, mode='a', header=False)
+        else:
+            df.to_csv(ruta, index=False)
+    elif formato == 'jsonl':
+        with open(ruta, 'a' if agregar else 'w', encoding='utf-8') as f:
+            f.write(_a_jsonl(df))
+    elif formato == 'parquet':
+        if agregar and os.path.exists(ruta):
+            # Parquet no admite agregar filas: se reescribe el archivo completo
+            df = pd.concat([pd.read_parquet(ruta), df], ignore_index=True)
+        ruta_tmp = f"{ruta}.tmp"
+        df.to_parquet(ruta_tmp, index=False)
+        os.replace(ruta_tmp, ruta)
+    else:
+        raise ValueError(f"Formato de reporte no soportado: {formato}")
+
+
+def leer_reporte(ruta: str, formato: str) -> pd.DataFrame:
+    """Lee un reporte guardado con guardar_reporte o EscritorReporte"""
+    if formato == 'csv':
+        return pd.read_csv(ruta)
+    if formato == 'jsonl':
+        return pd.read_json(ruta, lines=True) if os.path.getsize(ruta) > 0 else pd.DataFrame()
+    if formato == 'parquet':
+        return pd.read_parquet(ruta)
+    raise ValueError(f"Formato de reporte no soportado: {formato}")
+
+
+class EscritorReporte:
+    """Escribe un reporte por bloques en un archivo temporal y lo publica al cerrar"""
+
+    def __init__(self, ruta: str, formato: str, columnas: List[str]):
+        if formato not in FORMATOS_REPORTE:
+            raise ValueError(f"Formato de reporte no soportado: {formato}")
+        self.ruta = ruta
+        self.formato = formato
+        self.columnas = columnas
+        self.ruta_tmp = f"{ruta}.tmp"
+        self.filas = 0
+        self._archivo = None
+        self._escritor_parquet = None
+        self._esquema = None
+
+        if formato == 'csv':
+            self._archivo = open(self.ruta_tmp, 'w', encoding='utf-8', newline='')
+            pd.DataFrame(columns=columnas).to_csv(self._archivo, index=False)
+        elif formato == 'jsonl':
+            self._archivo = open(self.ruta_tmp, 'w', encoding='utf-8')
+
+    def escribir(self, df: pd.DataFrame):
+        """Agrega un bloque de filas (con las columnas del reporte)"""
+        if df.empty:
+            return
+        df = df[self.columnas]
+        if self.formato == 'csv':
+            _fechas_con_hora(df).to_csv(self._archivo, index=False, header=False)
+        elif self.formato == 'jsonl':
+            self._archivo.write(_a_jsonl(df))
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._escritor_parquet is None:
+                self._esquema = pa.Schema.from_pandas(df, preserve_index=False)
+                self._escritor_parquet = pq.ParquetWriter(self.ruta_tmp, self._esquema)
+            self._escritor_parquet.write_table(pa.Table.from_pandas(df, schema=self._esquema, preserve_index=False))
+        self.filas += len(df)
+
+    def cerrar(self):
+        """Cierra el temporal y lo reemplaza por el reporte definitivo"""
+        if self._archivo is not None:
+            self._archivo.close()
+        elif self._escritor_parquet is not None:
+            self._escritor_parquet.close()
+        else:
+            pd.DataFrame(columns=self.columnas).to_parquet(self.ruta_tmp, index=False)  # Reporte vacío
+        os.replace(self.ruta_tmp, self.ruta)
+
+    def descartar(self):
+        """Cierra y borra el temporal sin tocar el reporte anterior"""
+        if self._archivo is not None:
+            self._archivo.close()
+        elif self._escritor_parquet is not None:
+            self._escritor_parquet.close()
+        if os.path.exists(self.ruta_tmp):
+            os.remove(self.ruta_tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_error, error, traza):
+        if tipo_error is None:
+            self.cerrar()
+        else:
+            self.descartar()
+        return False
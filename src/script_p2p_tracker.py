@@ -10,9 +10,32 @@ calcula P&L usando Costo Promedio Ponderado (CPP), y rastrea flujo de fiat.
 """
 
 import pandas as pd
+import numpy as np
 import os
+import sys
+import logging
+import glob
+import argparse
+import tempfile
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+
+from motor_comisiones import TABLA_COMISIONES, calcular_comisiones, convertir_a_usd
+from motor_cpp import LADO_COMPRA, LADO_VENTA, ordenar_transacciones, calcular_cpp, columnas_por_venta
+from almacenamiento import AlmacenamientoLedgers, bloqueo_archivo, leer_csv_tipado
+from checkpoint_cpp import (NOMBRE_CHECKPOINT, cargar_checkpoint, guardar_checkpoint, estado_archivo,
+                            verificar_prefijo, leer_filas_nuevas, leer_prefijo_por_chunks)
+from motor_fiat import (LotesFiat, normalizar_conversiones, conciliar_conversiones, COLUMNAS_CONVERSIONES_POR_VENTA,
+                        COLUMNAS_CONVERSIONES_NO_CONCILIADAS)
+from flujo_cpp import COLUMNAS_CLAVE, generar_corridas, fusionar_corridas, agrupar_en_bloques
+from perfilado import perfilar
+from reportes import FORMATOS_REPORTE, formato_reporte_disponible, ruta_reporte, guardar_reporte, EscritorReporte
+from registro_p2p import obtener_registro, configurar_registro
+from esquemas import esquema_vigente, ledger_de
+from compacto import ESCALA_PUNTO_FIJO, normalizar_categorias, categorizar, a_punto_fijo, desde_punto_fijo
+
+registro = obtener_registro('tracker')
 
 # --- Definición de rutas --- SCRIPT_DIR y BASE_DIR para P2P_Profit/
 SCRIPT_DIR_TRACKER = os.path.dirname(os.path.abspath(__file__))
@@ -26,18 +49,101 @@ VENTAS_CSV_TRACKER = os.path.join(DATA_DIR_TRACKER, 'ventas_usdt.csv')
 CONVERSIONES_CSV_TRACKER = os.path.join(DATA_DIR_TRACKER, 'conversiones_fiat.csv')
 # --- Fin Definición de rutas ---
 
+COLUMNAS_COMPRAS = esquema_vigente('compras').columnas
+COLUMNAS_VENTAS = esquema_vigente('ventas').columnas
+COLUMNAS_REPORTE_VENTAS = [
+    'ID_Venta', 'Fecha_Venta', 'Cantidad_USDT_Vendida', 
+    'Moneda_Recibida', 'Precio_Unitario_Moneda_Recibida', 'Tasa_Cambio_UYU_USD_Venta',
+    'Ingreso_Total_Moneda_Recibida', 'Ingreso_Neto_en_USD', 
+    'Costo_Promedio_Ponderado_USD', 'Costo_Base_USD_de_USDT_Vendido', 
+    'Ganancia_Perdida_USDT_en_USD', 'Plataforma'
+]
+
+# Columnas que se conservan en las corridas del modo en flujo
+COLUMNAS_CORRIDA_COMPRAS = ['ID_Compra', 'Fecha_Compra', 'Cantidad_USDT_Comprada', 'Moneda_Pago', 'Fuente_De_Fondos_Fiat', 'Costo_Total_Moneda_Pago', 'Costo_Total_en_USD']
+COLUMNAS_CORRIDA_VENTAS = ['ID_Venta', 'Fecha_Venta', 'Cantidad_USDT_Vendida', 'Moneda_Recibida', 'Precio_Unitario_Moneda_Recibida', 'Tasa_Cambio_UYU_USD_Venta', 'Ingreso_Total_Moneda_Recibida', 'Ingreso_Neto_en_USD', 'Plataforma']
+FILAS_POR_CHUNK_FLUJO = 100_000
+COLUMNAS_RESOLUCIONES_TARDIAS = [
+    'ID_Venta', 'Fecha_Venta', 'ID_Compra', 'Fecha_Compra',
+    'Cantidad_USDT_Resuelta', 'Costo_Base_Asignado_USD', 'Dias_Hasta_Resolucion'
+]
+NOMBRE_TRAZA_PERFIL = 'perfil_tracker.json'
+
+
+# Un ledger puede venir en un archivo o repartido en varios (ej: uno por mes)
+RutasLedger = Union[str, List[str]]
+
+
+def _como_lista(rutas: RutasLedger) -> List[str]:
+    """Una ruta o varias, siempre como lista (None -> vacía)"""
+    if not rutas:
+        return []
+    return [rutas] if isinstance(rutas, str) else list(rutas)
+
+
+def _filas(df) -> int:
+    """Cantidad de filas de un DataFrame que puede no estar cargado"""
+    return 0 if df is None else len(df)
+
+
+# Métodos medidos con --profile y cómo contar las filas que procesa cada uno
+METODOS_PERFILADOS = {
+    'cargar_datos': lambda t: _filas(t.df_compras) + _filas(t.df_ventas),
+    'cargar_datos_incremental': lambda t: _filas(t.df_compras) + _filas(t.df_ventas),
+    'procesar_en_flujo': None,
+    'calcular_preliminares_compras': lambda t: _filas(t.df_compras_calc),
+    'calcular_preliminares_ventas': lambda t: _filas(t.df_ventas_calc),
+    'crear_transacciones_ordenadas': lambda t: len(t.transacciones_ordenadas.get('lado', ())),
+    'procesar_cpp_y_pl': lambda t: len(t.transacciones_ordenadas.get('lado', ())),
+    'procesar_conversiones_fiat': lambda t: _filas(t.df_conversiones),
+    'generar_reportes': lambda t: _filas(t.df_ventas_calc) + len(t.lotes_fiat),
+    'guardar_checkpoint': None,
+}
+
+
+def _tabla_a_lista(tabla: Dict[Tuple[str, str], float]) -> List:
+    """Representación JSON estable de la tabla de comisiones"""
+    return sorted([plataforma, moneda, tasa] for (plataforma, moneda), tasa in tabla.items())
+
+
 class P2PTracker:
-    BINANCE_FEE_UYU = 0.0016  # 0.16%
-    BINANCE_FEE_USD = 0.0028  # 0.28%
+    # Se mantienen por compatibilidad; las tasas efectivas salen de la tabla de comisiones
+    BINANCE_FEE_UYU = TABLA_COMISIONES[('binance', 'UYU')]  # 0.16%
+    BINANCE_FEE_USD = TABLA_COMISIONES[('binance', 'USD')]  # 0.28%
 
-    def __init__(self):
+    def __init__(self, tabla_comisiones: Dict[Tuple[str, str], float] = None, directorio_reportes: str = None,
+                 almacenamiento: AlmacenamientoLedgers = None, formato_reportes: str = 'csv', punto_fijo: bool = False,
+                 sobreventa: bool = False):
+        # Tabla de comisiones automáticas {(plataforma, moneda): tasa}
+        self.tabla_comisiones = dict(TABLA_COMISIONES) if tabla_comisiones is None else tabla_comisiones
+        
+        # CPP opcional en enteros (millonésimas de USDT/USD) para que las sumas de inventario no deriven
+        self.escala_cpp = ESCALA_PUNTO_FIJO if punto_fijo else None
+        
+        # Ventas sin stock: el faltante queda pendiente y lo saldan compras posteriores
+        self.sobreventa = sobreventa
+        
+        # Lectura de ledgers a través del espejo binario tipado
+        self.almacen = almacenamiento or AlmacenamientoLedgers()
+        
+        # Reportes y checkpoint de inventario
+        self.directorio_reportes = directorio_reportes or REPORTS_DIR_TRACKER
+        if formato_reportes not in FORMATOS_REPORTE:
+            raise ValueError(f"Formato de reporte no soportado: {formato_reportes}")
+        self.formato_reportes = formato_reportes
+        self.ruta_checkpoint = os.path.join(self.directorio_reportes, NOMBRE_CHECKPOINT)
+        self.modo_incremental = False
+        self._checkpoint_previo = {}
+        self._estado_archivos = {}
+        
         # Inventario USDT
         self.inventario_usdt_cantidad = 0.0
         self.inventario_usdt_costo_total_usd = 0.0
         
         # Seguimiento de fiat
-        self.fiat_tracker = {}  # {ID_Venta: {datos_fiat}}
-        self.conversion_fiat_tracker = {}  # {ID_Conversion: {datos_conversion}}
+        self.lotes_fiat = LotesFiat()  # Un lote por venta, en arreglos por moneda
+        self.conversiones_por_venta = pd.DataFrame(columns=COLUMNAS_CONVERSIONES_POR_VENTA)
+        self.conversiones_no_conciliadas = pd.DataFrame(columns=COLUMNAS_CONVERSIONES_NO_CONCILIADAS)
         
         # DataFrames
         self.df_compras = None
@@ -48,94 +154,480 @@ class P2PTracker:
         self.df_compras_calc = None
         self.df_ventas_calc = None
         
-        # Transacciones combinadas ordenadas
-        self.transacciones_ordenadas = []
+        # Transacciones combinadas ordenadas (arreglos: fecha, lado, posicion, cantidad, monto_usd)
+        self.transacciones_ordenadas = {}
+        
+        # Ventas con stock insuficiente (se informan agregadas, no una por una)
+        self.ventas_sin_stock = 0
+        self.usdt_sin_stock = 0.0
+        self.transacciones_no_finitas = 0  # Cantidad o monto USD NaN/infinito
+        
+        # Modo sobreventa: faltantes pendientes [(ID_Venta, Fecha_Venta ISO, USDT)] y resoluciones tardías
+        self.pendientes_sobreventa = []
+        self.resoluciones_tardias = []
+        self.usdt_resuelto_tarde = 0.0
 
-    def cargar_datos(self, archivo_compras: str, archivo_ventas: str, archivo_conversiones: str = None):
-        """Carga los datos desde archivos CSV"""
-        print("🟡 Cargando datos...")
+    def cargar_datos(self, archivo_compras: RutasLedger, archivo_ventas: RutasLedger,
+                     archivo_conversiones: RutasLedger = None):
+        """Carga los datos desde archivos CSV (uno o varios por ledger, que se concatenan)"""
+        registro.info("🟡 Cargando datos...")
+        
+        # Con los ledgers bloqueados una fila agregada durante la lectura no queda a medias
+        # entre el DataFrame y el tamaño que registra el checkpoint
+        with self._bloqueo_ledgers(archivo_compras, archivo_ventas):
+            tamaños = self._tamaños_ledgers(archivo_compras, archivo_ventas)
+            self._leer_ledgers(archivo_compras, archivo_ventas)
+        
+        # Cargar conversiones (opcional)
+        self._cargar_conversiones(archivo_conversiones)
         
+        self.modo_incremental = False
+        self._registrar_estado_archivos(archivo_compras, archivo_ventas, tamaños)
+
+    def _leer_ledgers(self, archivo_compras: RutasLedger, archivo_ventas: RutasLedger):
+        """Lee compras y ventas completas"""
         try:
             # Cargar compras
-            if os.path.exists(archivo_compras):
-                self.df_compras = pd.read_csv(archivo_compras)
-                self.df_compras['Fecha_Compra'] = pd.to_datetime(self.df_compras['Fecha_Compra'], format='mixed')
-                if 'Plataforma' not in self.df_compras.columns:
-                    self.df_compras['Plataforma'] = 'Otro' # Retrocompatibilidad
-                self.df_compras['Plataforma'] = self.df_compras['Plataforma'].astype(str).str.lower()
-                print(f"✅ Cargadas {len(self.df_compras)} compras")
+            archivos = self._archivos_existentes(archivo_compras, 'compras')
+            if archivos:
+                self.df_compras = self._preparar_compras(self._leer_ledger(archivos, 'Fecha_Compra'))
+                registro.info(f"✅ Cargadas {len(self.df_compras)} compras")
             else:
-                print(f"⚠️  Archivo de compras no encontrado: {archivo_compras}")
-                self.df_compras = pd.DataFrame(columns=['ID_Compra', 'Fecha_Compra', 'Cantidad_USDT_Comprada', 'Moneda_Pago', 'Precio_Unitario_Moneda_Pago', 'Tasa_Cambio_UYU_USD_Compra', 'Fuente_De_Fondos_Fiat', 'Comisiones_Compra_Moneda_Pago', 'Plataforma']) # Asegurar que el df vacío tenga todas las columnas esperadas
+                self.df_compras = pd.DataFrame(columns=COLUMNAS_COMPRAS) # Asegurar que el df vacío tenga todas las columnas esperadas
             
             # Cargar ventas
-            if os.path.exists(archivo_ventas):
-                self.df_ventas = pd.read_csv(archivo_ventas)
-                self.df_ventas['Fecha_Venta'] = pd.to_datetime(self.df_ventas['Fecha_Venta'], format='mixed')
-                if 'Plataforma' not in self.df_ventas.columns:
-                    self.df_ventas['Plataforma'] = 'Otro' # Retrocompatibilidad
-                self.df_ventas['Plataforma'] = self.df_ventas['Plataforma'].astype(str).str.lower()
-                print(f"✅ Cargadas {len(self.df_ventas)} ventas")
-            else:
-                print(f"⚠️  Archivo de ventas no encontrado: {archivo_ventas}")
-                self.df_ventas = pd.DataFrame(columns=['ID_Venta', 'Fecha_Venta', 'Cantidad_USDT_Vendida', 'Moneda_Recibida', 'Precio_Unitario_Moneda_Recibida', 'Tasa_Cambio_UYU_USD_Venta', 'Comisiones_Venta_Moneda_Recibida', 'Plataforma']) # Asegurar que el df vacío tenga todas las columnas esperadas
-            
-            # Cargar conversiones (opcional)
-            if archivo_conversiones and os.path.exists(archivo_conversiones):
-                self.df_conversiones = pd.read_csv(archivo_conversiones)
-                self.df_conversiones['Fecha_Conversion'] = pd.to_datetime(self.df_conversiones['Fecha_Conversion'], format='mixed')
-                print(f"✅ Cargadas {len(self.df_conversiones)} conversiones de fiat")
+            archivos = self._archivos_existentes(archivo_ventas, 'ventas')
+            if archivos:
+                self.df_ventas = self._preparar_ventas(self._leer_ledger(archivos, 'Fecha_Venta'))
+                registro.info(f"✅ Cargadas {len(self.df_ventas)} ventas")
             else:
-                self.df_conversiones = pd.DataFrame()
-                print("ℹ️  No se encontraron conversiones de fiat")
+                self.df_ventas = pd.DataFrame(columns=COLUMNAS_VENTAS) # Asegurar que el df vacío tenga todas las columnas esperadas
                 
         except Exception as e:
-            print(f"❌ Error cargando datos: {e}")
+            registro.error(f"❌ Error cargando datos: {e}")
             raise
 
+    def cargar_datos_incremental(self, archivo_compras: RutasLedger, archivo_ventas: RutasLedger,
+                                 archivo_conversiones: RutasLedger = None) -> bool:
+        """Carga solo las filas agregadas desde el último checkpoint.
+        
+        Restaura inventario y lotes de fiat del checkpoint. Si no hay checkpoint,
+        si se editó una fila ya procesada, si llega una fila con fecha anterior
+        al checkpoint o si un ledger se lee de varios archivos, hace una carga
+        completa. Devuelve True si la carga fue incremental.
+        """
+        checkpoint = cargar_checkpoint(self.ruta_checkpoint)
+        with self._bloqueo_ledgers(archivo_compras, archivo_ventas):
+            tamaños = self._tamaños_ledgers(archivo_compras, archivo_ventas)
+        motivo = self._motivo_recalculo_completo(checkpoint, archivo_compras, archivo_ventas)
+        
+        if motivo is None:
+            # Solo hasta el tamaño registrado: lo que se agregue mientras tanto queda para la próxima
+            registro.info("🟡 Cargando filas nuevas desde el checkpoint...")
+            compras_nuevas = self._preparar_compras(leer_filas_nuevas(
+                _como_lista(archivo_compras)[0], checkpoint['archivos']['compras']['bytes'], tamaños['compras']))
+            ventas_nuevas = self._preparar_ventas(leer_filas_nuevas(
+                _como_lista(archivo_ventas)[0], checkpoint['archivos']['ventas']['bytes'], tamaños['ventas']))
+            motivo = (self._motivo_filas_retroactivas(checkpoint, compras_nuevas, ventas_nuevas)
+                      or self._motivo_pendientes_saldados(checkpoint, compras_nuevas))
+        
+        if motivo is not None:
+            registro.info(f"ℹ️  Recálculo completo: {motivo}")
+            self.cargar_datos(archivo_compras, archivo_ventas, archivo_conversiones)
+            return False
+        
+        self.df_compras = compras_nuevas
+        self.df_ventas = ventas_nuevas
+        registro.info(f"✅ Cargadas {len(self.df_compras)} compras nuevas")
+        registro.info(f"✅ Cargadas {len(self.df_ventas)} ventas nuevas")
+        self._cargar_conversiones(archivo_conversiones)
+        
+        # Restaurar estado del checkpoint
+        self.inventario_usdt_cantidad = checkpoint['inventario_usdt_cantidad']
+        self.inventario_usdt_costo_total_usd = checkpoint['inventario_usdt_costo_total_usd']
+        self.lotes_fiat = LotesFiat.restaurar(checkpoint['lotes_fiat'])
+        self.pendientes_sobreventa = [tuple(p) for p in checkpoint.get('pendientes_sobreventa', [])]
+        self._checkpoint_previo = checkpoint
+        
+        self.modo_incremental = True
+        self._registrar_estado_archivos(archivo_compras, archivo_ventas, tamaños)
+        return True
+
+    def procesar_en_flujo(self, archivo_compras: RutasLedger, archivo_ventas: RutasLedger,
+                          archivo_conversiones: RutasLedger = None, filas_por_chunk: int = FILAS_POR_CHUNK_FLUJO):
+        """Procesa ledgers más grandes que la RAM con memoria acotada por el tamaño de chunk.
+        
+        Lee compras y ventas por chunks, guarda cada chunk ordenado por fecha como
+        corrida en disco, fusiona las corridas en orden cronológico y aplica CPP por
+        bloques, escribiendo las filas del reporte de P&L a medida que se calculan.
+        Las filas del reporte quedan en orden cronológico (no en el orden del archivo).
+        """
+        registro.info(f"🟡 Procesando en flujo (chunks de {filas_por_chunk} filas)...")
+        os.makedirs(self.directorio_reportes, exist_ok=True)
+        self.modo_incremental = False
+        self.inventario_usdt_cantidad = 0.0
+        self.inventario_usdt_costo_total_usd = 0.0
+        self.lotes_fiat = LotesFiat()
+        self.ventas_sin_stock = 0
+        self.usdt_sin_stock = 0.0
+        self.transacciones_no_finitas = 0
+        self.pendientes_sobreventa = []
+        self.resoluciones_tardias = []
+        self.usdt_resuelto_tarde = 0.0
+        self._ventas_retenidas = []
+        with self._bloqueo_ledgers(archivo_compras, archivo_ventas):
+            tamaños = self._tamaños_ledgers(archivo_compras, archivo_ventas)
+        
+        # Las corridas van junto a los reportes (disco) y no a /tmp, que puede estar en RAM
+        with tempfile.TemporaryDirectory(prefix='.corridas_', dir=self.directorio_reportes) as directorio_corridas:
+            corridas_compras = generar_corridas(
+                self._leer_chunks(archivo_compras, filas_por_chunk, 'compras', tamaños.get('compras')),
+                self._preliminares_chunk_compras,
+                'Fecha_Compra', LADO_COMPRA, COLUMNAS_CORRIDA_COMPRAS, directorio_corridas, 'compras')
+            corridas_ventas = generar_corridas(
+                self._leer_chunks(archivo_ventas, filas_por_chunk, 'ventas', tamaños.get('ventas')),
+                self._preliminares_chunk_ventas,
+                'Fecha_Venta', LADO_VENTA, COLUMNAS_CORRIDA_VENTAS, directorio_corridas, 'ventas')
+            registro.info(f"✅ {len(corridas_compras)} corridas de compras y {len(corridas_ventas)} de ventas ordenadas")
+            
+            filepath_ventas_pl = self._ruta_reporte('reporte_ventas_pl')
+            with EscritorReporte(filepath_ventas_pl, self.formato_reportes, COLUMNAS_REPORTE_VENTAS) as escritor:
+                flujo = fusionar_corridas(corridas_compras + corridas_ventas)
+                for bloque in agrupar_en_bloques(flujo, filas_por_chunk):
+                    self._procesar_bloque_flujo(bloque, escritor)
+                for ventas in self._ventas_retenidas:
+                    escritor.escribir(ventas)  # Sobrevendidas que quedaron pendientes
+            registro.info(f"✅ {escritor.filas} ventas escritas en '{filepath_ventas_pl}'")
+            self._generar_reporte_resoluciones_tardias()
+            self._advertir_sin_stock()
+            self._advertir_fiat_sin_cubrir()
+        
+        self._cargar_conversiones(archivo_conversiones)
+        self.procesar_conversiones_fiat()
+        self._generar_reporte_flujo_fiat()
+        self._generar_reporte_conversiones()
+        self._registrar_estado_archivos(archivo_compras, archivo_ventas, tamaños)
+
+    def _leer_chunks(self, archivos: RutasLedger, filas_por_chunk: int, nombre: str,
+                     hasta_byte: int = None) -> Iterator[pd.DataFrame]:
+        """Itera los CSV del ledger por chunks, uno detrás del otro (omite los que no existen).
+        
+        Con `hasta_byte` (ledger de un solo archivo) se lee solo hasta el tamaño que registra el checkpoint.
+        """
+        for archivo in self._archivos_existentes(archivos, nombre):
+            if hasta_byte is not None:
+                yield from leer_prefijo_por_chunks(archivo, hasta_byte, filas_por_chunk)
+            else:
+                yield from leer_csv_tipado(archivo, chunksize=filas_por_chunk)
+
+    def _preliminares_chunk_compras(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Preliminares de un chunk de compras (el último queda en df_compras para el checkpoint)"""
+        self.df_compras = self._preparar_compras(chunk)
+        self.calcular_preliminares_compras()
+        return self.df_compras_calc
+
+    def _preliminares_chunk_ventas(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Preliminares de un chunk de ventas (el último queda en df_ventas para el checkpoint)"""
+        self.df_ventas = self._preparar_ventas(chunk)
+        self.calcular_preliminares_ventas()
+        return self.df_ventas_calc
+
+    def _procesar_bloque_flujo(self, filas: List[tuple], escritor: EscritorReporte) -> int:
+        """Aplica CPP a un bloque del flujo fusionado y agrega sus ventas al reporte"""
+        es_venta = np.fromiter((fila[1] == LADO_VENTA for fila in filas), dtype='bool', count=len(filas))
+        compras = pd.DataFrame.from_records([fila for fila in filas if fila[1] == LADO_COMPRA],
+                                            columns=COLUMNAS_CLAVE + COLUMNAS_CORRIDA_COMPRAS)
+        ventas = pd.DataFrame.from_records([fila for fila in filas if fila[1] == LADO_VENTA],
+                                           columns=COLUMNAS_CLAVE + COLUMNAS_CORRIDA_VENTAS)
+        
+        # Arreglos del bloque en orden cronológico, con posiciones locales a cada lado
+        n = len(filas)
+        posicion = np.empty(n, dtype='int64')
+        posicion[~es_venta] = np.arange(len(compras))
+        posicion[es_venta] = np.arange(len(ventas))
+        fecha = np.empty(n, dtype='datetime64[ns]')
+        cantidad = np.empty(n, dtype='float64')
+        monto_usd = np.empty(n, dtype='float64')
+        if len(compras) > 0:
+            fecha[~es_venta] = compras['Fecha_Compra'].to_numpy(dtype='datetime64[ns]')
+            cantidad[~es_venta] = compras['Cantidad_USDT_Comprada'].to_numpy(dtype='float64')
+            monto_usd[~es_venta] = compras['Costo_Total_en_USD'].to_numpy(dtype='float64')
+        if len(ventas) > 0:
+            fecha[es_venta] = ventas['Fecha_Venta'].to_numpy(dtype='datetime64[ns]')
+            cantidad[es_venta] = ventas['Cantidad_USDT_Vendida'].to_numpy(dtype='float64')
+            monto_usd[es_venta] = ventas['Ingreso_Neto_en_USD'].to_numpy(dtype='float64')
+        
+        self.df_compras_calc = compras
+        self.df_ventas_calc = ventas
+        self.transacciones_ordenadas = {
+            'fecha': fecha,
+            'lado': np.where(es_venta, LADO_VENTA, LADO_COMPRA).astype('int8'),
+            'posicion': posicion,
+            'cantidad': cantidad,
+            'monto_usd': monto_usd,
+        }
+        previos = len(self.pendientes_sobreventa)
+        resultado = self.procesar_cpp_y_pl(advertir=False)  # Parte del inventario que dejó el bloque anterior
+        
+        if not self.sobreventa:
+            escritor.escribir(ventas)
+            return len(ventas)
+        for parte in self._ventas_listas_flujo(ventas, resultado, previos):
+            escritor.escribir(parte)
+        return len(ventas)
+
+    def _ventas_listas_flujo(self, ventas: pd.DataFrame, resultado: Dict, previos: int) -> List[pd.DataFrame]:
+        """Ventas que ya se pueden escribir en el reporte del modo en flujo (modo sobreventa).
+        
+        Las ventas con faltante pendiente se retienen en el mismo orden FIFO que
+        los pendientes hasta que una compra los salda, así su fila sale con el costo
+        base definitivo. Como se saldan en orden, las que se liberan son un prefijo.
+        """
+        resoluciones = resultado['resoluciones']
+        previa = resoluciones['venta'] < 0
+        if previa.any():
+            costos = np.bincount(-1 - resoluciones['venta'][previa], weights=resoluciones['costo_usd'][previa],
+                                 minlength=previos)
+            desde = 0
+            for k, retenidas in enumerate(self._ventas_retenidas):
+                costo = costos[desde:desde + len(retenidas)]
+                desde += len(retenidas)
+                if costo.any():
+                    self._ventas_retenidas[k] = self._sumar_costo_base(retenidas, costo)
+        
+        # Liberar las retenidas ya saldadas (las primeras `liberar` filas)
+        liberar = previos - sum(1 for ref, _ in resultado['pendientes'] if ref < 0)
+        listas = []
+        while liberar > 0:
+            retenidas = self._ventas_retenidas.pop(0)
+            if len(retenidas) > liberar:
+                self._ventas_retenidas.insert(0, retenidas.iloc[liberar:])
+                retenidas = retenidas.iloc[:liberar]
+            listas.append(retenidas)
+            liberar -= len(retenidas)
+        
+        # Las ventas del bloque están en orden cronológico: el índice de transacción da su fila
+        pendientes = [ref for ref, _ in resultado['pendientes'] if ref >= 0]
+        if pendientes:
+            filas = self.transacciones_ordenadas['posicion'][pendientes]
+            self._ventas_retenidas.append(ventas.iloc[filas])
+            ventas = ventas.drop(index=ventas.index[filas])
+        listas.append(ventas)
+        return listas
+
+    def _sumar_costo_base(self, ventas: pd.DataFrame, costo: np.ndarray) -> pd.DataFrame:
+        """Suma costo base a las ventas (en punto fijo si corresponde, igual que el kernel)"""
+        ventas = ventas.copy()
+        base = ventas['Costo_Base_USD_de_USDT_Vendido'].to_numpy(dtype='float64')
+        ganancia = ventas['Ganancia_Perdida_USDT_en_USD'].to_numpy(dtype='float64')
+        cantidad = ventas['Cantidad_USDT_Vendida'].to_numpy(dtype='float64')
+        if self.escala_cpp is None or not np.isfinite([base, ganancia, costo]).all():
+            base = base + costo
+            ganancia = ganancia - costo
+            cpp = base / cantidad
+        else:
+            escala = self.escala_cpp
+            base_entera = a_punto_fijo(base, escala) + a_punto_fijo(costo, escala)
+            cpp = base_entera / a_punto_fijo(cantidad, escala)
+            base = desde_punto_fijo(base_entera, escala)
+            ganancia = desde_punto_fijo(a_punto_fijo(ganancia, escala) - a_punto_fijo(costo, escala), escala)
+        ventas['Costo_Base_USD_de_USDT_Vendido'] = base
+        ventas['Ganancia_Perdida_USDT_en_USD'] = ganancia
+        ventas['Costo_Promedio_Ponderado_USD'] = cpp
+        return ventas
+
+    def _preparar_compras(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Normaliza fechas y plataforma de las compras"""
+        if not pd.api.types.is_datetime64_any_dtype(df['Fecha_Compra']):
+            df['Fecha_Compra'] = pd.to_datetime(df['Fecha_Compra'], format='mixed')
+        if 'Plataforma' not in df.columns:
+            df['Plataforma'] = 'Otro' # Retrocompatibilidad
+        df['Plataforma'] = normalizar_categorias(df['Plataforma'], lambda c: c.str.lower())
+        return df
+
+    def _preparar_ventas(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Normaliza fechas y plataforma de las ventas"""
+        if not pd.api.types.is_datetime64_any_dtype(df['Fecha_Venta']):
+            df['Fecha_Venta'] = pd.to_datetime(df['Fecha_Venta'], format='mixed')
+        if 'Plataforma' not in df.columns:
+            df['Plataforma'] = 'Otro' # Retrocompatibilidad
+        df['Plataforma'] = normalizar_categorias(df['Plataforma'], lambda c: c.str.lower())
+        return df
+
+    def _cargar_conversiones(self, archivo_conversiones: RutasLedger = None):
+        """Carga las conversiones de fiat (opcional)"""
+        archivos = [ruta for ruta in _como_lista(archivo_conversiones) if os.path.exists(ruta)]
+        if archivos:
+            self.df_conversiones = self._leer_ledger(archivos, 'Fecha_Conversion')
+            registro.info(f"✅ Cargadas {len(self.df_conversiones)} conversiones de fiat")
+        else:
+            self.df_conversiones = pd.DataFrame()
+            registro.info("ℹ️  No se encontraron conversiones de fiat")
+
+    def _archivos_existentes(self, archivos: RutasLedger, nombre: str) -> List[str]:
+        """Archivos del ledger que existen; avisa por los que faltan"""
+        existentes = []
+        for ruta in _como_lista(archivos):
+            if os.path.exists(ruta):
+                existentes.append(ruta)
+            else:
+                registro.warning(f"⚠️  Archivo de {nombre} no encontrado: {ruta}")
+        return existentes
+
+    def _leer_ledger(self, archivos: List[str], columna_fecha: str) -> pd.DataFrame:
+        """Lee los archivos del ledger y los concatena en el orden dado"""
+        partes = [self.almacen.leer(ruta, columna_fecha) for ruta in archivos]
+        if len(partes) == 1:
+            return partes[0]
+        # Categóricas con distintas categorías en cada archivo se concatenan como texto: se recodifican
+        df = pd.concat(partes, ignore_index=True)
+        ledger = ledger_de(list(df.columns))
+        return categorizar(df, esquema_vigente(ledger).categoricas) if ledger else df
+
+    def _ruta_reporte(self, nombre: str) -> str:
+        """Ruta del reporte en el directorio y formato configurados"""
+        return ruta_reporte(self.directorio_reportes, nombre, self.formato_reportes)
+
+    @contextmanager
+    def _bloqueo_ledgers(self, archivo_compras: RutasLedger, archivo_ventas: RutasLedger):
+        """Bloquea los ledgers de un solo archivo: nadie agrega filas mientras se miden o se leen"""
+        with ExitStack() as pila:
+            for archivos in (archivo_compras, archivo_ventas):
+                archivos = _como_lista(archivos)
+                if len(archivos) == 1 and os.path.exists(archivos[0]):
+                    pila.enter_context(bloqueo_archivo(archivos[0]))
+            yield
+
+    def _tamaños_ledgers(self, archivo_compras: RutasLedger, archivo_ventas: RutasLedger) -> Dict[str, int]:
+        """Tamaño de los ledgers de un solo archivo antes de leerlos (medirlos con los ledgers bloqueados)"""
+        tamaños = {}
+        for clave, archivos in (('compras', archivo_compras), ('ventas', archivo_ventas)):
+            archivos = _como_lista(archivos)
+            if len(archivos) == 1 and os.path.exists(archivos[0]):
+                tamaños[clave] = os.path.getsize(archivos[0])
+        return tamaños
+
+    def _registrar_estado_archivos(self, archivo_compras: RutasLedger, archivo_ventas: RutasLedger,
+                                   tamaños: Dict[str, int]):
+        """Guarda tamaño y huella de los archivos tal como fueron leídos (hasta `tamaños`).
+        
+        Los ledgers repartidos en varios archivos no se registran: el checkpoint
+        solo sabe retomar un archivo que crece por el final.
+        """
+        self._estado_archivos = {}
+        for clave, archivos in (('compras', archivo_compras), ('ventas', archivo_ventas)):
+            if clave in tamaños:
+                self._estado_archivos[clave] = estado_archivo(_como_lista(archivos)[0], tamaños[clave])
+
+    def _motivo_recalculo_completo(self, checkpoint, archivo_compras: RutasLedger, archivo_ventas: RutasLedger):
+        """Devuelve por qué no se puede procesar incrementalmente, o None si se puede"""
+        if checkpoint is None:
+            return "no hay checkpoint previo"
+        if checkpoint.get('tabla_comisiones') != _tabla_a_lista(self.tabla_comisiones):
+            return "cambió la tabla de comisiones"
+        if checkpoint.get('sobreventa', False) != self.sobreventa:
+            return "cambió el modo de sobreventa"
+        if not os.path.exists(self._ruta_reporte('reporte_ventas_pl')):
+            return "no existe el reporte de P&L previo"
+        
+        archivos = checkpoint.get('archivos', {})
+        for clave, rutas in (('compras', archivo_compras), ('ventas', archivo_ventas)):
+            rutas = _como_lista(rutas)
+            if len(rutas) != 1:
+                return f"{clave} se lee de {len(rutas)} archivos"
+            if clave not in archivos:
+                return f"el checkpoint no registra {clave}"
+            motivo = verificar_prefijo(rutas[0], archivos[clave])
+            if motivo is not None:
+                return motivo
+        return None
+
+    def _motivo_filas_retroactivas(self, checkpoint, compras_nuevas: pd.DataFrame, ventas_nuevas: pd.DataFrame):
+        """Detecta filas nuevas con fecha anterior al checkpoint.
+        
+        Las compras deben ser posteriores a la última fecha procesada; las ventas
+        pueden empatar, porque en el orden completo quedarían igualmente al final.
+        """
+        if checkpoint.get('ultima_fecha') is None:
+            return None
+        ultima_fecha = pd.Timestamp(checkpoint['ultima_fecha'])
+        if (compras_nuevas['Fecha_Compra'] <= ultima_fecha).any():
+            return "hay compras nuevas con fecha anterior al checkpoint"
+        if (ventas_nuevas['Fecha_Venta'] < ultima_fecha).any():
+            return "hay ventas nuevas con fecha anterior al checkpoint"
+        return None
+
+    def _motivo_pendientes_saldados(self, checkpoint, compras_nuevas: pd.DataFrame):
+        """Compras nuevas con ventas sobrevendidas pendientes en el checkpoint.
+        
+        Esas compras cambian el costo base de ventas que ya están en el reporte de P&L,
+        que en modo incremental solo se agrega: hay que recalcularlo completo.
+        """
+        if checkpoint.get('pendientes_sobreventa') and len(compras_nuevas) > 0:
+            return "hay compras nuevas que saldan ventas sobrevendidas del checkpoint"
+        return None
+
+    def guardar_checkpoint(self):
+        """Guarda inventario, lotes de fiat y última fecha/ID procesados"""
+        previo = self._checkpoint_previo if self.modo_incremental else {}
+        
+        fechas = self.transacciones_ordenadas.get('fecha')
+        ultima_fecha = previo.get('ultima_fecha')
+        if fechas is not None and len(fechas) > 0:
+            ultima_fecha = pd.Timestamp(fechas[-1]).isoformat()
+        
+        ultimo_id_compra = previo.get('ultimo_id_compra')
+        if self.df_compras is not None and not self.df_compras.empty:
+            ultimo_id_compra = self.df_compras['ID_Compra'].iloc[-1]
+        ultimo_id_venta = previo.get('ultimo_id_venta')
+        if self.df_ventas is not None and not self.df_ventas.empty:
+            ultimo_id_venta = self.df_ventas['ID_Venta'].iloc[-1]
+        
+        guardar_checkpoint(self.ruta_checkpoint, {
+            'inventario_usdt_cantidad': self.inventario_usdt_cantidad,
+            'inventario_usdt_costo_total_usd': self.inventario_usdt_costo_total_usd,
+            'lotes_fiat': self.lotes_fiat.serializar(),
+            'ultima_fecha': ultima_fecha,
+            'ultimo_id_compra': ultimo_id_compra,
+            'ultimo_id_venta': ultimo_id_venta,
+            'archivos': self._estado_archivos,
+            'tabla_comisiones': _tabla_a_lista(self.tabla_comisiones),
+            'sobreventa': self.sobreventa,
+            'pendientes_sobreventa': [list(p) for p in self.pendientes_sobreventa],
+        })
+        registro.info(f"✅ Checkpoint guardado en '{self.ruta_checkpoint}'")
+
     def calcular_preliminares_compras(self):
         """Calcula valores preliminares para las compras"""
         if self.df_compras.empty:
             self.df_compras_calc = pd.DataFrame(columns=list(self.df_compras.columns) + ['Costo_Total_Moneda_Pago', 'Costo_Total_en_USD', 'Costo_Adquisicion_Unitario_USD']) # Asegurar columnas incluso si está vacío inicialmente
             return
             
-        print("🟡 Calculando preliminares de compras...")
+        registro.info("🟡 Calculando preliminares de compras...")
         
-        # Crear copia para cálculos
-        self.df_compras_calc = self.df_compras.copy()
+        # Copia superficial: las columnas que no se recalculan comparten memoria con df_compras
+        # (solo se asignan columnas completas, nunca se modifican en el lugar)
+        self.df_compras_calc = self.df_compras.copy(deep=False)
         
         # Asegurar que la columna Plataforma exista si df_compras_calc se creó a partir de un df_compras vacío pero con columnas definidas
         if 'Plataforma' not in self.df_compras_calc.columns:
             self.df_compras_calc['Plataforma'] = 'Otro'
         else:
-            self.df_compras_calc['Plataforma'] = self.df_compras_calc['Plataforma'].astype(str).str.lower()
+            self.df_compras_calc['Plataforma'] = normalizar_categorias(self.df_compras_calc['Plataforma'], lambda c: c.str.lower())
 
         # Rellenar comisiones NaN con 0 para el cálculo inicial
         self.df_compras_calc['Comisiones_Compra_Moneda_Pago'] = self.df_compras_calc['Comisiones_Compra_Moneda_Pago'].fillna(0)
         
-        # Calcular comisiones de Binance si es necesario
-        # Si la plataforma es Binance y la comisión manual es 0, se calcula automáticamente.
-        def calcular_comision_compra(row):
-            # Asegurarse que la plataforma no sea NaN o similar antes de .lower()
-            plataforma_val = str(row['Plataforma']).lower() if pd.notna(row['Plataforma']) else 'otro'
-            
-            if plataforma_val == 'binance' and row['Comisiones_Compra_Moneda_Pago'] == 0:
-                cantidad_usdt_comprada = row['Cantidad_USDT_Comprada']
-                precio_unitario = row['Precio_Unitario_Moneda_Pago']
-                tasa_comision_binance = 0
-                
-                if row['Moneda_Pago'] == 'UYU':
-                    tasa_comision_binance = P2PTracker.BINANCE_FEE_UYU
-                elif row['Moneda_Pago'] == 'USD':
-                    tasa_comision_binance = P2PTracker.BINANCE_FEE_USD
-                
-                if tasa_comision_binance > 0:
-                    comision_en_usdt = cantidad_usdt_comprada * tasa_comision_binance
-                    valor_comision_en_moneda_pago = comision_en_usdt * precio_unitario
-                    return valor_comision_en_moneda_pago
-            return row['Comisiones_Compra_Moneda_Pago'] # Devuelve la original si no se calcula o no es Binance
-
-        self.df_compras_calc['Comisiones_Compra_Moneda_Pago'] = self.df_compras_calc.apply(calcular_comision_compra, axis=1)
+        # Calcular comisiones automáticas según la tabla (plataforma, moneda)
+        # Si la comisión manual es 0 y la tabla tiene tasa para la combinación, se calcula automáticamente.
+        self.df_compras_calc['Comisiones_Compra_Moneda_Pago'] = calcular_comisiones(
+            self.df_compras_calc['Cantidad_USDT_Comprada'],
+            self.df_compras_calc['Precio_Unitario_Moneda_Pago'],
+            self.df_compras_calc['Comisiones_Compra_Moneda_Pago'],
+            self.df_compras_calc['Plataforma'],
+            self.df_compras_calc['Moneda_Pago'],
+            self.tabla_comisiones
+        )
         
         # Costo total en moneda de pago
         self.df_compras_calc['Costo_Total_Moneda_Pago'] = (
@@ -145,10 +637,10 @@ class P2PTracker:
         )
         
         # Costo total en USD
-        self.df_compras_calc['Costo_Total_en_USD'] = self.df_compras_calc.apply(
-            lambda row: row['Costo_Total_Moneda_Pago'] if row['Moneda_Pago'] == 'USD' 
-            else row['Costo_Total_Moneda_Pago'] / row['Tasa_Cambio_UYU_USD_Compra'], 
-            axis=1
+        self.df_compras_calc['Costo_Total_en_USD'] = convertir_a_usd(
+            self.df_compras_calc['Costo_Total_Moneda_Pago'],
+            self.df_compras_calc['Moneda_Pago'],
+            self.df_compras_calc['Tasa_Cambio_UYU_USD_Compra']
         )
         
         # Costo de adquisición unitario en USD
@@ -157,7 +649,7 @@ class P2PTracker:
             self.df_compras_calc['Cantidad_USDT_Comprada']
         )
         
-        print(f"✅ Preliminares de compras calculados")
+        registro.info(f"✅ Preliminares de compras calculados")
 
     def calcular_preliminares_ventas(self):
         """Calcula valores preliminares para las ventas"""
@@ -165,41 +657,30 @@ class P2PTracker:
             self.df_ventas_calc = pd.DataFrame(columns=list(self.df_ventas.columns) + ['Ingreso_Total_Moneda_Recibida', 'Ingreso_Neto_en_USD', 'Costo_Base_USD_de_USDT_Vendido', 'Ganancia_Perdida_USDT_en_USD'])
             return
             
-        print("🟡 Calculando preliminares de ventas...")
+        registro.info("🟡 Calculando preliminares de ventas...")
         
-        # Crear copia para cálculos
-        self.df_ventas_calc = self.df_ventas.copy()
+        # Copia superficial: las columnas que no se recalculan comparten memoria con df_ventas
+        # (solo se asignan columnas completas, nunca se modifican en el lugar)
+        self.df_ventas_calc = self.df_ventas.copy(deep=False)
 
         if 'Plataforma' not in self.df_ventas_calc.columns:
             self.df_ventas_calc['Plataforma'] = 'Otro'
         else:
-            self.df_ventas_calc['Plataforma'] = self.df_ventas_calc['Plataforma'].astype(str).str.lower()
+            self.df_ventas_calc['Plataforma'] = normalizar_categorias(self.df_ventas_calc['Plataforma'], lambda c: c.str.lower())
         
         # Rellenar comisiones NaN con 0
         self.df_ventas_calc['Comisiones_Venta_Moneda_Recibida'] = self.df_ventas_calc['Comisiones_Venta_Moneda_Recibida'].fillna(0)
 
-        # Calcular comisiones de Binance si es necesario
-        # Si la plataforma es Binance y la comisión manual es 0, se calcula automáticamente.
-        def calcular_comision_venta(row):
-            plataforma_val = str(row['Plataforma']).lower() if pd.notna(row['Plataforma']) else 'otro'
-
-            if plataforma_val == 'binance' and row['Comisiones_Venta_Moneda_Recibida'] == 0:
-                cantidad_usdt_vendida = row['Cantidad_USDT_Vendida']
-                precio_unitario = row['Precio_Unitario_Moneda_Recibida']
-                tasa_comision_binance = 0
-                
-                if row['Moneda_Recibida'] == 'UYU':
-                    tasa_comision_binance = P2PTracker.BINANCE_FEE_UYU
-                elif row['Moneda_Recibida'] == 'USD':
-                    tasa_comision_binance = P2PTracker.BINANCE_FEE_USD
-                
-                if tasa_comision_binance > 0:
-                    comision_en_usdt = cantidad_usdt_vendida * tasa_comision_binance
-                    valor_comision_en_moneda_recibida = comision_en_usdt * precio_unitario
-                    return valor_comision_en_moneda_recibida
-            return row['Comisiones_Venta_Moneda_Recibida'] # Devuelve la original si no se calcula o no es Binance
-
-        self.df_ventas_calc['Comisiones_Venta_Moneda_Recibida'] = self.df_ventas_calc.apply(calcular_comision_venta, axis=1)
+        # Calcular comisiones automáticas según la tabla (plataforma, moneda)
+        # Si la comisión manual es 0 y la tabla tiene tasa para la combinación, se calcula automáticamente.
+        self.df_ventas_calc['Comisiones_Venta_Moneda_Recibida'] = calcular_comisiones(
+            self.df_ventas_calc['Cantidad_USDT_Vendida'],
+            self.df_ventas_calc['Precio_Unitario_Moneda_Recibida'],
+            self.df_ventas_calc['Comisiones_Venta_Moneda_Recibida'],
+            self.df_ventas_calc['Plataforma'],
+            self.df_ventas_calc['Moneda_Recibida'],
+            self.tabla_comisiones
+        )
 
         # Ingreso total en moneda recibida
         self.df_ventas_calc['Ingreso_Total_Moneda_Recibida'] = (
@@ -209,245 +690,385 @@ class P2PTracker:
         )
         
         # Ingreso neto en USD
-        self.df_ventas_calc['Ingreso_Neto_en_USD'] = self.df_ventas_calc.apply(
-            lambda row: row['Ingreso_Total_Moneda_Recibida'] if row['Moneda_Recibida'] == 'USD' 
-            else row['Ingreso_Total_Moneda_Recibida'] / row['Tasa_Cambio_UYU_USD_Venta'], 
-            axis=1
+        self.df_ventas_calc['Ingreso_Neto_en_USD'] = convertir_a_usd(
+            self.df_ventas_calc['Ingreso_Total_Moneda_Recibida'],
+            self.df_ventas_calc['Moneda_Recibida'],
+            self.df_ventas_calc['Tasa_Cambio_UYU_USD_Venta']
         )
         
         # Inicializar columnas para cálculos posteriores
         self.df_ventas_calc['Costo_Base_USD_de_USDT_Vendido'] = 0.0
         self.df_ventas_calc['Ganancia_Perdida_USDT_en_USD'] = 0.0
         
-        print(f"✅ Preliminares de ventas calculados")
+        registro.info(f"✅ Preliminares de ventas calculados")
 
     def crear_transacciones_ordenadas(self):
-        """Crea una lista de transacciones ordenadas cronológicamente"""
-        print("🟡 Ordenando transacciones cronológicamente...")
-        
-        transacciones = []
-        
-        # Agregar compras
-        if not self.df_compras_calc.empty:
-            for idx, row in self.df_compras_calc.iterrows():
-                transacciones.append({
-                    'fecha': row['Fecha_Compra'],
-                    'tipo': 'compra',
-                    'data': row,
-                    'idx': idx
-                })
-        
-        # Agregar ventas
-        if not self.df_ventas_calc.empty:
-            for idx, row in self.df_ventas_calc.iterrows():
-                transacciones.append({
-                    'fecha': row['Fecha_Venta'],
-                    'tipo': 'venta',
-                    'data': row,
-                    'idx': idx
-                })
-        
-        # Ordenar por fecha
-        self.transacciones_ordenadas = sorted(transacciones, key=lambda x: x['fecha'])
-        print(f"✅ {len(self.transacciones_ordenadas)} transacciones ordenadas")
-
-    def procesar_cpp_y_pl(self):
-        """Procesa todas las transacciones aplicando CPP y calculando P&L"""
-        print("🟡 Procesando CPP y P&L...")
-        
-        for transaccion in self.transacciones_ordenadas:
-            if transaccion['tipo'] == 'compra':
-                self._procesar_compra(transaccion)
-            elif transaccion['tipo'] == 'venta':
-                self._procesar_venta(transaccion)
-        
-        print(f"✅ CPP y P&L procesados")
-
-    def _procesar_compra(self, transaccion):
-        """Procesa una compra individual"""
-        data = transaccion['data']
+        """Combina compras y ventas en arreglos ordenados cronológicamente"""
+        registro.info("🟡 Ordenando transacciones cronológicamente...")
         
-        # Actualizar inventario
-        self.inventario_usdt_cantidad += data['Cantidad_USDT_Comprada']
-        self.inventario_usdt_costo_total_usd += data['Costo_Total_en_USD']
-        
-        # Rastrear fiat usado
-        self._rastrear_fiat_usado_compra(data)
-        
-        print(f"📈 Compra procesada: {data['Cantidad_USDT_Comprada']} USDT")
-
-    def _procesar_venta(self, transaccion):
-        """Procesa una venta individual"""
-        data = transaccion['data']
-        idx = transaccion['idx']
-        
-        cantidad_vendida = data['Cantidad_USDT_Vendida']
-        ingreso_neto_usd_venta = data['Ingreso_Neto_en_USD']
-
-        # Añadir Costo_Promedio_Ponderado_USD al df_ventas_calc si no existe (para casos de venta sin stock)
-        if 'Costo_Promedio_Ponderado_USD' not in self.df_ventas_calc.columns:
-            self.df_ventas_calc['Costo_Promedio_Ponderado_USD'] = 0.0
-
-        if self.inventario_usdt_cantidad == 0 or self.inventario_usdt_cantidad < cantidad_vendida:
-            print(f"⚠️  Advertencia: Venta ID {data['ID_Venta']} de {cantidad_vendida} USDT. Stock insuficiente ({self.inventario_usdt_cantidad} USDT) en {data['Fecha_Venta']}. P&L no se calculará con CPP real.")
-            # Se podría asignar un CPP de 0 o NaN, y el P&L sería simplemente el ingreso.
-            self.df_ventas_calc.loc[idx, 'Costo_Base_USD_de_USDT_Vendido'] = 0 # O un valor que indique que no se pudo calcular
-            self.df_ventas_calc.loc[idx, 'Ganancia_Perdida_USDT_en_USD'] = ingreso_neto_usd_venta # O NaN
-            self.df_ventas_calc.loc[idx, 'Costo_Promedio_Ponderado_USD'] = 0.0 # O pd.NA
-            # No se descuenta del inventario si no hay suficiente para cubrirlo completamente según CPP
-            # O se podría optar por vender lo que hay y registrar el resto como una pérdida/problema.
-            # Por ahora, la venta se registra, pero su P&L y efecto en CPP son problemáticos.
-            self._rastrear_fiat_generado_venta(data, idx) # Rastrear fiat incluso si el P&L es problemático
-            return
+        self.transacciones_ordenadas = ordenar_transacciones(
+            self.df_compras_calc['Fecha_Compra'].to_numpy(dtype='datetime64[ns]'),
+            self.df_ventas_calc['Fecha_Venta'].to_numpy(dtype='datetime64[ns]'),
+            self.df_compras_calc['Cantidad_USDT_Comprada'].to_numpy(dtype='float64'),
+            self.df_ventas_calc['Cantidad_USDT_Vendida'].to_numpy(dtype='float64'),
+            self.df_compras_calc['Costo_Total_en_USD'].to_numpy(dtype='float64'),
+            self.df_ventas_calc['Ingreso_Neto_en_USD'].to_numpy(dtype='float64')
+        )
+        registro.info(f"✅ {len(self.transacciones_ordenadas['lado'])} transacciones ordenadas")
+
+    def procesar_cpp_y_pl(self, advertir: bool = True) -> Dict:
+        """Procesa todas las transacciones aplicando CPP y calculando P&L; devuelve el resultado del kernel.
         
-        # Calcular CPP actual
-        cpp_actual = self.inventario_usdt_costo_total_usd / self.inventario_usdt_cantidad
+        Con `advertir=False` las ventas sin stock se acumulan para informarlas al final (modo en flujo).
+        En modo sobreventa, los faltantes que saldan compras de este tramo corrigen el costo base de
+        sus ventas; los de tramos anteriores del modo en flujo se aplican a las ventas retenidas.
+        """
+        registro.info("🟡 Procesando CPP y P&L...")
+        if advertir:
+            self.ventas_sin_stock = 0
+            self.usdt_sin_stock = 0.0
+            self.transacciones_no_finitas = 0
+            self.resoluciones_tardias = []
+            self.usdt_resuelto_tarde = 0.0
         
-        # Calcular costo base de USDT vendido
-        costo_base_usd = cantidad_vendida * cpp_actual
+        transacciones = self.transacciones_ordenadas
+        resultado = calcular_cpp(
+            transacciones,
+            self.inventario_usdt_cantidad,
+            self.inventario_usdt_costo_total_usd,
+            escala=self.escala_cpp,
+            sobreventa=self.sobreventa,
+            pendientes_iniciales=[cantidad for _, _, cantidad in self.pendientes_sobreventa]
+        )
         
-        # Calcular ganancia/pérdida
-        ganancia_perdida = ingreso_neto_usd_venta - costo_base_usd
+        # Escribir resultados como columnas completas
+        if len(self.df_ventas_calc) > 0:
+            columnas = columnas_por_venta(transacciones, resultado, len(self.df_ventas_calc))
+            self.df_ventas_calc['Costo_Base_USD_de_USDT_Vendido'] = columnas['costo_base_usd']
+            self.df_ventas_calc['Ganancia_Perdida_USDT_en_USD'] = columnas['ganancia_perdida_usd']
+            self.df_ventas_calc['Costo_Promedio_Ponderado_USD'] = columnas['cpp_usd'] # CPP usado en cada venta
         
-        # Actualizar DataFrame de ventas
-        self.df_ventas_calc.loc[idx, 'Costo_Base_USD_de_USDT_Vendido'] = costo_base_usd
-        self.df_ventas_calc.loc[idx, 'Ganancia_Perdida_USDT_en_USD'] = ganancia_perdida
-        self.df_ventas_calc.loc[idx, 'Costo_Promedio_Ponderado_USD'] = cpp_actual # Almacenar CPP usado para esta venta
+        self.transacciones_no_finitas += resultado['no_finitos']
         
         # Actualizar inventario
-        self.inventario_usdt_costo_total_usd -= costo_base_usd
-        self.inventario_usdt_cantidad -= cantidad_vendida
+        self.inventario_usdt_cantidad = resultado['inventario_cantidad']
+        self.inventario_usdt_costo_total_usd = resultado['inventario_costo_usd']
         
-        # Rastrear fiat generado
-        self._rastrear_fiat_generado_venta(data, idx)
+        # Rastrear fiat en orden cronológico
+        self._registrar_transacciones(transacciones, resultado)
+        if self.sobreventa:
+            self._registrar_resoluciones(transacciones, resultado)
         
-        print(f"📉 Venta procesada: {data['Cantidad_USDT_Vendida']} USDT, P&L: ${ganancia_perdida:.2f}")
+        registro.info(f"✅ CPP y P&L procesados")
+        if advertir:
+            self._advertir_sin_stock()
+            self._advertir_fiat_sin_cubrir()
+        return resultado
 
-    def _rastrear_fiat_generado_venta(self, data, idx):
-        """Rastrea el fiat generado por una venta"""
-        id_venta = data['ID_Venta']
+    def _advertir_sin_stock(self):
+        """Una sola advertencia con el total de ventas sin stock suficiente (y otra si hubo montos no finitos)"""
+        if self.transacciones_no_finitas:
+            registro.warning(
+                f"⚠️  {self.transacciones_no_finitas} transacciones con cantidad o monto en USD NaN/infinito "
+                f"(ej: precio vacío o tasa de cambio 0): el CPP se calculó en float y arrastra ese valor "
+                f"(revisar con src/validacion.py).",
+                extra={'evento': 'resumen_no_finitos', 'transacciones': self.transacciones_no_finitas}
+            )
+        if self.sobreventa:
+            self._advertir_sobreventa()
+        elif self.ventas_sin_stock:
+            registro.warning(
+                f"⚠️  {self.ventas_sin_stock} ventas ({self.usdt_sin_stock:,.2f} USDT) con stock insuficiente: "
+                f"su P&L no se calculó con CPP real (detalle con nivel DEBUG).",
+                extra={'evento': 'resumen_sin_stock', 'ventas': self.ventas_sin_stock, 'cantidad_usdt': self.usdt_sin_stock}
+            )
+
+    def _advertir_sobreventa(self):
+        """Resumen de faltantes: cuánto saldaron compras posteriores y cuántas ventas siguen sin costo"""
+        if self.ventas_sin_stock or self.usdt_resuelto_tarde:
+            registro.warning(
+                f"⚠️  {self.ventas_sin_stock} ventas sobrevendidas ({self.usdt_sin_stock:,.2f} USDT sin stock al vender); "
+                f"{self.usdt_resuelto_tarde:,.2f} USDT con costo asignado por compras posteriores "
+                f"(ver reporte_resoluciones_tardias).",
+                extra={'evento': 'resumen_sobreventa', 'ventas': self.ventas_sin_stock,
+                       'cantidad_usdt': self.usdt_sin_stock, 'resuelto_usdt': self.usdt_resuelto_tarde}
+            )
+        if self.pendientes_sobreventa:
+            # Incluye las que vienen del checkpoint, no solo las de esta ejecución
+            pendiente = sum(cantidad for _, _, cantidad in self.pendientes_sobreventa)
+            registro.warning(
+                f"⚠️  {len(self.pendientes_sobreventa)} ventas sobrevendidas siguen pendientes ({pendiente:,.2f} USDT sin costo "
+                f"base): se saldarán con las próximas compras.",
+                extra={'evento': 'pendientes_sobreventa', 'ventas': len(self.pendientes_sobreventa),
+                       'pendiente_usdt': pendiente}
+            )
+
+    def _advertir_fiat_sin_cubrir(self):
+        """Una advertencia por moneda con el fiat de compras que no alcanzaron a cubrir las ventas"""
+        for moneda, monto in sorted(self.lotes_fiat.sin_cubrir.items()):
+            registro.warning(
+                f"⚠️  {monto:,.2f} {moneda} de compras financiadas con ventas no tienen fiat de ventas disponible "
+                f"(tipo 'sin_cubrir' en reporte_asignaciones_fiat).",
+                extra={'evento': 'resumen_fiat_sin_cubrir', 'moneda': moneda, 'monto': monto}
+            )
+
+    def _registrar_transacciones(self, transacciones, resultado):
+        """Rastrea el flujo de fiat en orden cronológico; el detalle por transacción va al nivel DEBUG"""
+        compras = self.df_compras_calc
+        ventas = self.df_ventas_calc
         
-        self.fiat_tracker[id_venta] = {
-            'Moneda_Generada': data['Moneda_Recibida'],
-            'Monto_Neto_Generado_Moneda_Original': data['Ingreso_Total_Moneda_Recibida'],
-            'Monto_Fiat_Utilizado_Moneda_Original': 0.0,
-            'Monto_Fiat_Disponible_Moneda_Original': data['Ingreso_Total_Moneda_Recibida'],
-            'Estado_Fiat': 'Disponible',
-            'Fecha_Venta': data['Fecha_Venta']
-        }
+        mascara_sin_stock = resultado['sin_stock']
+        self.ventas_sin_stock += int(mascara_sin_stock.sum())
+        if self.sobreventa:
+            self.usdt_sin_stock += float(resultado['faltante'].sum())
+        else:
+            self.usdt_sin_stock += float(transacciones['cantidad'][mascara_sin_stock].sum())
+        
+        # Formatear un mensaje por transacción solo si alguien lo va a registrar
+        detalle = registro.isEnabledFor(logging.DEBUG)
+        
+        ids_compra = compras['ID_Compra'].tolist()
+        cantidades_compra = compras['Cantidad_USDT_Comprada'].tolist()
+        monedas_compra = compras['Moneda_Pago'].tolist()
+        fuentes_compra = compras['Fuente_De_Fondos_Fiat'].tolist()
+        costos_compra = compras['Costo_Total_Moneda_Pago'].tolist()
+        
+        ids_venta = ventas['ID_Venta'].tolist()
+        cantidades_venta = ventas['Cantidad_USDT_Vendida'].tolist()
+        fechas_venta = ventas['Fecha_Venta'].tolist()
+        
+        # Un lote de fiat por venta, creados de una vez en orden cronológico
+        es_venta = transacciones['lado'] == LADO_VENTA
+        orden_ventas = transacciones['posicion'][es_venta]
+        fechas_ns = transacciones['fecha'].view('int64')
+        self.lotes_fiat.registrar_ventas(
+            ventas['ID_Venta'].to_numpy()[orden_ventas],
+            ventas['Moneda_Recibida'].to_numpy()[orden_ventas],
+            ventas['Ingreso_Total_Moneda_Recibida'].to_numpy(dtype='float64')[orden_ventas],
+            fechas_ns[es_venta],
+            np.flatnonzero(es_venta)
+        )
+        fechas_ns = fechas_ns.tolist()
+        
+        lados = transacciones['lado'].tolist()
+        posiciones = transacciones['posicion'].tolist()
+        ganancias = resultado['ganancia_perdida_usd'].tolist()
+        sin_stock = resultado['sin_stock'].tolist()
+        faltante = resultado['faltante'].tolist()
+        inventario_previo = resultado['inventario_previo'].tolist()
+        
+        for i, pos in enumerate(posiciones):
+            if lados[i] == LADO_COMPRA:
+                self.lotes_fiat.asignar(ids_compra[pos], fuentes_compra[pos], monedas_compra[pos], costos_compra[pos],
+                                        fechas_ns[i], i)
+                if detalle:
+                    registro.debug(f"📈 Compra procesada: {cantidades_compra[pos]} USDT",
+                                   extra={'evento': 'compra', 'id': ids_compra[pos], 'cantidad_usdt': cantidades_compra[pos]})
+                continue
+            
+            if not detalle:
+                continue
+            if sin_stock[i] and self.sobreventa:
+                # Se descuenta el stock que había; el faltante recibe costo cuando llegue una compra
+                registro.debug(f"⚠️  Venta ID {ids_venta[pos]} de {cantidades_venta[pos]} USDT sobrevendida: faltan {faltante[i]} USDT (stock {inventario_previo[i]} USDT) en {fechas_venta[pos]}. El costo del faltante lo asignarán compras posteriores.",
+                               extra={'evento': 'venta_sobrevendida', 'id': ids_venta[pos], 'cantidad_usdt': cantidades_venta[pos],
+                                      'faltante_usdt': faltante[i], 'inventario_usdt': inventario_previo[i], 'fecha_venta': fechas_venta[pos]})
+            elif sin_stock[i]:
+                # La venta se registra con costo base 0 y todo el ingreso como P&L; el inventario no se descuenta
+                registro.debug(f"⚠️  Advertencia: Venta ID {ids_venta[pos]} de {cantidades_venta[pos]} USDT. Stock insuficiente ({inventario_previo[i]} USDT) en {fechas_venta[pos]}. P&L no se calculará con CPP real.",
+                               extra={'evento': 'venta_sin_stock', 'id': ids_venta[pos], 'cantidad_usdt': cantidades_venta[pos],
+                                      'inventario_usdt': inventario_previo[i], 'fecha_venta': fechas_venta[pos]})
+            else:
+                registro.debug(f"📉 Venta procesada: {cantidades_venta[pos]} USDT, P&L: ${ganancias[i]:.2f}",
+                               extra={'evento': 'venta', 'id': ids_venta[pos], 'cantidad_usdt': cantidades_venta[pos],
+                                      'pnl_usd': ganancias[i]})
+        
+        self.lotes_fiat.cerrar_tramo(len(posiciones))
 
-    def _rastrear_fiat_usado_compra(self, data):
-        """Rastrea el uso de fiat en una compra"""
-        fuente = data.get('Fuente_De_Fondos_Fiat', '')
-        
-        if fuente.startswith('Venta_ID_'):
-            id_venta_ref = fuente.replace('Venta_ID_', '')
-            if id_venta_ref in self.fiat_tracker:
-                # Actualizar uso de fiat
-                monto_usado = data['Costo_Total_Moneda_Pago']
-                self.fiat_tracker[id_venta_ref]['Monto_Fiat_Utilizado_Moneda_Original'] += monto_usado
-                self.fiat_tracker[id_venta_ref]['Monto_Fiat_Disponible_Moneda_Original'] -= monto_usado
-                
-                # Actualizar estado
-                if self.fiat_tracker[id_venta_ref]['Monto_Fiat_Disponible_Moneda_Original'] <= 0:
-                    self.fiat_tracker[id_venta_ref]['Estado_Fiat'] = 'Totalmente Usado'
-                else:
-                    self.fiat_tracker[id_venta_ref]['Estado_Fiat'] = 'Parcialmente Usado'
+    def _registrar_resoluciones(self, transacciones, resultado):
+        """Agrega las resoluciones tardías del tramo y actualiza los faltantes pendientes"""
+        previos = self.pendientes_sobreventa
+        resoluciones = resultado['resoluciones']
+        posiciones = transacciones['posicion']
+        fechas = transacciones['fecha']
+        ids_venta = self.df_ventas_calc['ID_Venta'].to_numpy(dtype=object)
+        
+        # Venta de cada resolución: del tramo (índice de transacción) o pendiente previo (-1-k)
+        venta = resoluciones['venta']
+        previa = venta < 0
+        id_venta = np.empty(len(venta), dtype=object)
+        fecha_venta = np.empty(len(venta), dtype='datetime64[ns]')
+        if previa.any():
+            indices = -1 - venta[previa]
+            id_venta[previa] = np.array([p[0] for p in previos], dtype=object)[indices]
+            fecha_venta[previa] = np.array([p[1] for p in previos], dtype='datetime64[ns]')[indices]
+        if not previa.all():
+            id_venta[~previa] = ids_venta[posiciones[venta[~previa]]]
+            fecha_venta[~previa] = fechas[venta[~previa]]
+        
+        if len(venta) > 0:
+            compra = resoluciones['compra']
+            fecha_compra = fechas[compra]
+            self.resoluciones_tardias.append(pd.DataFrame({
+                'ID_Venta': id_venta,
+                'Fecha_Venta': fecha_venta,
+                'ID_Compra': self.df_compras_calc['ID_Compra'].to_numpy(dtype=object)[posiciones[compra]],
+                'Fecha_Compra': fecha_compra,
+                'Cantidad_USDT_Resuelta': resoluciones['cantidad'],
+                'Costo_Base_Asignado_USD': resoluciones['costo_usd'],
+                'Dias_Hasta_Resolucion': ((fecha_compra - fecha_venta) / np.timedelta64(1, 'D')).round(2),
+            }, columns=COLUMNAS_RESOLUCIONES_TARDIAS))
+            self.usdt_resuelto_tarde += float(resoluciones['cantidad'].sum())
+            if registro.isEnabledFor(logging.DEBUG):
+                for fila in self.resoluciones_tardias[-1].itertuples(index=False):
+                    registro.debug(f"🧾 Venta ID {fila.ID_Venta}: {fila.Cantidad_USDT_Resuelta} USDT saldados por compra ID {fila.ID_Compra}, costo base +${fila.Costo_Base_Asignado_USD:.2f}",
+                                   extra={'evento': 'resolucion_tardia', 'id': fila.ID_Venta, 'id_compra': fila.ID_Compra,
+                                          'cantidad_usdt': fila.Cantidad_USDT_Resuelta, 'costo_usd': fila.Costo_Base_Asignado_USD})
+        
+        pendientes = []
+        for ref, cantidad in resultado['pendientes']:
+            if ref < 0:
+                pendientes.append((previos[-1 - ref][0], previos[-1 - ref][1], cantidad))
+            else:
+                pendientes.append((str(ids_venta[posiciones[ref]]), pd.Timestamp(fechas[ref]).isoformat(), cantidad))
+        self.pendientes_sobreventa = pendientes
 
     def procesar_conversiones_fiat(self):
-        """Procesa las conversiones de fiat"""
+        """Concilia las conversiones con el fiat de cada venta (merge por ID_Venta_Asociada)"""
         if self.df_conversiones.empty:
             return
             
-        print("🟡 Procesando conversiones de fiat...")
+        registro.info("🟡 Procesando conversiones de fiat...")
         
-        for idx, row in self.df_conversiones.iterrows():
-            id_conversion = row['ID_Conversion']
-            id_venta_asociada_val = str(row.get('ID_Venta_Asociada', '')).strip()
-            notas_val = str(row.get('Notas', '')).strip()
-            
-            # Registrar la conversión
-            self.conversion_fiat_tracker[id_conversion] = {
-                'Moneda_Origen': row['Moneda_Origen'],
-                'Cantidad_Origen': row['Cantidad_Origen'],
-                'Moneda_Destino': row['Moneda_Destino'],
-                'Cantidad_Destino': row['Cantidad_Destino'],
-                'Fecha_Conversion': row['Fecha_Conversion'],
-                'ID_Venta_Asociada': id_venta_asociada_val,
-                'Notas': notas_val
-            }
-            
-            # Si proviene de una venta específica y el ID de venta es válido
-            if id_venta_asociada_val and id_venta_asociada_val.upper() != 'N/A':
-                if id_venta_asociada_val in self.fiat_tracker:
-                    self.fiat_tracker[id_venta_asociada_val]['Estado_Fiat'] = 'Convertido'
-                # else: # Opcional: advertir si el ID de venta asociado no se encuentra
-                    # print(f"⚠️ Advertencia: ID de Venta Asociada '{id_venta_asociada_val}' para Conversión '{id_conversion}' no encontrado en fiat_tracker.")
+        conversiones = normalizar_conversiones(self.df_conversiones)
+        self.conversiones_por_venta, self.conversiones_no_conciliadas = conciliar_conversiones(
+            conversiones, self.lotes_fiat.reporte())
+        self.lotes_fiat.marcar_convertidos(self.conversiones_por_venta['ID_Venta'])
         
-        print(f"✅ {len(self.df_conversiones)} conversiones procesadas")
+        no_conciliadas = self.conversiones_no_conciliadas
+        if not no_conciliadas.empty:
+            # Una sola advertencia por motivo, con algunos IDs de ejemplo (el detalle va al reporte)
+            for motivo, grupo in no_conciliadas.groupby('Motivo'):
+                ejemplos = ', '.join(grupo['ID_Venta_Asociada'].astype(str).unique()[:5])
+                registro.warning(
+                    f"⚠️  {len(grupo)} conversiones con ID_Venta_Asociada sin conciliar ({motivo}): {ejemplos}"
+                    f"{'...' if grupo['ID_Venta_Asociada'].nunique() > 5 else ''}",
+                    extra={'evento': 'conversiones_no_conciliadas', 'motivo': motivo, 'conversiones': len(grupo)}
+                )
+        
+        registro.info(f"✅ {len(conversiones)} conversiones procesadas "
+                      f"({len(self.conversiones_por_venta)} ventas con conversiones)")
 
     def generar_reportes(self):
-        """Genera los reportes CSV"""
-        print("🟡 Generando reportes...")
+        """Genera los reportes (CSV, Parquet o JSON-lines según formato_reportes)"""
+        registro.info("🟡 Generando reportes...")
         
-        os.makedirs(REPORTS_DIR_TRACKER, exist_ok=True) # Asegurar que el directorio de reportes exista
+        os.makedirs(self.directorio_reportes, exist_ok=True) # Asegurar que el directorio de reportes exista
 
-        # Reporte de P&L de Ventas
-        if self.df_ventas_calc is not None and not self.df_ventas_calc.empty:
-            columnas_reporte_ventas = [
-                'ID_Venta', 'Fecha_Venta', 'Cantidad_USDT_Vendida', 
-                'Moneda_Recibida', 'Precio_Unitario_Moneda_Recibida', 'Tasa_Cambio_UYU_USD_Venta',
-                'Ingreso_Total_Moneda_Recibida', 'Ingreso_Neto_en_USD', 
-                'Costo_Promedio_Ponderado_USD', 'Costo_Base_USD_de_USDT_Vendido', 
-                'Ganancia_Perdida_USDT_en_USD', 'Plataforma'
-            ]
+        self._generar_reporte_ventas_pl()
+        self._generar_reporte_resoluciones_tardias()
+        self._generar_reporte_flujo_fiat()
+        self._generar_reporte_conversiones()
             
+        registro.info("✅ Reportes generados.")
+
+    def _generar_reporte_ventas_pl(self):
+        """Reporte de P&L de ventas"""
+        if self.df_ventas_calc is not None and not self.df_ventas_calc.empty:
             # Asegurarse que todas las columnas existan, añadiendo las que falten con pd.NA
             df_reporte_ventas = self.df_ventas_calc.copy()
-            for col in columnas_reporte_ventas:
+            for col in COLUMNAS_REPORTE_VENTAS:
                 if col not in df_reporte_ventas.columns:
                     df_reporte_ventas[col] = pd.NA 
             
-            filepath_ventas_pl = os.path.join(REPORTS_DIR_TRACKER, 'reporte_ventas_pl.csv')
+            filepath_ventas_pl = self._ruta_reporte('reporte_ventas_pl')
             try:
-                df_reporte_ventas[columnas_reporte_ventas].to_csv(filepath_ventas_pl, index=False)
-                print(f"✅ Reporte de P&L de ventas guardado en '{filepath_ventas_pl}'")
+                if self.modo_incremental:
+                    # Solo se agregan las ventas nuevas al reporte existente
+                    guardar_reporte(df_reporte_ventas[COLUMNAS_REPORTE_VENTAS], filepath_ventas_pl, self.formato_reportes, agregar=True)
+                    registro.info(f"✅ {len(df_reporte_ventas)} ventas nuevas agregadas a '{filepath_ventas_pl}'")
+                else:
+                    guardar_reporte(df_reporte_ventas[COLUMNAS_REPORTE_VENTAS], filepath_ventas_pl, self.formato_reportes)
+                    registro.info(f"✅ Reporte de P&L de ventas guardado en '{filepath_ventas_pl}'")
             except Exception as e:
-                print(f"❌ Error guardando reporte P&L: {e}")
-                print("Dataframe de ventas para reporte:")
-                print(df_reporte_ventas[columnas_reporte_ventas].head())
-                print("Columnas disponibles en df_reporte_ventas:", df_reporte_ventas.columns.tolist())
+                registro.error(f"❌ Error guardando reporte P&L: {e}")
+                registro.debug("Dataframe de ventas para reporte:\n%s", df_reporte_ventas[COLUMNAS_REPORTE_VENTAS].head())
+                registro.debug("Columnas disponibles en df_reporte_ventas: %s", df_reporte_ventas.columns.tolist())
 
+        elif self.modo_incremental:
+            registro.info("ℹ️  No hay ventas nuevas; el reporte de P&L no cambia.")
         else:
-            print("ℹ️  No hay datos de ventas calculados para generar reporte de P&L.")
-
-        # Reporte de Flujo de Fiat
-        if self.fiat_tracker:
-            df_flujo_fiat = pd.DataFrame.from_dict(self.fiat_tracker, orient='index')
-            df_flujo_fiat.index.name = 'ID_Venta'
-            if not df_flujo_fiat.empty:
-                filepath_flujo_fiat = os.path.join(REPORTS_DIR_TRACKER, 'reporte_flujo_fiat.csv')
-                try:
-                    df_flujo_fiat.to_csv(filepath_flujo_fiat, index=False)
-                    print(f"✅ Reporte de flujo de fiat guardado en '{filepath_flujo_fiat}'")
-                except Exception as e:
-                    print(f"❌ Error guardando reporte de flujo de fiat: {e}")
+            registro.info("ℹ️  No hay datos de ventas calculados para generar reporte de P&L.")
+
+    def _generar_reporte_resoluciones_tardias(self):
+        """Ventas sobrevendidas cuyo faltante saldó una compra posterior (una fila por compra que lo saldó)"""
+        filepath = self._ruta_reporte('reporte_resoluciones_tardias')
+        if not self.resoluciones_tardias:
+            if not self.modo_incremental and os.path.exists(filepath):
+                os.remove(filepath)  # No dejar el reporte de una ejecución anterior
+            return
+        
+        resoluciones = pd.concat(self.resoluciones_tardias, ignore_index=True)
+        try:
+            if self.modo_incremental and os.path.exists(filepath):
+                guardar_reporte(resoluciones, filepath, self.formato_reportes, agregar=True)
+                registro.info(f"✅ {len(resoluciones)} resoluciones tardías agregadas a '{filepath}'")
             else:
-                print("ℹ️  No hay datos de flujo de fiat para generar reporte.")
-        else: # Añadido para el caso en que self.fiat_tracker esté vacío
-            print("ℹ️  No hay datos en fiat_tracker para generar reporte de flujo de fiat.")
-            
-        print("✅ Reportes generados.")
+                guardar_reporte(resoluciones, filepath, self.formato_reportes)
+                registro.info(f"✅ Reporte de resoluciones tardías guardado en '{filepath}'")
+        except Exception as e:
+            registro.error(f"❌ Error guardando reporte de resoluciones tardías: {e}")
+
+    def _generar_reporte_flujo_fiat(self):
+        """Reportes de flujo de fiat (un lote por venta) y de asignaciones de compras contra lotes"""
+        if len(self.lotes_fiat) == 0:
+            registro.info("ℹ️  No hay lotes de fiat para generar reporte de flujo de fiat.")
+            return
+        
+        filepath_flujo_fiat = self._ruta_reporte('reporte_flujo_fiat')
+        try:
+            guardar_reporte(self.lotes_fiat.reporte(), filepath_flujo_fiat, self.formato_reportes)
+            registro.info(f"✅ Reporte de flujo de fiat guardado en '{filepath_flujo_fiat}'")
+        except Exception as e:
+            registro.error(f"❌ Error guardando reporte de flujo de fiat: {e}")
+        
+        asignaciones = self.lotes_fiat.reporte_asignaciones()
+        filepath_asignaciones = self._ruta_reporte('reporte_asignaciones_fiat')
+        try:
+            if self.modo_incremental and os.path.exists(filepath_asignaciones):
+                # Las asignaciones anteriores ya están en el reporte; solo se agregan las de las compras nuevas
+                guardar_reporte(asignaciones, filepath_asignaciones, self.formato_reportes, agregar=True)
+                registro.info(f"✅ {len(asignaciones)} asignaciones de fiat agregadas a '{filepath_asignaciones}'")
+            else:
+                guardar_reporte(asignaciones, filepath_asignaciones, self.formato_reportes)
+                registro.info(f"✅ Reporte de asignaciones de fiat guardado en '{filepath_asignaciones}'")
+        except Exception as e:
+            registro.error(f"❌ Error guardando reporte de asignaciones de fiat: {e}")
+
+    def _generar_reporte_conversiones(self):
+        """Conversiones por venta (monto convertido, tasa implícita, saldo residual) y las no conciliadas"""
+        for nombre, df in (('reporte_conversiones_fiat', self.conversiones_por_venta),
+                           ('reporte_conversiones_no_conciliadas', self.conversiones_no_conciliadas)):
+            filepath = self._ruta_reporte(nombre)
+            if df.empty:
+                if os.path.exists(filepath):
+                    os.remove(filepath)  # No dejar el reporte de una ejecución anterior
+                continue
+            try:
+                guardar_reporte(df, filepath, self.formato_reportes)
+                registro.info(f"✅ Reporte {nombre} guardado en '{filepath}'")
+            except Exception as e:
+                registro.error(f"❌ Error guardando {nombre}: {e}")
 
 def crear_archivos_ejemplo():
     """Crea archivos CSV de ejemplo si no existen."""
-    print("🟡 Verificando archivos de ejemplo...")
+    registro.info("🟡 Verificando archivos de ejemplo...")
 
     archivos_a_verificar = {
         # Rutas antiguas comentadas
         # '../data/compras_usdt.csv': {
         COMPRAS_CSV_TRACKER: {
-            'columnas': ['ID_Compra', 'Fecha_Compra', 'Cantidad_USDT_Comprada', 'Moneda_Pago', 'Precio_Unitario_Moneda_Pago', 'Tasa_Cambio_UYU_USD_Compra', 'Fuente_De_Fondos_Fiat', 'Comisiones_Compra_Moneda_Pago', 'Plataforma'],
+            'columnas': COLUMNAS_COMPRAS,
             'data': [
                 ['C1', '2023-01-01 10:00:00', 100.0, 'UYU', 39.5, 39.5, 'Ahorros UYU', 0.0, 'binance'],
                 ['C2', '2023-01-05 15:30:00', 50.0, 'USD', 1.01, 1.0, 'Ahorros USD', 0.0, 'otro'],
@@ -455,16 +1076,16 @@ def crear_archivos_ejemplo():
         },
         # '../data/ventas_usdt.csv': {
         VENTAS_CSV_TRACKER: {
-            'columnas': ['ID_Venta', 'Fecha_Venta', 'Cantidad_USDT_Vendida', 'Moneda_Recibida', 'Precio_Unitario_Moneda_Recibida', 'Tasa_Cambio_UYU_USD_Venta', 'Comisiones_Venta_Moneda_Recibida', 'Plataforma'],
+            'columnas': COLUMNAS_VENTAS,
             'data': [
                 ['V1', '2023-01-10 12:00:00', 70.0, 'UYU', 40.5, 40.0, 0.0, 'binance'],
             ]
         },
         # '../data/conversiones_fiat.csv': {
         CONVERSIONES_CSV_TRACKER: {
-            'columnas': ['ID_Conversion', 'Fecha_Conversion', 'Moneda_Origen', 'Cantidad_Origen', 'Moneda_Destino', 'Cantidad_Destino', 'ID_Venta_Asociada', 'Notas'],
+            'columnas': esquema_vigente('conversiones').columnas,
             'data': [
-                ['CF1', '2023-01-11 09:00:00', 'UYU', 2835.0, 'USD', 70.0, 'V1', 'Conversion de UYU de venta V1 a USD'],
+                ['CF1', '2023-01-11 09:00:00', 'UYU', 2835.0, 'USD', 70.0, 40.5, 'V1', 'Conversion de UYU de venta V1 a USD'],
             ]
         }
     }
@@ -474,10 +1095,10 @@ def crear_archivos_ejemplo():
         directorio = os.path.dirname(archivo_path)
         if not os.path.exists(directorio):
             os.makedirs(directorio)
-            print(f"📂 Directorio creado: {directorio}")
+            registro.info(f"📂 Directorio creado: {directorio}")
 
         if not os.path.exists(archivo_path):
-            print(f"⏳ Creando archivo de ejemplo: {archivo_path}")
+            registro.info(f"⏳ Creando archivo de ejemplo: {archivo_path}")
             df_ejemplo = pd.DataFrame(info['data'], columns=info['columnas'])
             
             # Convertir columnas de fecha a datetime si es necesario y luego a string en formato ISO
@@ -490,45 +1111,201 @@ def crear_archivos_ejemplo():
 
             df_ejemplo.to_csv(archivo_path, index=False)
             algun_archivo_creado = True
-            print(f"✅ Archivo de ejemplo creado: {archivo_path}")
+            registro.info(f"✅ Archivo de ejemplo creado: {archivo_path}")
         else:
-            print(f"ℹ️  Archivo encontrado: {archivo_path}")
+            registro.info(f"ℹ️  Archivo encontrado: {archivo_path}")
 
     if algun_archivo_creado:
-        print("✨ ¡Archivos CSV de ejemplo creados/verificados! Por favor, revísalos y modifícalos con tus datos reales.")
+        registro.info("✨ ¡Archivos CSV de ejemplo creados/verificados! Por favor, revísalos y modifícalos con tus datos reales.")
     else:
-        print("✅ Todos los archivos de datos ya existen.")
+        registro.info("✅ Todos los archivos de datos ya existen.")
 
-def main():
-    print("🚀 Iniciando P2P Tracker Script...")
-    
-    # Verificar y crear archivos de ejemplo si es necesario
-    # Esto asegura que los directorios data/ y data/reports/ existan si son creados por primera vez aquí.
-    crear_archivos_ejemplo()
+# Etapas del pipeline en orden de ejecución y las que cada una necesita antes
+ETAPAS_PIPELINE = ['cargar', 'preliminares', 'ordenar', 'cpp', 'conversiones', 'reportes', 'checkpoint']
+DEPENDENCIAS_ETAPAS = {
+    'cargar': [],
+    'preliminares': ['cargar'],
+    'ordenar': ['preliminares'],
+    'cpp': ['ordenar'],
+    'conversiones': ['cpp'],
+    'reportes': ['conversiones'],  # El flujo de fiat y el checkpoint llevan el estado 'Convertido' de los lotes
+    'checkpoint': ['reportes'],
+}
+
+# En flujo carga, cálculos y reportes ocurren juntos por bloque: solo el checkpoint es opcional
+ETAPAS_EN_FLUJO = [etapa for etapa in ETAPAS_PIPELINE if etapa != 'checkpoint']
+
+
+def resolver_etapas(etapas: List[str] = None) -> List[str]:
+    """Etapas pedidas más sus dependencias, en orden de ejecución (None -> todas)"""
+    if not etapas:
+        return list(ETAPAS_PIPELINE)
+    pendientes = list(etapas)
+    necesarias = set()
+    while pendientes:
+        etapa = pendientes.pop()
+        if etapa not in DEPENDENCIAS_ETAPAS:
+            raise ValueError(f"Etapa desconocida: {etapa}")
+        if etapa not in necesarias:
+            necesarias.add(etapa)
+            pendientes.extend(DEPENDENCIAS_ETAPAS[etapa])
+    return [etapa for etapa in ETAPAS_PIPELINE if etapa in necesarias]
 
-    tracker = P2PTracker()
+
+def expandir_rutas(patrones: List[str]) -> List[str]:
+    """Expande patrones glob (ej: 'data/compras_*.csv') en orden alfabético; las rutas sin comodines quedan igual"""
+    rutas = []
+    for patron in patrones or []:
+        if glob.has_magic(patron):
+            coincidencias = sorted(glob.glob(patron))
+            if not coincidencias:
+                registro.warning(f"⚠️  Ningún archivo coincide con '{patron}'")
+            rutas.extend(coincidencias)
+        else:
+            rutas.append(patron)
+    return rutas
+
+
+def ejecutar_pipeline(tracker: P2PTracker, archivo_compras: RutasLedger = COMPRAS_CSV_TRACKER,
+                      archivo_ventas: RutasLedger = VENTAS_CSV_TRACKER,
+                      archivo_conversiones: RutasLedger = CONVERSIONES_CSV_TRACKER,
+                      etapas: List[str] = None, incremental: bool = True, modo_flujo: bool = False,
+                      filas_por_chunk: int = FILAS_POR_CHUNK_FLUJO, progreso: Callable[[str], None] = None):
+    """Ejecuta las etapas pedidas (y sus dependencias): carga, cálculos, reportes y checkpoint.
+    
+    Si se indica `progreso`, se llama con el nombre de cada etapa antes de ejecutarla.
+    """
+    etapas = resolver_etapas(etapas)
+    avisar = progreso or (lambda etapa: None)
+    if modo_flujo and not set(ETAPAS_EN_FLUJO) <= set(etapas):
+        raise ValueError(f"En modo flujo no se pueden omitir etapas salvo 'checkpoint' "
+                         f"(faltan: {', '.join(e for e in ETAPAS_EN_FLUJO if e not in etapas)})")
     
-    # Cargar datos
-    tracker.cargar_datos(
-        # archivo_compras='../data/compras_usdt.csv', 
-        # archivo_ventas='../data/ventas_usdt.csv', 
-        # archivo_conversiones='../data/conversiones_fiat.csv'
-        archivo_compras=COMPRAS_CSV_TRACKER, 
-        archivo_ventas=VENTAS_CSV_TRACKER, 
-        archivo_conversiones=CONVERSIONES_CSV_TRACKER
-    )
+    if modo_flujo:
+        # Ledgers más grandes que la RAM: ordenamiento externo y reporte emitido por bloques.
+        # Carga, cálculos y reportes ocurren juntos, bloque a bloque.
+        avisar('cargar')
+        tracker.procesar_en_flujo(archivo_compras, archivo_ventas, archivo_conversiones, filas_por_chunk)
+        if 'checkpoint' in etapas:
+            avisar('checkpoint')
+            tracker.guardar_checkpoint()
+        return
+    
+    # Cargar datos (solo las filas nuevas si hay un checkpoint válido)
+    avisar('cargar')
+    if incremental:
+        tracker.cargar_datos_incremental(archivo_compras, archivo_ventas, archivo_conversiones)
+    else:
+        tracker.cargar_datos(archivo_compras, archivo_ventas, archivo_conversiones)
     
     # Realizar cálculos
-    tracker.calcular_preliminares_compras()
-    tracker.calcular_preliminares_ventas()
-    tracker.crear_transacciones_ordenadas()
-    tracker.procesar_cpp_y_pl()
-    tracker.procesar_conversiones_fiat()
+    if 'preliminares' in etapas:
+        avisar('preliminares')
+        tracker.calcular_preliminares_compras()
+        tracker.calcular_preliminares_ventas()
+    if 'ordenar' in etapas:
+        avisar('ordenar')
+        tracker.crear_transacciones_ordenadas()
+    if 'cpp' in etapas:
+        avisar('cpp')
+        tracker.procesar_cpp_y_pl()
+    if 'conversiones' in etapas:
+        avisar('conversiones')
+        tracker.procesar_conversiones_fiat()
     
     # Generar reportes
-    tracker.generar_reportes()
+    if 'reportes' in etapas:
+        avisar('reportes')
+        tracker.generar_reportes()
+    
+    # Guardar checkpoint para la próxima ejecución
+    if 'checkpoint' in etapas:
+        avisar('checkpoint')
+        tracker.guardar_checkpoint()
+
+def crear_parser() -> argparse.ArgumentParser:
+    """Opciones de línea de comandos del tracker"""
+    parser = argparse.ArgumentParser(description="Seguimiento P2P de USDT: P&L por CPP y flujo de fiat")
+    
+    entrada = parser.add_argument_group('archivos')
+    entrada.add_argument('--compras', nargs='+', metavar='RUTA', default=[COMPRAS_CSV_TRACKER],
+                         help="CSV de compras; acepta varios archivos o patrones glob (se concatenan en orden)")
+    entrada.add_argument('--ventas', nargs='+', metavar='RUTA', default=[VENTAS_CSV_TRACKER],
+                         help="CSV de ventas; acepta varios archivos o patrones glob")
+    entrada.add_argument('--conversiones', nargs='+', metavar='RUTA', default=[CONVERSIONES_CSV_TRACKER],
+                         help="CSV de conversiones de fiat; acepta varios archivos o patrones glob")
+    entrada.add_argument('--salida', metavar='DIRECTORIO', default=REPORTS_DIR_TRACKER,
+                         help="Directorio de reportes y checkpoint (default: data/reports)")
+    entrada.add_argument('--formato', choices=sorted(FORMATOS_REPORTE), default='csv',
+                         help="Formato de los reportes (default: csv)")
+    entrada.add_argument('--crear-ejemplos', action='store_true',
+                         help="Crear los CSV de ejemplo en data/ si no existen")
+    
+    proceso = parser.add_argument_group('procesamiento')
+    proceso.add_argument('--etapas', nargs='+', choices=ETAPAS_PIPELINE, metavar='ETAPA',
+                         help=f"Ejecutar solo estas etapas (y las que necesitan): {', '.join(ETAPAS_PIPELINE)}")
+    modo = proceso.add_mutually_exclusive_group()
+    modo.add_argument('--incremental', dest='incremental', action='store_true', default=True,
+                      help="Procesar solo las filas nuevas si hay checkpoint válido (default)")
+    modo.add_argument('--full', dest='incremental', action='store_false',
+                      help="Recalcular todo desde cero ignorando el checkpoint")
+    proceso.add_argument('--flujo', action='store_true', help="Procesar por chunks (ledgers más grandes que la RAM)")
+    proceso.add_argument('--filas-por-chunk', type=int, default=FILAS_POR_CHUNK_FLUJO, metavar='N',
+                         help=f"Filas por chunk en modo --flujo (default: {FILAS_POR_CHUNK_FLUJO})")
+    proceso.add_argument('--cpp-punto-fijo', dest='punto_fijo', action='store_true',
+                         help="Calcular el CPP en punto fijo (millonésimas) en lugar de float64")
+    proceso.add_argument('--sobreventa', action='store_true',
+                         help="Ventas sin stock: dejar el faltante pendiente y asignarle el costo de compras posteriores")
+    proceso.add_argument('--profile', action='store_true', help="Medir tiempo, CPU, memoria y filas por etapa")
+    
+    consola = parser.add_argument_group('salida por consola')
+    nivel = consola.add_mutually_exclusive_group()
+    nivel.add_argument('--quiet', '-q', action='store_true', help="Sin salida por consola salvo errores (ej: cron)")
+    nivel.add_argument('--verbose', '-v', action='store_true', help="Mostrar cada transacción procesada")
+    consola.add_argument('--log-jsonl', metavar='RUTA', help="Agregar un log de auditoría JSON-lines con cada evento")
+    return parser
+
+def main(argv: List[str] = None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if not formato_reporte_disponible(args.formato):
+        parser.error(f"el formato '{args.formato}' requiere instalar {FORMATOS_REPORTE[args.formato][1]}")
+    if args.filas_por_chunk <= 0:
+        parser.error("--filas-por-chunk debe ser mayor que 0")
+    if args.flujo and args.etapas and not set(ETAPAS_EN_FLUJO) <= set(resolver_etapas(args.etapas)):
+        parser.error("con --flujo las etapas se ejecutan juntas por bloque; --etapas solo puede omitir 'checkpoint' "
+                     "(ej: --etapas reportes)")
+    
+    nivel_consola = logging.ERROR if args.quiet else logging.DEBUG if args.verbose else logging.INFO
+    configurar_registro(nivel_consola, ruta_jsonl=args.log_jsonl)
+    
+    registro.info("🚀 Iniciando P2P Tracker Script...")
+    
+    # Los CSV de ejemplo solo se crean si se piden (en data/, las rutas por defecto)
+    if args.crear_ejemplos:
+        crear_archivos_ejemplo()
+
+    tracker = P2PTracker(directorio_reportes=args.salida, formato_reportes=args.formato, punto_fijo=args.punto_fijo,
+                         sobreventa=args.sobreventa)
+    opciones = {
+        'archivo_compras': expandir_rutas(args.compras),
+        'archivo_ventas': expandir_rutas(args.ventas),
+        'archivo_conversiones': expandir_rutas(args.conversiones),
+        'etapas': args.etapas,
+        'incremental': args.incremental,
+        'modo_flujo': args.flujo,
+        'filas_por_chunk': args.filas_por_chunk,
+    }
+    
+    if args.profile:
+        # Tiempo, CPU, memoria y filas por método; traza Chrome junto a los reportes
+        with perfilar(os.path.join(tracker.directorio_reportes, NOMBRE_TRAZA_PERFIL)) as perfilador:
+            perfilador.instrumentar(tracker, METODOS_PERFILADOS)
+            ejecutar_pipeline(tracker, **opciones)
+    else:
+        ejecutar_pipeline(tracker, **opciones)
     
-    print(f"\n🎉 ¡Procesamiento completado exitosamente!")
+    registro.info(f"\n🎉 ¡Procesamiento completado exitosamente!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validación y Limpieza de Ledgers - P2P USDT
+
+Recorre los CSV de compras, ventas y conversiones por chunks aplicando reglas
+vectorizadas (IDs duplicados, montos no positivos, tasas faltantes, fechas
+inválidas, plataformas desconocidas y referencias a ventas inexistentes).
+Devuelve un resumen por regla y, opcionalmente, escribe el detalle de cada
+violación y una copia corregida de cada archivo. Los valores se leen como
+texto, así un dato mal formado no corta la lectura y las filas válidas se
+copian sin reformatear.
+
+Con pyarrow instalado el CSV se lee con su lector por bloques y los números
+y fechas se convierten primero con los casts de Arrow; solo los chunks con
+algún valor que no los cumple pasan por los parsers de pandas. Los IDs vistos
+se guardan como hashes de 64 bits en arrays ordenados (8 bytes por fila), así
+un archivo de 10M de filas se valida con memoria acotada.
+
+Uso:
+    python src/validacion.py --compras data/compras_usdt.csv --ventas data/ventas_usdt.csv \\
+        --conversiones data/conversiones_fiat.csv --salida data/limpios --detalle data/reports/validacion.csv
+"""
+
+import os
+import sys
+import csv
+import shutil
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from almacenamiento import bloqueo_archivo, leer_encabezado
+from esquemas import identificar, es_vigente, esquema_vigente, adaptar
+from compacto import normalizar_categorias
+from motor_comisiones import TABLA_COMISIONES
+from motor_fiat import PREFIJO_FUENTE_VENTA, FUENTE_FIFO
+from registro_p2p import obtener_registro, configurar_registro
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+registro = obtener_registro('validacion')
+
+FILAS_POR_CHUNK_VALIDACION = 500_000
+EJEMPLOS_POR_REGLA = 3
+SUFIJO_RESPALDO = '.bak'
+FNV_BASE = np.uint64(0xcbf29ce484222325)
+FNV_PRIMO = np.uint64(0x100000001b3)
+
+# Valores que el cast de Arrow convierte directamente (el resto pasa por pandas)
+PATRON_NUMERO = r'[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?'
+PATRON_FECHA_ISO = r'\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?'
+
+# Plataformas que ofrece el dashboard más las de la tabla de comisiones (en minúsculas)
+PLATAFORMAS_CONOCIDAS = frozenset(['binance', 'kucoin', 'bybit', 'okx', 'p2p', 'whatsapp', 'otro']
+                                  + [plataforma for plataforma, _ in TABLA_COMISIONES])
+PLATAFORMA_POR_DEFECTO = 'otro'
+
+# Regla -> (descripción, acción sobre la copia corregida)
+# descartar: la fila no se copia; corregir: se reemplaza el valor; informar: solo se reporta
+REGLAS = {
+    'id_duplicado': ("ID repetido (se conserva la primera aparición que no se descarta)", 'descartar'),
+    'fecha_invalida': ("Fecha vacía o no reconocible", 'descartar'),
+    'cantidad_no_positiva': ("Cantidad vacía, no numérica o <= 0", 'descartar'),
+    'precio_no_positivo': ("Precio vacío, no numérico o <= 0", 'descartar'),
+    'tasa_faltante': ("Operación en moneda distinta de USD sin tasa de cambio o con tasa 0 "
+                      "(se usa la última tasa válida de esa moneda)", 'corregir'),
+    'plataforma_desconocida': (f"Plataforma fuera de la lista conocida (vacía -> '{PLATAFORMA_POR_DEFECTO}')", 'informar'),
+    'venta_inexistente': ("Referencia a una venta que no existe (se desvincula)", 'corregir'),
+}
+
+# Columnas que revisa cada regla en cada ledger
+COLUMNAS_VALIDADAS = {
+    'compras': {
+        'cantidades': ['Cantidad_USDT_Comprada'],
+        'precios': ['Precio_Unitario_Moneda_Pago'],
+        'moneda': 'Moneda_Pago',
+        'tasa': 'Tasa_Cambio_UYU_USD_Compra',
+        'plataforma': 'Plataforma',
+        'referencia_venta': 'Fuente_De_Fondos_Fiat',
+    },
+    'ventas': {
+        'cantidades': ['Cantidad_USDT_Vendida'],
+        'precios': ['Precio_Unitario_Moneda_Recibida'],
+        'moneda': 'Moneda_Recibida',
+        'tasa': 'Tasa_Cambio_UYU_USD_Venta',
+        'plataforma': 'Plataforma',
+    },
+    'conversiones': {
+        'cantidades': ['Cantidad_Origen', 'Cantidad_Destino'],
+        'referencia_venta': 'ID_Venta_Asociada',
+    },
+}
+
+# Las ventas van primero: sus IDs se usan para validar las referencias de los otros ledgers
+ORDEN_LEDGERS = ['ventas', 'compras', 'conversiones']
+COLUMNAS_DETALLE = ['Ledger', 'Fila', 'ID', 'Regla', 'Columna', 'Valor']
+
+
+def hashes_ids(ids: pd.Series) -> np.ndarray:
+    """Hash FNV-1a de 64 bits de cada ID (sin espacios a los lados), vectorizado por posición de byte"""
+    textos = ids.astype(str).str.strip()
+    try:
+        datos = textos.to_numpy(dtype='S')
+    except UnicodeEncodeError:
+        datos = textos.str.encode('utf-8').to_numpy(dtype='S')
+    bytes_por_id = datos.view(np.uint8).reshape(len(datos), datos.dtype.itemsize)
+    hashes = np.full(len(datos), FNV_BASE, dtype=np.uint64)
+    for byte in bytes_por_id.T:
+        # El relleno de ceros del final no cuenta: el hash no depende del ID más largo del chunk
+        hashes = np.where(byte != 0, (hashes ^ byte) * FNV_PRIMO, hashes)
+    return hashes
+
+
+class ConjuntoIDs:
+    """Conjunto de IDs como hashes en arrays ordenados.
+
+    Los arrays se fusionan cuando el último no es menor que la mitad del
+    anterior, así hay O(log n) arrays y cada fila se reordena O(log n) veces.
+    """
+
+    def __init__(self):
+        self._niveles: List[np.ndarray] = []
+        self.total = 0
+
+    def contiene(self, hashes: np.ndarray) -> np.ndarray:
+        # Buscar los hashes ordenados recorre cada nivel en orden (menos fallos de caché)
+        orden = np.argsort(hashes)
+        buscados = hashes[orden]
+        encontrados = np.zeros(len(hashes), dtype=bool)
+        for nivel in self._niveles:
+            posiciones = np.searchsorted(nivel, buscados)
+            encontrados |= nivel[np.minimum(posiciones, len(nivel) - 1)] == buscados
+        presentes = np.empty(len(hashes), dtype=bool)
+        presentes[orden] = encontrados
+        return presentes
+
+    def agregar(self, hashes: np.ndarray):
+        if len(hashes) == 0:
+            return
+        self._niveles.append(np.sort(hashes))
+        self.total += len(hashes)
+        while len(self._niveles) > 1 and len(self._niveles[-1]) * 2 >= len(self._niveles[-2]):
+            ultimo = self._niveles.pop()
+            self._niveles[-1] = np.sort(np.concatenate([self._niveles[-1], ultimo]), kind='mergesort')
+
+
+def bloques_de_filas(archivo, tamaño: int) -> Iterator[bytes]:
+    """Bloques de unos `tamaño` bytes del archivo, cortados al final de una fila.
+
+    El corte se hace en un salto de línea con una cantidad par de comillas
+    antes, así un valor entre comillas con saltos de línea no se parte.
+    """
+    resto = b''
+    while True:
+        datos = archivo.read(tamaño)
+        if not datos:
+            if resto:
+                yield resto
+            return
+        bloque = resto + datos
+        corte = bloque.rfind(b'\n') + 1
+        while corte > 0 and bloque.count(b'"', 0, corte) % 2:
+            corte = bloque.rfind(b'\n', 0, corte - 1) + 1
+        if corte == 0:
+            resto = bloque  # Una fila más larga que el bloque: se sigue leyendo
+            continue
+        yield bloque[:corte]
+        resto = bloque[corte:]
+
+
+def leer_chunks(ruta: str, columnas: List[str], filas_por_chunk: int) -> Iterator[pd.DataFrame]:
+    """Chunks del CSV con todas las columnas como texto y solo '' como vacío"""
+    if pa_csv is None:
+        yield from pd.read_csv(ruta, dtype=str, keep_default_na=False, na_values=[''], chunksize=filas_por_chunk)
+        return
+    # Los bloques se cortan aquí y no con open_csv de Arrow, que lee por adelantado sin
+    # límite; cada bloque lo parsea Arrow en paralelo. El tamaño de fila se estima con el comienzo
+    with open(ruta, 'rb') as f:
+        f.readline()
+        muestra = f.read(1 << 20)
+        f.seek(-len(muestra), os.SEEK_CUR)
+        tamaño = max(int(len(muestra) / max(muestra.count(b'\n'), 1) * filas_por_chunk), 1 << 16)
+        opciones_conversion = pa_csv.ConvertOptions(column_types={columna: pa.string() for columna in columnas},
+                                                    strings_can_be_null=True, null_values=[''])
+        for bloque in bloques_de_filas(f, tamaño):
+            tabla = pa_csv.read_csv(
+                pa.BufferReader(bloque),
+                read_options=pa_csv.ReadOptions(column_names=columnas),
+                parse_options=pa_csv.ParseOptions(newlines_in_values=b'"' in bloque),
+                convert_options=opciones_conversion,
+            )
+            yield tabla.to_pandas()
+
+
+def _convertir_con_arrow(serie: pd.Series, tipo: str, patron: str) -> Tuple[Optional[pd.Series], Optional[np.ndarray]]:
+    """Cast de Arrow de los valores que cumplen `patron` y máscara de los no vacíos que no lo cumplen.
+
+    (None, None) si no hay pyarrow o algún valor que cumple el patrón no se
+    puede convertir (ej: '2024-02-30'); ahí se usa el parser de pandas.
+    """
+    if pa is None:
+        return None, None
+    try:
+        return serie.astype(tipo), np.zeros(len(serie), dtype=bool)
+    except (TypeError, ValueError):
+        pass
+    cumple = serie.str.fullmatch(patron).fillna(False).to_numpy(dtype=bool)
+    try:
+        convertida = serie.where(cumple).astype(tipo)
+    except (TypeError, ValueError):
+        return None, None
+    return convertida, ~cumple & serie.notna().to_numpy()
+
+
+def a_numero(serie: pd.Series) -> np.ndarray:
+    """float64 de una columna de texto; lo que no es un número queda NaN"""
+    convertida, pendientes = _convertir_con_arrow(serie, 'float64[pyarrow]', PATRON_NUMERO)
+    if convertida is None:
+        return pd.to_numeric(serie, errors='coerce').to_numpy(dtype='float64')
+    numeros = convertida.to_numpy(dtype='float64', na_value=np.nan, copy=True)
+    if pendientes.any():
+        numeros[pendientes] = pd.to_numeric(serie[pendientes], errors='coerce')
+    return numeros
+
+
+def _fechas_invalidas_pandas(fechas: pd.Series) -> np.ndarray:
+    parseadas = pd.to_datetime(fechas, format='ISO8601', errors='coerce')
+    pendientes = parseadas.isna() & fechas.notna()
+    if pendientes.any():
+        parseadas[pendientes] = pd.to_datetime(fechas[pendientes], format='mixed', errors='coerce')
+    return parseadas.isna().to_numpy()
+
+
+def fechas_invalidas(fechas: pd.Series) -> np.ndarray:
+    """Fechas vacías o que el tracker no puede parsear (format='mixed').
+
+    Las fechas ISO se validan con el cast de Arrow; solo las demás pasan por
+    los parsers de pandas, el de formatos mixtos mucho más lento.
+    """
+    convertida, pendientes = _convertir_con_arrow(fechas, 'timestamp[us][pyarrow]', PATRON_FECHA_ISO)
+    if convertida is None:
+        return _fechas_invalidas_pandas(fechas)
+    invalidas = convertida.isna().to_numpy(copy=True)
+    if pendientes.any():
+        invalidas[pendientes] = _fechas_invalidas_pandas(fechas[pendientes])
+    return invalidas
+
+
+class ValidadorLedgers:
+    """Valida ledgers por chunks y acumula el resumen de violaciones por regla"""
+
+    def __init__(self, plataformas: frozenset = PLATAFORMAS_CONOCIDAS,
+                 filas_por_chunk: int = FILAS_POR_CHUNK_VALIDACION, ruta_detalle: str = None):
+        self.plataformas = frozenset(p.lower() for p in plataformas)
+        self.filas_por_chunk = filas_por_chunk
+        self.ruta_detalle = ruta_detalle
+
+        self.conteos: Dict[tuple, Dict] = {}    # (ledger, regla) -> filas/corregidas/descartadas/ejemplos
+        self.filas: Dict[str, int] = {}         # Filas leídas por ledger
+        self.filas_limpias: Dict[str, int] = {}  # Filas escritas en la copia corregida
+        self.ids_ventas: Optional[ConjuntoIDs] = None  # IDs del archivo de ventas (None: no se validaron ventas)
+        self.limpios: Dict[str, str] = {}       # Ledger -> copia corregida
+        self._detalle = None
+
+    def validar(self, archivos: Dict[str, str], directorio_salida: str = None) -> Dict[str, str]:
+        """Valida los ledgers {'compras': ruta, ...}; devuelve las rutas de las copias corregidas"""
+        if self.ruta_detalle:
+            os.makedirs(os.path.dirname(os.path.abspath(self.ruta_detalle)), exist_ok=True)
+            self._detalle = open(self.ruta_detalle, 'w', encoding='utf-8', newline='')
+            csv.writer(self._detalle, lineterminator='\n').writerow(COLUMNAS_DETALLE)
+        try:
+            for ledger in ORDEN_LEDGERS:
+                ruta = archivos.get(ledger)
+                if not ruta or not os.path.exists(ruta) or os.path.getsize(ruta) == 0:
+                    continue
+                ruta_salida = None
+                if directorio_salida:
+                    os.makedirs(directorio_salida, exist_ok=True)
+                    ruta_salida = os.path.join(directorio_salida, os.path.basename(ruta))
+                self.validar_archivo(ruta, ledger, ruta_salida)
+                if ruta_salida:
+                    self.limpios[ledger] = ruta_salida
+        finally:
+            if self._detalle is not None:
+                self._detalle.close()
+                self._detalle = None
+        return self.limpios
+
+    def validar_archivo(self, ruta: str, ledger: str, ruta_salida: str = None) -> int:
+        """Valida un CSV del ledger (y escribe su copia corregida si se indica); devuelve las filas leídas"""
+        columnas = leer_encabezado(ruta)
+        detectado, _ = identificar(columnas)
+        if detectado != ledger:
+            raise ValueError(f"{ruta} no parece un ledger de {ledger} (columnas: {', '.join(columnas)})")
+        vigente = es_vigente(columnas, ledger)
+        if not vigente:
+            columnas = esquema_vigente(ledger).columnas
+
+        ids = ConjuntoIDs()
+        ultima_tasa: Dict[str, float] = {}  # Última tasa válida por moneda (se arrastra entre chunks)
+        if ledger == 'ventas':
+            self.ids_ventas = ids
+        self.filas[ledger] = 0
+        self.filas_limpias[ledger] = 0
+        for regla in REGLAS:
+            self._conteo(ledger, regla)
+
+        salida = None
+        ruta_tmp = ruta_salida + '.tmp' if ruta_salida else None
+        if ruta_tmp:
+            salida = open(ruta_tmp, 'w', encoding='utf-8', newline='')
+            csv.writer(salida, lineterminator='\n').writerow(columnas)
+        try:
+            # Todo como texto: las filas válidas se copian tal cual estaban
+            for chunk in leer_chunks(ruta, leer_encabezado(ruta), self.filas_por_chunk):
+                if not vigente:
+                    chunk = adaptar(chunk, ledger)
+                chunk.index = pd.RangeIndex(self.filas[ledger] + 1, self.filas[ledger] + 1 + len(chunk))
+                descartar = self._revisar_chunk(chunk, ledger, ids, ultima_tasa)
+                self.filas[ledger] += len(chunk)
+                if salida is not None:
+                    conservadas = chunk[~descartar]
+                    conservadas.to_csv(salida, header=False, index=False, lineterminator='\n')
+                    self.filas_limpias[ledger] += len(conservadas)
+            if salida is not None:
+                salida.flush()
+                os.fsync(salida.fileno())
+        except Exception:
+            if salida is not None:
+                salida.close()
+                os.remove(ruta_tmp)
+            raise
+        if salida is not None:
+            salida.close()
+            os.replace(ruta_tmp, ruta_salida)
+
+        violaciones = sum(self.conteos[(ledger, regla)]['filas'] for regla in REGLAS)
+        registro.info(f"✅ {ruta}: {self.filas[ledger]} filas de {ledger} validadas, {violaciones} violaciones")
+        return self.filas[ledger]
+
+    def _revisar_chunk(self, chunk: pd.DataFrame, ledger: str, ids: ConjuntoIDs,
+                       ultima_tasa: Dict[str, float]) -> np.ndarray:
+        """Aplica las reglas al chunk (corrigiéndolo en el lugar); devuelve la máscara de filas a descartar"""
+        columnas = COLUMNAS_VALIDADAS[ledger]
+        esquema = esquema_vigente(ledger)
+        descartar = np.zeros(len(chunk), dtype=bool)
+
+        columna_fecha = esquema.columna_fecha
+        descartar |= self._registrar(chunk, ledger, 'fecha_invalida', fechas_invalidas(chunk[columna_fecha]), columna_fecha)
+
+        for clave, regla in (('cantidades', 'cantidad_no_positiva'), ('precios', 'precio_no_positivo')):
+            for columna in columnas.get(clave, []):
+                invalida = ~(a_numero(chunk[columna]) > 0)
+                descartar |= self._registrar(chunk, ledger, regla, invalida, columna)
+
+        if 'tasa' in columnas:
+            descartar |= self._revisar_tasas(chunk, ledger, columnas['moneda'], columnas['tasa'], ultima_tasa)
+
+        if 'plataforma' in columnas:
+            columna = columnas['plataforma']
+            plataforma = normalizar_categorias(chunk[columna], lambda c: c.str.strip().str.lower(), faltante='')
+            vacia = (plataforma == '').to_numpy()
+            desconocida = vacia | ~plataforma.isin(self.plataformas).to_numpy()
+            self._registrar(chunk, ledger, 'plataforma_desconocida', desconocida, columna, corregidas=vacia)
+            chunk.loc[vacia, columna] = PLATAFORMA_POR_DEFECTO
+
+        if 'referencia_venta' in columnas and self.ids_ventas is not None:
+            self._revisar_referencias(chunk, ledger, columnas['referencia_venta'])
+
+        # Un ID se repite si ya lo tiene una fila conservada (de un chunk anterior o antes en este);
+        # las filas descartadas no registran su ID
+        columna_id = esquema.columna_id
+        candidatas = chunk[columna_id].notna().to_numpy()
+        hashes = hashes_ids(chunk.loc[candidatas, columna_id])
+        conservada = ~descartar[candidatas]
+        posicion = np.arange(len(hashes))
+        primera_conservada = pd.Series(np.where(conservada, posicion, len(hashes))).groupby(hashes).transform('min')
+        repetido = ids.contiene(hashes) | (primera_conservada.to_numpy() < posicion)
+        ids.agregar(hashes[conservada & ~repetido])
+        duplicado = np.zeros(len(chunk), dtype=bool)
+        duplicado[np.flatnonzero(candidatas)[repetido]] = True
+        descartar |= self._registrar(chunk, ledger, 'id_duplicado', duplicado, columna_id)
+        return descartar
+
+    def _revisar_tasas(self, chunk: pd.DataFrame, ledger: str, columna_moneda: str, columna_tasa: str,
+                       ultima_tasa: Dict[str, float]) -> np.ndarray:
+        """Tasa faltante o 0 fuera de USD (convertir_a_usd dividiría por ella); se completa con la última válida"""
+        moneda = normalizar_categorias(chunk[columna_moneda], lambda c: c.str.strip().str.upper(), faltante='')
+        tasa = pd.Series(a_numero(chunk[columna_tasa]), index=chunk.index)
+        requiere = (moneda != 'USD').to_numpy()
+        faltante = requiere & ~(tasa > 0).to_numpy()
+        validas = tasa.where(requiere & ~faltante)
+        claves = moneda.cat.codes.to_numpy()
+        corregible = np.zeros(len(chunk), dtype=bool)
+        if faltante.any():
+            previa = moneda.map(ultima_tasa).astype('float64')
+            relleno = validas.groupby(claves).ffill().fillna(previa)
+            corregible = faltante & relleno.notna().to_numpy()
+            self._registrar(chunk, ledger, 'tasa_faltante', faltante, columna_tasa,
+                            corregidas=corregible, descartadas=faltante & ~corregible)
+            chunk.loc[corregible, columna_tasa] = relleno[corregible].astype(str)
+        ultima = validas.groupby(claves).last().dropna()
+        ultima_tasa.update(zip(moneda.cat.categories[ultima.index], ultima))
+        return faltante & ~corregible
+
+    def _revisar_referencias(self, chunk: pd.DataFrame, ledger: str, columna: str):
+        """Referencias a ventas que no existen: las compras pasan a FIFO y las conversiones quedan sin venta"""
+        valores = chunk[columna].str.strip()
+        if ledger == 'compras':
+            es_referencia = valores.str.startswith(PREFIJO_FUENTE_VENTA, na=False).to_numpy()
+            referidas = valores[es_referencia].str.slice(len(PREFIJO_FUENTE_VENTA))
+            reemplazo = FUENTE_FIFO
+        else:
+            es_referencia = (valores.notna() & (valores != '')).to_numpy()
+            referidas = valores[es_referencia]
+            reemplazo = np.nan
+        inexistente = np.zeros(len(chunk), dtype=bool)
+        inexistente[np.flatnonzero(es_referencia)] = ~self.ids_ventas.contiene(hashes_ids(referidas))
+        self._registrar(chunk, ledger, 'venta_inexistente', inexistente, columna, corregidas=inexistente)
+        chunk.loc[inexistente, columna] = reemplazo
+
+    def _conteo(self, ledger: str, regla: str) -> Dict:
+        return self.conteos.setdefault((ledger, regla), {'filas': 0, 'corregidas': 0, 'descartadas': 0, 'ejemplos': []})
+
+    def _registrar(self, chunk: pd.DataFrame, ledger: str, regla: str, mascara, columna: str,
+                   corregidas=None, descartadas=None) -> np.ndarray:
+        """Suma las violaciones de la regla al resumen y al detalle; devuelve la máscara como array"""
+        mascara = np.asarray(mascara, dtype=bool)
+        cantidad = int(mascara.sum())
+        if cantidad == 0:
+            return mascara
+
+        accion = REGLAS[regla][1]
+        conteo = self._conteo(ledger, regla)
+        conteo['filas'] += cantidad
+        if corregidas is not None:
+            conteo['corregidas'] += int(np.asarray(corregidas, dtype=bool).sum())
+        if descartadas is not None:
+            conteo['descartadas'] += int(np.asarray(descartadas, dtype=bool).sum())
+        elif accion == 'descartar':
+            conteo['descartadas'] += cantidad
+
+        columna_id = esquema_vigente(ledger).columna_id
+        faltan = EJEMPLOS_POR_REGLA - len(conteo['ejemplos'])
+        if faltan > 0:
+            filas = chunk.index[mascara][:faltan]
+            conteo['ejemplos'].extend(f"fila {fila} ({chunk.at[fila, columna_id]})" for fila in filas)
+
+        if self._detalle is not None:
+            pd.DataFrame({
+                'Ledger': ledger,
+                'Fila': chunk.index[mascara],
+                'ID': chunk[columna_id].to_numpy()[mascara],
+                'Regla': regla,
+                'Columna': columna,
+                'Valor': chunk[columna].to_numpy()[mascara],
+            }).to_csv(self._detalle, header=False, index=False, lineterminator='\n')
+        return mascara
+
+    def total_violaciones(self) -> int:
+        return sum(conteo['filas'] for conteo in self.conteos.values())
+
+    def reporte(self) -> pd.DataFrame:
+        """Resumen por ledger y regla (solo las reglas con violaciones)"""
+        filas = []
+        for (ledger, regla), conteo in self.conteos.items():
+            if conteo['filas'] == 0:
+                continue
+            descripcion, accion = REGLAS[regla]
+            filas.append({
+                'Ledger': ledger,
+                'Regla': regla,
+                'Descripción': descripcion,
+                'Acción': accion,
+                'Filas': conteo['filas'],
+                'Corregidas': conteo['corregidas'],
+                'Descartadas': conteo['descartadas'],
+                'Ejemplos': ', '.join(conteo['ejemplos']),
+            })
+        columnas = ['Ledger', 'Regla', 'Descripción', 'Acción', 'Filas', 'Corregidas', 'Descartadas', 'Ejemplos']
+        return pd.DataFrame(filas, columns=columnas)
+
+
+def validar_ledgers(archivos: Dict[str, str], directorio_salida: str = None, ruta_detalle: str = None,
+                    plataformas: frozenset = PLATAFORMAS_CONOCIDAS,
+                    filas_por_chunk: int = FILAS_POR_CHUNK_VALIDACION) -> ValidadorLedgers:
+    """Valida los ledgers {'compras': ruta, 'ventas': ruta, 'conversiones': ruta} y devuelve el validador"""
+    validador = ValidadorLedgers(plataformas, filas_por_chunk, ruta_detalle)
+    validador.validar(archivos, directorio_salida)
+    return validador
+
+
+def reemplazar_con_limpio(ruta: str, ruta_limpia: str, respaldo: bool = True):
+    """Reemplaza el CSV por su copia corregida (el original queda como <csv>.bak)"""
+    with bloqueo_archivo(ruta):
+        if respaldo:
+            shutil.copy2(ruta, ruta + SUFIJO_RESPALDO)
+        shutil.copyfile(ruta_limpia, ruta + '.limpiando')
+        os.replace(ruta + '.limpiando', ruta)
+    registro.info(f"✅ {ruta} reemplazado por su copia corregida"
+                  + (f" (respaldo en {ruta + SUFIJO_RESPALDO})" if respaldo else ""))
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Valida los ledgers CSV y opcionalmente escribe copias corregidas")
+    parser.add_argument('--compras', metavar='CSV')
+    parser.add_argument('--ventas', metavar='CSV')
+    parser.add_argument('--conversiones', metavar='CSV')
+    parser.add_argument('--salida', metavar='DIRECTORIO', help="Escribir aquí las copias corregidas")
+    parser.add_argument('--detalle', metavar='CSV', help="Escribir una fila por violación")
+    parser.add_argument('--plataforma', action='append', default=[], metavar='NOMBRE',
+                        help="Plataforma adicional a considerar conocida (se puede repetir)")
+    parser.add_argument('--filas-por-chunk', type=int, default=FILAS_POR_CHUNK_VALIDACION, metavar='N')
+    args = parser.parse_args(argv)
+    if args.filas_por_chunk <= 0:
+        parser.error("--filas-por-chunk debe ser mayor que 0")
+    archivos = {ledger: ruta for ledger, ruta in
+                (('compras', args.compras), ('ventas', args.ventas), ('conversiones', args.conversiones)) if ruta}
+    if not archivos:
+        parser.error("indicar al menos uno de --compras, --ventas o --conversiones")
+
+    configurar_registro(logging.INFO)
+    faltantes = [ruta for ruta in archivos.values() if not os.path.exists(ruta)]
+    for ruta in faltantes:
+        registro.error(f"❌ Archivo no encontrado: {ruta}")
+    if faltantes:
+        return 1
+
+    try:
+        validador = validar_ledgers(archivos, args.salida, args.detalle,
+                                    PLATAFORMAS_CONOCIDAS | set(args.plataforma), args.filas_por_chunk)
+    except (OSError, ValueError) as e:
+        registro.error(f"❌ Error validando: {e}")
+        return 1
+
+    reporte = validador.reporte()
+    if reporte.empty:
+        registro.info("✅ Sin violaciones")
+    else:
+        print(reporte.drop(columns=['Descripción']).to_string(index=False))
+    for ledger, ruta in validador.limpios.items():
+        registro.info(f"🧹 {ledger}: {validador.filas_limpias[ledger]} de {validador.filas[ledger]} filas en {ruta}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Utilidades compartidas por los tests: `src/` en el path y ledgers de ejemplo en un directorio temporal"""
+
+import os
+import sys
+import logging
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from esquemas import esquema_vigente  # noqa: E402
+from registro_p2p import configurar_registro  # noqa: E402
+from script_p2p_tracker import P2PTracker, ejecutar_pipeline  # noqa: E402
+
+
+def compra(id_compra, fecha, cantidad, precio=1.0, moneda='USD', tasa=1.0, fuente='Ahorros USD', comision=0.0,
+           plataforma='otro'):
+    return [id_compra, fecha, cantidad, moneda, precio, tasa, fuente, comision, plataforma]
+
+
+def venta(id_venta, fecha, cantidad, precio=1.5, moneda='USD', tasa=1.0, comision=0.0, plataforma='otro'):
+    return [id_venta, fecha, cantidad, moneda, precio, tasa, comision, plataforma]
+
+
+class Ledgers:
+    """CSV de compras, ventas y conversiones en un directorio; se pueden escribir de una vez o agregar filas"""
+
+    def __init__(self, directorio):
+        self.directorio = str(directorio)
+        self.compras = os.path.join(self.directorio, 'compras_usdt.csv')
+        self.ventas = os.path.join(self.directorio, 'ventas_usdt.csv')
+        self.conversiones = os.path.join(self.directorio, 'conversiones_fiat.csv')
+
+    def escribir(self, compras=(), ventas=()):
+        pd.DataFrame(list(compras), columns=esquema_vigente('compras').columnas).to_csv(self.compras, index=False)
+        pd.DataFrame(list(ventas), columns=esquema_vigente('ventas').columnas).to_csv(self.ventas, index=False)
+
+    def agregar(self, compras=(), ventas=()):
+        for ruta, filas in ((self.compras, compras), (self.ventas, ventas)):
+            if filas:
+                pd.DataFrame(list(filas)).to_csv(ruta, mode='a', header=False, index=False)
+
+    def correr(self, salida, incremental=False, **opciones) -> P2PTracker:
+        """Corre el pipeline completo; `flujo=N` procesa en flujo con chunks de N filas"""
+        filas_por_chunk = opciones.pop('flujo', None)
+        tracker = P2PTracker(directorio_reportes=str(salida), **opciones)
+        extra = {'modo_flujo': True, 'filas_por_chunk': filas_por_chunk} if filas_por_chunk else {}
+        ejecutar_pipeline(tracker, self.compras, self.ventas, self.conversiones, incremental=incremental, **extra)
+        return tracker
+
+
+def leer_reporte(salida, nombre: str, orden: str = None) -> pd.DataFrame:
+    df = pd.read_csv(os.path.join(str(salida), f'{nombre}.csv'))
+    return df.sort_values(orden, kind='stable').reset_index(drop=True) if orden else df
+
+
+@pytest.fixture(autouse=True)
+def registro_silencioso():
+    configurar_registro(logging.ERROR)
+
+
+@pytest.fixture
+def ledgers(tmp_path):
+    return Ledgers(tmp_path)
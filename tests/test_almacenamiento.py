@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""Conteo de registros de los ledgers CSV"""
+
+import pandas as pd
+import pytest
+
+import almacenamiento
+from almacenamiento import contar_registros
+
+CONTENIDO = ('ID,Nota,Monto\n'
+             '1,simple,10\n'
+             '2,"nota con\nsalto de línea",20\n'
+             '3,"con ""comillas""\ny otro salto",30\n'
+             '4,"coma, y\r\nCRLF",40\n'
+             '5,fin,50')
+
+
+@pytest.mark.parametrize('bloque', [1 << 20, 1, 2, 7])
+def test_contar_registros_ignora_saltos_entre_comillas(tmp_path, monkeypatch, bloque):
+    # Bloques chicos: las comillas abiertas quedan repartidas entre varios bloques
+    monkeypatch.setattr(almacenamiento, 'TAMAÑO_BLOQUE_CONTEO', bloque)
+    ruta = tmp_path / f'ledger_{bloque}.csv'
+    ruta.write_bytes(CONTENIDO.encode('utf-8'))
+    assert contar_registros(str(ruta)) == len(pd.read_csv(ruta)) == 5
+
+
+def test_contar_registros_sin_comillas(tmp_path):
+    ruta = tmp_path / 'ledger.csv'
+    ruta.write_text('ID,Monto\n1,10\n2,20\n')
+    assert contar_registros(str(ruta)) == 2
+    ruta.write_text('ID,Monto\n')
+    assert contar_registros(str(ruta)) == 0
+    ruta.write_text('')
+    assert contar_registros(str(ruta)) == 0
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Checkpoint: las filas agregadas mientras corre el tracker quedan para la próxima ejecución"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from almacenamiento import AlmacenamientoLedgers
+from checkpoint_cpp import estado_archivo, huella_archivo, leer_filas_nuevas, leer_prefijo_por_chunks
+from conftest import compra, venta, leer_reporte
+from esquemas import esquema_vigente
+from script_p2p_tracker import P2PTracker
+
+COMPRAS = [compra('C1', '2024-01-01 10:00:00', 100)]
+VENTAS = [venta('V1', '2024-01-02 10:00:00', 10)] + [venta(f'V{i}', f'2024-01-0{i} 10:00:00', 1) for i in (3, 4)]
+
+
+def _agregar_durante_la_corrida(monkeypatch, ruta, fila):
+    """Agrega `fila` al ledger (como el dashboard) después de leer compras y ventas y antes de guardar el checkpoint"""
+    original = P2PTracker._cargar_conversiones
+    pendiente = [dict(zip(esquema_vigente('ventas').columnas, fila))]
+
+    def agregar_y_cargar(tracker, *args, **kwargs):
+        if pendiente:
+            AlmacenamientoLedgers().agregar_fila(ruta, pendiente.pop())
+        return original(tracker, *args, **kwargs)
+
+    monkeypatch.setattr(P2PTracker, '_cargar_conversiones', agregar_y_cargar)
+
+
+@pytest.mark.parametrize('flujo', [None, 1])
+def test_fila_agregada_durante_la_corrida_no_se_pierde(ledgers, tmp_path, monkeypatch, flujo):
+    ledgers.escribir(COMPRAS, VENTAS[:1])
+    opciones = {'flujo': flujo} if flujo else {}
+    with monkeypatch.context() as m:
+        _agregar_durante_la_corrida(m, ledgers.ventas, venta('V2', '2024-01-02 12:00:00', 5))
+        ledgers.correr(tmp_path / 'inc', **opciones)
+    assert leer_reporte(tmp_path / 'inc', 'reporte_ventas_pl')['ID_Venta'].tolist() == ['V1']
+
+    # La corrida incremental toma V2 y V3; V4 se agrega mientras corre y queda para la siguiente
+    ledgers.agregar(ventas=VENTAS[1:2])
+    with monkeypatch.context() as m:
+        _agregar_durante_la_corrida(m, ledgers.ventas, VENTAS[2])
+        tracker = ledgers.correr(tmp_path / 'inc', incremental=True)
+    assert tracker.modo_incremental
+    assert tracker.df_ventas['ID_Venta'].tolist() == ['V2', 'V3']
+
+    tracker = ledgers.correr(tmp_path / 'inc', incremental=True)
+    assert tracker.modo_incremental
+    assert tracker.df_ventas['ID_Venta'].tolist() == ['V4']
+    assert tracker.inventario_usdt_cantidad == pytest.approx(83.0)
+    ledgers.correr(tmp_path / 'full')
+    pd.testing.assert_frame_equal(leer_reporte(tmp_path / 'inc', 'reporte_ventas_pl', 'ID_Venta'),
+                                  leer_reporte(tmp_path / 'full', 'reporte_ventas_pl', 'ID_Venta'))
+
+
+def test_lecturas_acotadas_al_tamaño_registrado(ledgers):
+    ledgers.escribir(COMPRAS, VENTAS[:2])
+    with open(ledgers.ventas, 'rb') as f:
+        encabezado = len(f.readline())
+    tamaño = os.path.getsize(ledgers.ventas)
+    ledgers.agregar(ventas=VENTAS[2:])
+
+    assert leer_filas_nuevas(ledgers.ventas, encabezado, tamaño)['ID_Venta'].tolist() == ['V1', 'V3']
+    assert leer_filas_nuevas(ledgers.ventas, tamaño)['ID_Venta'].tolist() == ['V4']
+    chunks = list(leer_prefijo_por_chunks(ledgers.ventas, tamaño, 1))
+    assert [chunk['ID_Venta'].tolist() for chunk in chunks] == [['V1'], ['V3']]
+    assert estado_archivo(ledgers.ventas, tamaño) == {'ruta': os.path.abspath(ledgers.ventas), 'bytes': tamaño,
+                                                      'huella': huella_archivo(ledgers.ventas, tamaño)}
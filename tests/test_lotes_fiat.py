@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Lotes de fiat: asignación explícita, FIFO y sin cubrir, y su paso por el checkpoint"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from checkpoint_cpp import guardar_checkpoint, cargar_checkpoint
+from motor_fiat import LotesFiat
+
+DIA = 86_400 * 10**9
+
+
+def _lotes() -> LotesFiat:
+    lotes = LotesFiat()
+    lotes.registrar_ventas(np.array(['V1', 'V2', 'V3']), np.array(['UYU', 'UYU', 'USD']),
+                           np.array([100.0, 50.0, 30.0]), np.array([1, 2, 3]) * DIA, np.array([0, 1, 2]))
+    return lotes
+
+
+def _asignaciones(lotes: LotesFiat) -> list:
+    df = lotes.reporte_asignaciones()
+    ventas = [None if pd.isna(id_venta) else id_venta for id_venta in df['ID_Venta']]
+    return list(zip(df['ID_Compra'], ventas, df['Monto_Asignado'], df['Tipo_Asignacion']))
+
+
+def test_asignacion_explicita_fifo_y_sin_cubrir():
+    lotes = _lotes()
+    assert lotes.asignar('C1', 'Venta_ID_V2', 'UYU', 70.0, 4 * DIA, 3) == 0.0  # V2 entero y el resto FIFO
+    assert lotes.asignar('C2', 'Ventas_FIFO', 'UYU', 100.0, 5 * DIA, 4) == pytest.approx(20.0)
+    assert lotes.asignar('C3', 'Ahorros USD', 'USD', 10.0, 5 * DIA, 5) == 0.0  # No es fiat de ventas
+    assert lotes.asignar('C4', 'Venta_ID_V9', 'USD', 10.0, 5 * DIA, 6) == 0.0  # Venta desconocida: FIFO
+    lotes.cerrar_tramo(7)
+
+    assert _asignaciones(lotes) == [('C1', 'V2', 50.0, 'explicita'), ('C1', 'V1', 20.0, 'fifo'),
+                                    ('C2', 'V1', 80.0, 'fifo'), ('C2', None, 20.0, 'sin_cubrir'),
+                                    ('C4', 'V3', 10.0, 'fifo')]
+    assert lotes.sin_cubrir == {'UYU': 20.0}
+    reporte = lotes.reporte().set_index('ID_Venta')
+    assert reporte['Estado_Fiat'].to_dict() == {'V1': 'Totalmente Usado', 'V2': 'Totalmente Usado',
+                                                'V3': 'Parcialmente Usado'}
+    assert lotes.disponible_al('UYU', 3 * DIA) == 150.0
+    assert lotes.disponible_al('UYU', 4 * DIA) == 80.0
+    assert lotes.disponible_al('USD', 6 * DIA) == 20.0
+
+
+def test_compra_no_usa_ventas_posteriores_del_mismo_instante():
+    lotes = LotesFiat()
+    lotes.registrar_ventas(np.array(['V1']), np.array(['UYU']), np.array([100.0]), np.array([DIA]), np.array([1]))
+    assert lotes.asignar('C1', 'Venta_ID_V1', 'UYU', 10.0, DIA, 0) == 10.0
+
+
+def test_checkpoint_con_lotes_ida_y_vuelta(tmp_path):
+    lotes = _lotes()
+    lotes.asignar('C1', 'Venta_ID_V2', 'UYU', 70.0, 4 * DIA, 3)
+    lotes.cerrar_tramo(4)
+    ruta = str(tmp_path / 'checkpoint_cpp.json')
+    guardar_checkpoint(ruta, {'lotes_fiat': lotes.serializar(), 'fecha': pd.Timestamp('2024-01-04')})
+    guardar_checkpoint(ruta, {'lotes_fiat': lotes.serializar(), 'fecha': pd.Timestamp('2024-01-04')})
+
+    # JSON compacto en una línea y un único .npz con los arreglos
+    with open(ruta, encoding='utf-8') as f:
+        texto = f.read()
+    assert '\n' not in texto and json.loads(texto)['arreglos'].endswith('.npz')
+    assert len(list(tmp_path.glob('checkpoint_cpp.*.npz'))) == 1
+
+    restaurados = LotesFiat.restaurar(cargar_checkpoint(ruta)['lotes_fiat'])
+    pd.testing.assert_frame_equal(restaurados.reporte(), lotes.reporte())
+    # Sigue asignando donde quedó: V1 tiene 80 disponibles y las ventas nuevas continúan el orden
+    restaurados.registrar_ventas(np.array(['V4']), np.array(['UYU']), np.array([10.0]), np.array([5 * DIA]),
+                                 np.array([0]))
+    assert restaurados.asignar('C2', 'Ventas_FIFO', 'UYU', 95.0, 6 * DIA, 1) == pytest.approx(5.0)
+    assert [fila[1] for fila in _asignaciones(restaurados)] == ['V1', 'V4', None]
+    assert restaurados.reporte()['ID_Venta'].tolist() == ['V1', 'V2', 'V3', 'V4']
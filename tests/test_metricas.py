@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Métricas del dashboard: mismos costos e ingresos en USD que el tracker"""
+
+import pytest
+
+from conftest import compra, venta
+from motor_comisiones import TABLA_COMISIONES
+from motor_metricas import calcular_metricas
+
+
+def test_metricas_usan_las_comisiones_del_tracker(ledgers, tmp_path):
+    # Comisión 0 en binance: se completa con la tabla; la manual se respeta
+    ledgers.escribir(
+        [compra('C1', '2024-01-01 10:00:00', 100, precio=40.0, moneda='UYU', tasa=39.5, plataforma='binance'),
+         compra('C2', '2024-01-02 10:00:00', 50, precio=1.01, plataforma='Binance'),
+         compra('C3', '2024-01-03 10:00:00', 20, precio=1.02, comision=0.5, plataforma='binance'),
+         compra('C4', '2024-01-04 10:00:00', 10, precio=1.03, plataforma='otro')],
+        [venta('V1', '2024-01-05 10:00:00', 60, precio=41.0, moneda='UYU', tasa=39.0, plataforma='binance'),
+         venta('V2', '2024-01-06 10:00:00', 30, precio=1.05, plataforma='otro')])
+    tracker = ledgers.correr(tmp_path / 'out')
+
+    globales = calcular_metricas(tracker.df_compras, tracker.df_ventas)['globales']
+    inversion = tracker.df_compras_calc['Costo_Total_en_USD'].sum()
+    assert globales['inversion_total_usd'] == pytest.approx(inversion, rel=1e-12)
+    assert globales['ingresos_total_usd'] == pytest.approx(tracker.df_ventas_calc['Ingreso_Neto_en_USD'].sum(),
+                                                           rel=1e-12)
+    assert globales['cpp_promedio'] == pytest.approx(inversion / 180, rel=1e-12)
+    # Sin comisiones automáticas el costo es menor
+    sin_tabla = calcular_metricas(tracker.df_compras, tracker.df_ventas, tabla_comisiones={})['globales']
+    assert sin_tabla['inversion_total_usd'] < globales['inversion_total_usd']
+    assert TABLA_COMISIONES[('binance', 'UYU')] > 0
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Migración de ledgers con esquemas anteriores (por línea de comandos y al iniciar el dashboard)"""
+
+import io
+import os
+
+import pandas as pd
+import pytest
+from rich.console import Console
+
+import dashboard_p2p
+from almacenamiento import leer_csv_tipado
+from migrar_ledgers import necesita_migracion, migrar_archivo, main, SUFIJO_RESPALDO
+
+ENCABEZADO_VIGENTE = ('ID_Conversion,Fecha_Conversion,Moneda_Origen,Cantidad_Origen,Moneda_Destino,Cantidad_Destino,'
+                      'Tasa_Conversion_Implicita,ID_Venta_Asociada,Notas\n')
+
+# v1 (la que creaba el dashboard): Monto_* y Tasa_Cambio, sin venta asociada ni notas
+CONVERSIONES_V1 = """ID_Conversion,Fecha_Conversion,Monto_Origen,Moneda_Origen,Monto_Destino,Moneda_Destino,Tasa_Cambio
+X1,2024-01-10 10:00:00,395.50,UYU,10,USD,39.55
+X2,2024-01-11,400,UYU,10,USD,
+X3,2024-01-12 09:00:00,10,USD,395,UYU,
+X4,2024-01-13 09:00:00,100,UYU,0,USD,
+"""
+CONVERSIONES_V1_MIGRADAS = ENCABEZADO_VIGENTE + """X1,2024-01-10 10:00:00,UYU,395.50,USD,10,39.55,,
+X2,2024-01-11,UYU,400,USD,10,40.0,,
+X3,2024-01-12 09:00:00,USD,10,UYU,395,39.5,,
+X4,2024-01-13 09:00:00,UYU,100,USD,0,,,
+"""
+
+# v2 (la del tracker de ejemplo): sin tasa implícita; las notas entre comillas se copian tal cual
+CONVERSIONES_V2 = """ID_Conversion,Fecha_Conversion,Moneda_Origen,Cantidad_Origen,Moneda_Destino,Cantidad_Destino,ID_Venta_Asociada,Notas
+X1,2024-01-10 10:00:00,UYU,395.50,USD,10,V1,"cambio, en ""casa""
+de cambio"
+X2,2024-01-11 10:00:00,UYU,400,USD,10,,
+"""
+CONVERSIONES_V2_MIGRADAS = ENCABEZADO_VIGENTE + """X1,2024-01-10 10:00:00,UYU,395.50,USD,10,39.55,V1,"cambio, en ""casa""
+de cambio"
+X2,2024-01-11 10:00:00,UYU,400,USD,10,40.0,,
+"""
+
+COMPRAS_V1 = """ID_Compra,Fecha_Compra,Cantidad_USDT_Comprada,Moneda_Pago,Precio_Unitario_Moneda_Pago,Tasa_Cambio_UYU_USD_Compra,Fuente_De_Fondos_Fiat,Comisiones_Compra_Moneda_Pago
+C1,2024-01-01 10:00:00,100.0,UYU,39.50,39.5,Ahorros UYU,0
+"""
+
+
+def _escribir(directorio, nombre: str, contenido: str) -> str:
+    ruta = directorio / nombre
+    ruta.write_text(contenido, encoding='utf-8')
+    return str(ruta)
+
+
+def _leer(ruta: str) -> str:
+    with open(ruta, encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('original, migrado, filas', [(CONVERSIONES_V1, CONVERSIONES_V1_MIGRADAS, 4),
+                                                      (CONVERSIONES_V2, CONVERSIONES_V2_MIGRADAS, 2)],
+                         ids=['v1', 'v2'])
+@pytest.mark.parametrize('filas_por_chunk', [1, 1000])
+def test_migra_conversiones_al_esquema_vigente(tmp_path, original, migrado, filas, filas_por_chunk):
+    ruta = _escribir(tmp_path, 'conversiones_fiat.csv', original)
+    en_memoria = leer_csv_tipado(ruta)  # Lo que ve el tracker antes de migrar (adaptado al leer)
+    assert necesita_migracion(ruta)
+
+    assert migrar_archivo(ruta, filas_por_chunk=filas_por_chunk) == filas
+    assert _leer(ruta) == migrado
+    assert _leer(ruta + SUFIJO_RESPALDO) == original
+    assert not necesita_migracion(ruta)
+    # Mismos valores que la lectura adaptada (una categórica sin valores puede cambiar el tipo de sus categorías)
+    pd.testing.assert_frame_equal(leer_csv_tipado(ruta).astype(object), en_memoria.astype(object))
+
+
+def test_columnas_mezcladas_no_pierden_datos(tmp_path):
+    # Filas escritas con dos esquemas: la columna legada completa a la vigente donde está vacía
+    ruta = _escribir(tmp_path, 'conversiones_fiat.csv', ENCABEZADO_VIGENTE.rstrip('\n') + ',Tasa_Cambio\n'
+                     'X1,2024-01-10,UYU,395,USD,10,,V1,,39.6\n'
+                     'X2,2024-01-11,UYU,400,USD,10,40.1,,nota,\n')
+    assert migrar_archivo(ruta) == 2
+    assert _leer(ruta) == ENCABEZADO_VIGENTE + 'X1,2024-01-10,UYU,395,USD,10,39.6,V1,\nX2,2024-01-11,UYU,400,USD,10,40.1,,nota\n'
+
+
+def test_compras_v1_reciben_plataforma_por_defecto(tmp_path):
+    ruta = _escribir(tmp_path, 'compras_usdt.csv', COMPRAS_V1)
+    assert migrar_archivo(ruta, respaldo=False) == 1
+    assert _leer(ruta).splitlines() == [COMPRAS_V1.splitlines()[0] + ',Plataforma',
+                                        COMPRAS_V1.splitlines()[1] + ',Otro']
+    assert not os.path.exists(ruta + SUFIJO_RESPALDO)
+
+
+def test_esquema_vigente_no_se_toca(tmp_path):
+    ruta = _escribir(tmp_path, 'conversiones_fiat.csv', CONVERSIONES_V2_MIGRADAS)
+    os.utime(ruta, ns=(1_000_000_000, 1_000_000_000))
+    assert migrar_archivo(ruta) is None
+    assert main([ruta]) == 0
+    assert _leer(ruta) == CONVERSIONES_V2_MIGRADAS
+    assert os.stat(ruta).st_mtime_ns == 1_000_000_000
+    assert not os.path.exists(ruta + SUFIJO_RESPALDO)
+    assert main([str(tmp_path / 'no_existe.csv')]) == 1
+
+
+def test_dashboard_migra_al_iniciar(tmp_path, monkeypatch):
+    rutas = {'COMPRAS_CSV': _escribir(tmp_path, 'compras_usdt.csv', COMPRAS_V1),
+             'VENTAS_CSV': str(tmp_path / 'ventas_usdt.csv'),
+             'CONVERSIONES_CSV': _escribir(tmp_path, 'conversiones_fiat.csv', CONVERSIONES_V1)}
+    for nombre, ruta in rutas.items():
+        monkeypatch.setattr(dashboard_p2p, nombre, ruta)
+    dashboard = dashboard_p2p.P2PDashboardRich.__new__(dashboard_p2p.P2PDashboardRich)
+    dashboard.console = Console(file=io.StringIO(), width=200)
+
+    dashboard._inicializar_archivos_csv()
+    assert _leer(rutas['CONVERSIONES_CSV']) == CONVERSIONES_V1_MIGRADAS
+    assert _leer(rutas['CONVERSIONES_CSV'] + SUFIJO_RESPALDO) == CONVERSIONES_V1
+    assert _leer(rutas['COMPRAS_CSV']).splitlines()[1].endswith(',Otro')
+    assert not necesita_migracion(rutas['VENTAS_CSV'])  # Creado con el encabezado vigente
+    assert 'Compras USDT, Conversiones Fiat' in dashboard.console.file.getvalue()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Pipeline del tracker: etapas y equivalencia entre los modos completo, incremental y en flujo"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from conftest import compra, venta, leer_reporte
+from esquemas import esquema_vigente
+from script_p2p_tracker import crear_parser, main, ejecutar_pipeline, resolver_etapas, P2PTracker
+
+
+def test_flujo_rechaza_etapas_parciales(ledgers, tmp_path):
+    with pytest.raises(SystemExit):
+        main(['--flujo', '--etapas', 'preliminares', '--salida', str(tmp_path)])
+    with pytest.raises(ValueError):
+        ejecutar_pipeline(P2PTracker(directorio_reportes=str(tmp_path)), ledgers.compras, ledgers.ventas,
+                          etapas=['cpp'], modo_flujo=True)
+
+
+def test_flujo_sin_checkpoint(ledgers, tmp_path):
+    ledgers.escribir([compra('C1', '2024-01-01 10:00:00', 10)], [venta('V1', '2024-01-02 10:00:00', 4)])
+    assert crear_parser().parse_args(['--flujo', '--etapas', 'conversiones', 'reportes']).flujo
+    tracker = P2PTracker(directorio_reportes=str(tmp_path / 'out'))
+    ejecutar_pipeline(tracker, ledgers.compras, ledgers.ventas, ledgers.conversiones,
+                      etapas=['conversiones', 'reportes'], modo_flujo=True, filas_por_chunk=1)
+    assert (tmp_path / 'out' / 'reporte_ventas_pl.csv').exists()
+    assert not (tmp_path / 'out' / 'checkpoint_cpp.json').exists()
+
+
+# Ventas en UYU que financian compras posteriores (lote explícito, FIFO y sin cubrir)
+COMPRAS = ([compra('C1', '2024-01-01 10:00:00', 100, precio=1.01)]
+           + [compra(f'C{i}', f'2024-01-{i:02d} 12:00:00', 40 if i == 17 else 3 + i % 4, precio=40.0 + i / 10, moneda='UYU', tasa=39.0,
+                     fuente=f'Venta_ID_V{i - 1}' if i % 3 == 0 else 'Ventas_FIFO', plataforma='binance')
+              for i in range(2, 20)])
+VENTAS = [venta(f'V{i}', f'2024-01-{i:02d} 09:00:00', 4 + i % 5, precio=41.0 + i / 10, moneda='UYU', tasa=39.5)
+          for i in range(1, 20)]
+REPORTES = {'reporte_ventas_pl': 'ID_Venta', 'reporte_flujo_fiat': 'ID_Venta',
+            'reporte_asignaciones_fiat': ['ID_Compra', 'ID_Venta']}
+
+
+@pytest.mark.parametrize('punto_fijo', [False, True])
+def test_completo_incremental_y_flujo_coinciden(ledgers, tmp_path, punto_fijo):
+    ledgers.escribir(COMPRAS[:8], VENTAS[:8])
+    ledgers.correr(tmp_path / 'inc', punto_fijo=punto_fijo)
+    ledgers.agregar(COMPRAS[8:14], VENTAS[8:14])
+    assert ledgers.correr(tmp_path / 'inc', incremental=True, punto_fijo=punto_fijo).modo_incremental
+    ledgers.agregar(COMPRAS[14:], VENTAS[14:])
+    assert ledgers.correr(tmp_path / 'inc', incremental=True, punto_fijo=punto_fijo).modo_incremental
+    ledgers.correr(tmp_path / 'full', punto_fijo=punto_fijo)
+    ledgers.correr(tmp_path / 'flujo', punto_fijo=punto_fijo, flujo=4)
+
+    completo = {nombre: leer_reporte(tmp_path / 'full', nombre, orden) for nombre, orden in REPORTES.items()}
+    assert set(completo['reporte_asignaciones_fiat']['Tipo_Asignacion']) == {'explicita', 'fifo', 'sin_cubrir'}
+    for salida in ('inc', 'flujo'):
+        for nombre, orden in REPORTES.items():
+            pd.testing.assert_frame_equal(leer_reporte(tmp_path / salida, nombre, orden), completo[nombre],
+                                          obj=f'{salida}/{nombre}')
+
+
+@pytest.mark.parametrize('etapas', [['checkpoint'], ['reportes']])
+def test_reportes_y_checkpoint_incluyen_conversiones(ledgers, tmp_path, etapas):
+    ledgers.escribir(COMPRAS[:1], VENTAS[:2])
+    pd.DataFrame([['X1', '2024-01-03 10:00:00', 'UYU', 100.0, 'USD', 2.5, 40.0, 'V1', '']],
+                 columns=esquema_vigente('conversiones').columnas).to_csv(ledgers.conversiones, index=False)
+    assert 'conversiones' in resolver_etapas(etapas)
+    ledgers.correr(tmp_path / 'out')
+    previos = {nombre: (tmp_path / 'out' / f'{nombre}.csv').read_bytes()
+               for nombre in ('reporte_flujo_fiat', 'reporte_conversiones_fiat')}
+    assert b'Convertido' in previos['reporte_flujo_fiat']
+
+    ejecutar_pipeline(P2PTracker(directorio_reportes=str(tmp_path / 'out')), ledgers.compras, ledgers.ventas,
+                      ledgers.conversiones, etapas=etapas, incremental=False)
+    for nombre, contenido in previos.items():
+        assert (tmp_path / 'out' / f'{nombre}.csv').read_bytes() == contenido, nombre
+
+
+def test_profile_respeta_quiet(ledgers, tmp_path, capsys):
+    ledgers.escribir(COMPRAS[:2], VENTAS[:2])
+    argumentos = ['--compras', ledgers.compras, '--ventas', ledgers.ventas, '--conversiones', ledgers.conversiones,
+                  '--profile']
+    main(argumentos + ['--salida', str(tmp_path / 'quiet'), '--quiet', '--log-jsonl', str(tmp_path / 'log.jsonl')])
+    assert capsys.readouterr().out == ''
+    assert (tmp_path / 'quiet' / 'perfil_tracker.json').exists()
+    with open(tmp_path / 'log.jsonl', encoding='utf-8') as f:
+        eventos = [json.loads(linea) for linea in f]
+    etapas = {evento['nombre'] for evento in eventos if evento.get('evento') == 'perfil_etapa'}
+    assert {'cargar_datos', 'procesar_cpp_y_pl'} <= etapas
+
+    main(argumentos + ['--salida', str(tmp_path / 'normal')])
+    assert '📊 Perfil por etapa' in capsys.readouterr().out
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""CPP en punto fijo: coincide con float y no corrompe montos NaN/infinitos"""
+
+import numpy as np
+import pytest
+
+from conftest import compra, venta
+from compacto import a_punto_fijo, desde_punto_fijo
+from motor_cpp import ordenar_transacciones, calcular_cpp
+
+
+def test_a_punto_fijo_redondea_y_vuelve():
+    enteros = a_punto_fijo([1.0000004, 2.5, -0.0000015])
+    assert enteros.tolist() == [1000000, 2500000, -2]
+    assert desde_punto_fijo(enteros).tolist() == [1.0, 2.5, -0.000002]
+
+
+@pytest.mark.parametrize('valor', [np.nan, np.inf, -np.inf])
+def test_a_punto_fijo_rechaza_no_finitos(valor):
+    with pytest.raises(ValueError):
+        a_punto_fijo([1.0, valor])
+
+
+def _transacciones_aleatorias(n: int, semilla: int = 7):
+    rng = np.random.default_rng(semilla)
+    fechas = np.datetime64('2024-01-01') + np.sort(rng.integers(0, 10**6, 2 * n)).astype('timedelta64[s]')
+    cantidades = np.round(rng.uniform(1, 500, 2 * n), 3)
+    compras, ventas = fechas[::2], fechas[1::2]
+    return ordenar_transacciones(compras, ventas, cantidades[::2], cantidades[1::2] * 0.9,
+                                 np.round(cantidades[::2] * rng.uniform(0.98, 1.03, n), 2),
+                                 np.round(cantidades[1::2] * 0.9 * rng.uniform(0.99, 1.05, n), 2))
+
+
+def test_punto_fijo_coincide_con_float():
+    transacciones = _transacciones_aleatorias(5000)
+    flotante = calcular_cpp(transacciones)
+    fijo = calcular_cpp(transacciones, escala=10**6)
+
+    assert fijo['no_finitos'] == 0
+    assert (fijo['sin_stock'] == flotante['sin_stock']).all()
+    np.testing.assert_allclose(fijo['costo_base_usd'], flotante['costo_base_usd'], rtol=0, atol=1e-5)
+    np.testing.assert_allclose(fijo['ganancia_perdida_usd'], flotante['ganancia_perdida_usd'], rtol=0, atol=1e-5)
+    assert fijo['inventario_cantidad'] == pytest.approx(flotante['inventario_cantidad'], abs=1e-6)
+    assert fijo['inventario_costo_usd'] == pytest.approx(flotante['inventario_costo_usd'], abs=1e-3)
+
+
+def test_vender_todo_en_punto_fijo_deja_cero():
+    fechas = np.array(['2024-01-01', '2024-01-02', '2024-01-03'], dtype='datetime64[ns]')
+    transacciones = ordenar_transacciones(fechas[:2], fechas[2:], np.array([0.1, 0.2]), np.array([0.3]),
+                                          np.array([0.1, 0.2]), np.array([0.35]))
+    resultado = calcular_cpp(transacciones, escala=10**6)
+    assert not resultado['sin_stock'].any()
+    assert resultado['inventario_cantidad'] == 0.0
+    assert resultado['inventario_costo_usd'] == 0.0
+
+
+def test_kernel_con_montos_no_finitos_usa_float():
+    fechas = np.array(['2024-01-01', '2024-01-02', '2024-01-03'], dtype='datetime64[ns]')
+    transacciones = ordenar_transacciones(fechas[:2], fechas[2:], np.array([10.0, 10.0]), np.array([5.0]),
+                                          np.array([10.0, np.inf]), np.array([7.5]))
+    fijo = calcular_cpp(transacciones, escala=10**6)
+    flotante = calcular_cpp(transacciones)
+    assert fijo['no_finitos'] == 1
+    assert not np.isfinite(fijo['inventario_costo_usd'])
+    np.testing.assert_array_equal(fijo['costo_base_usd'], flotante['costo_base_usd'])
+
+
+@pytest.mark.parametrize('punto_fijo', [False, True])
+def test_tasa_cero_y_precio_vacio_se_ven_como_nan(ledgers, tmp_path, punto_fijo):
+    ledgers.escribir([compra('C1', '2024-01-01 10:00:00', 10),
+                      compra('C2', '2024-01-02 10:00:00', 10, moneda='UYU', precio=40.0, tasa=0.0),
+                      compra('C3', '2024-01-03 10:00:00', 5, precio=np.nan)],
+                     [venta('V1', '2024-01-04 10:00:00', 5)])
+    tracker = ledgers.correr(tmp_path / 'out', punto_fijo=punto_fijo)
+    assert tracker.transacciones_no_finitas == 2
+    assert np.isnan(tracker.df_ventas_calc['Costo_Base_USD_de_USDT_Vendido']).all()
+    assert not np.isfinite(tracker.inventario_usdt_costo_total_usd)
+
+
+def test_tracker_punto_fijo_es_opcional():
+    from script_p2p_tracker import P2PTracker, crear_parser
+    assert P2PTracker().escala_cpp is None
+    assert not crear_parser().parse_args([]).punto_fijo
+    assert crear_parser().parse_args(['--cpp-punto-fijo']).punto_fijo
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Modo sobreventa: faltantes pendientes saldados por compras posteriores"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import compra, venta, leer_reporte
+from motor_cpp import ordenar_transacciones, calcular_cpp
+
+COMPRAS = [compra('C1', '2024-01-01 10:00:00', 2), compra('C2', '2024-01-03 10:00:00', 4),
+           compra('C3', '2024-01-04 10:00:00', 10, precio=2.0)]
+VENTAS = [venta('V1', '2024-01-02 10:00:00', 10)]
+
+
+def _fechas(*fechas):
+    return np.array(fechas, dtype='datetime64[ns]')
+
+
+@pytest.mark.parametrize('escala', [None, 10**6])
+def test_kernel_salda_faltante_con_compras_posteriores(escala):
+    transacciones = ordenar_transacciones(
+        _fechas('2024-01-01', '2024-01-03', '2024-01-04'), _fechas('2024-01-02'),
+        np.array([2.0, 4.0, 10.0]), np.array([10.0]), np.array([2.0, 4.0, 20.0]), np.array([15.0]))
+    resultado = calcular_cpp(transacciones, escala=escala, sobreventa=True)
+
+    # 2 USDT del stock a 1.0, 4 de C2 a 1.0 y 4 de C3 a 2.0
+    assert resultado['costo_base_usd'][1] == pytest.approx(14.0)
+    assert resultado['ganancia_perdida_usd'][1] == pytest.approx(1.0)
+    assert resultado['faltante'][1] == pytest.approx(8.0)
+    assert resultado['resoluciones']['compra'].tolist() == [2, 3]
+    assert resultado['resoluciones']['cantidad'].tolist() == pytest.approx([4.0, 4.0])
+    assert resultado['inventario_cantidad'] == pytest.approx(6.0)
+    assert resultado['inventario_costo_usd'] == pytest.approx(12.0)
+    assert resultado['pendientes'] == []
+
+
+def test_kernel_sin_sobreventa_no_cambia():
+    transacciones = ordenar_transacciones(
+        _fechas('2024-01-01'), _fechas('2024-01-02'), np.array([2.0]), np.array([10.0]),
+        np.array([2.0]), np.array([15.0]))
+    resultado = calcular_cpp(transacciones)
+    assert resultado['sin_stock'][1]
+    assert resultado['costo_base_usd'][1] == 0.0
+    assert resultado['ganancia_perdida_usd'][1] == 15.0
+    assert resultado['inventario_cantidad'] == 2.0
+
+
+def test_kernel_pendientes_iniciales_se_saldan_primero():
+    transacciones = ordenar_transacciones(
+        _fechas('2024-01-05'), _fechas(), np.array([10.0]), np.array([]), np.array([20.0]), np.array([]))
+    resultado = calcular_cpp(transacciones, escala=10**6, sobreventa=True, pendientes_iniciales=[3.0, 4.0])
+    assert resultado['resoluciones']['venta'].tolist() == [-1, -2]
+    assert resultado['resoluciones']['costo_usd'].tolist() == pytest.approx([6.0, 8.0])
+    assert resultado['inventario_cantidad'] == pytest.approx(3.0)
+    assert resultado['inventario_costo_usd'] == pytest.approx(6.0)
+
+
+def test_incremental_con_pendientes_del_checkpoint_igual_a_completo(ledgers, tmp_path):
+    ledgers.escribir(COMPRAS[:1], VENTAS)
+    tracker = ledgers.correr(tmp_path / 'inc', sobreventa=True)
+    assert [p[0] for p in tracker.pendientes_sobreventa] == ['V1']
+
+    ledgers.agregar(COMPRAS[1:])
+    tracker = ledgers.correr(tmp_path / 'inc', incremental=True, sobreventa=True)
+    assert not tracker.modo_incremental  # Las compras nuevas saldan una venta ya escrita
+    ledgers.correr(tmp_path / 'full', sobreventa=True)
+
+    for nombre in ('reporte_ventas_pl', 'reporte_resoluciones_tardias'):
+        pd.testing.assert_frame_equal(leer_reporte(tmp_path / 'inc', nombre), leer_reporte(tmp_path / 'full', nombre))
+    pl = leer_reporte(tmp_path / 'full', 'reporte_ventas_pl')
+    assert pl.loc[0, 'Costo_Base_USD_de_USDT_Vendido'] > 2.1
+
+
+def test_incremental_solo_con_ventas_nuevas_conserva_pendientes(ledgers, tmp_path):
+    ledgers.escribir(COMPRAS[:1], VENTAS)
+    ledgers.correr(tmp_path / 'inc', sobreventa=True)
+    ledgers.agregar(ventas=[venta('V2', '2024-01-02 12:00:00', 1)])
+    tracker = ledgers.correr(tmp_path / 'inc', incremental=True, sobreventa=True)
+    assert tracker.modo_incremental
+    assert [(p[0], p[2]) for p in tracker.pendientes_sobreventa] == [('V1', 8.0), ('V2', 1.0)]
+
+    ledgers.agregar(COMPRAS[1:])
+    ledgers.correr(tmp_path / 'inc', incremental=True, sobreventa=True)
+    ledgers.correr(tmp_path / 'full', sobreventa=True)
+    pd.testing.assert_frame_equal(leer_reporte(tmp_path / 'inc', 'reporte_ventas_pl'),
+                                  leer_reporte(tmp_path / 'full', 'reporte_ventas_pl'))
+
+
+@pytest.mark.parametrize('punto_fijo', [True, False])
+def test_flujo_igual_a_completo_con_sobreventa(ledgers, tmp_path, punto_fijo):
+    compras = COMPRAS + [compra(f'C{i}', f'2024-02-{i:02d} 10:00:00', 3, precio=1 + i / 100) for i in range(4, 20)]
+    ventas = VENTAS + [venta(f'V{i}', f'2024-02-{i:02d} 09:00:00', 5 if i % 3 else 1) for i in range(2, 20)]
+    ledgers.escribir(compras, ventas)
+    ledgers.correr(tmp_path / 'full', sobreventa=True, punto_fijo=punto_fijo)
+    ledgers.correr(tmp_path / 'flujo', sobreventa=True, punto_fijo=punto_fijo, flujo=3)
+
+    pd.testing.assert_frame_equal(leer_reporte(tmp_path / 'flujo', 'reporte_ventas_pl', 'ID_Venta'),
+                                  leer_reporte(tmp_path / 'full', 'reporte_ventas_pl', 'ID_Venta'))
+    pd.testing.assert_frame_equal(
+        leer_reporte(tmp_path / 'flujo', 'reporte_resoluciones_tardias', ['ID_Venta', 'ID_Compra']),
+        leer_reporte(tmp_path / 'full', 'reporte_resoluciones_tardias', ['ID_Venta', 'ID_Compra']))
+
+
+def test_cambio_de_modo_fuerza_recalculo(ledgers, tmp_path):
+    ledgers.escribir(COMPRAS, VENTAS)
+    ledgers.correr(tmp_path / 'out', sobreventa=True)
+    tracker = ledgers.correr(tmp_path / 'out', incremental=True)
+    assert not tracker.modo_incremental
+    assert not (tmp_path / 'out' / 'reporte_resoluciones_tardias.csv').exists()
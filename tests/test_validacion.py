@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Validación y limpieza de ledgers: reglas, copia corregida y paridad Arrow/pandas"""
+
+import pandas as pd
+import pytest
+
+import validacion
+from validacion import validar_ledgers, reemplazar_con_limpio, SUFIJO_RESPALDO
+
+VENTAS = """ID_Venta,Fecha_Venta,Cantidad_USDT_Vendida,Moneda_Recibida,Precio_Unitario_Moneda_Recibida,Tasa_Cambio_UYU_USD_Venta,Comisiones_Venta_Moneda_Recibida,Plataforma
+V1,2024-01-01 10:00:00,10,UYU,40,,0,binance
+V1,2024-01-02 10:00:00,10,UYU,40,39.5,0,binance
+V2,2024-01-03 10:00:00,5,UYU,41.25,0,0,Binance
+V3,2024-13-45 10:00:00,5,USD,1,1,0,binance
+V4,2024-01-04 10:00:00,-1,USD,1,1,0,otro
+V5,2024-01-05 10:00:00,2,USD,abc,1,0,otro
+V6,2024-01-06 10:00:00,2,USD,1.5,1,0,
+V2,2024-01-07 10:00:00,1,USD,1.5,1,0,otro
+V7,2024/01/08 10:00,3,USD,1.50,1,0.010,bybit
+"""
+COMPRAS = """ID_Compra,Fecha_Compra,Cantidad_USDT_Comprada,Moneda_Pago,Precio_Unitario_Moneda_Pago,Tasa_Cambio_UYU_USD_Compra,Fuente_De_Fondos_Fiat,Comisiones_Compra_Moneda_Pago,Plataforma
+C1,2024-01-09 10:00:00,5,UYU,40,39.0,Venta_ID_V3,0,binance
+C2,2024-01-09 11:00:00,5,UYU,40,39.0,Venta_ID_V1,0,binance
+C3,2024-01-09 12:00:00,1,USD,1.01,,Venta_ID_V9,0,otro
+C4,,1,USD,1.01,1,Ahorros USD,0,otro
+"""
+CONVERSIONES = """ID_Conversion,Fecha_Conversion,Moneda_Origen,Cantidad_Origen,Moneda_Destino,Cantidad_Destino,Tasa_Conversion_Implicita,ID_Venta_Asociada,Notas
+X1,2024-01-10 10:00:00,UYU,395,USD,10,39.5,V1,"cambio, en casa
+de cambio"
+X2,2024-01-10 11:00:00,UYU,200,USD,5,40,V3,
+X3,2024-01-10 12:00:00,UYU,0,USD,5,40,,sin venta
+"""
+
+# (ledger, regla) -> (filas, corregidas, descartadas)
+ESPERADO = {
+    ('ventas', 'id_duplicado'): (1, 0, 1),            # El V2 de la fila 8; el V1 de la fila 2 no es duplicado
+    ('ventas', 'fecha_invalida'): (1, 0, 1),
+    ('ventas', 'cantidad_no_positiva'): (1, 0, 1),
+    ('ventas', 'precio_no_positivo'): (1, 0, 1),
+    ('ventas', 'tasa_faltante'): (2, 1, 1),           # V1 sin tasa previa se descarta; V2 toma 39.5
+    ('ventas', 'plataforma_desconocida'): (1, 1, 0),  # Vacía -> 'otro'
+    ('compras', 'fecha_invalida'): (1, 0, 1),
+    ('compras', 'venta_inexistente'): (2, 2, 0),      # V3 se descartó por su fecha: C1 pasa a FIFO
+    ('conversiones', 'cantidad_no_positiva'): (1, 0, 1),
+    ('conversiones', 'venta_inexistente'): (1, 1, 0),
+}
+
+
+def _ledgers(directorio):
+    archivos = {}
+    for ledger, nombre, contenido in (('ventas', 'ventas_usdt.csv', VENTAS), ('compras', 'compras_usdt.csv', COMPRAS),
+                                      ('conversiones', 'conversiones_fiat.csv', CONVERSIONES)):
+        ruta = directorio / nombre
+        ruta.write_text(contenido, encoding='utf-8')
+        archivos[ledger] = str(ruta)
+    return archivos
+
+
+def _validar(tmp_path, nombre, **opciones):
+    return validar_ledgers(_ledgers(tmp_path), str(tmp_path / nombre), str(tmp_path / f'{nombre}.csv'), **opciones)
+
+
+def test_reglas_y_copia_corregida(tmp_path):
+    validador = _validar(tmp_path, 'limpios')
+    reporte = validador.reporte()
+    assert {(fila.Ledger, fila.Regla): (fila.Filas, fila.Corregidas, fila.Descartadas)
+            for fila in reporte.itertuples()} == ESPERADO
+
+    limpios = {ledger: pd.read_csv(ruta, dtype=str, keep_default_na=False)
+               for ledger, ruta in validador.limpios.items()}
+    ventas = limpios['ventas'].set_index('ID_Venta')
+    assert ventas.index.tolist() == ['V1', 'V2', 'V6', 'V7']
+    assert ventas.loc['V1', 'Fecha_Venta'] == '2024-01-02 10:00:00'
+    assert ventas.loc['V2', 'Tasa_Cambio_UYU_USD_Venta'] == '39.5'
+    assert ventas.loc['V6', 'Plataforma'] == 'otro'
+    # Las filas válidas se copian tal cual (sin reformatear números ni fechas)
+    assert ventas.loc['V7'].tolist() == ['2024/01/08 10:00', '3', 'USD', '1.50', '1', '0.010', 'bybit']
+    assert limpios['compras']['Fuente_De_Fondos_Fiat'].tolist() == ['Ventas_FIFO', 'Venta_ID_V1', 'Ventas_FIFO']
+    assert limpios['conversiones']['ID_Venta_Asociada'].tolist() == ['V1', '']
+    assert limpios['conversiones']['Notas'].tolist() == ['cambio, en casa\nde cambio', '']
+    assert validador.filas == {'ventas': 9, 'compras': 4, 'conversiones': 3}
+    assert validador.filas_limpias == {'ventas': 4, 'compras': 3, 'conversiones': 2}
+
+
+def test_copia_corregida_valida_sin_violaciones(tmp_path):
+    limpios = _validar(tmp_path, 'limpios').limpios
+    revalidado = validar_ledgers(limpios)
+    assert revalidado.total_violaciones() == 0
+    assert revalidado.filas == {'ventas': 4, 'compras': 3, 'conversiones': 2}
+
+
+def test_plataforma_desconocida_solo_se_informa(tmp_path):
+    ruta = tmp_path / 'ventas_usdt.csv'
+    ruta.write_text(VENTAS.splitlines()[0] + '\nV1,2024-01-01 10:00:00,1,USD,1,1,0,Kraken\n', encoding='utf-8')
+    validador = validar_ledgers({'ventas': str(ruta)}, str(tmp_path / 'limpios'))
+    assert validador.reporte()[['Regla', 'Corregidas', 'Descartadas']].values.tolist() == [
+        ['plataforma_desconocida', 0, 0]]
+    assert validador.filas_limpias['ventas'] == 1
+    assert validar_ledgers({'ventas': str(ruta)}, plataformas=frozenset(['kraken'])).total_violaciones() == 0
+
+
+def _detalle(directorio) -> pd.DataFrame:
+    """Detalle de violaciones en un orden fijo (cada chunk escribe las suyas regla por regla)"""
+    detalle = pd.read_csv(directorio / 'limpios.csv', dtype=str, keep_default_na=False)
+    return detalle.sort_values(['Ledger', 'Fila', 'Regla'], kind='stable').reset_index(drop=True)
+
+
+@pytest.mark.parametrize('filas_por_chunk', [2, 3])
+def test_paridad_arrow_pandas_y_chunks(tmp_path, monkeypatch, filas_por_chunk):
+    for nombre in ('ref', 'pandas', 'chunks'):
+        (tmp_path / nombre).mkdir()
+    # Referencia: Arrow (si está instalado) y un único chunk
+    referencia = _validar(tmp_path / 'ref', 'limpios')
+    with monkeypatch.context() as m:
+        m.setattr(validacion, 'pa', None)
+        m.setattr(validacion, 'pa_csv', None)
+        con_pandas = _validar(tmp_path / 'pandas', 'limpios', filas_por_chunk=filas_por_chunk)
+    por_chunks = _validar(tmp_path / 'chunks', 'limpios', filas_por_chunk=filas_por_chunk)
+
+    for validador, directorio in ((con_pandas, 'pandas'), (por_chunks, 'chunks')):
+        pd.testing.assert_frame_equal(validador.reporte(), referencia.reporte())
+        pd.testing.assert_frame_equal(_detalle(tmp_path / directorio), _detalle(tmp_path / 'ref'))
+        for ledger, ruta in validador.limpios.items():
+            with open(ruta, 'rb') as f, open(referencia.limpios[ledger], 'rb') as g:
+                assert f.read() == g.read(), ledger
+
+
+def test_reemplazar_con_limpio_deja_respaldo(tmp_path):
+    archivos = _ledgers(tmp_path)
+    validador = validar_ledgers(archivos, str(tmp_path / 'limpios'))
+    reemplazar_con_limpio(archivos['ventas'], validador.limpios['ventas'])
+    assert (tmp_path / ('ventas_usdt.csv' + SUFIJO_RESPALDO)).read_text(encoding='utf-8') == VENTAS
+    assert (tmp_path / 'ventas_usdt.csv').read_bytes() == (tmp_path / 'limpios' / 'ventas_usdt.csv').read_bytes()